@@ -1,473 +1,978 @@
-import ttkbootstrap as ttk
-from ttkbootstrap.constants import *
-from ttkbootstrap import Style
-from tkinter import messagebox
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
-from visualisation import *
-from classes.bibliotheque import Bibliotheque
-from classes.livre import Livre
-from classes.membre import Membre
-from classes.exceptions import *
-
-# Creation de l'objet Bibliothèque et chargement des données (livres + membres)
-biblio = Bibliotheque()
-biblio.charger()
-
-# Configuration du style et de la fenêtre principale avec ttkbootstrap
-style = Style("darkly")  # Choix du thème (darkly, flatly, morph, ...)
-root = style.master
-root.title("Système de Gestion de Bibliothèque")
-root.geometry("1000x700")  # Dimensions fenêtre
-root.configure(bg="#1b697d")  # Couleur de fond
-
-#  Création des onglets : Livres, Membres, Statistiques
-onglets = ttk.Notebook(root, bootstyle="primary")
-tab_livres = ttk.Frame(onglets)
-tab_membres = ttk.Frame(onglets)
-tab_stats = ttk.Frame(onglets)
-onglets.add(tab_livres, text=' Livres')
-onglets.add(tab_membres, text=' Membres')
-onglets.add(tab_stats, text=' Statistiques')
-onglets.pack(expand=1, fill='both', padx=10, pady=10)
-
-# =======================
-#  Onglet LIVRES
-# =======================
-
-def refresh_liste_livres():
-    # Vide la liste affichée puis recharge tous les livres depuis biblio.livres
-    for row in tree_livres.get_children():
-        tree_livres.delete(row)
-    for livre in biblio.livres.values():
-        tree_livres.insert('', 'end', values=(livre.isbn, livre.titre, livre.auteur, livre.genre, livre.statut))
-
-# Frame contenant la liste des livres
-frame_livres = ttk.Frame(tab_livres, padding=10)
-frame_livres.pack(fill='both', expand=True)
-
-# Table (Treeview) affichant les livres avec colonnes ISBN, Titre, Auteur, Genre, Statut
-tree_livres = ttk.Treeview(frame_livres, columns=('ISBN', 'Titre', 'Auteur', 'Genre', 'Statut'), show='headings', bootstyle="info")
-for col in tree_livres["columns"]:
-    tree_livres.heading(col, text=col)  # Nom des colonnes
-tree_livres.pack(fill='both', expand=True, pady=10)
-
-# Formulaire d'ajout ou mise à jour d'un livre
-form_frame = ttk.Labelframe(tab_livres, text="Ajouter un Livre", padding=10, bootstyle="primary")
-form_frame.pack(pady=10)
-
-entries = {}       # Dictionnaire pour stocker les champs de saisie
-labels = {}        # Dictionnaire des labels des champs
-error_labels = {}  # Labels d'erreur affichés sous chaque champ (en rouge)
-champs = ["ISBN", "Titre", "Auteur", "Année", "Genre"]
-
-# Création dynamique des labels, champs d'entrée et labels d'erreur pour chaque champ
-for i, label_text in enumerate(champs):
-    lbl = ttk.Label(form_frame, text=label_text)
-    lbl.grid(row=0, column=i, padx=5)
-    labels[label_text] = lbl
-    
-    ent = ttk.Entry(form_frame, width=15, bootstyle="primary")
-    ent.grid(row=1, column=i, padx=5)
-    entries[label_text] = ent
-
-    # Label vide initial pour afficher un message d'erreur sous chaque champ si besoin
-    err_lbl = ttk.Label(form_frame, text="", foreground="red")
-    err_lbl.grid(row=2, column=i)
-    error_labels[label_text] = err_lbl
-
-def valider_champs():
-    # Valide que tous les champs sont remplis, sinon met en rouge les champs et labels concernés
-    valid = True
-    for champ in champs:
-        value = entries[champ].get().strip()
-        if not value:
-            entries[champ].configure(bootstyle="danger")    # Champ rouge
-            labels[champ].configure(foreground="red")       # Label rouge
-            error_labels[champ].configure(text="Remplir ce champ")
-            valid = False
-        else:
-            entries[champ].configure(bootstyle="success")   # Champ vert
-            labels[champ].configure(foreground="white")     # Label blanc
-            error_labels[champ].configure(text="")
-    return valid
-
-def vider_champs():
-    # Vide tous les champs et remet leur style à normal (primaire)
-    for champ in champs:
-        entries[champ].delete(0, 'end')
-        entries[champ].configure(bootstyle="primary")
-        labels[champ].configure(foreground="white")
-        error_labels[champ].configure(text="")
-
-def ajouter_livre():
-    # Fonction déclenchée lors de l'ajout ou mise à jour d'un livre via le formulaire
-    if not valider_champs():
-        messagebox.showerror("Erreur", "Veuillez remplir tous les champs.")
-        return
-
-    isbn = entries["ISBN"].get().strip()
-    titre = entries["Titre"].get().strip()
-    auteur = entries["Auteur"].get().strip()
-    annee = entries["Année"].get().strip()
-    genre = entries["Genre"].get().strip()
-
-    try:
-        if isbn in biblio.livres:
-            # Mise à jour d'un livre existant
-            livre = biblio.livres[isbn]
-            livre.titre = titre
-            livre.auteur = auteur
-            livre.annee = annee
-            livre.genre = genre
-            message = "Livre mis à jour avec succès."
-        else:
-            # Ajout d'un nouveau livre
-            livre = Livre(isbn, titre, auteur, annee, genre)
-            biblio.ajouter_livre(livre)
-            message = "Livre ajouté avec succès."
-
-        biblio.sauvegarder()  # Sauvegarde des données dans fichier
-        refresh_liste_livres()  # Rafraîchit l'affichage
-        vider_champs()
-        messagebox.showinfo("Succès", message)
-
-    except Exception as e:
-        messagebox.showerror("Erreur", str(e))
-
-def supprimer_livre_selectionne():
-    # Supprime le livre sélectionné dans la table, après confirmation
-    selected = tree_livres.selection()
-    if not selected:
-        messagebox.showwarning("Aucun livre sélectionné", "Veuillez sélectionner un livre à supprimer.")
-        return
-
-    try:
-        item = tree_livres.item(selected[0])
-        isbn = str(item["values"][0]).strip()
-
-        if isbn not in biblio.livres:
-            raise LivreInexistantError()
-
-        confirmation = messagebox.askyesno("Confirmation", f"Voulez-vous vraiment supprimer le livre ISBN {isbn} ?")
-        if not confirmation:
-            return
-
-        #  Supprimer le livre de la liste des livres empruntés par tous les membres
-        for membre in biblio.membres.values():
-            if isbn in membre.livres_empruntes:
-                membre.livres_empruntes.remove(isbn)
-
-        # Supprimer le livre de la bibliothèque
-        biblio.supprimer_livre(isbn)
-        biblio.sauvegarder()
-
-        refresh_liste_livres()
-        refresh_membres()  # Met à jour aussi la liste des membres (car leurs emprunts ont changé)
-
-        messagebox.showinfo("Succès", f"Livre ISBN {isbn} supprimé avec succès.")
-
-    except LivreInexistantError:
-        messagebox.showerror("Erreur", "Le livre sélectionné n'existe pas.")
-    except Exception as e:
-        messagebox.showerror("Erreur", f"Erreur lors de la suppression : {str(e)}")
-
-# Boutons pour ajouter/metre à jour et supprimer un livre
-ttk.Button(form_frame, text="Ajouter / Mettre à jour Livre", command=ajouter_livre, bootstyle="success-outline rounded").grid(row=3, column=0, columnspan=len(champs), pady=10)
-ttk.Button(
-    form_frame,
-    text=" Supprimer Livre Sélectionné",
-    command=lambda: supprimer_livre_selectionne(),
-    bootstyle="danger-outline"
-).grid(row=4, column=0, columnspan=len(champs), pady=5)
-
-refresh_liste_livres()  # Affiche la liste des livres au démarrage
-
-# =======================
-#  Onglet MEMBRES 
-# =======================
-
-def refresh_membres():
-    # Vide et recharge la table des membres avec leurs emprunts affichés
-    for row in tree_membres.get_children():
-        tree_membres.delete(row)
-    for m in biblio.membres.values():
-        tree_membres.insert('', 'end', values=(m.id_membre, m.nom, ", ".join(m.livres_empruntes)))
-
-frame_membres = ttk.Frame(tab_membres, padding=10)
-frame_membres.pack(fill='both', expand=True)
-
-# Table affichant les membres avec ID, Nom, et Livres empruntés
-tree_membres = ttk.Treeview(frame_membres, columns=('ID', 'Nom', 'Livres Empruntés'), show='headings', bootstyle="info")
-for col in tree_membres["columns"]:
-    tree_membres.heading(col, text=col)
-tree_membres.pack(fill='both', expand=True, pady=10)
-
-# Conteneur pour les 3 sections dans Membres : Ajout, Emprunt, Retour
-frame_sections = ttk.Frame(tab_membres)
-frame_sections.pack(fill='x', pady=10, padx=10)
-
-# ----- Section 1 : Ajouter un Membre -----
-form_ajout = ttk.Labelframe(frame_sections, text="Ajouter un Membre", padding=10, bootstyle="primary")
-form_ajout.grid(row=0, column=0, sticky='nsew', padx=5)
-
-id_entry = ttk.Entry(form_ajout, width=15, bootstyle="primary")
-nom_entry = ttk.Entry(form_ajout, width=15, bootstyle="primary")
-ttk.Label(form_ajout, text="ID").grid(row=0, column=0, padx=5, pady=2)
-id_entry.grid(row=1, column=0, padx=5, pady=2)
-ttk.Label(form_ajout, text="Nom").grid(row=0, column=1, padx=5, pady=2)
-nom_entry.grid(row=1, column=1, padx=5, pady=2)
-
-def valider_ajout_membre():
-    # Valide que l'ID et le nom sont remplis pour ajouter un membre
-    valid = True
-    if not id_entry.get().strip():
-        id_entry.configure(bootstyle="danger")
-        valid = False
-    else:
-        id_entry.configure(bootstyle="primary")
-    if not nom_entry.get().strip():
-        nom_entry.configure(bootstyle="danger")
-        valid = False
-    else:
-        nom_entry.configure(bootstyle="primary")
-    return valid
-
-def ajouter_membre():
-    # Ajoute un membre à la bibliothèque si la validation passe
-    if not valider_ajout_membre():
-        messagebox.showerror("Erreur", "Veuillez remplir tous les champs.")
-        return
-    try:
-        membre = Membre(id_entry.get().strip(), nom_entry.get().strip())
-        biblio.enregistrer_membre(membre)
-        biblio.sauvegarder()
-        refresh_membres()
-        messagebox.showinfo("Succès", "Membre ajouté.")
-        id_entry.delete(0, 'end')
-        nom_entry.delete(0, 'end')
-        id_entry.configure(bootstyle="primary")
-        nom_entry.configure(bootstyle="primary")
-    except Exception as e:
-        messagebox.showerror("Erreur", str(e))
-
-ttk.Button(form_ajout, text="Ajouter Membre", command=ajouter_membre, bootstyle="success-outline").grid(row=2, column=0, columnspan=2, pady=10)
-
-# ----- Section 2 : Emprunter un Livre -----
-form_emprunt = ttk.Labelframe(frame_sections, text="Emprunter un Livre", padding=10, bootstyle="primary")
-form_emprunt.grid(row=0, column=1, sticky='nsew', padx=5)
-
-emprunt_id_entry = ttk.Entry(form_emprunt, width=15, bootstyle="primary")
-emprunt_isbn_entry = ttk.Entry(form_emprunt, width=15, bootstyle="primary")
-ttk.Label(form_emprunt, text="ID Membre").grid(row=0, column=0, padx=5, pady=2)
-emprunt_id_entry.grid(row=1, column=0, padx=5, pady=2)
-ttk.Label(form_emprunt, text="ISBN Livre").grid(row=0, column=1, padx=5, pady=2)
-emprunt_isbn_entry.grid(row=1, column=1, padx=5, pady=2)
-
-def valider_emprunt():
-    # Valide que les champs ID Membre et ISBN sont remplis pour un emprunt
-    valid = True
-    if not emprunt_id_entry.get().strip():
-        emprunt_id_entry.configure(bootstyle="danger")
-        valid = False
-    else:
-        emprunt_id_entry.configure(bootstyle="primary")
-    if not emprunt_isbn_entry.get().strip():
-        emprunt_isbn_entry.configure(bootstyle="danger")
-        valid = False
-    else:
-        emprunt_isbn_entry.configure(bootstyle="primary")
-    return valid
-
-def emprunter_livre():
-    # Gère l'emprunt d'un livre par un membre
-    if not valider_emprunt():
-        messagebox.showerror("Erreur", "Veuillez remplir tous les champs.")
-        return
-    id_membre = emprunt_id_entry.get().strip()
-    isbn = emprunt_isbn_entry.get().strip()
-    try:
-        biblio.emprunter_livre(isbn, id_membre)  # Méthode métier pour emprunter
-        biblio.sauvegarder()
-        refresh_membres()
-        refresh_liste_livres()
-        messagebox.showinfo("Succès", f"Livre {isbn} emprunté par le membre {id_membre}.")
-        emprunt_id_entry.delete(0, 'end')
-        emprunt_isbn_entry.delete(0, 'end')
-    except Exception as e:
-        messagebox.showerror("Erreur", str(e))
-
-ttk.Button(form_emprunt, text="Emprunter Livre", command=emprunter_livre, bootstyle="success-outline").grid(row=2, column=0, columnspan=2, pady=10)
-
-# ----- Section 3 : Retourner un Livre -----
-form_retour = ttk.Labelframe(frame_sections, text="Retourner un Livre", padding=10, bootstyle="primary")
-form_retour.grid(row=0, column=2, sticky='nsew', padx=5)
-
-retour_id_entry = ttk.Entry(form_retour, width=15, bootstyle="primary")
-retour_isbn_entry = ttk.Entry(form_retour, width=15, bootstyle="primary")
-ttk.Label(form_retour, text="ID Membre").grid(row=0, column=0, padx=5, pady=2)
-retour_id_entry.grid(row=1, column=0, padx=5, pady=2)
-ttk.Label(form_retour, text="ISBN Livre").grid(row=0, column=1, padx=5, pady=2)
-retour_isbn_entry.grid(row=1, column=1, padx=5, pady=2)
-
-def valider_retour():
-    # Valide que les champs ID Membre et ISBN sont remplis pour retour livre
-    valid = True
-    if not retour_id_entry.get().strip():
-        retour_id_entry.configure(bootstyle="danger")
-        valid = False
-    else:
-        retour_id_entry.configure(bootstyle="primary")
-    if not retour_isbn_entry.get().strip():
-        retour_isbn_entry.configure(bootstyle="danger")
-        valid = False
-    else:
-        retour_isbn_entry.configure(bootstyle="primary")
-    return valid
-
-def retourner_livre():
-    # Gère le retour d'un livre par un membre
-    if not valider_retour():
-        messagebox.showerror("Erreur", "Veuillez remplir tous les champs.")
-        return
-    id_membre = retour_id_entry.get().strip()
-    isbn = retour_isbn_entry.get().strip()
-    try:
-        biblio.retourner_livre(isbn, id_membre)
-        biblio.sauvegarder()
-        refresh_membres()
-        refresh_liste_livres()
-        messagebox.showinfo("Succès", f"Livre {isbn} retourné par le membre {id_membre}.")
-        retour_id_entry.delete(0, 'end')
-        retour_isbn_entry.delete(0, 'end')
-    except Exception as e:
-        messagebox.showerror("Erreur", str(e))
-
-ttk.Button(form_retour, text="Retourner Livre", command=retourner_livre, bootstyle="success-outline").grid(row=2, column=0, columnspan=2, pady=10)
-
-# Bouton pour supprimer un membre sélectionné dans la table des membres
-def supprimer_membre_selectionne():
-    selection = tree_membres.selection()
-    if not selection:
-        messagebox.showwarning("Avertissement", "Aucun membre sélectionné.")
-        return
-
-    id_membre = tree_membres.item(selection[0], "values")[0]
-    try:
-        if id_membre not in biblio.membres:
-            raise MembreInexistantError()
-
-        membre = biblio.membres[id_membre]
-
-        #  Rendre tous les livres empruntés par ce membre disponibles
-        for isbn in membre.livres_empruntes:
-            if isbn in biblio.livres:
-                biblio.livres[isbn].statut = "disponible"
-
-        #  Supprimer le membre de la bibliothèque
-        del biblio.membres[id_membre]
-        biblio.sauvegarder()
-
-        refresh_membres()
-        refresh_liste_livres()
-
-        messagebox.showinfo("Succès", f"Membre {id_membre} supprimé et ses livres ont été rendus disponibles.")
-
-    except Exception as e:
-        messagebox.showerror("Erreur", str(e))
-
-ttk.Button(tab_membres, text=" Supprimer Membre Sélectionné", command=supprimer_membre_selectionne, bootstyle="danger-outline").pack(pady=10)
-
-# Ajustement des colonnes pour que les 3 sections soient équitablement réparties
-frame_sections.columnconfigure(0, weight=1)
-frame_sections.columnconfigure(1, weight=1)
-frame_sections.columnconfigure(2, weight=1)
-
-refresh_membres()  # Affiche la liste des membres au démarrage
-
-# =======================
-#  Onglet STATISTIQUES
-# =======================
-
-# Variables globales pour stocker l'état actuel du graphique affiché
-canvas_stats = None
-current_fig = None
-graph_frame = None
-button_frame = None
-current_chart = "genres"
-
-def afficher_graphique_stats(fig):
-    # Affiche le graphique matplotlib passé en argument dans le frame dédié
-    global canvas_stats, current_fig
-    if canvas_stats:
-        canvas_stats.get_tk_widget().destroy()  # Supprime ancien graphique
-    if current_fig:
-        plt.close(current_fig)  # Ferme l'ancienne figure matplotlib
-    current_fig = fig
-    canvas_stats = FigureCanvasTkAgg(fig, master=graph_frame)
-    canvas_stats.draw()
-    canvas_stats.get_tk_widget().pack(fill='both', expand=True, pady=10)
-
-def switch_graphique(type_chart):
-    # Permet de changer de graphique selon le bouton sélectionné
-    global current_chart
-    current_chart = type_chart
-    if type_chart == "genres":
-        fig = genre_pie_chart_figure()
-    elif type_chart == "auteurs":
-        fig = top_auteurs_bar_figure()
-    elif type_chart == "emprunts":
-        fig = activite_emprunts_courbe_figure()
-    else:
-        fig = genre_pie_chart_figure()
-    afficher_graphique_stats(fig)
-    afficher_boutons()
-
-def afficher_boutons():
-    # Affiche les boutons permettant de changer de graphique
-    for widget in button_frame.winfo_children():
-        widget.destroy()
-
-    autres = {
-        "genres": [(" Top 10 Auteurs", "auteurs"), (" Emprunts Récents", "emprunts")],
-        "auteurs": [("Répartition Genres", "genres"), (" Emprunts Récents", "emprunts")],
-        "emprunts": [(" Répartition Genres", "genres"), (" Top 10 Auteurs", "auteurs")]
-    }
-
-    for texte, chart in autres.get(current_chart, []):
-        ttk.Button(
-            button_frame,
-            text=texte,
-            command=lambda c=chart: switch_graphique(c),
-            bootstyle="light-outline",
-            cursor="hand2",
-            width=20,
-            padding=10,
-        ).pack(side="left", padx=5)
-
-def afficher_statistiques():
-    # Initialisation et affichage des widgets graphiques dans l'onglet Statistiques
-    global graph_frame, button_frame
-    for widget in tab_stats.winfo_children():
-        widget.destroy()
-
-    ttk.Label(tab_stats, text="Statistiques de la Bibliothèque", font=("Segoe UI", 18, "bold")).pack(pady=5)
-
-    button_frame = ttk.Frame(tab_stats)
-    button_frame.pack(pady=5)
-
-    graph_frame = ttk.Frame(tab_stats)
-    graph_frame.pack(fill='both', expand=True)
-
-    switch_graphique("genres")  # Affiche par défaut la répartition des genres
-
-#  Détecte le changement d'onglet et recharge les stats si on arrive sur l'onglet Statistiques
-def on_tab_change(event):
-    if onglets.index("current") == 2:  # Index 2 = onglet Statistiques
-        afficher_statistiques()
-
-onglets.bind("<<NotebookTabChanged>>", on_tab_change)
-afficher_statistiques()
-
-#  Lancement principal de la boucle Tkinter
-root.mainloop()
+import argparse
+import time
+DEBUT_DEMARRAGE = time.perf_counter()
+import ttkbootstrap as ttk
+from ttkbootstrap.constants import *
+from ttkbootstrap import Style
+from tkinter import messagebox, filedialog, BooleanVar, StringVar, Text
+from concurrent.futures import ThreadPoolExecutor
+from tableau_virtuel import TableauVirtuel
+from classes.bibliotheque import Bibliotheque
+from classes.livre import Livre
+from classes.membre import Membre
+from classes.exceptions import *
+from classes.mesures import instrumenter, registre
+
+# Creation de l'objet Bibliothèque et chargement des données (livres + membres)
+# Mode "journal" : chaque opération ajoute une ligne à data/journal.jsonl au lieu de réécrire tous les fichiers
+# L'historique est écrit par lots sur un thread dédié pour ne jamais bloquer l'interface
+# Le snapshot binaire data/livres.bin accélère le démarrage (livres construits à la demande)
+# Mode client : python App.py --serveur 127.0.0.1:8765 utilise le serveur de classes/serveur.py
+#
+# Démarrage : la fenêtre est dessinée avant la lecture des données (voir demarrer() en fin de
+# fichier). matplotlib et visualisation ne sont importés qu'à la première ouverture de l'onglet
+# Statistiques, ou en arrière-plan une fois les données affichées.
+# python App.py --chrono-demarrage affiche les temps de démarrage puis quitte.
+parser = argparse.ArgumentParser(description="Système de Gestion de Bibliothèque")
+parser.add_argument("--serveur", metavar="HOTE:PORT", help="se connecter à un serveur au lieu des fichiers locaux")
+parser.add_argument("--chrono-demarrage", action="store_true", help="affiche les temps de démarrage puis quitte")
+arguments = parser.parse_args()
+if arguments.serveur:
+    from classes.client import BibliothequeDistante  # asyncio et le protocole ne servent qu'en mode client
+    biblio = BibliothequeDistante(arguments.serveur)
+else:
+    biblio = Bibliotheque(persistance="journal", options_historique={"arriere_plan": True}, snapshot_binaire=True)
+
+# Configuration du style et de la fenêtre principale avec ttkbootstrap
+style = Style("darkly")  # Choix du thème (darkly, flatly, morph, ...)
+root = style.master
+root.title("Système de Gestion de Bibliothèque")
+root.geometry("1000x700")  # Dimensions fenêtre
+root.configure(bg="#1b697d")  # Couleur de fond
+
+#  Création des onglets : Livres, Membres, Statistiques, Diagnostics
+onglets = ttk.Notebook(root, bootstyle="primary")
+tab_livres = ttk.Frame(onglets)
+tab_membres = ttk.Frame(onglets)
+tab_stats = ttk.Frame(onglets)
+tab_diagnostics = ttk.Frame(onglets)
+onglets.add(tab_livres, text=' Livres')
+onglets.add(tab_membres, text=' Membres')
+onglets.add(tab_stats, text=' Statistiques')
+onglets.add(tab_diagnostics, text=' Diagnostics')
+onglets.pack(expand=1, fill='both', padx=10, pady=10)
+
+# =======================
+#  Onglet LIVRES
+# =======================
+
+def valeurs_livre(isbn):
+    # Valeurs d'une ligne de la table des livres (None si le livre n'existe plus) ; un livre
+    # emprunté ou mis de côté affiche aussi ses réservations
+    livre = biblio.livres.get(isbn)
+    if livre is None:
+        return None
+    return (livre.isbn, livre.titre, livre.auteur, livre.genre, texte_statut(livre))
+
+def texte_statut(livre):
+    if livre.statut == "disponible":
+        return livre.statut
+    detenteur, file = biblio.reservations_livre(livre.isbn)
+    texte = f"{livre.statut} pour {detenteur}" if detenteur is not None else livre.statut
+    return f"{texte} ({len(file)} en attente)" if file else texte
+
+@instrumenter("app.refresh_liste_livres")
+def refresh_liste_livres():
+    # Remplace la liste des livres affichés : tous, ou seulement ceux qui correspondent à la recherche
+    # (seules les lignes visibles sont réellement créées dans la table)
+    requete = recherche_var.get().strip()
+    if requete:
+        tableau_livres.afficher(livre.isbn for livre in biblio.rechercher(requete, limit=500))
+    else:
+        tableau_livres.afficher(biblio.livres)
+
+@instrumenter("app.maj_livres")
+def maj_livres(*isbns):
+    # Met à jour uniquement les lignes des livres modifiés ; pendant une recherche,
+    # un nouveau livre peut ne pas correspondre, la recherche est donc relancée
+    if recherche_var.get().strip() and any(isbn not in tableau_livres for isbn in isbns):
+        refresh_liste_livres()
+    else:
+        tableau_livres.mettre_a_jour(*isbns)
+
+# Barre de recherche : filtre la liste des livres à chaque frappe (titre, auteur, genre, sans accents)
+frame_recherche = ttk.Frame(tab_livres, padding=(10, 10, 10, 0))
+frame_recherche.pack(fill='x')
+ttk.Label(frame_recherche, text="Rechercher").pack(side='left', padx=5)
+recherche_var = StringVar()
+ttk.Entry(frame_recherche, textvariable=recherche_var, bootstyle="info").pack(side='left', fill='x', expand=True, padx=5)
+recherche_var.trace_add("write", lambda *args: refresh_liste_livres())
+
+# Frame contenant la liste des livres
+frame_livres = ttk.Frame(tab_livres, padding=10)
+frame_livres.pack(fill='both', expand=True)
+
+# Table virtualisée affichant les livres avec colonnes ISBN, Titre, Auteur, Genre, Statut
+# (clic sur un en-tête pour trier)
+tableau_livres = TableauVirtuel(frame_livres, ('ISBN', 'Titre', 'Auteur', 'Genre', 'Statut'), valeurs_livre, bootstyle="info")
+tableau_livres.pack(fill='both', expand=True, pady=10)
+tree_livres = tableau_livres.tree
+# Visible sur la première image, jusqu'à la fin du chargement des données
+label_chargement = ttk.Label(frame_livres, text="Chargement des données...", font=("Segoe UI", 12))
+label_chargement.place(relx=0.5, rely=0.5, anchor='center')
+
+# Formulaire d'ajout ou mise à jour d'un livre
+form_frame = ttk.Labelframe(tab_livres, text="Ajouter un Livre", padding=10, bootstyle="primary")
+form_frame.pack(pady=10)
+
+entries = {}       # Dictionnaire pour stocker les champs de saisie
+labels = {}        # Dictionnaire des labels des champs
+error_labels = {}  # Labels d'erreur affichés sous chaque champ (en rouge)
+champs = ["ISBN", "Titre", "Auteur", "Année", "Genre"]
+
+# Création dynamique des labels, champs d'entrée et labels d'erreur pour chaque champ
+for i, label_text in enumerate(champs):
+    lbl = ttk.Label(form_frame, text=label_text)
+    lbl.grid(row=0, column=i, padx=5)
+    labels[label_text] = lbl
+    
+    ent = ttk.Entry(form_frame, width=15, bootstyle="primary")
+    ent.grid(row=1, column=i, padx=5)
+    entries[label_text] = ent
+
+    # Label vide initial pour afficher un message d'erreur sous chaque champ si besoin
+    err_lbl = ttk.Label(form_frame, text="", foreground="red")
+    err_lbl.grid(row=2, column=i)
+    error_labels[label_text] = err_lbl
+
+def valider_champs():
+    # Valide que tous les champs sont remplis, sinon met en rouge les champs et labels concernés
+    valid = True
+    for champ in champs:
+        value = entries[champ].get().strip()
+        if not value:
+            entries[champ].configure(bootstyle="danger")    # Champ rouge
+            labels[champ].configure(foreground="red")       # Label rouge
+            error_labels[champ].configure(text="Remplir ce champ")
+            valid = False
+        else:
+            entries[champ].configure(bootstyle="success")   # Champ vert
+            labels[champ].configure(foreground="white")     # Label blanc
+            error_labels[champ].configure(text="")
+    return valid
+
+def vider_champs():
+    # Vide tous les champs et remet leur style à normal (primaire)
+    for champ in champs:
+        entries[champ].delete(0, 'end')
+        entries[champ].configure(bootstyle="primary")
+        labels[champ].configure(foreground="white")
+        error_labels[champ].configure(text="")
+
+def ajouter_livre():
+    # Fonction déclenchée lors de l'ajout ou mise à jour d'un livre via le formulaire
+    if not valider_champs():
+        messagebox.showerror("Erreur", "Veuillez remplir tous les champs.")
+        return
+
+    isbn = entries["ISBN"].get().strip()
+    titre = entries["Titre"].get().strip()
+    auteur = entries["Auteur"].get().strip()
+    annee = entries["Année"].get().strip()
+    genre = entries["Genre"].get().strip()
+
+    try:
+        if isbn in biblio.livres:
+            # Mise à jour d'un livre existant
+            biblio.modifier_livre(isbn, titre, auteur, annee, genre)
+            message = "Livre mis à jour avec succès."
+        else:
+            # Ajout d'un nouveau livre
+            livre = Livre(isbn, titre, auteur, annee, genre)
+            biblio.ajouter_livre(livre)
+            message = "Livre ajouté avec succès."
+
+        biblio.sauvegarder()  # Sauvegarde des données dans fichier
+        maj_livres(isbn)  # Rafraîchit la ligne du livre
+        vider_champs()
+        messagebox.showinfo("Succès", message)
+
+    except Exception as e:
+        messagebox.showerror("Erreur", str(e))
+
+def supprimer_livre_selectionne():
+    # Supprime le livre sélectionné dans la table, après confirmation
+    selected = tree_livres.selection()
+    if not selected:
+        messagebox.showwarning("Aucun livre sélectionné", "Veuillez sélectionner un livre à supprimer.")
+        return
+
+    try:
+        isbn = selected[0]  # Les lignes de la table sont identifiées par l'ISBN
+
+        if isbn not in biblio.livres:
+            raise LivreInexistantError()
+
+        confirmation = messagebox.askyesno("Confirmation", f"Voulez-vous vraiment supprimer le livre ISBN {isbn} ?")
+        if not confirmation:
+            return
+
+        # Supprimer le livre de la bibliothèque (et des emprunts et réservations des membres)
+        emprunteur = biblio.emprunteur_de(isbn)
+        detenteur, reservataires = biblio.reservations_livre(isbn)
+        if detenteur is not None:
+            reservataires.append(detenteur)
+        biblio.supprimer_livre(isbn)
+        biblio.sauvegarder()
+
+        maj_livres(isbn)
+        if emprunteur is not None:
+            tableau_membres.mettre_a_jour(emprunteur.id_membre)  # Ses emprunts ont changé
+        tableau_membres.mettre_a_jour(*reservataires)  # Leurs réservations aussi
+
+        messagebox.showinfo("Succès", f"Livre ISBN {isbn} supprimé avec succès.")
+
+    except LivreInexistantError:
+        messagebox.showerror("Erreur", "Le livre sélectionné n'existe pas.")
+    except Exception as e:
+        messagebox.showerror("Erreur", f"Erreur lors de la suppression : {str(e)}")
+
+# Boutons pour ajouter/metre à jour et supprimer un livre
+ttk.Button(form_frame, text="Ajouter / Mettre à jour Livre", command=ajouter_livre, bootstyle="success-outline rounded").grid(row=3, column=0, columnspan=len(champs), pady=10)
+ttk.Button(
+    form_frame,
+    text=" Supprimer Livre Sélectionné",
+    command=lambda: supprimer_livre_selectionne(),
+    bootstyle="danger-outline"
+).grid(row=4, column=0, columnspan=len(champs), pady=5)
+
+def afficher_reservations_livre():
+    # File d'attente du livre sélectionné : membre pour qui il est mis de côté, puis les suivants
+    selected = tree_livres.selection()
+    if not selected:
+        messagebox.showwarning("Aucun livre sélectionné", "Veuillez sélectionner un livre.")
+        return
+    isbn = selected[0]
+    try:
+        detenteur, file = biblio.reservations_livre(isbn)
+        lignes = []
+        if detenteur is not None:
+            retrait = biblio.membres[detenteur].reservation(isbn)[1]
+            lignes.append(f"Mis de côté pour {detenteur} jusqu'au {retrait[:10]}")
+        lignes += [f"{rang}. {id_membre}" for rang, id_membre in enumerate(file, 1)]
+        messagebox.showinfo(f"Réservations du livre {isbn}", "\n".join(lignes) or "Aucune réservation.")
+    except Exception as e:
+        messagebox.showerror("Erreur", str(e))
+
+ttk.Button(form_frame, text=" Réservations du Livre Sélectionné", command=afficher_reservations_livre,
+           bootstyle="info-outline").grid(row=5, column=0, columnspan=len(champs), pady=5)
+
+
+# =======================
+#  Onglet MEMBRES 
+# =======================
+
+def valeurs_membre(id_membre):
+    # Valeurs d'une ligne de la table des membres, avec leurs emprunts et réservations
+    # (None si le membre n'existe plus)
+    m = biblio.membres.get(id_membre)
+    if m is None:
+        return None
+    return (m.id_membre, m.nom, ", ".join(m.livres_empruntes), texte_reservations(m))
+
+def texte_reservations(membre):
+    # Livres réservés ; ceux qui attendent le membre affichent la fin de leur mise de côté
+    return ", ".join(f"{isbn} (à retirer avant le {retrait[:10]})" if retrait else isbn
+                     for isbn, (_, retrait) in membre.reservations.items())
+
+@instrumenter("app.refresh_membres")
+def refresh_membres():
+    # Recharge la liste complète des membres
+    tableau_membres.afficher(biblio.membres)
+
+frame_membres = ttk.Frame(tab_membres, padding=10)
+frame_membres.pack(fill='both', expand=True)
+
+# Table virtualisée affichant les membres avec ID, Nom, Livres empruntés et Réservations
+tableau_membres = TableauVirtuel(frame_membres, ('ID', 'Nom', 'Livres Empruntés', 'Réservations'), valeurs_membre,
+                                 bootstyle="info")
+tableau_membres.pack(fill='both', expand=True, pady=10)
+tree_membres = tableau_membres.tree
+
+# Conteneur pour les 3 sections dans Membres : Ajout, Emprunt, Retour
+frame_sections = ttk.Frame(tab_membres)
+frame_sections.pack(fill='x', pady=10, padx=10)
+
+# ----- Section 1 : Ajouter un Membre -----
+form_ajout = ttk.Labelframe(frame_sections, text="Ajouter un Membre", padding=10, bootstyle="primary")
+form_ajout.grid(row=0, column=0, sticky='nsew', padx=5)
+
+id_entry = ttk.Entry(form_ajout, width=15, bootstyle="primary")
+nom_entry = ttk.Entry(form_ajout, width=15, bootstyle="primary")
+ttk.Label(form_ajout, text="ID").grid(row=0, column=0, padx=5, pady=2)
+id_entry.grid(row=1, column=0, padx=5, pady=2)
+ttk.Label(form_ajout, text="Nom").grid(row=0, column=1, padx=5, pady=2)
+nom_entry.grid(row=1, column=1, padx=5, pady=2)
+
+def valider_ajout_membre():
+    # Valide que l'ID et le nom sont remplis pour ajouter un membre
+    valid = True
+    if not id_entry.get().strip():
+        id_entry.configure(bootstyle="danger")
+        valid = False
+    else:
+        id_entry.configure(bootstyle="primary")
+    if not nom_entry.get().strip():
+        nom_entry.configure(bootstyle="danger")
+        valid = False
+    else:
+        nom_entry.configure(bootstyle="primary")
+    return valid
+
+def ajouter_membre():
+    # Ajoute un membre à la bibliothèque si la validation passe
+    if not valider_ajout_membre():
+        messagebox.showerror("Erreur", "Veuillez remplir tous les champs.")
+        return
+    try:
+        membre = Membre(id_entry.get().strip(), nom_entry.get().strip())
+        biblio.enregistrer_membre(membre)
+        biblio.sauvegarder()
+        tableau_membres.mettre_a_jour(membre.id_membre)
+        messagebox.showinfo("Succès", "Membre ajouté.")
+        id_entry.delete(0, 'end')
+        nom_entry.delete(0, 'end')
+        id_entry.configure(bootstyle="primary")
+        nom_entry.configure(bootstyle="primary")
+    except Exception as e:
+        messagebox.showerror("Erreur", str(e))
+
+ttk.Button(form_ajout, text="Ajouter Membre", command=ajouter_membre, bootstyle="success-outline").grid(row=2, column=0, columnspan=2, pady=10)
+
+# ----- Section 2 : Emprunter un Livre -----
+form_emprunt = ttk.Labelframe(frame_sections, text="Emprunter un Livre", padding=10, bootstyle="primary")
+form_emprunt.grid(row=0, column=1, sticky='nsew', padx=5)
+
+emprunt_id_entry = ttk.Entry(form_emprunt, width=15, bootstyle="primary")
+emprunt_isbn_entry = ttk.Entry(form_emprunt, width=15, bootstyle="primary")
+ttk.Label(form_emprunt, text="ID Membre").grid(row=0, column=0, padx=5, pady=2)
+emprunt_id_entry.grid(row=1, column=0, padx=5, pady=2)
+ttk.Label(form_emprunt, text="ISBN Livre").grid(row=0, column=1, padx=5, pady=2)
+emprunt_isbn_entry.grid(row=1, column=1, padx=5, pady=2)
+
+def valider_emprunt():
+    # Valide que les champs ID Membre et ISBN sont remplis pour un emprunt
+    valid = True
+    if not emprunt_id_entry.get().strip():
+        emprunt_id_entry.configure(bootstyle="danger")
+        valid = False
+    else:
+        emprunt_id_entry.configure(bootstyle="primary")
+    if not emprunt_isbn_entry.get().strip():
+        emprunt_isbn_entry.configure(bootstyle="danger")
+        valid = False
+    else:
+        emprunt_isbn_entry.configure(bootstyle="primary")
+    return valid
+
+def emprunter_livre():
+    # Gère l'emprunt d'un livre par un membre
+    if not valider_emprunt():
+        messagebox.showerror("Erreur", "Veuillez remplir tous les champs.")
+        return
+    id_membre = emprunt_id_entry.get().strip()
+    isbn = emprunt_isbn_entry.get().strip()
+    try:
+        biblio.emprunter_livre(isbn, id_membre)  # Méthode métier pour emprunter
+        biblio.sauvegarder()
+        # Seules les deux lignes concernées sont mises à jour
+        tableau_membres.mettre_a_jour(id_membre)
+        maj_livres(isbn)
+        messagebox.showinfo("Succès", f"Livre {isbn} emprunté par le membre {id_membre}.")
+        emprunt_id_entry.delete(0, 'end')
+        emprunt_isbn_entry.delete(0, 'end')
+        # Suggestions pour la suite, d'après les emprunts du membre (celui-ci compris)
+        afficher_suggestions(id_membre=id_membre)
+    except LivreIndisponibleError as e:
+        # Plutôt que de réessayer plus tard, le membre peut prendre place dans la file du livre
+        maj_livres(isbn)
+        if messagebox.askyesno("Livre indisponible", f"{e}\nRéserver le livre {isbn} pour le membre {id_membre} ?"):
+            reserver_livre()
+    except Exception as e:
+        messagebox.showerror("Erreur", str(e))
+
+def reserver_livre():
+    # Inscrit le membre dans la file d'attente du livre : il lui sera mis de côté à son retour
+    if not valider_emprunt():
+        messagebox.showerror("Erreur", "Veuillez remplir tous les champs.")
+        return
+    id_membre = emprunt_id_entry.get().strip()
+    isbn = emprunt_isbn_entry.get().strip()
+    try:
+        rang = biblio.reserver_livre(isbn, id_membre)
+        biblio.sauvegarder()
+        tableau_membres.mettre_a_jour(id_membre)
+        maj_livres(isbn)
+        messagebox.showinfo("Succès", f"Livre {isbn} réservé par le membre {id_membre} (rang {rang} dans la file).")
+        emprunt_id_entry.delete(0, 'end')
+        emprunt_isbn_entry.delete(0, 'end')
+    except Exception as e:
+        messagebox.showerror("Erreur", str(e))
+
+ttk.Button(form_emprunt, text="Emprunter Livre", command=emprunter_livre, bootstyle="success-outline").grid(row=2, column=0, pady=10)
+ttk.Button(form_emprunt, text="Réserver", command=reserver_livre, bootstyle="info-outline").grid(row=2, column=1, pady=10)
+
+# Suggestions « ont aussi emprunté » sous le formulaire : pour l'ISBN saisi, sinon pour le membre.
+# La matrice des co-emprunts est calculée sur le thread de rendu au démarrage puis installée
+# sur le thread de Tk ; ensuite chaque suggestion est lue dans la matrice précalculée.
+suggestions_label = ttk.Label(form_emprunt, text="", wraplength=280, justify="left", bootstyle="secondary")
+suggestions_label.grid(row=3, column=0, columnspan=2, sticky='w', padx=5)
+recommandations_pretes = False  # vrai une fois la matrice installée (voir demarrer)
+
+def attendre_recommandations(futur):
+    # Les caches de la bibliothèque ne sont modifiés que sur le thread de Tk : le résultat
+    # calculé par le thread de rendu est installé ici
+    global recommandations_pretes
+    if not futur.done():
+        root.after(100, attendre_recommandations, futur)
+        return
+    if futur.exception() is None:
+        biblio.installer_recommandations(futur.result())
+        recommandations_pretes = True
+
+@instrumenter("app.suggestions")
+def afficher_suggestions(event=None, id_membre=None):
+    if not recommandations_pretes:
+        suggestions_label.configure(text="")
+        return
+    isbn = emprunt_isbn_entry.get().strip()
+    id_membre = id_membre or emprunt_id_entry.get().strip()
+    try:
+        if isbn:
+            suggestions, titre = biblio.recommandations(isbn, 5), "Aussi empruntés avec ce livre"
+        elif id_membre:
+            suggestions, titre = biblio.recommandations_membre(id_membre, 5), f"Suggestions pour {id_membre}"
+        else:
+            suggestions = []
+    except (MembreInexistantError, ServeurError):
+        suggestions = []
+    if not suggestions:
+        suggestions_label.configure(text="")
+        return
+    lignes = [f"• {livre.titre} ({livre.auteur}){'' if livre.statut == 'disponible' else ' - ' + livre.statut}"
+              for livre, _ in suggestions]
+    suggestions_label.configure(text=titre + " :\n" + "\n".join(lignes))
+
+emprunt_id_entry.bind("<KeyRelease>", afficher_suggestions)
+emprunt_isbn_entry.bind("<KeyRelease>", afficher_suggestions)
+
+# ----- Section 3 : Retourner un Livre -----
+form_retour = ttk.Labelframe(frame_sections, text="Retourner un Livre", padding=10, bootstyle="primary")
+form_retour.grid(row=0, column=2, sticky='nsew', padx=5)
+
+retour_id_entry = ttk.Entry(form_retour, width=15, bootstyle="primary")
+retour_isbn_entry = ttk.Entry(form_retour, width=15, bootstyle="primary")
+ttk.Label(form_retour, text="ID Membre").grid(row=0, column=0, padx=5, pady=2)
+retour_id_entry.grid(row=1, column=0, padx=5, pady=2)
+ttk.Label(form_retour, text="ISBN Livre").grid(row=0, column=1, padx=5, pady=2)
+retour_isbn_entry.grid(row=1, column=1, padx=5, pady=2)
+
+def valider_retour():
+    # Valide que les champs ID Membre et ISBN sont remplis pour retour livre
+    valid = True
+    if not retour_id_entry.get().strip():
+        retour_id_entry.configure(bootstyle="danger")
+        valid = False
+    else:
+        retour_id_entry.configure(bootstyle="primary")
+    if not retour_isbn_entry.get().strip():
+        retour_isbn_entry.configure(bootstyle="danger")
+        valid = False
+    else:
+        retour_isbn_entry.configure(bootstyle="primary")
+    return valid
+
+def retourner_livre():
+    # Gère le retour d'un livre par un membre
+    if not valider_retour():
+        messagebox.showerror("Erreur", "Veuillez remplir tous les champs.")
+        return
+    id_membre = retour_id_entry.get().strip()
+    isbn = retour_isbn_entry.get().strip()
+    try:
+        suivant = biblio.retourner_livre(isbn, id_membre)
+        biblio.sauvegarder()
+        tableau_membres.mettre_a_jour(id_membre, *([suivant] if suivant is not None else []))
+        maj_livres(isbn)
+        verifier_echeances(planifier=False)
+        message = f"Livre {isbn} retourné par le membre {id_membre}."
+        if suivant is not None:
+            message += f"\nIl est mis de côté pour le membre {suivant}, premier de la file d'attente."
+        messagebox.showinfo("Succès", message)
+        retour_id_entry.delete(0, 'end')
+        retour_isbn_entry.delete(0, 'end')
+    except Exception as e:
+        messagebox.showerror("Erreur", str(e))
+
+def prolonger_emprunt():
+    # Repousse l'échéance de l'emprunt saisi dans la section Retour
+    if not valider_retour():
+        messagebox.showerror("Erreur", "Veuillez remplir tous les champs.")
+        return
+    id_membre = retour_id_entry.get().strip()
+    isbn = retour_isbn_entry.get().strip()
+    try:
+        echeance = biblio.prolonger_emprunt(isbn, id_membre)
+        biblio.sauvegarder()
+        verifier_echeances(planifier=False)
+        messagebox.showinfo("Succès", f"Livre {isbn} prolongé jusqu'au {echeance[:10]}.")
+    except Exception as e:
+        messagebox.showerror("Erreur", str(e))
+
+def annuler_reservation():
+    # Retire le membre de la file du livre ; un livre qui lui était mis de côté passe au suivant
+    if not valider_retour():
+        messagebox.showerror("Erreur", "Veuillez remplir tous les champs.")
+        return
+    id_membre = retour_id_entry.get().strip()
+    isbn = retour_isbn_entry.get().strip()
+    try:
+        suivant = biblio.annuler_reservation(isbn, id_membre)
+        biblio.sauvegarder()
+        tableau_membres.mettre_a_jour(id_membre, *([suivant] if suivant is not None else []))
+        maj_livres(isbn)
+        messagebox.showinfo("Succès", f"Réservation du livre {isbn} annulée pour le membre {id_membre}.")
+    except Exception as e:
+        messagebox.showerror("Erreur", str(e))
+
+ttk.Button(form_retour, text="Retourner Livre", command=retourner_livre, bootstyle="success-outline").grid(row=2, column=0, pady=10)
+ttk.Button(form_retour, text="Prolonger", command=prolonger_emprunt, bootstyle="info-outline").grid(row=2, column=1, pady=10)
+ttk.Button(form_retour, text="Annuler Réservation", command=annuler_reservation, bootstyle="warning-outline").grid(row=3, column=0, columnspan=2, pady=(0, 10))
+
+# Bouton pour supprimer un membre sélectionné dans la table des membres
+def supprimer_membre_selectionne():
+    selection = tree_membres.selection()
+    if not selection:
+        messagebox.showwarning("Avertissement", "Aucun membre sélectionné.")
+        return
+
+    id_membre = selection[0]  # Les lignes de la table sont identifiées par l'ID du membre
+    try:
+        #  Supprimer le membre ; ses livres empruntés ou mis de côté pour lui sont rendus
+        #  (au premier de leur file d'attente s'ils sont réservés)
+        remis = biblio.supprimer_membre(id_membre)
+        biblio.sauvegarder()
+
+        tableau_membres.mettre_a_jour(id_membre, *(suivant for _, suivant in remis if suivant is not None))
+        maj_livres(*(isbn for isbn, _ in remis))
+        verifier_echeances(planifier=False)
+
+        messagebox.showinfo("Succès", f"Membre {id_membre} supprimé et ses livres ont été rendus.")
+
+    except Exception as e:
+        messagebox.showerror("Erreur", str(e))
+
+# Fiche du membre sélectionné (bouton ou double-clic) : emprunts en cours et historique complet,
+# lu par l'index des positions de l'historique
+@instrumenter("app.afficher_details_membre")
+def afficher_details_membre(event=None):
+    selection = tree_membres.selection()
+    if not selection:
+        messagebox.showwarning("Avertissement", "Aucun membre sélectionné.")
+        return
+    id_membre = selection[0]
+    membre = biblio.membres.get(id_membre)
+    try:
+        historique = biblio.historique_membre(id_membre)
+    except Exception as e:
+        messagebox.showerror("Erreur", str(e))
+        return
+
+    fenetre = ttk.Toplevel(root)
+    fenetre.title(f"Membre {id_membre}")
+    fenetre.geometry("750x500")
+    nom = membre.nom if membre is not None else "(membre supprimé)"
+    ttk.Label(fenetre, text=f"{id_membre} - {nom}", font=("Segoe UI", 14, "bold")).pack(pady=5)
+    empruntes = ", ".join(f"{isbn} (échéance {membre.echeance(isbn)[:10]})" if membre.echeance(isbn) else isbn
+                          for isbn in membre.livres_empruntes) if membre is not None else ""
+    nb_emprunts = sum(1 for ligne in historique if ligne[3] == "emprunt")
+    ttk.Label(fenetre, text=f"Livres empruntés : {empruntes or 'aucun'}").pack()
+    reservations = texte_reservations(membre) if membre is not None else ""
+    ttk.Label(fenetre, text=f"Réservations : {reservations or 'aucune'}").pack()
+    ttk.Label(fenetre, text=f"{nb_emprunts} emprunt(s) depuis le début de l'historique").pack(pady=(0, 5))
+
+    frame_historique = ttk.Frame(fenetre, padding=10)
+    frame_historique.pack(fill='both', expand=True)
+    colonnes = ('Date', 'ISBN', 'Titre', 'Action')
+    tree_historique = ttk.Treeview(frame_historique, columns=colonnes, show='headings', bootstyle="info")
+    for colonne in colonnes:
+        tree_historique.heading(colonne, text=colonne)
+    tree_historique.column('Date', width=150, stretch=False)
+    tree_historique.column('ISBN', width=100, stretch=False)
+    tree_historique.column('Action', width=90, stretch=False)
+    defilement = ttk.Scrollbar(frame_historique, orient='vertical', command=tree_historique.yview)
+    tree_historique.configure(yscrollcommand=defilement.set)
+    defilement.pack(side='right', fill='y')
+    tree_historique.pack(fill='both', expand=True)
+    # Les plus récents en premier ; chaque titre n'est lu qu'une fois (un appel réseau en mode client)
+    titres = {}
+    for date_ligne, isbn, _, action in reversed(historique):
+        if isbn not in titres:
+            livre = biblio.livres.get(isbn)
+            titres[isbn] = livre.titre if livre is not None else "(livre supprimé)"
+        tree_historique.insert('', 'end', values=(date_ligne[:19].replace("T", " "), isbn, titres[isbn], action))
+
+tree_membres.bind("<Double-1>", afficher_details_membre)
+
+frame_boutons_membres = ttk.Frame(tab_membres)
+frame_boutons_membres.pack(pady=10)
+ttk.Button(frame_boutons_membres, text=" Détails du Membre Sélectionné", command=afficher_details_membre, bootstyle="info-outline").pack(side='left', padx=5)
+ttk.Button(frame_boutons_membres, text=" Supprimer Membre Sélectionné", command=supprimer_membre_selectionne, bootstyle="danger-outline").pack(side='left', padx=5)
+
+# Ajustement des colonnes pour que les 3 sections soient équitablement réparties
+frame_sections.columnconfigure(0, weight=1)
+frame_sections.columnconfigure(1, weight=1)
+frame_sections.columnconfigure(2, weight=1)
+
+
+# =======================
+#  Onglet STATISTIQUES
+# =======================
+
+# Variables globales pour stocker l'état actuel du graphique affiché
+canvas_stats = None
+graph_frame = None
+button_frame = None
+label_attente = None
+current_chart = "genres"
+
+# Les graphiques sont construits et dessinés sur un thread dédié. Les figures prêtes sont
+# gardées en cache par (graphique, version des données, largeur, hauteur) : tant que
+# biblio.version ne change pas, revenir sur l'onglet ou changer de graphique est immédiat
+rendu_executor = ThreadPoolExecutor(max_workers=1)
+cache_graphiques = {}
+graphique_demande = None  # clé du dernier graphique demandé
+
+def module_visualisation():
+    # visualisation (et matplotlib, la plus grosse partie du démarrage) n'est importé qu'ici
+    import visualisation
+    return visualisation
+
+def taille_graphique():
+    # Taille du canvas en pixels, ou (None, None) tant qu'il n'est pas affiché
+    widget = canvas_stats.get_tk_widget()
+    largeur, hauteur = widget.winfo_width(), widget.winfo_height()
+    if largeur <= 1 or hauteur <= 1:
+        return None, None
+    return largeur, hauteur
+
+def afficher_graphique_stats(fig, rendu):
+    # Affiche une figure déjà dessinée dans le canvas existant (réutilisé d'un graphique à l'autre)
+    label_attente.place_forget()
+    canvas_stats.figure = fig
+    fig.set_canvas(canvas_stats)
+    largeur, hauteur = taille_graphique()
+    if largeur and abs(rendu.width - largeur) <= 1 and abs(rendu.height - hauteur) <= 1:
+        # Même taille que le canvas : l'image calculée par le thread est copiée telle quelle
+        canvas_stats.renderer = rendu
+        canvas_stats.blit()
+    else:
+        canvas_stats.draw()
+
+@instrumenter("app.switch_graphique")
+def switch_graphique(type_chart):
+    # Permet de changer de graphique selon le bouton sélectionné
+    global current_chart, graphique_demande
+    current_chart = type_chart
+    afficher_boutons()
+    largeur, hauteur = taille_graphique()
+    cle = (type_chart, biblio.version, largeur, hauteur)
+    graphique_demande = cle
+    if cle in cache_graphiques:
+        afficher_graphique_stats(*cache_graphiques[cle])
+        registre.compter("app.graphiques_depuis_cache")
+        return
+    # Les données viennent des statistiques tenues à jour en mémoire par la bibliothèque ;
+    # elles sont copiées ici car l'interface continue à les modifier pendant le rendu
+    visualisation = module_visualisation()
+    if type_chart in visualisation.ANALYSES:
+        # Analyses de tout l'historique : tableaux NumPy chargés au premier graphique
+        donnees = visualisation.donnees_graphique(type_chart, source=biblio)
+    else:
+        donnees = visualisation.donnees_graphique(type_chart, biblio.statistiques())
+    label_attente.place(relx=0.5, rely=0.5, anchor='center')
+    futur = rendu_executor.submit(visualisation.rendre_graphique, type_chart, donnees, largeur, hauteur,
+                                  canvas_stats.figure.dpi)
+    attendre_graphique(cle, futur, time.perf_counter())
+
+def attendre_graphique(cle, futur, debut):
+    # Tkinter ne doit pas être appelé depuis le thread de rendu : on vérifie ici si la figure est prête
+    if not futur.done():
+        root.after(30, attendre_graphique, cle, futur, debut)
+        return
+    if futur.exception() is not None:
+        label_attente.place_forget()
+        messagebox.showerror("Erreur", f"Erreur lors du rendu du graphique : {futur.exception()}")
+        return
+    # Les figures d'une version plus ancienne des données ne resserviront plus
+    for ancienne in [c for c in cache_graphiques if c[1] < cle[1]]:
+        del cache_graphiques[ancienne]
+    cache_graphiques[cle] = futur.result()
+    if cle == graphique_demande:
+        afficher_graphique_stats(*cache_graphiques[cle])
+        if registre.actif:
+            # Délai vu par l'utilisateur, de la demande à l'affichage
+            registre.enregistrer("app.graphique_affiche", time.perf_counter() - debut)
+
+def afficher_boutons():
+    # Affiche les boutons permettant de changer de graphique
+    for widget in button_frame.winfo_children():
+        widget.destroy()
+
+    autres = {
+        "genres": [(" Top 10 Auteurs", "auteurs"), (" Emprunts Récents", "emprunts")],
+        "auteurs": [("Répartition Genres", "genres"), (" Emprunts Récents", "emprunts")],
+        "emprunts": [(" Répartition Genres", "genres"), (" Top 10 Auteurs", "auteurs")]
+    }
+
+    tous = [(" Répartition Genres", "genres"), (" Top 10 Auteurs", "auteurs"), (" Emprunts Récents", "emprunts")]
+    for texte, chart in autres.get(current_chart, tous):
+        ttk.Button(
+            button_frame,
+            text=texte,
+            command=lambda c=chart: switch_graphique(c),
+            bootstyle="light-outline",
+            cursor="hand2",
+            width=20,
+            padding=10,
+        ).pack(side="left", padx=5)
+
+def afficher_statistiques():
+    # Création des widgets de l'onglet Statistiques, à sa première ouverture
+    global graph_frame, button_frame, canvas_stats, label_attente
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    from matplotlib.figure import Figure
+    ttk.Label(tab_stats, text="Statistiques de la Bibliothèque", font=("Segoe UI", 18, "bold")).pack(pady=5)
+
+    button_frame = ttk.Frame(tab_stats)
+    button_frame.pack(pady=5)
+
+    # Graphiques d'analyse de tout l'historique, choisis dans une liste
+    analyse_frame = ttk.Frame(tab_stats)
+    analyse_frame.pack(pady=5)
+    ttk.Label(analyse_frame, text="Analyses de l'historique :", font=("Segoe UI", 11)).pack(side="left", padx=5)
+    analyses = module_visualisation().ANALYSES
+    titres = {titre: code for code, titre in analyses.items()}
+    choix_analyse = ttk.Combobox(analyse_frame, values=list(titres), state="readonly", width=35)
+    choix_analyse.pack(side="left", padx=5)
+    choix_analyse.bind("<<ComboboxSelected>>", lambda e: switch_graphique(titres[choix_analyse.get()]))
+
+    graph_frame = ttk.Frame(tab_stats)
+    graph_frame.pack(fill='both', expand=True)
+
+    # Canvas unique, qui reçoit tour à tour les figures rendues par le thread
+    canvas_stats = FigureCanvasTkAgg(Figure(facecolor='none'), master=graph_frame)
+    canvas_stats.get_tk_widget().pack(fill='both', expand=True, pady=10)
+    label_attente = ttk.Label(graph_frame, text="Préparation du graphique...", font=("Segoe UI", 12))
+
+    switch_graphique("genres")  # Affiche par défaut la répartition des genres
+
+#  Détecte le changement d'onglet et affiche le graphique courant si on arrive sur l'onglet Statistiques
+#  (depuis le cache si les données n'ont pas changé) ; l'onglet est construit à la première visite
+def on_tab_change(event):
+    if onglets.index("current") == 2:  # Index 2 = onglet Statistiques
+        if canvas_stats is None:
+            afficher_statistiques()
+        else:
+            switch_graphique(current_chart)
+    elif onglets.index("current") == 3:  # Index 3 = onglet Diagnostics
+        actualiser_diagnostics()
+
+onglets.bind("<<NotebookTabChanged>>", on_tab_change)
+
+# =======================
+#  Onglet DIAGNOSTICS
+# =======================
+
+# Mesures de classes/mesures.py : durée des opérations de la bibliothèque, du stockage et de
+# l'interface, octets écrits, et profil cProfile d'une opération choisie. Les mesures sont
+# désactivées par défaut (BIBLIOTHEQUE_MESURES=1 pour les activer dès le démarrage).
+frame_diag_haut = ttk.Frame(tab_diagnostics, padding=(10, 10, 10, 0))
+frame_diag_haut.pack(fill='x')
+
+mesures_var = BooleanVar(value=registre.actif)
+ttk.Checkbutton(frame_diag_haut, text="Mesures activées", variable=mesures_var, bootstyle="success-round-toggle",
+                command=lambda: registre.activer(mesures_var.get())).pack(side='left', padx=5)
+
+def reinitialiser_diagnostics():
+    registre.reinitialiser()
+    actualiser_diagnostics()
+
+def exporter_diagnostics():
+    # Écrit toutes les mesures (histogrammes, compteurs, profils) dans un fichier JSON
+    chemin = filedialog.asksaveasfilename(defaultextension=".json", initialfile="diagnostics.json",
+                                          filetypes=[("JSON", "*.json")])
+    if chemin:
+        try:
+            registre.vider(chemin)
+            messagebox.showinfo("Succès", f"Mesures exportées dans {chemin}")
+        except OSError as e:
+            messagebox.showerror("Erreur", str(e))
+
+ttk.Button(frame_diag_haut, text="Actualiser", command=lambda: actualiser_diagnostics(), bootstyle="info-outline").pack(side='left', padx=5)
+ttk.Button(frame_diag_haut, text="Réinitialiser", command=reinitialiser_diagnostics, bootstyle="warning-outline").pack(side='left', padx=5)
+ttk.Button(frame_diag_haut, text="Exporter...", command=exporter_diagnostics, bootstyle="primary-outline").pack(side='left', padx=5)
+
+# Table des opérations mesurées (durées en millisecondes)
+colonnes_diag = ('Opération', 'Appels', 'Total', 'Moyenne', 'p50', 'p99', 'Max')
+tree_diagnostics = ttk.Treeview(tab_diagnostics, columns=colonnes_diag, show='headings', height=12, bootstyle="info")
+for colonne in colonnes_diag:
+    tree_diagnostics.heading(colonne, text=colonne if colonne in ('Opération', 'Appels') else colonne + " (ms)")
+    tree_diagnostics.column(colonne, width=260 if colonne == 'Opération' else 90, anchor='w' if colonne == 'Opération' else 'e')
+tree_diagnostics.pack(fill='both', expand=True, padx=10, pady=10)
+
+label_compteurs = ttk.Label(tab_diagnostics, text="", wraplength=950, justify='left')
+label_compteurs.pack(fill='x', padx=10)
+
+# Profil cProfile du prochain appel d'une opération choisie
+frame_profil = ttk.Labelframe(tab_diagnostics, text="Profil d'une opération", padding=10, bootstyle="primary")
+frame_profil.pack(fill='both', expand=True, padx=10, pady=10)
+operation_profilee = StringVar()
+choix_operation = ttk.Combobox(frame_profil, textvariable=operation_profilee, width=40, state="readonly")
+choix_operation.pack(anchor='w')
+
+def profiler_operation():
+    nom = operation_profilee.get()
+    if not nom:
+        return
+    registre.activer()
+    mesures_var.set(True)
+    registre.profiler(nom)
+    afficher_profil(f"Le prochain appel de {nom} sera profilé.")
+
+ttk.Button(frame_profil, text="Profiler le prochain appel", command=profiler_operation, bootstyle="info-outline").pack(anchor='w', pady=5)
+texte_profil = Text(frame_profil, height=10, wrap='none', font=("Consolas", 9))
+defilement_profil = ttk.Scrollbar(frame_profil, orient='vertical', command=texte_profil.yview)
+texte_profil.configure(yscrollcommand=defilement_profil.set, state='disabled')
+defilement_profil.pack(side='right', fill='y')
+texte_profil.pack(fill='both', expand=True)
+choix_operation.bind("<<ComboboxSelected>>", lambda event: actualiser_diagnostics())
+profil_affiche = None
+
+def afficher_profil(texte):
+    global profil_affiche
+    profil_affiche = texte
+    texte_profil.configure(state='normal')
+    texte_profil.delete('1.0', 'end')
+    texte_profil.insert('1.0', texte)
+    texte_profil.configure(state='disabled')
+
+diagnostics_planifie = None  # rappel after() en attente
+
+def actualiser_diagnostics():
+    # Recopie les mesures dans l'onglet ; rappelée chaque seconde tant que l'onglet est affiché
+    global diagnostics_planifie
+    if diagnostics_planifie is not None:
+        root.after_cancel(diagnostics_planifie)
+        diagnostics_planifie = None
+    donnees = registre.vers_dict()
+    tree_diagnostics.delete(*tree_diagnostics.get_children())
+    for nom, h in sorted(donnees["operations"].items(), key=lambda item: -item[1]["total_s"]):
+        tree_diagnostics.insert('', 'end', values=(
+            nom, h["appels"], f"{h['total_s'] * 1000:.1f}", f"{h['moyenne_s'] * 1000:.3f}",
+            f"{h['p50_s'] * 1000:.3f}", f"{h['p99_s'] * 1000:.3f}", f"{h['max_s'] * 1000:.3f}"))
+    label_compteurs.config(text="   ".join(f"{nom} : {valeur}" for nom, valeur in donnees["compteurs"].items()))
+    choix_operation.config(values=sorted(registre.noms))
+    profil = donnees["profils"].get(operation_profilee.get())
+    if profil and profil != profil_affiche:
+        afficher_profil(profil)
+    if onglets.index("current") == 3:
+        diagnostics_planifie = root.after(1000, actualiser_diagnostics)
+
+# =======================
+#  Synchronisation avec les autres processus (autre fenêtre, import en ligne de commande)
+# =======================
+
+@instrumenter("app.synchroniser")
+def synchroniser():
+    # Toutes les 2 secondes, reprend les modifications faites par les autres processus
+    # et ne met à jour que les lignes concernées
+    root.after(2000, synchroniser)
+    try:
+        isbns, ids = biblio.actualiser()
+    except ServeurError:
+        return  # Serveur momentanément injoignable (mode client) : nouvel essai au prochain tour
+    if isbns is None:
+        refresh_liste_livres()
+        refresh_membres()
+    else:
+        if isbns:
+            maj_livres(*isbns)
+        if ids:
+            tableau_membres.mettre_a_jour(*ids)
+    if (isbns is None or isbns or ids) and onglets.index("current") == 2:
+        switch_graphique(current_chart)
+
+# =======================
+#  Emprunts en retard
+# =======================
+
+INTERVALLE_ECHEANCES = 30000  # ms
+tree_membres.tag_configure("retard", foreground="#dc3545")
+tree_livres.tag_configure("retard", foreground="#dc3545")
+
+@instrumenter("app.verifier_echeances")
+def verifier_echeances(planifier=True):
+    # Marque en rouge les membres et les livres des emprunts en retard. Les retards sont lus
+    # dans l'échéancier de la bibliothèque (les plus anciens d'abord) sans parcourir les membres,
+    # et seules les lignes visibles dont le marquage change sont redessinées.
+    # Les mises de côté échues passent au suivant de la file (tas des fins de mise de côté).
+    if planifier:
+        root.after(INTERVALLE_ECHEANCES, verifier_echeances)
+    try:
+        expirees = biblio.expirer_reservations()
+        retards = biblio.emprunts_en_retard()
+    except ServeurError:
+        return
+    if expirees:
+        biblio.sauvegarder()
+        maj_livres(*(isbn for isbn, _, _ in expirees))
+        tableau_membres.mettre_a_jour(*(id_membre for _, ancien, suivant in expirees
+                                        for id_membre in (ancien, suivant) if id_membre is not None))
+    tableau_membres.etiqueter("retard", (id_membre for _, _, id_membre in retards))
+    tableau_livres.etiqueter("retard", (isbn for _, isbn, _ in retards))
+
+def fermer_application():
+    # Termine proprement la persistance (snapshot en cours, journal) avant de quitter
+    rendu_executor.shutdown(wait=False, cancel_futures=True)
+    biblio.fermer()
+    root.destroy()
+
+root.protocol("WM_DELETE_WINDOW", fermer_application)
+
+# =======================
+#  Démarrage
+# =======================
+
+def demarrer():
+    # Appelé par la boucle Tkinter : la fenêtre et l'onglet Livres (table vide) sont d'abord
+    # dessinés, puis les données sont lues et seules les lignes visibles des tables sont remplies.
+    # matplotlib est ensuite importé sur le thread de rendu pendant que l'interface est utilisable.
+    global recommandations_pretes
+    root.update()
+    premiere_image = time.perf_counter() - DEBUT_DEMARRAGE
+    registre.enregistrer("app.demarrage.premiere_image", premiere_image)
+    biblio.charger()
+    refresh_liste_livres()
+    refresh_membres()
+    label_chargement.place_forget()
+    root.update_idletasks()
+    interactif = time.perf_counter() - DEBUT_DEMARRAGE
+    registre.enregistrer("app.demarrage.interactif", interactif)
+    root.after(2000, synchroniser)
+    root.after(1000, verifier_echeances)
+    rendu_executor.submit(module_visualisation)
+    if arguments.serveur:
+        # Mode client : la matrice est construite par le serveur
+        recommandations_pretes = True
+    else:
+        # Historique figé ici, matrice des co-emprunts calculée sur le thread de rendu
+        attendre_recommandations(rendu_executor.submit(biblio.preparer_recommandations()))
+    if arguments.chrono_demarrage:
+        print(f"Première image : {premiere_image * 1000:.0f} ms, données affichées : {interactif * 1000:.0f} ms")
+        fermer_application()
+
+root.after(0, demarrer)
+
+#  Lancement principal de la boucle Tkinter
+root.mainloop()
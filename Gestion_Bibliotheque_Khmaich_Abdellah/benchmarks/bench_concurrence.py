@@ -0,0 +1,129 @@
+# Benchmark de plusieurs processus qui partagent le même dossier de données :
+# emprunts et retours aléatoires en parallèle, débit et temps passé à attendre / tenir le verrou,
+# puis vérification que les données finales sont cohérentes.
+# Lancement depuis le dossier du projet : python -m benchmarks.bench_concurrence [nb_processus] [nb_operations]
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from multiprocessing import Barrier, Pool
+from classes.bibliotheque import Bibliotheque, ERREURS_OPERATION
+from classes.membre import QUOTA_EMPRUNTS
+
+NB_LIVRES = 2000
+NB_MEMBRES = 200
+
+
+def preparer(dossier):
+    livres = {str(i): {"isbn": str(i), "titre": f"Titre {i}", "auteur": f"Auteur {i % 300}",
+                       "annee": 1950 + i % 70, "genre": f"Genre {i % 12}", "statut": "disponible"}
+              for i in range(NB_LIVRES)}
+    membres = {f"{i:03d}": {"id_membre": f"{i:03d}", "nom": f"Membre {i}", "livres_empruntes": []}
+               for i in range(NB_MEMBRES)}
+    with open(os.path.join(dossier, "livres.json"), "w", encoding="utf-8") as f:
+        json.dump(livres, f)
+    with open(os.path.join(dossier, "membres.json"), "w", encoding="utf-8") as f:
+        json.dump(membres, f)
+
+
+def etat(biblio):
+    livres = {isbn: livre.statut for isbn, livre in biblio.livres.items()}
+    membres = {id_: sorted(m.livres_empruntes) for id_, m in biblio.membres.items()}
+    return livres, membres
+
+
+def initialiser(barriere):
+    global fin_des_operations
+    fin_des_operations = barriere
+
+
+def travailleur(args):
+    # Un processus : emprunte un livre disponible, ou rend un livre emprunté par son emprunteur
+    persistance, dossier, nb_operations, graine = args
+    rng = random.Random(graine)
+    biblio = Bibliotheque(persistance=persistance, dossier=dossier)
+    biblio.charger()
+    refusees = 0
+    debut = time.perf_counter()
+    for _ in range(nb_operations):
+        isbn = str(rng.randrange(NB_LIVRES))
+        try:
+            emprunteur = biblio.emprunteur_de(isbn)
+            if emprunteur is None:
+                biblio.emprunter_livre(isbn, f"{rng.randrange(NB_MEMBRES):03d}")
+            else:
+                biblio.retourner_livre(isbn, emprunteur.id_membre)
+        except ERREURS_OPERATION:
+            # Donnée lue avant que le verrou soit pris : un autre processus est passé avant
+            refusees += 1
+    duree = time.perf_counter() - debut
+    # L'état final n'est relu qu'une fois tous les processus arrêtés
+    fin_des_operations.wait()
+    biblio.actualiser()
+    final = etat(biblio)
+    verrou = getattr(biblio._stockage, "verrou", None)
+    mesures = (verrou.acquisitions, verrou.attente, verrou.detention, verrou.detention_max) if verrou else None
+    biblio.fermer()
+    return duree, refusees, mesures, final
+
+
+def verifier(persistance, dossier, etats):
+    # Invariants : un livre emprunté a exactement un emprunteur, aucun quota dépassé,
+    # et chaque processus a fini avec le même état qu'un chargement à neuf
+    biblio = Bibliotheque(persistance=persistance, dossier=dossier)
+    biblio.charger()
+    livres, membres = etat(biblio)
+    biblio.fermer()
+    erreurs = []
+    emprunteurs = {}
+    for id_, isbns in membres.items():
+        if len(isbns) > QUOTA_EMPRUNTS:
+            erreurs.append(f"quota dépassé pour {id_}")
+        for isbn in isbns:
+            if isbn in emprunteurs:
+                erreurs.append(f"{isbn} emprunté par {emprunteurs[isbn]} et {id_}")
+            emprunteurs[isbn] = id_
+    for isbn, statut in livres.items():
+        if (statut == "emprunté") != (isbn in emprunteurs):
+            erreurs.append(f"statut incohérent pour {isbn}")
+    for i, final in enumerate(etats):
+        if final != (livres, membres):
+            erreurs.append(f"le processus {i} a fini sur un état différent")
+    return erreurs, len(emprunteurs)
+
+
+def mesurer(persistance, nb_processus, nb_operations):
+    with tempfile.TemporaryDirectory() as dossier:
+        preparer(dossier)
+        debut = time.perf_counter()
+        with Pool(nb_processus, initialiser, (Barrier(nb_processus),)) as pool:
+            resultats = pool.map(travailleur, [(persistance, dossier, nb_operations, i) for i in range(nb_processus)])
+        duree = time.perf_counter() - debut
+        erreurs, nb_empruntes = verifier(persistance, dossier, [r[3] for r in resultats])
+    total = nb_processus * nb_operations
+    refusees = sum(r[1] for r in resultats)
+    print(f"{persistance:<8} {total / duree:>10.0f} op/s  ({duree:.2f} s, {refusees} refusées, "
+          f"{nb_empruntes} livres empruntés à la fin)")
+    mesures = [r[2] for r in resultats if r[2] is not None]
+    if mesures:
+        acquisitions = sum(m[0] for m in mesures)
+        attente = sum(m[1] for m in mesures)
+        detention = sum(m[2] for m in mesures)
+        print(f"         verrou : {acquisitions} acquisitions, attente moyenne {attente / acquisitions * 1000:.2f} ms, "
+              f"détention moyenne {detention / acquisitions * 1000:.2f} ms, max {max(m[3] for m in mesures) * 1000:.1f} ms")
+    print("         cohérence : " + ("ok" if not erreurs else "; ".join(erreurs[:5])))
+    return not erreurs
+
+
+def main(nb_processus=4, nb_operations=500):
+    ok = True
+    # Le mode json n'écrit qu'à sauvegarder() : il est prévu pour un seul poste
+    for persistance in ("journal", "sqlite"):
+        ok = mesurer(persistance, nb_processus, nb_operations) and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(int(a) for a in sys.argv[1:3])))
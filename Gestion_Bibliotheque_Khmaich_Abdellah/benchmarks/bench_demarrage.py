@@ -0,0 +1,41 @@
+# Benchmark du démarrage : charger() depuis livres.json ou depuis le snapshot binaire livres.bin
+# Lancement depuis le dossier du projet : python -m benchmarks.bench_demarrage [nb_livres]
+import json
+import os
+import sys
+import tempfile
+import time
+from classes.bibliotheque import Bibliotheque
+from classes.snapshot_binaire import convertir
+
+
+def generer(dossier, nb):
+    livres = {str(i): {"isbn": str(i), "titre": f"Titre {i}", "auteur": f"Auteur {i % 5000}",
+                       "annee": str(1800 + i % 220), "genre": ("Roman", "Conte", "Essai")[i % 3],
+                       "statut": "disponible"} for i in range(nb)}
+    with open(os.path.join(dossier, "livres.json"), "w", encoding="utf-8") as f:
+        json.dump(livres, f, indent=2)
+
+
+def mesurer(nom, dossier, snapshot_binaire):
+    debut = time.perf_counter()
+    biblio = Bibliotheque(dossier=dossier, snapshot_binaire=snapshot_binaire)
+    biblio.charger()
+    charge = time.perf_counter() - debut
+    livre = biblio.livres[str(len(biblio.livres) // 2)]
+    premier_acces = time.perf_counter() - debut - charge
+    print(f"{nom:<26} charger() {charge:7.3f} s   premier accès {premier_acces * 1000:7.3f} ms   ({livre.titre})")
+
+
+def main(nb=1_000_000):
+    with tempfile.TemporaryDirectory() as dossier:
+        generer(dossier, nb)
+        debut = time.perf_counter()
+        convertir(os.path.join(dossier, "livres.json"))
+        print(f"conversion JSON -> binaire : {time.perf_counter() - debut:.2f} s")
+        mesurer("livres.json", dossier, False)
+        mesurer("livres.bin (mmap)", dossier, True)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,92 @@
+# Benchmark de la fédération de branches (classes/federation.py) : génère N branches aux
+# catalogues disjoints, puis mesure le chargement, les requêtes sur toutes les branches et les
+# emprunts routés avec 1, 2, 4... processus de travail (jusqu'au nombre de cœurs), et
+# l'accélération par rapport à un seul processus.
+# Lancement depuis le dossier du projet :
+#   python -m benchmarks.bench_federation [nb_branches] [livres_par_branche] [historique_par_branche] [persistance]
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from benchmarks.donnees import generer, id_membre
+from classes.bibliotheque import Bibliotheque, ERREURS_OPERATION
+from classes.federation import Federation
+
+NB_REQUETES = 20
+NB_EMPRUNTS = 200
+
+
+def preparer(dossier, nb_branches, nb_livres, nb_historique, persistance):
+    branches = {}
+    for b in range(nb_branches):
+        nom = f"B{b}"
+        branches[nom] = os.path.join(dossier, nom)
+        generer(branches[nom], nb_livres, max(1, nb_livres // 10), nb_historique, graine=b, prefixe=f"{nom}-")
+        # Première ouverture (migration de l'historique, base sqlite) hors des mesures
+        biblio = Bibliotheque(persistance, branches[nom])
+        biblio.charger()
+        biblio.fermer()
+    return branches
+
+
+def chrono(fonction, repetitions=1):
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        fonction()
+    return (time.perf_counter() - debut) / repetitions
+
+
+def mesurer(branches, persistance, processus, nb_livres):
+    rng = random.Random(0)
+    noms = list(branches)
+    isbns = [f"{rng.choice(noms)}-{rng.randrange(nb_livres)}" for _ in range(NB_EMPRUNTS)]
+    depuis = date.today() - timedelta(days=30)
+    temps = {}
+    with Federation(branches, persistance, processus) as federation:
+        temps["chargement"] = chrono(federation.demarrer)
+        temps["disponibilite"] = chrono(lambda: federation.disponibilite(rng.choice(isbns)), NB_REQUETES)
+        temps["compter_par genre"] = chrono(lambda: federation.compter_par("genre"), NB_REQUETES)
+        temps["compter_par auteur"] = chrono(lambda: federation.compter_par("auteur"), NB_REQUETES)
+        temps["historique 7 jours"] = chrono(
+            lambda: federation.parcourir_historique(depuis, depuis + timedelta(days=7)), NB_REQUETES)
+
+        def emprunts():
+            # Emprunt puis retour de chaque livre disponible, routés vers sa branche
+            for isbn in isbns:
+                membre = id_membre(rng.randrange(max(1, nb_livres // 10)))
+                try:
+                    federation.emprunter_livre(isbn, membre)
+                    federation.retourner_livre(isbn, membre)
+                except ERREURS_OPERATION:
+                    pass
+        temps["emprunt + retour routés"] = chrono(emprunts) / len(isbns)
+    return temps
+
+
+def main(nb_branches=4, nb_livres=50_000, nb_historique=200_000, persistance="journal"):
+    coeurs = os.cpu_count() or 1
+    series = [1]
+    while series[-1] * 2 <= min(coeurs, nb_branches):
+        series.append(series[-1] * 2)
+    if series[-1] < min(coeurs, nb_branches):
+        series.append(min(coeurs, nb_branches))
+    print(f"{nb_branches} branches de {nb_livres} livres et {nb_historique} lignes d'historique, "
+          f"{persistance}, {coeurs} cœur(s)")
+    with tempfile.TemporaryDirectory() as dossier:
+        branches = preparer(dossier, nb_branches, nb_livres, nb_historique, persistance)
+        resultats = {processus: mesurer(branches, persistance, processus, nb_livres) for processus in series}
+    reference = resultats[1]
+    print(f"{'':<26}" + "".join(f"{f'{p} proc.':>18}" for p in series))
+    for mesure in reference:
+        print(f"{mesure:<26}" + "".join(
+            f"{resultats[p][mesure] * 1000:>9.2f} ms x{reference[mesure] / resultats[p][mesure]:<5.2f}"
+            for p in series))
+    if len(series) == 1:
+        print("Un seul cœur disponible : pas d'accélération mesurable")
+
+
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+    main(*(int(a) for a in arguments[:3]), *arguments[3:4])
@@ -0,0 +1,45 @@
+# Benchmark de l'écriture de l'historique : événements par seconde avant / après HistoriqueWriter
+# Lancement depuis le dossier du projet : python -m benchmarks.bench_historique [nb_evenements]
+import csv
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from classes.historique import HistoriqueWriter
+from classes.historique_partitions import HistoriquePartitionne
+
+
+def ecrire_ancienne_version(chemin, isbn, id_membre, action):
+    # Ancienne implémentation de Bibliotheque.enregistrer_historique : un open() par événement
+    with open(chemin, "a", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([datetime.now().isoformat(), isbn, id_membre, action])
+
+
+def mesurer(nom, nb, ecrire, fermer=None):
+    debut = time.perf_counter()
+    for i in range(nb):
+        ecrire(str(i % 5000), f"{i % 300:03d}", "emprunt" if i % 2 else "retour")
+    if fermer:
+        fermer()
+    duree = time.perf_counter() - debut
+    print(f"{nom:<40} {nb / duree:>12.0f} évén./s  ({duree:.3f} s)")
+
+
+def main(nb=20000):
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "historique_avant.csv")
+        mesurer("avant : open() par événement", nb, lambda *a: ecrire_ancienne_version(chemin, *a))
+        for durabilite in ("ligne", "lot", "jamais"):
+            for arriere_plan in (False, True):
+                if durabilite == "ligne" and arriere_plan:
+                    continue
+                historique = HistoriquePartitionne(os.path.join(dossier, f"historique_{durabilite}_{arriere_plan}"))
+                writer = HistoriqueWriter(historique, durabilite=durabilite, arriere_plan=arriere_plan)
+                nom = f"après : durabilite={durabilite}" + (", thread" if arriere_plan else "")
+                mesurer(nom, nb, writer.ecrire, writer.fermer)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
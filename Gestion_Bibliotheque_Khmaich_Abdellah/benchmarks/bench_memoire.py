@@ -0,0 +1,62 @@
+# Benchmark mémoire du modèle : octets par livre avec l'ancienne classe (__dict__) et la nouvelle (__slots__)
+# Lancement depuis le dossier du projet : python -m benchmarks.bench_memoire [nb_livres]
+import gc
+import json
+import random
+import sys
+import tracemalloc
+from classes.livre import Livre
+from classes.membre import Membre
+
+AUTEURS = [f"Auteur {i}" for i in range(5000)]
+GENRES = ["Roman", "Conte", "Poésie", "Théâtre", "Essai", "Dystopie", "Policier"]
+
+
+class LivreDict:
+    # Ancienne représentation de Livre, conservée ici pour comparaison
+    def __init__(self, isbn, titre, auteur, annee, genre, statut="disponible"):
+        self.isbn = isbn
+        self.titre = titre
+        self.auteur = auteur
+        self.annee = annee
+        self.genre = genre
+        self.statut = statut
+
+
+def json_synthetique(nb, graine=42):
+    # Même format que data/livres.json
+    aleatoire = random.Random(graine)
+    return json.dumps({str(i): {"isbn": str(i), "titre": f"Titre {i}", "auteur": aleatoire.choice(AUTEURS),
+                                "annee": str(1800 + i % 220), "genre": aleatoire.choice(GENRES),
+                                "statut": "emprunté" if i % 7 == 0 else "disponible"} for i in range(nb)})
+
+
+def mesurer(nom, classe, texte):
+    # Mémoire restant allouée après un chargement comme celui de charger() :
+    # json.load puis un objet par livre, le document JSON étant ensuite libéré
+    gc.collect()
+    tracemalloc.start()
+    donnees = json.loads(texte)
+    livres = {isbn: classe(**d) for isbn, d in donnees.items()}
+    del donnees
+    gc.collect()
+    taille, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{nom:<22} {taille / len(livres):8.1f} octets/livre  ({taille / 2**20:.0f} Mo)")
+    return livres
+
+
+def main(nb=1_000_000):
+    texte = json_synthetique(nb)
+    avant = mesurer("avant (__dict__)", LivreDict, texte)
+    del avant
+    apres = mesurer("après (__slots__)", Livre, texte)
+    # Aller-retour JSON : le format écrit par sauvegarder() reste identique
+    assert {isbn: livre.vers_dict() for isbn, livre in apres.items()} == json.loads(texte)
+    print("aller-retour JSON identique")
+    membre = Membre("001", "Test")
+    print(f"membre sans emprunt : {sys.getsizeof(membre)} octets (+ tuple vide partagé)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
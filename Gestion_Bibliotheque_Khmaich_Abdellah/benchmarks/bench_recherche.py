@@ -0,0 +1,37 @@
+# Benchmark de la recherche plein texte : construction de l'index et latence des requêtes
+# Lancement depuis le dossier du projet : python -m benchmarks.bench_recherche [nb_livres]
+import random
+import sys
+import time
+from classes.livre import Livre
+from classes.recherche import IndexRecherche
+
+MOTS = ["prince", "misérables", "étranger", "guerre", "paix", "nuit", "château", "mémoires",
+        "voyage", "océan", "île", "mystère", "cœur", "rivière", "forêt", "été", "hiver", "révolte"]
+AUTEURS = ["Saint-Exupéry", "Hugo", "Camus", "Zola", "Balzac", "Dumas", "Flaubert", "Verne", "Sand", "Proust"]
+GENRES = ["Roman", "Conte", "Poésie", "Théâtre", "Essai", "Dystopie", "Policier"]
+REQUETES = ["exupery", "mise", "guerre paix", "chateau hugo", "h", "coeur foret zola", "zzz"]
+
+
+def livres_synthetiques(nb, graine=42):
+    aleatoire = random.Random(graine)
+    for i in range(nb):
+        titre = " ".join(aleatoire.choice(MOTS) for _ in range(3)) + f" {i}"
+        auteur = f"{aleatoire.choice(AUTEURS)} {i % 5000}"
+        yield Livre(str(i), titre, auteur, str(1800 + i % 220), aleatoire.choice(GENRES))
+
+
+def main(nb=1_000_000):
+    index = IndexRecherche()
+    debut = time.perf_counter()
+    index.construire(livres_synthetiques(nb))
+    print(f"construction ({nb} livres) : {time.perf_counter() - debut:.2f} s, {len(index.vocabulaire)} mots")
+    for requete in REQUETES:
+        debut = time.perf_counter()
+        for _ in range(10):
+            resultats = index.rechercher(requete, 50)
+        print(f"{requete!r:<22} {(time.perf_counter() - debut) * 100:8.2f} ms  ({len(resultats)} résultats)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,111 @@
+# Générateur de charge pour le serveur réseau (classes/serveur.py) : des centaines de clients
+# simulés sur localhost, chacun avec plusieurs requêtes en vol, mesurent le débit et la latence.
+# Les clients sont répartis sur plusieurs processus pour que le générateur ne soit pas le goulot.
+# Lancement depuis le dossier du projet :
+#   python -m benchmarks.bench_serveur [nb_clients] [duree_s] [requetes_en_vol] [persistance]
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+from benchmarks.bench_concurrence import NB_LIVRES, NB_MEMBRES, preparer
+
+# Répartition des requêtes : lectures majoritaires, comme à un guichet
+MELANGE = (("livre", 0.55), ("emprunteur", 0.10), ("rechercher", 0.10), ("emprunter", 0.15), ("retourner", 0.10))
+
+
+def requete_aleatoire(rng):
+    op = rng.choices([op for op, _ in MELANGE], [poids for _, poids in MELANGE])[0]
+    isbn = str(rng.randrange(NB_LIVRES))
+    if op == "rechercher":
+        return op, {"requete": f"titre {rng.randrange(NB_LIVRES)}", "limite": 20}
+    if op in ("emprunter", "retourner"):
+        return op, {"isbn": isbn, "id_membre": f"{rng.randrange(NB_MEMBRES):03d}"}
+    return op, {"isbn": isbn}
+
+
+async def client(adresse, fin, en_vol, graine, latences, compteurs):
+    # Envoie des requêtes tant que `fin` n'est pas atteint, avec au plus `en_vol` réponses attendues
+    rng = random.Random(graine)
+    reader, writer = await asyncio.open_connection(*adresse)
+    places = asyncio.Semaphore(en_vol)
+    envois = {}
+
+    async def lire_reponses():
+        while True:
+            ligne = await reader.readline()
+            if not ligne:
+                return
+            reponse = json.loads(ligne)
+            latences.append(time.perf_counter() - envois.pop(reponse["id"]))
+            compteurs["ok" if reponse["ok"] else "refus"] += 1
+            places.release()
+
+    lecteur = asyncio.create_task(lire_reponses())
+    id_requete = 0
+    while time.perf_counter() < fin:
+        await places.acquire()
+        id_requete += 1
+        op, args = requete_aleatoire(rng)
+        envois[id_requete] = time.perf_counter()
+        writer.write(json.dumps({"id": id_requete, "op": op, "args": args}).encode("utf-8") + b"\n")
+    # Attend les dernières réponses avant de fermer
+    for _ in range(en_vol):
+        await places.acquire()
+    writer.close()
+    lecteur.cancel()
+
+
+async def charge(adresse, graines, duree, en_vol):
+    latences = []
+    compteurs = {"ok": 0, "refus": 0}
+    fin = time.perf_counter() + duree
+    await asyncio.gather(*(client(adresse, fin, en_vol, graine, latences, compteurs) for graine in graines))
+    return latences, compteurs
+
+
+def processus_de_charge(args):
+    adresse, graines, duree, en_vol = args
+    return asyncio.run(charge(adresse, graines, duree, en_vol))
+
+
+def centile(valeurs_triees, p):
+    return valeurs_triees[min(len(valeurs_triees) - 1, int(len(valeurs_triees) * p))]
+
+
+def main(nb_clients=200, duree=10, en_vol=4, persistance="journal", nb_processus=None):
+    nb_processus = nb_processus or max(1, min(4, (os.cpu_count() or 2) // 2))
+    with tempfile.TemporaryDirectory() as dossier:
+        preparer(dossier)
+        serveur = subprocess.Popen(
+            [sys.executable, "-m", "classes.serveur", "--persistance", persistance, "--dossier", dossier, "--port", "0"],
+            stdout=subprocess.PIPE, text=True)
+        try:
+            # Première ligne : "En écoute sur HOTE:PORT"
+            hote, port = serveur.stdout.readline().split()[-1].rsplit(":", 1)
+            adresse = (hote, int(port))
+            debut = time.perf_counter()
+            with Pool(nb_processus) as pool:
+                resultats = pool.map(processus_de_charge, [
+                    (adresse, range(i, nb_clients, nb_processus), duree, en_vol) for i in range(nb_processus)])
+            temps = time.perf_counter() - debut
+        finally:
+            serveur.send_signal(signal.SIGINT if os.name == "posix" else signal.SIGTERM)
+            serveur.wait(30)
+    latences = sorted(latence for l, _ in resultats for latence in l)
+    reussies = sum(c["ok"] for _, c in resultats)
+    refusees = sum(c["refus"] for _, c in resultats)
+    print(f"{persistance}, {nb_clients} clients ({nb_processus} processus), {en_vol} requêtes en vol chacun, {temps:.1f} s")
+    print(f"  {len(latences) / temps:>10.0f} requêtes/s  ({reussies} réussies, {refusees} refusées)")
+    print(f"  latence p50 {centile(latences, 0.50) * 1000:.2f} ms, p99 {centile(latences, 0.99) * 1000:.2f} ms, "
+          f"p99.9 {centile(latences, 0.999) * 1000:.2f} ms, max {latences[-1] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+    main(*(int(a) for a in arguments[:3]), *arguments[3:4])
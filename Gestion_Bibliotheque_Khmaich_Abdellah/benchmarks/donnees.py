@@ -0,0 +1,110 @@
+# Générateur déterministe de données synthétiques au format de data/ : livres.json, membres.json
+# et historique.csv. Même graine et même date de fin -> mêmes fichiers, octet pour octet.
+# Les fichiers sont écrits en flux : 1M livres et 10M lignes d'historique tiennent en mémoire.
+# Lancement depuis le dossier du projet :
+#   python -m benchmarks.donnees dossier [nb_livres] [nb_membres] [nb_historique]
+import csv
+import json
+import os
+import random
+import sys
+from datetime import date, datetime, timedelta
+from classes.membre import DUREE_EMPRUNT, QUOTA_EMPRUNTS
+
+MOTS = ["prince", "misérables", "étranger", "guerre", "paix", "nuit", "château", "mémoires",
+        "voyage", "océan", "île", "mystère", "cœur", "rivière", "forêt", "été", "hiver", "révolte"]
+GENRES = ["Roman", "Conte", "Poésie", "Théâtre", "Essai", "Dystopie", "Policier"]
+PRENOMS = ["Yassine", "Sara", "Ilyas", "Amine", "Salma", "Hugo", "Léa", "Omar", "Inès", "Karim"]
+# Part des livres empruntés au moment de la génération, et durée couverte par l'historique
+TAUX_EMPRUNT = 0.1
+JOURS_HISTORIQUE = 365
+
+
+def id_membre(i):
+    return f"{i:06d}"
+
+
+def _ecrire_objet(chemin, paires):
+    # Même présentation que json.dump(..., indent=2) de sauvegarder(), une entrée à la fois
+    with open(chemin, "w", encoding="utf-8") as f:
+        f.write("{")
+        premier = True
+        for cle, valeur in paires:
+            corps = json.dumps(valeur, indent=2).replace("\n", "\n  ")
+            f.write(("\n  " if premier else ",\n  ") + json.dumps(cle) + ": " + corps)
+            premier = False
+        f.write("\n}" if not premier else "}")
+
+
+def _emprunts(rng, nb_livres, nb_membres):
+    # isbn -> id du membre emprunteur ; chaque membre reste sous son quota
+    places = min(int(nb_livres * TAUX_EMPRUNT), nb_membres * QUOTA_EMPRUNTS)
+    isbns = rng.sample(range(nb_livres), places)
+    emprunteurs = {}
+    for j, isbn in enumerate(isbns):
+        emprunteurs[isbn] = j % nb_membres
+    return emprunteurs
+
+
+def _livres(rng, nb_livres, emprunteurs, prefixe):
+    auteurs = max(1, nb_livres // 20)
+    for i in range(nb_livres):
+        titre = " ".join(rng.choice(MOTS) for _ in range(3)).capitalize() + f" {i}"
+        yield f"{prefixe}{i}", {"isbn": f"{prefixe}{i}", "titre": titre, "auteur": f"Auteur {rng.randrange(auteurs)}",
+                       "annee": str(1800 + rng.randrange(225)), "genre": rng.choice(GENRES),
+                       "statut": "emprunté" if i in emprunteurs else "disponible"}
+
+
+def _membres(nb_membres, emprunteurs, fin, prefixe):
+    # Échéances réparties sur DUREE_EMPRUNT jours autour de `fin` : environ un tiers en retard
+    empruntes = [[] for _ in range(nb_membres)]
+    echeances = [{} for _ in range(nb_membres)]
+    origine = datetime.combine(fin, datetime.min.time()) - timedelta(days=DUREE_EMPRUNT // 3)
+    for isbn, membre in sorted(emprunteurs.items()):
+        empruntes[membre].append(f"{prefixe}{isbn}")
+        echeance = origine + timedelta(days=isbn * 7919 % DUREE_EMPRUNT, hours=isbn % 10 + 9)
+        echeances[membre][f"{prefixe}{isbn}"] = echeance.isoformat(timespec="seconds")
+    for i in range(nb_membres):
+        yield id_membre(i), {"nom": f"{PRENOMS[i % len(PRENOMS)]} {i}", "livres_empruntes": empruntes[i],
+                             "echeances": echeances[i]}
+
+
+def _historique(rng, chemin, nb_lignes, nb_livres, nb_membres, fin, prefixe):
+    # Lignes réparties uniformément sur JOURS_HISTORIQUE jours jusqu'à `fin`, dans l'ordre des dates
+    debut = datetime.combine(fin, datetime.min.time()) - timedelta(days=JOURS_HISTORIQUE - 1)
+    pas = JOURS_HISTORIQUE * 86400 / max(1, nb_lignes)
+    with open(chemin, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["date", "ISBN", "ID_membre", "action"])
+        lot = []
+        for i in range(nb_lignes):
+            moment = debut + timedelta(seconds=i * pas + rng.random() * pas)
+            lot.append((moment.isoformat(), f"{prefixe}{rng.randrange(nb_livres)}", id_membre(rng.randrange(nb_membres)),
+                        "emprunt" if rng.random() < 0.5 else "retour"))
+            if len(lot) >= 10000:
+                writer.writerows(lot)
+                lot.clear()
+        writer.writerows(lot)
+
+
+def generer(dossier, nb_livres=100_000, nb_membres=10_000, nb_historique=1_000_000, graine=42, fin=None,
+            prefixe=""):
+    # Écrit les trois fichiers dans `dossier` ; `fin` (date) est le jour de la dernière ligne
+    # d'historique, aujourd'hui par défaut pour que le graphique des 30 derniers jours soit rempli ;
+    # `prefixe` précède chaque ISBN (branches d'une fédération aux catalogues disjoints)
+    os.makedirs(dossier, exist_ok=True)
+    fin = fin or date.today()
+    rng = random.Random(graine)
+    emprunteurs = _emprunts(rng, nb_livres, nb_membres)
+    _ecrire_objet(os.path.join(dossier, "livres.json"), _livres(rng, nb_livres, emprunteurs, prefixe))
+    _ecrire_objet(os.path.join(dossier, "membres.json"), _membres(nb_membres, emprunteurs, fin, prefixe))
+    _historique(rng, os.path.join(dossier, "historique.csv"), nb_historique, max(1, nb_livres), max(1, nb_membres), fin,
+                prefixe)
+    return {"nb_livres": nb_livres, "nb_membres": nb_membres, "nb_historique": nb_historique,
+            "nb_empruntes": len(emprunteurs), "graine": graine, "fin": fin.isoformat()}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("usage : python -m benchmarks.donnees dossier [nb_livres] [nb_membres] [nb_historique]")
+    print(generer(sys.argv[1], *(int(a) for a in sys.argv[2:5])))
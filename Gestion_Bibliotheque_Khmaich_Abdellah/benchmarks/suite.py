@@ -0,0 +1,274 @@
+# Suite de benchmarks sur données synthétiques (benchmarks/donnees.py) : chargement, sauvegarde,
+# emprunts / retours, historique, analyses, recommandations, suppressions et préparation / rendu
+# des graphiques.
+# Les résultats sont écrits dans un fichier JSON ; avec --reference, ils sont comparés à ceux
+# d'une exécution précédente (autre version du code) et les régressions sont signalées.
+# Lancement depuis le dossier du projet :
+#   python -m benchmarks.suite --livres 1000000 --membres 100000 --historique 10000000 --sortie apres.json
+#   python -m benchmarks.suite ... --reference avant.json
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from benchmarks.donnees import generer, id_membre
+from classes.bibliotheque import Bibliotheque
+from classes.membre import QUOTA_EMPRUNTS
+
+FORMAT_RESULTATS = 1
+PERSISTANCES = ("json", "journal", "sqlite")
+GRAPHIQUES = ("genres", "auteurs", "emprunts")
+ANALYSES = ("volumes_jour", "volumes_semaine", "volumes_mois", "genres_temps", "heures", "durees")
+
+
+def chronometrer(fonction, *args):
+    debut = time.perf_counter()
+    resultat = fonction(*args)
+    return time.perf_counter() - debut, resultat
+
+
+def debit(fonction, operations, duree_max):
+    # Exécute fonction(*operation) dans l'ordre jusqu'à épuisement ou jusqu'à duree_max secondes
+    nb = 0
+    debut = time.perf_counter()
+    for operation in operations:
+        fonction(*operation)
+        nb += 1
+        if time.perf_counter() - debut >= duree_max:
+            break
+    return {"operations": nb, "secondes": time.perf_counter() - debut}
+
+
+def unique(secondes):
+    return {"operations": 1, "secondes": secondes}
+
+
+def choisir_emprunts(biblio, nb, rng, parametres):
+    # Couples (isbn, id_membre) empruntables, tirés avant la mesure : livre disponible,
+    # membre sous son quota en tenant compte des emprunts déjà choisis
+    couples = []
+    livres_pris = set()
+    emprunts = {}
+    for _ in range(nb * 20):
+        if len(couples) >= nb:
+            break
+        isbn = str(rng.randrange(parametres["nb_livres"]))
+        membre = id_membre(rng.randrange(parametres["nb_membres"]))
+        if isbn in livres_pris:
+            continue
+        livre = biblio.livres.get(isbn)
+        if livre is None or livre.statut != "disponible":
+            continue
+        if membre not in emprunts:
+            emprunts[membre] = len(biblio.membres[membre].livres_empruntes)
+        if emprunts[membre] >= QUOTA_EMPRUNTS:
+            continue
+        emprunts[membre] += 1
+        livres_pris.add(isbn)
+        couples.append((isbn, membre))
+    return couples
+
+
+def mesurer_graphiques(stats, mesures, prefixe):
+    # Préparation des données (thread de l'interface) et rendu Agg (thread de fond) séparés
+    try:
+        from visualisation import donnees_graphique, rendre_graphique
+    except ImportError as e:
+        print(f"  graphiques ignorés : {e}")
+        return
+    for type_chart in GRAPHIQUES:
+        secondes, donnees = chronometrer(donnees_graphique, type_chart, stats)
+        mesures[f"{prefixe}.graphique_{type_chart}.donnees"] = unique(secondes)
+        secondes, _ = chronometrer(rendre_graphique, type_chart, donnees, 900, 500)
+        mesures[f"{prefixe}.graphique_{type_chart}.rendu"] = unique(secondes)
+
+
+def mesurer_persistance(persistance, source, parametres, nb_operations, duree_max, mesures):
+    with tempfile.TemporaryDirectory() as dossier:
+        for nom in ("livres.json", "membres.json", "historique.csv"):
+            shutil.copy(os.path.join(source, nom), dossier)
+        rng = random.Random(parametres["graine"])
+
+        # Premier chargement (migration de historique.csv par mois, et vers la base en mode sqlite), puis chargement courant
+        biblio = Bibliotheque(persistance=persistance, dossier=dossier)
+        secondes, _ = chronometrer(biblio.charger)
+        mesures[f"{persistance}.charger_initial"] = unique(secondes)
+        biblio.fermer()
+        biblio = Bibliotheque(persistance=persistance, dossier=dossier)
+        secondes, _ = chronometrer(biblio.charger)
+        mesures[f"{persistance}.charger"] = unique(secondes)
+
+        # Statistiques des graphiques : catalogue + relecture de l'historique
+        secondes, stats = chronometrer(biblio.statistiques)
+        mesures[f"{persistance}.statistiques"] = unique(secondes)
+
+        # Emprunts puis retours un par un (chaque opération est écrite), puis par lot
+        couples = choisir_emprunts(biblio, nb_operations, rng, parametres)
+        mesure = debit(biblio.emprunter_livre, couples, duree_max)
+        mesures[f"{persistance}.emprunter_livre"] = mesure
+        faits = couples[:mesure["operations"]]
+        mesures[f"{persistance}.retourner_livre"] = debit(biblio.retourner_livre, faits, duree_max)
+        couples = choisir_emprunts(biblio, nb_operations, rng, parametres)
+        secondes, _ = chronometrer(biblio.emprunter_lot, couples)
+        mesures[f"{persistance}.emprunter_lot"] = {"operations": len(couples), "secondes": secondes}
+        secondes, _ = chronometrer(biblio.retourner_lot, couples)
+        mesures[f"{persistance}.retourner_lot"] = {"operations": len(couples), "secondes": secondes}
+
+        # Historique : événements écrits puis vidés sur disque
+        evenements = [(str(rng.randrange(parametres["nb_livres"])), id_membre(rng.randrange(parametres["nb_membres"])),
+                       "emprunt" if i % 2 else "retour") for i in range(nb_operations * 10)]
+        debut = time.perf_counter()
+        mesure = debit(biblio.enregistrer_historique, evenements, duree_max)
+        biblio.sauvegarder()
+        mesure["secondes"] = time.perf_counter() - debut
+        mesures[f"{persistance}.enregistrer_historique"] = mesure
+
+        # Historique d'un membre et d'un livre (index des positions en mode fichiers)
+        membres = [(id_membre(rng.randrange(parametres["nb_membres"])),) for _ in range(nb_operations)]
+        mesures[f"{persistance}.historique_membre"] = debit(biblio.historique_membre, membres, duree_max)
+        livres = [(str(rng.randrange(parametres["nb_livres"])),) for _ in range(nb_operations)]
+        mesures[f"{persistance}.historique_livre"] = debit(biblio.historique_livre, livres, duree_max)
+
+        # Échéances : premier appel (construction de l'échéancier), puis requêtes courantes
+        secondes, retards = chronometrer(biblio.emprunts_en_retard)
+        mesures[f"{persistance}.emprunts_en_retard_initial"] = unique(secondes)
+        mesures[f"{persistance}.emprunts_en_retard"] = debit(biblio.emprunts_en_retard, [()] * nb_operations, duree_max)
+        mesures[f"{persistance}.emprunts_a_echeance"] = debit(biblio.emprunts_a_echeance, [(3,)] * nb_operations, duree_max)
+
+        # Analyses de tout l'historique : chargement des tableaux NumPy, puis chaque graphique
+        try:
+            secondes, _ = chronometrer(biblio.analyses)
+        except ImportError as e:
+            print(f"  analyses ignorées : {e}")
+        else:
+            mesures[f"{persistance}.analyses_chargement"] = unique(secondes)
+            for type_analyse in ANALYSES:
+                secondes, _ = chronometrer(biblio.donnees_analyse, type_analyse)
+                mesures[f"{persistance}.analyse_{type_analyse}"] = unique(secondes)
+            # Recommandations : construction de la matrice des co-emprunts, puis requêtes courantes
+            secondes, _ = chronometrer(biblio.recommandations, livres[0][0])
+            mesures[f"{persistance}.recommandations_construction"] = unique(secondes)
+            mesures[f"{persistance}.recommandations"] = debit(biblio.recommandations, livres, duree_max)
+            mesures[f"{persistance}.recommandations_membre"] = debit(biblio.recommandations_membre, membres, duree_max)
+
+        secondes, _ = chronometrer(biblio.sauvegarder)
+        mesures[f"{persistance}.sauvegarder"] = unique(secondes)
+        if persistance == "json":
+            # Réécriture complète de livres.json et membres.json, faite à la fin de chaque opération
+            secondes, _ = chronometrer(biblio._stockage._ecrire, biblio)
+            mesures[f"{persistance}.ecriture_complete"] = unique(secondes)
+
+        # Suppressions (un membre rend ses livres, un livre est retiré de son emprunteur)
+        membres = [(id_,) for id_ in rng.sample([id_membre(i) for i in range(parametres["nb_membres"])],
+                                                min(nb_operations, parametres["nb_membres"]))]
+        mesures[f"{persistance}.supprimer_membre"] = debit(biblio.supprimer_membre, membres, duree_max)
+        livres = [(str(i),) for i in rng.sample(range(parametres["nb_livres"]), min(nb_operations, parametres["nb_livres"]))]
+        mesures[f"{persistance}.supprimer_livre"] = debit(biblio.supprimer_livre, livres, duree_max)
+
+        mesurer_graphiques(biblio.statistiques(), mesures, persistance)
+        biblio.fermer()
+
+
+def commit_courant():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def par_operation(mesure):
+    return mesure["secondes"] / max(1, mesure["operations"])
+
+
+def afficher(mesures):
+    for nom, mesure in mesures.items():
+        if mesure["operations"] > 1:
+            print(f"  {nom:<40} {mesure['operations'] / mesure['secondes']:>12.0f} op/s  "
+                  f"({mesure['operations']} en {mesure['secondes']:.3f} s)")
+        else:
+            print(f"  {nom:<40} {mesure['secondes'] * 1000:>12.1f} ms")
+
+
+def comparer(reference, resultats, seuil):
+    # Temps par opération de chaque mesure commune ; renvoie le nombre de régressions
+    if reference["parametres"] != resultats["parametres"]:
+        print("attention : paramètres différents de ceux de la référence")
+    regressions = 0
+    print(f"comparaison avec {reference.get('commit') or '?'} ({reference['date']}) :")
+    for nom, mesure in resultats["mesures"].items():
+        ancienne = reference["mesures"].get(nom)
+        if ancienne is None:
+            continue
+        rapport = par_operation(mesure) / max(par_operation(ancienne), 1e-12)
+        etat = ""
+        if rapport > 1 + seuil:
+            etat = "  <- régression"
+            regressions += 1
+        elif rapport < 1 - seuil:
+            etat = "  (amélioration)"
+        print(f"  {nom:<40} x{rapport:6.2f}{etat}")
+    return regressions
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de la bibliothèque sur données synthétiques")
+    parser.add_argument("--livres", type=int, default=100_000)
+    parser.add_argument("--membres", type=int, default=10_000)
+    parser.add_argument("--historique", type=int, default=1_000_000)
+    parser.add_argument("--graine", type=int, default=42)
+    parser.add_argument("--persistance", default=",".join(PERSISTANCES),
+                        help="modes mesurés, séparés par des virgules")
+    parser.add_argument("--operations", type=int, default=1000, help="opérations par scénario")
+    parser.add_argument("--duree-max", type=float, default=10.0, help="durée maximale d'un scénario (s)")
+    parser.add_argument("--donnees", help="dossier de données générées à réutiliser (créé s'il n'existe pas)")
+    parser.add_argument("--sortie", default="resultats_benchmarks.json")
+    parser.add_argument("--reference", help="résultats d'une exécution précédente à comparer")
+    parser.add_argument("--seuil", type=float, default=0.10, help="écart relatif signalé comme régression")
+    args = parser.parse_args(arguments)
+
+    with tempfile.TemporaryDirectory() as temporaire:
+        source = args.donnees or temporaire
+        parametres = {"nb_livres": args.livres, "nb_membres": args.membres, "nb_historique": args.historique,
+                      "graine": args.graine, "operations": args.operations, "duree_max": args.duree_max}
+        mesures = {}
+        if not os.path.exists(os.path.join(source, "historique.csv")):
+            print(f"génération : {args.livres} livres, {args.membres} membres, {args.historique} lignes d'historique")
+            secondes, _ = chronometrer(generer, source, args.livres, args.membres, args.historique, args.graine)
+            mesures["generation"] = unique(secondes)
+        for persistance in args.persistance.split(","):
+            print(f"{persistance} :")
+            avant = len(mesures)
+            mesurer_persistance(persistance, source, parametres, args.operations, args.duree_max, mesures)
+            afficher(dict(list(mesures.items())[avant:]))
+
+    resultats = {
+        "format": FORMAT_RESULTATS,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit_courant(),
+        "python": platform.python_version(),
+        "plateforme": platform.platform(),
+        "processeurs": os.cpu_count(),
+        "parametres": parametres,
+        "mesures": mesures,
+    }
+    with open(args.sortie, "w", encoding="utf-8") as f:
+        json.dump(resultats, f, indent=2)
+    print(f"résultats écrits dans {args.sortie}")
+
+    if args.reference:
+        with open(args.reference, "r", encoding="utf-8") as f:
+            reference = json.load(f)
+        if comparer(reference, resultats, args.seuil):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+import numpy as np
+from classes.historique_partitions import LecteurColonnes
+from classes.mesures import instrumenter
+
+# Analyses de l'historique sur toute sa durée : volumes d'emprunts et de retours par jour,
+# semaine ou mois, popularité des genres dans le temps, carte heure x jour de la semaine et
+# durée des emprunts (paires emprunt / retour).
+#
+# L'historique est chargé une fois dans des tableaux NumPy : dates en datetime64[us], ISBN,
+# membres et actions en codes entiers (index dans isbns / membres / actions). Les agrégats
+# sont des bincount sur des clés calculées une fois par ligne (jour x action, heure de la
+# semaine x action) ; les semaines et les mois se déduisent ensuite des comptes par jour.
+# Les mois compactés sont lus bloc par bloc directement dans les tableaux ; les nouvelles
+# lignes (événements "historique" de la bibliothèque) sont ajoutées à la requête suivante.
+#
+# NumPy n'est importé que par ce module, lui-même importé à la première analyse.
+
+JOURS_SEMAINE = ("Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche")
+# Durées d'emprunt au-delà regroupées dans la dernière case de l'histogramme
+DUREE_MAX_HISTOGRAMME = 60
+MICROSECONDES_PAR_HEURE = 3_600_000_000
+
+
+class Dictionnaire:
+    # Valeur -> code entier, dans l'ordre d'apparition
+    def __init__(self):
+        self.codes = {}
+        self._valeurs = []
+
+    def coder(self, valeurs):
+        # Codes d'une colonne de textes ; setdefault ajoute les valeurs inconnues au passage
+        codes = self.codes
+        return np.array([codes.setdefault(valeur, len(codes)) for valeur in valeurs], dtype=np.int64)
+
+    @property
+    def valeurs(self):
+        if len(self._valeurs) != len(self.codes):
+            self._valeurs = list(self.codes)
+        return self._valeurs
+
+
+def tri_par_code(codes, nb_codes):
+    # Ordre stable des lignes par code : tri par base sur 16 bits (linéaire) plutôt qu'un
+    # tri fusion, en deux passes au-delà de 65536 codes distincts
+    ordre = np.argsort((codes & 0xFFFF).astype(np.uint16), kind="stable")
+    if nb_codes > 0x10000:
+        ordre = ordre[np.argsort((codes[ordre] >> 16).astype(np.uint16), kind="stable")]
+    return ordre
+
+
+class Analyses:
+    def __init__(self):
+        self.isbns = Dictionnaire()
+        self.membres = Dictionnaire()
+        self.actions = Dictionnaire()
+        self.dates = np.empty(0, dtype="datetime64[us]")
+        self.isbn = np.empty(0, dtype=np.int32)
+        self.membre = np.empty(0, dtype=np.int32)
+        self.action = np.empty(0, dtype=np.int8)
+        self._morceaux = []
+        self._en_attente = []
+        # Tableaux dérivés, recalculés après l'ajout de lignes
+        self._cache = {}
+
+    # --- Chargement ---
+
+    @classmethod
+    def depuis_historique(cls, historique):
+        # historique : HistoriquePartitionne (modes json et journal)
+        return cls.depuis_mois(historique.parcourir_mois())
+
+    @classmethod
+    @instrumenter("Analyses.depuis_historique")
+    def depuis_mois(cls, mois_historique):
+        # mois_historique : HistoriquePartitionne.parcourir_mois(), éventuellement lu sur un autre thread
+        analyses = cls()
+        for mois in mois_historique:
+            if isinstance(mois, LecteurColonnes):
+                analyses._ajouter_blocs(mois)
+            else:
+                analyses._ajouter_colonnes(*mois)
+        analyses._assembler()
+        return analyses
+
+    @classmethod
+    @instrumenter("Analyses.depuis_lignes")
+    def depuis_lignes(cls, lignes):
+        # lignes : (date, isbn, id_membre, action) en texte, par exemple la table de la base sqlite
+        analyses = cls()
+        analyses._ajouter_lignes(lignes)
+        analyses._assembler()
+        return analyses
+
+    def _ajouter_blocs(self, lecteur):
+        # Mois compacté : les codes du mois sont traduits en codes globaux par un seul indexage
+        blocs = list(lecteur.octets_blocs())
+        if not blocs:
+            return
+        recodages = [dictionnaire.coder(lecteur.valeurs(nom)) for dictionnaire, nom in
+                     ((self.isbns, "isbn"), (self.membres, "membre"), (self.actions, "action"))]
+        colonnes = [np.frombuffer(b"".join(bloc[i] for bloc in blocs), dtype="<i8") for i in range(4)]
+        # Dates : écarts cumulés repartant de zéro à chaque bloc
+        tailles = np.array([len(bloc[0]) // 8 for bloc in blocs])
+        cumul = np.cumsum(colonnes[0])
+        decalages = np.concatenate(([0], cumul[np.cumsum(tailles)[:-1] - 1]))
+        dates = cumul - np.repeat(decalages, tailles)
+        self._morceaux.append((dates.astype("datetime64[us]"), recodages[0][colonnes[1]],
+                               recodages[1][colonnes[2]], recodages[2][colonnes[3]]))
+
+    def _ajouter_colonnes(self, dates, isbns, membres, actions):
+        if dates:
+            self._morceaux.append((np.array(dates, dtype="datetime64[us]"), self.isbns.coder(isbns),
+                                   self.membres.coder(membres), self.actions.coder(actions)))
+
+    def _ajouter_lignes(self, lignes):
+        colonnes = list(zip(*lignes))
+        if colonnes:
+            self._ajouter_colonnes(*colonnes)
+
+    def _assembler(self):
+        # Concatène les morceaux lus aux tableaux existants, dans l'ordre des dates
+        if not self._morceaux:
+            return
+        morceaux = [(self.dates, self.isbn, self.membre, self.action)] + self._morceaux
+        self._morceaux = []
+        dates = np.concatenate([m[0] for m in morceaux])
+        colonnes = [np.concatenate([m[i] for m in morceaux]).astype(type_) for i, type_ in
+                    ((1, np.int32), (2, np.int32), (3, np.int8))]
+        if len(dates) > 1 and not (dates[1:] >= dates[:-1]).all():
+            # Lots écrits en retard par d'autres processus : tri stable par date
+            ordre = np.argsort(dates, kind="stable")
+            dates = dates[ordre]
+            colonnes = [colonne[ordre] for colonne in colonnes]
+        self.dates = dates
+        self.isbn, self.membre, self.action = colonnes
+        self._cache = {}
+
+    def recevoir(self, evenement, donnees):
+        # Abonné aux événements de Bibliotheque : les lignes sont intégrées à la requête suivante
+        if evenement == "historique":
+            self._en_attente.append((donnees["date"], donnees["isbn"], donnees["id_membre"], donnees["action"]))
+
+    def _actualiser(self):
+        if self._en_attente:
+            lignes, self._en_attente = self._en_attente, []
+            self._ajouter_lignes(lignes)
+            self._assembler()
+
+    def __len__(self):
+        self._actualiser()
+        return len(self.dates)
+
+    # --- Tableaux dérivés ---
+
+    def _derive(self, nom, calcul):
+        self._actualiser()
+        if nom not in self._cache:
+            self._cache[nom] = calcul()
+        return self._cache[nom]
+
+    def _jours(self):
+        # Jour de chaque ligne, en jours depuis le 1970-01-01 (croissants, comme les dates)
+        return self._derive("jours", lambda: self.dates.astype("datetime64[D]").astype(np.int64))
+
+    def _etendue(self):
+        # (premier jour, nombre de jours) de l'historique
+        jours = self._jours()
+        return (int(jours[0]), int(jours[-1]) - int(jours[0]) + 1) if len(jours) else (0, 0)
+
+    def _cles_jour(self):
+        # Clé (jour, action) de chaque ligne, jours comptés depuis le premier de l'historique
+        return self._derive("cles_jour",
+                            lambda: (self._jours() - self._etendue()[0]) * len(self.actions.codes) + self.action)
+
+    def _par_jour(self):
+        # Matrice jours x actions du nombre de lignes
+        def calcul():
+            nb_jours, nb_actions = self._etendue()[1], len(self.actions.codes)
+            return np.bincount(self._cles_jour(), minlength=nb_jours * nb_actions).reshape(nb_jours, nb_actions)
+        return self._derive("par_jour", calcul)
+
+    def _periodes(self, periode):
+        # Numéro de période (0, 1, ...) de chaque jour de l'historique et débuts des périodes
+        premier, nb_jours = self._etendue()
+        jours = np.arange(premier, premier + nb_jours)
+        if periode == "jour":
+            numeros, debuts = jours, jours
+        elif periode == "semaine":
+            # Semaines commençant le lundi (le 1970-01-01 est un jeudi)
+            numeros = (jours + 3) // 7
+            debuts = np.unique(numeros) * 7 - 3
+        elif periode == "mois":
+            numeros = jours.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+            debuts = np.unique(numeros).astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+        else:
+            raise ValueError(f"Période inconnue : {periode} (jour, semaine ou mois)")
+        return numeros, debuts.astype("datetime64[D]")
+
+    def _regrouper(self, par_jour, periode):
+        # Comptes par jour (jours sur le dernier axe) -> (débuts des périodes, comptes par période)
+        numeros, debuts = self._periodes(periode)
+        if periode == "jour" or not len(numeros):
+            return debuts, par_jour
+        # Les jours sont consécutifs : chaque période est une tranche de jours
+        return debuts, np.add.reduceat(par_jour, np.flatnonzero(np.diff(numeros, prepend=numeros[0] - 1)), axis=-1)
+
+    # --- Agrégats ---
+
+    @instrumenter("Analyses.volumes")
+    def volumes(self, periode="jour", actions=("emprunt", "retour")):
+        # Nombre de lignes de chaque action par période, périodes vides comprises :
+        # (débuts des périodes, {action: nombres})
+        par_jour = self._par_jour()
+        debuts = self._periodes(periode)[1]
+        volumes = {}
+        for action in actions:
+            code = self.actions.codes.get(action)
+            if code is None:
+                volumes[action] = np.zeros(len(debuts), dtype=np.int64)
+            else:
+                volumes[action] = self._regrouper(par_jour[:, code], periode)[1]
+        return debuts, volumes
+
+    @instrumenter("Analyses.genres_par_periode")
+    def genres_par_periode(self, genres, periode="mois", action="emprunt"):
+        # Lignes de l'action pour chaque genre par période. genres : isbn -> genre (catalogue
+        # actuel ; les livres supprimés depuis comptent dans "Inconnu"). Renvoie (débuts des
+        # périodes, noms des genres, matrice genres x périodes)
+        cles = self._cles_jour()
+        noms = Dictionnaire()
+        # Genre de chaque code ISBN : une boucle sur les ISBN distincts, pas sur les lignes
+        genre_du_code = noms.coder([genres.get(isbn, "Inconnu") for isbn in self.isbns.valeurs])
+        nb_jours, nb_actions = self._etendue()[1], len(self.actions.codes)
+        comptes = np.bincount(genre_du_code[self.isbn] * (nb_jours * nb_actions) + cles,
+                              minlength=len(noms.codes) * nb_jours * nb_actions)
+        comptes = comptes.reshape(len(noms.codes), nb_jours, nb_actions)
+        code = self.actions.codes.get(action)
+        par_jour = comptes[:, :, code] if code is not None else np.zeros(comptes.shape[:2], dtype=np.int64)
+        debuts, matrice = self._regrouper(par_jour, periode)
+        return debuts, noms.valeurs, matrice
+
+    def _par_heure(self):
+        # Comptes par (jour de la semaine, heure, action), lundi d'abord
+        def calcul():
+            # Heures depuis le 1970-01-01, un jeudi : la semaine commence 3 jours plus tôt
+            heures = self.dates.astype(np.int64) // MICROSECONDES_PAR_HEURE
+            nb_actions = len(self.actions.codes)
+            cles = ((heures + 3 * 24) % (7 * 24)) * nb_actions + self.action
+            return np.bincount(cles, minlength=7 * 24 * nb_actions).reshape(7, 24, nb_actions)
+        return self._derive("par_heure", calcul)
+
+    @instrumenter("Analyses.carte_horaire")
+    def carte_horaire(self, action="emprunt"):
+        # Matrice 7 x 24 : lignes de l'action par jour de la semaine et par heure
+        par_heure = self._par_heure()
+        code = self.actions.codes.get(action)
+        return par_heure[:, :, code] if code is not None else np.zeros((7, 24), dtype=np.int64)
+
+    @instrumenter("Analyses.durees_emprunts")
+    def durees_emprunts(self):
+        # Paires emprunt -> retour suivant du même livre par le même membre :
+        # (dates des emprunts, durées en jours). Un livre n'a qu'un emprunt en cours à la fois,
+        # donc une paire est formée de deux lignes voisines une fois les lignes emprunt / retour
+        # groupées par livre (tri stable : l'ordre des dates est gardé dans chaque livre).
+        def calcul():
+            code_emprunt, code_retour = self.actions.codes.get("emprunt"), self.actions.codes.get("retour")
+            if code_emprunt is None or code_retour is None:
+                return np.empty(0, dtype="datetime64[us]"), np.empty(0)
+            lignes = np.flatnonzero(np.isin(self.action, (code_emprunt, code_retour)))
+            isbns = self.isbn[lignes]
+            ordre = tri_par_code(isbns, len(self.isbns.codes))
+            lignes, isbns = lignes[ordre], isbns[ordre]
+            membres, actions = self.membre[lignes], self.action[lignes]
+            paires = np.flatnonzero((isbns[:-1] == isbns[1:]) & (membres[:-1] == membres[1:])
+                                    & (actions[:-1] == code_emprunt) & (actions[1:] == code_retour))
+            debuts, fins = self.dates[lignes[paires]], self.dates[lignes[paires + 1]]
+            return debuts, (fins - debuts) / np.timedelta64(1, "D")
+        return self._derive("durees", calcul)
+
+    # --- Données des graphiques (listes et textes, transportables en JSON par le serveur) ---
+
+    def donnees(self, type_analyse, genres=None):
+        if type_analyse.startswith("volumes_"):
+            periodes, volumes = self.volumes(type_analyse[len("volumes_"):])
+            return {"periodes": np.datetime_as_string(periodes).tolist(),
+                    **{action: nombres.tolist() for action, nombres in volumes.items()}}
+        if type_analyse == "genres_temps":
+            periodes, noms, matrice = self.genres_par_periode(genres or {})
+            return {"periodes": np.datetime_as_string(periodes).tolist(), "genres": noms, "valeurs": matrice.tolist()}
+        if type_analyse == "heures":
+            return {"jours": list(JOURS_SEMAINE), "valeurs": self.carte_horaire().tolist()}
+        if type_analyse == "durees":
+            _, durees = self.durees_emprunts()
+            cases = np.bincount(np.minimum(durees.astype(np.int64), DUREE_MAX_HISTOGRAMME),
+                                minlength=DUREE_MAX_HISTOGRAMME + 1)
+            return {"nombres": cases.tolist(), "nombre": int(len(durees)),
+                    "moyenne": float(durees.mean()) if len(durees) else None,
+                    "mediane": float(np.median(durees)) if len(durees) else None}
+        raise ValueError(f"Analyse inconnue : {type_analyse}")
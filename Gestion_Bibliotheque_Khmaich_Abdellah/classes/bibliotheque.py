@@ -1,75 +1,955 @@
-import json
-import csv
-from datetime import datetime
-from classes.livre import Livre
-from classes.membre import Membre
-from classes.exceptions import *
-
-class Bibliotheque:
-    def __init__(self):
-        self.livres = {}
-        self.membres = {}
-
-    def ajouter_livre(self, livre):
-        self.livres[livre.isbn] = livre
-
-    def supprimer_livre(self, isbn):
-        if isbn in self.livres:
-            del self.livres[isbn]
-        else:
-            raise LivreInexistantError()
-
-    def enregistrer_membre(self, membre):
-        self.membres[membre.id_membre] = membre
-
-    def emprunter_livre(self, isbn, id_membre):
-        if id_membre not in self.membres:
-            raise MembreInexistantError()
-        if isbn not in self.livres:
-            raise LivreInexistantError()
-        livre = self.livres[isbn]
-        membre = self.membres[id_membre]
-        if livre.statut != "disponible":
-            raise LivreIndisponibleError()
-        if len(membre.livres_empruntes) >= 3:
-            raise QuotaEmpruntDepasseError()
-        livre.statut = "emprunté"
-        membre.livres_empruntes.append(isbn)
-        self.enregistrer_historique(isbn, id_membre, "emprunt")
-
-    def retourner_livre(self, isbn, id_membre):
-        livre = self.livres.get(isbn)
-        membre = self.membres.get(id_membre)
-        if livre and isbn in membre.livres_empruntes:
-            livre.statut = "disponible"
-            membre.livres_empruntes.remove(isbn)
-            self.enregistrer_historique(isbn, id_membre, "retour")
-        else:
-            raise LivreInexistantError("Le livre n'est pas emprunté par ce membre.")
-
-    def sauvegarder(self):
-        with open("data/livres.json", "w",encoding="utf-8") as f:
-            json.dump({isbn: vars(livre) for isbn, livre in self.livres.items()}, f, indent=2)
-        with open("data/membres.json", "w",encoding="utf-8") as f:
-            json.dump({id_: {"nom": m.nom, "livres_empruntes": m.livres_empruntes} for id_, m in self.membres.items()}, f, indent=2)
-
-    def charger(self):
-        try:
-            with open("data/livres.json", "r",encoding="utf-8") as f:
-                data = json.load(f)
-                self.livres = {isbn: Livre(**d) for isbn, d in data.items()}
-        except FileNotFoundError:
-            pass
-        try:
-            with open("data/membres.json", "r", encoding="utf-8") as f:
-                data = json.load(f)
-                self.membres = {id_: Membre(id_, d["nom"]) for id_, d in data.items()}
-                for id_, m in data.items():
-                    self.membres[id_].livres_empruntes = m["livres_empruntes"]
-        except FileNotFoundError:
-            pass
-
-    def enregistrer_historique(self, isbn, id_membre, action):
-        with open("data/historique.csv", "a",encoding="utf-8", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow([datetime.now().isoformat(), isbn, id_membre, action])
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta
+import weakref
+from functools import wraps
+from classes.livre import Livre, convertir_annee
+from classes.membre import Membre, DUREE_EMPRUNT, QUOTA_EMPRUNTS
+from classes.echeances import Echeancier, echeance_depuis, prolongation
+from classes.exceptions import *
+from classes.historique_partitions import en_texte
+from classes.mesures import instrumenter
+from classes.index import CHAMPS_INDEXES, IndexSecondaires
+from classes.instantane import Instantane, VueFigee, copier_livre, copier_membre
+from classes.recherche import IndexRecherche
+from classes.reservations import FilesReservations, fin_retrait
+from classes.statistiques import Statistiques
+from classes.stockage import StockageJSON, StockageJournal
+from classes.stockage_sqlite import StockageSQLite
+
+# Erreurs d'une opération d'un lot : notées dans le rapport sans interrompre le lot
+ERREURS_OPERATION = (LivreInexistantError, MembreInexistantError, LivreIndisponibleError, QuotaEmpruntDepasseError,
+                     ReservationImpossibleError)
+
+
+def _operation(methode):
+    # Exécute une mutation dans la section critique du stockage (verrou entre processus,
+    # modifications des autres processus prises en compte juste avant)
+    @wraps(methode)
+    def executer(self, *args, **kwargs):
+        with self._stockage.operation(self):
+            return methode(self, *args, **kwargs)
+    return executer
+
+
+class Transaction:
+    # État d'une transaction en cours (voir Bibliotheque.transaction)
+    def __init__(self):
+        # État d'origine des enregistrements modifiés : (objet, état) ou None s'il n'existait pas
+        self.livres_origine = {}
+        self.membres_origine = {}
+        # Écritures différées jusqu'à la validation (clés dans l'ordre des opérations)
+        self.livres = {}
+        self.membres = {}
+        self.historique = []
+        self.evenements = []
+
+
+class Bibliotheque:
+    def __init__(self, persistance="json", dossier="data", options_historique=None, snapshot_binaire=False,
+                 options_recommandations=None):
+        # persistance : "json" (réécriture complète à chaque sauvegarde),
+        #               "journal" (ajout en fin de journal + snapshot périodique)
+        #               ou "sqlite" (base data/bibliotheque.db, lectures à la demande)
+        # options_historique : paramètres du HistoriqueWriter (taille_lot, intervalle,
+        #                      durabilite, arriere_plan) pour les modes json et journal
+        # snapshot_binaire : en modes json et journal, écrit aussi data/livres.bin et le lit
+        #                    par mmap au démarrage (livres construits à la demande)
+        # options_recommandations : paramètres des recommandations (fenetre, demi_vie en jours)
+        self.livres = {}
+        self.membres = {}
+        self.dossier = dossier
+        # Index secondaires (statut, genre, auteur, emprunteur), construits à la première utilisation
+        self._index = None
+        # Index de recherche plein texte, construit à la première recherche
+        self._recherche = None
+        # Échéancier des emprunts en cours, construit à la première requête sur les échéances
+        self._echeancier = None
+        # Files d'attente des réservations, construites à la première opération qui les utilise
+        self._reservations = None
+        # Fonctions appelées à chaque mutation : fonction(evenement, donnees)
+        self._abonnes = []
+        self._statistiques = None
+        self._analyses = None
+        self._recommandations = None
+        # Lignes d'historique mises de côté pendant une construction hors du thread principal
+        # (voir preparer_recommandations)
+        self._construction = None
+        self.options_recommandations = options_recommandations or {}
+        # Version des données, incrémentée à chaque mutation (clé des caches de l'interface)
+        self.version = 0
+        # Transaction en cours, ou None
+        self._transaction = None
+        # Vues ouvertes par snapshot() (modes json et journal), qui reçoivent l'état d'origine
+        # des enregistrements avant leur modification
+        self._instantanes = weakref.WeakSet()
+        # Clés modifiées par d'autres processus depuis le dernier actualiser() (None : tout recharger)
+        self._externes = (set(), set())
+        if persistance == "json":
+            self._stockage = StockageJSON(dossier, options_historique, snapshot_binaire)
+        elif persistance == "journal":
+            self._stockage = StockageJournal(dossier, options_historique, snapshot_binaire)
+        elif persistance == "sqlite":
+            self._stockage = StockageSQLite(dossier)
+        else:
+            raise ValueError(f"Mode de persistance inconnu : {persistance}")
+
+    def _index_secondaires(self):
+        # En mode sqlite, les index de la base servent directement les requêtes
+        if self._stockage.transactionnel:
+            return self._stockage.index
+        if self._index is None:
+            self._index = IndexSecondaires()
+            self._index.construire(self.livres, self.membres)
+        return self._index
+
+    def _echeances(self):
+        # Même principe que _index_secondaires : en mode sqlite, l'index sur l'échéance de la base
+        if self._stockage.transactionnel:
+            return self._stockage.echeancier
+        if self._echeancier is None:
+            self._dater_anciens_emprunts()
+            self._echeancier = Echeancier(self.membres)
+            self._echeancier.construire()
+        return self._echeancier
+
+    def _files_reservations(self):
+        # Même principe : en mode sqlite, la table reservations et ses index
+        if self._stockage.transactionnel:
+            return self._stockage.reservations
+        if self._reservations is None:
+            self._reservations = FilesReservations(self.membres)
+            self._reservations.construire()
+        return self._reservations
+
+    def _dater_anciens_emprunts(self):
+        # Emprunts enregistrés avant les échéances : échéance comptée depuis leur dernière ligne
+        # "emprunt" de l'historique (lue par l'index des positions), ou depuis aujourd'hui.
+        # Elle est écrite avec la prochaine modification du membre.
+        for membre in self.membres.values():
+            for isbn in membre.livres_empruntes:
+                if membre.echeance(isbn) is None:
+                    self._figer(membres=[membre.id_membre])
+                    debut = max((ligne[0] for ligne in self.parcourir_historique(id_membre=membre.id_membre, isbn=isbn)
+                                 if ligne[3] == "emprunt"), default=None)
+                    membre.fixer_echeance(isbn, echeance_depuis(debut or datetime.now()))
+
+    def abonner(self, fonction):
+        # Événements : "livre_ajoute", "livre_modifie", "livre_supprime" (avec l'état
+        # précédent du livre dans donnees["ancien"]) et "historique" (chaque ligne d'historique)
+        self._abonnes.append(fonction)
+
+    def _notifier(self, evenement, **donnees):
+        if self._transaction is not None:
+            # Les abonnés ne voient que les opérations validées
+            self._transaction.evenements.append((evenement, donnees))
+            return
+        self.version += 1
+        if self._construction is not None and evenement == "historique":
+            self._construction.append(donnees)
+        for fonction in self._abonnes:
+            fonction(evenement, donnees)
+
+    @instrumenter()
+    @_operation
+    def ajouter_livre(self, livre):
+        self._memoriser(livres=[livre.isbn])
+        ancien = self.livres.get(livre.isbn)
+        ancien = ancien.vers_dict() if ancien is not None else None
+        self.livres[livre.isbn] = livre
+        if self._index is not None:
+            self._index.indexer_livre(livre)
+        if self._recherche is not None:
+            self._recherche.indexer_livre(livre)
+        # En mode sqlite, l'affectation dans self.livres a déjà écrit la ligne
+        if not self._stockage.transactionnel:
+            self._changement(livres=[livre.isbn])
+        self._notifier("livre_ajoute", livre=livre, ancien=ancien)
+
+    @instrumenter()
+    @_operation
+    def modifier_livre(self, isbn, titre, auteur, annee, genre):
+        if isbn not in self.livres:
+            raise LivreInexistantError()
+        # Année vérifiée avant de toucher au livre : une année refusée le laisse intact
+        annee = convertir_annee(annee)
+        self._memoriser(livres=[isbn])
+        livre = self.livres[isbn]
+        ancien = livre.vers_dict()
+        livre.titre = titre
+        livre.auteur = auteur
+        livre.annee = annee
+        livre.genre = genre
+        if self._index is not None:
+            self._index.indexer_livre(livre)
+        if self._recherche is not None:
+            self._recherche.indexer_livre(livre)
+        self._changement(livres=[isbn])
+        self._notifier("livre_modifie", livre=livre, ancien=ancien)
+
+    @instrumenter()
+    @_operation
+    def supprimer_livre(self, isbn):
+        detenteur, file = self.reservations_livre(isbn)
+        reservataires = ([detenteur] if detenteur is not None else []) + file
+        if self._transaction is not None or self._instantanes:
+            self._memoriser(livres=[isbn], membres=[self._index_secondaires().emprunteur(isbn)] + reservataires)
+        ancien = self.livres.get(isbn)
+        if self._stockage.transactionnel:
+            self._stockage.supprimer_livre(self, isbn)
+            if self._recherche is not None:
+                self._recherche.retirer_livre(isbn)
+        elif ancien is not None:
+            index = self._index_secondaires()
+            del self.livres[isbn]
+            # Le livre est aussi retiré des emprunts de son emprunteur, retrouvé par l'index
+            touches = []
+            id_membre = index.emprunteur(isbn)
+            membre = self.membres.get(id_membre)
+            if membre is not None and isbn in membre.livres_empruntes:
+                membre.livres_empruntes.remove(isbn)
+                touches.append(id_membre)
+                if self._echeancier is not None:
+                    self._echeancier.perimer()
+            # Ses réservations disparaissent avec lui
+            for id_reservataire in reservataires:
+                self.membres[id_reservataire].retirer_reservation(isbn)
+                touches.append(id_reservataire)
+            if reservataires:
+                self._reservations.oublier_livre(isbn)
+                self._reservations.perimer(len(reservataires))
+            index.retirer_livre(isbn)
+            index.retour(isbn)
+            if self._recherche is not None:
+                self._recherche.retirer_livre(isbn)
+            self._changement(livres=[isbn], membres=touches)
+        else:
+            raise LivreInexistantError()
+        self._notifier("livre_supprime", ancien=ancien.vers_dict())
+
+    @instrumenter()
+    @_operation
+    def enregistrer_membre(self, membre):
+        self._memoriser(membres=[membre.id_membre])
+        ancien = self.membres.get(membre.id_membre)
+        self.membres[membre.id_membre] = membre
+        if self._index is not None:
+            if ancien is not None:
+                for isbn in ancien.livres_empruntes:
+                    self._index.retour(isbn)
+            for isbn in membre.livres_empruntes:
+                self._index.emprunt(isbn, membre.id_membre)
+        if self._echeancier is not None:
+            for isbn, echeance in membre.echeances.items():
+                if ancien is None or ancien.echeance(isbn) != echeance:
+                    self._echeancier.ajouter(isbn, membre.id_membre, echeance)
+        if self._reservations is not None:
+            for isbn, (date, retrait) in membre.reservations.items():
+                if ancien is not None and ancien.reservation(isbn) == (date, retrait):
+                    continue
+                if retrait is None:
+                    self._reservations.ajouter(isbn, membre.id_membre, date)
+                else:
+                    self._reservations.retenir(isbn, membre.id_membre, retrait)
+        if not self._stockage.transactionnel:
+            self._changement(membres=[membre.id_membre])
+        self.version += 1
+
+    @instrumenter()
+    @_operation
+    def supprimer_membre(self, id_membre):
+        # Ses livres empruntés ou mis de côté pour lui passent au premier de leur file d'attente,
+        # ou redeviennent disponibles : renvoie [(isbn, id_membre suivant ou None)] de ces livres
+        if self._transaction is not None or self._instantanes:
+            membre = self.membres.get(id_membre)
+            self._memoriser(livres=membre.livres_empruntes if membre is not None else (), membres=[id_membre])
+        self.version += 1
+        if self._stockage.transactionnel:
+            return self._stockage.supprimer_membre(self, id_membre)
+        if id_membre not in self.membres:
+            raise MembreInexistantError()
+        membre = self.membres.pop(id_membre)
+        if self._echeancier is not None:
+            self._echeancier.perimer(len(membre.livres_empruntes))
+        # Ses réservations sont périmées ; les livres mis de côté pour lui passent au suivant
+        remis = []
+        if membre.nb_reservations():
+            self._files_reservations().perimer(membre.nb_reservations())
+            for isbn, (_, retrait) in membre.reservations.items():
+                livre = self.livres.get(isbn)
+                if retrait is not None and livre is not None and livre.statut == "réservé":
+                    remis.append((isbn, self._remettre(livre)))
+        # Les livres empruntés par ce membre sont rendus comme par retourner_livre
+        for isbn in membre.livres_empruntes:
+            livre = self.livres.get(isbn)
+            if livre is not None:
+                remis.append((isbn, self._remettre(livre)))
+                if self._index is not None:
+                    self._index.retour(isbn)
+        self._changement(livres=[isbn for isbn, _ in remis],
+                         membres=[id_membre] + [suivant for _, suivant in remis if suivant is not None])
+        return remis
+
+    @instrumenter()
+    @_operation
+    def emprunter_livre(self, isbn, id_membre):
+        self._memoriser(livres=[isbn], membres=[id_membre])
+        echeance = echeance_depuis(datetime.now())
+        if self._stockage.transactionnel:
+            # Une mise de côté échue passe d'abord au suivant de la file (lecture de l'index
+            # sur la fin de mise de côté), puis contrôles et insertion exécutés atomiquement
+            self._expirer(datetime.now())
+            self._stockage.emprunter(self, isbn, id_membre, echeance)
+            self.enregistrer_historique(isbn, id_membre, "emprunt")
+            return
+        if id_membre not in self.membres:
+            raise MembreInexistantError()
+        if isbn not in self.livres:
+            raise LivreInexistantError()
+        livre = self.livres[isbn]
+        membre = self.membres[id_membre]
+        if livre.statut == "réservé":
+            self._expirer(datetime.now())
+        # Un livre mis de côté ne peut être emprunté que par le membre pour qui il l'est
+        reservation = membre.reservation(isbn)
+        if livre.statut == "réservé" and (reservation is None or reservation[1] is None):
+            raise LivreIndisponibleError("Le livre est mis de côté pour un autre membre.")
+        if livre.statut not in ("disponible", "réservé"):
+            raise LivreIndisponibleError()
+        # Les réservations comptent dans le quota, sauf celle que cet emprunt honore
+        if len(membre.livres_empruntes) + membre.nb_reservations() - (reservation is not None) >= QUOTA_EMPRUNTS:
+            raise QuotaEmpruntDepasseError()
+        livre.statut = "emprunté"
+        if reservation is not None:
+            membre.retirer_reservation(isbn)
+            if self._reservations is not None:
+                self._reservations.perimer()
+        membre.livres_empruntes.append(isbn)
+        membre.fixer_echeance(isbn, echeance)
+        if self._index is not None:
+            self._index.indexer_livre(livre)
+            self._index.emprunt(isbn, id_membre)
+        if self._echeancier is not None:
+            self._echeancier.ajouter(isbn, id_membre, echeance)
+        self._changement(livres=[isbn], membres=[id_membre])
+        self.enregistrer_historique(isbn, id_membre, "emprunt")
+
+    @instrumenter()
+    @_operation
+    def retourner_livre(self, isbn, id_membre):
+        # Le livre est mis de côté pour le premier membre de sa file d'attente, s'il y en a un :
+        # renvoie l'ID de ce membre, ou None si le livre redevient disponible
+        self._memoriser(livres=[isbn], membres=[id_membre])
+        if self._stockage.transactionnel:
+            suivant = self._stockage.retourner(self, isbn, id_membre)
+            self.enregistrer_historique(isbn, id_membre, "retour")
+            return suivant
+        livre = self.livres.get(isbn)
+        membre = self.membres.get(id_membre)
+        if livre and membre and isbn in membre.livres_empruntes:
+            membre.livres_empruntes.remove(isbn)
+            suivant = self._remettre(livre)
+            if self._index is not None:
+                self._index.retour(isbn)
+            # L'entrée de l'échéancier est périmée : elle sera ignorée puis éliminée
+            if self._echeancier is not None:
+                self._echeancier.perimer()
+            self._changement(livres=[isbn], membres=[id_membre] + ([suivant] if suivant is not None else []))
+            self.enregistrer_historique(isbn, id_membre, "retour")
+            return suivant
+        else:
+            raise LivreInexistantError("Le livre n'est pas emprunté par ce membre.")
+
+    @instrumenter()
+    @_operation
+    def prolonger_emprunt(self, isbn, id_membre, jours=DUREE_EMPRUNT):
+        # Repousse l'échéance de `jours` jours (depuis aujourd'hui si elle est déjà dépassée)
+        # et renvoie la nouvelle échéance
+        self._memoriser(membres=[id_membre])
+        if self._stockage.transactionnel:
+            echeance = self._stockage.prolonger(self, isbn, id_membre, jours)
+        else:
+            membre = self.membres.get(id_membre)
+            if membre is None or isbn not in membre.livres_empruntes:
+                raise LivreInexistantError("Le livre n'est pas emprunté par ce membre.")
+            echeance = prolongation(membre.echeance(isbn), jours)
+            membre.fixer_echeance(isbn, echeance)
+            if self._echeancier is not None:
+                self._echeancier.ajouter(isbn, id_membre, echeance)
+                self._echeancier.perimer()
+            self._changement(membres=[id_membre])
+        self.enregistrer_historique(isbn, id_membre, "prolongation")
+        return echeance
+
+    # Réservations : file d'attente FIFO par livre (voir classes/reservations.py). Au retour,
+    # le livre est mis de côté DELAI_RETRAIT jours pour le premier de la file (statut
+    # "réservé"), puis passe au suivant si personne ne vient l'emprunter.
+
+    @instrumenter()
+    @_operation
+    def reserver_livre(self, isbn, id_membre):
+        # Inscrit le membre dans la file d'un livre emprunté ou mis de côté ; une réservation
+        # compte dans le quota comme un emprunt. Renvoie le rang du membre dans la file
+        self._memoriser(membres=[id_membre])
+        date = datetime.now().isoformat()
+        if self._stockage.transactionnel:
+            rang = self._stockage.reserver(self, isbn, id_membre, date)
+        else:
+            if id_membre not in self.membres:
+                raise MembreInexistantError()
+            if isbn not in self.livres:
+                raise LivreInexistantError()
+            membre = self.membres[id_membre]
+            if self.livres[isbn].statut == "disponible":
+                raise ReservationImpossibleError("Le livre est disponible : il peut être emprunté.")
+            if isbn in membre.livres_empruntes or membre.reservation(isbn) is not None:
+                raise ReservationImpossibleError("Le membre a déjà emprunté ou réservé ce livre.")
+            if len(membre.livres_empruntes) + membre.nb_reservations() >= QUOTA_EMPRUNTS:
+                raise QuotaEmpruntDepasseError()
+            files = self._files_reservations()
+            membre.fixer_reservation(isbn, date)
+            files.ajouter(isbn, id_membre, date)
+            self._changement(membres=[id_membre])
+            rang = len(files.en_attente(isbn))
+        self.enregistrer_historique(isbn, id_membre, "reservation")
+        return rang
+
+    @instrumenter()
+    @_operation
+    def annuler_reservation(self, isbn, id_membre):
+        # Si le livre était mis de côté pour ce membre, il passe au suivant de la file :
+        # renvoie l'ID de ce suivant, ou None
+        self._memoriser(livres=[isbn], membres=[id_membre])
+        if self._stockage.transactionnel:
+            suivant = self._stockage.annuler_reservation(self, isbn, id_membre)
+        else:
+            membre = self.membres.get(id_membre)
+            reservation = membre.reservation(isbn) if membre is not None else None
+            if reservation is None:
+                raise ReservationImpossibleError("Le membre n'a pas réservé ce livre.")
+            membre.retirer_reservation(isbn)
+            self._files_reservations().perimer()
+            livre = self.livres.get(isbn)
+            suivant = None
+            if reservation[1] is not None and livre is not None and livre.statut == "réservé":
+                suivant = self._remettre(livre)
+            self._changement(livres=[isbn] if reservation[1] is not None else [],
+                             membres=[id_membre] + ([suivant] if suivant is not None else []))
+        self.enregistrer_historique(isbn, id_membre, "annulation")
+        return suivant
+
+    @instrumenter()
+    @_operation
+    def expirer_reservations(self, maintenant=None):
+        # Mises de côté terminées : [(isbn, id_membre, id_membre suivant ou None)]
+        return self._expirer(maintenant or datetime.now())
+
+    def _expirer(self, maintenant):
+        # Lit seulement la plus proche fin de mise de côté (tête du tas, ou index de la base)
+        # tant que rien n'est échu ; sinon chaque livre échu passe au suivant de sa file
+        files = self._files_reservations()
+        maintenant = en_texte(maintenant)
+        prochaine = files.prochaine_expiration()
+        if prochaine is None or prochaine > maintenant:
+            return []
+        if self._stockage.transactionnel:
+            expirees = self._stockage.expirer(self, maintenant)
+        else:
+            expirees = []
+            for isbn, id_membre in files.echues(maintenant):
+                self._memoriser(livres=[isbn], membres=[id_membre])
+                self.membres[id_membre].retirer_reservation(isbn)
+                livre = self.livres.get(isbn)
+                suivant = self._remettre(livre) if livre is not None and livre.statut == "réservé" else None
+                self._changement(livres=[isbn] if livre is not None else [],
+                                 membres=[id_membre] + ([suivant] if suivant is not None else []))
+                expirees.append((isbn, id_membre, suivant))
+        for isbn, id_membre, _ in expirees:
+            self.enregistrer_historique(isbn, id_membre, "expiration")
+        return expirees
+
+    def _remettre(self, livre):
+        # Livre rendu, ou dont la mise de côté s'arrête : mis de côté pour le premier membre
+        # encore en attente (tête de sa file, O(1)), sinon de nouveau disponible
+        files = self._files_reservations()
+        id_membre = files.suivant(livre.isbn)
+        self._memoriser(livres=[livre.isbn], membres=[id_membre])
+        if id_membre is None:
+            livre.statut = "disponible"
+        else:
+            membre = self.membres[id_membre]
+            retrait = fin_retrait(datetime.now())
+            membre.fixer_reservation(livre.isbn, membre.reservation(livre.isbn)[0], retrait)
+            files.retenir(livre.isbn, id_membre, retrait)
+            livre.statut = "réservé"
+        if self._index is not None:
+            self._index.indexer_livre(livre)
+        return id_membre
+
+    @instrumenter()
+    def reservations_livre(self, isbn):
+        # (membre pour qui le livre est mis de côté ou None, membres en attente dans l'ordre)
+        files = self._files_reservations()
+        return files.detenteur(isbn), files.en_attente(isbn)
+
+    def _changement(self, livres=(), membres=()):
+        # Signale au stockage les enregistrements modifiés ; dans une transaction (modes json
+        # et journal), ils sont écrits en une seule fois à la validation
+        if self._transaction is not None and not self._stockage.transactionnel:
+            self._transaction.livres.update(dict.fromkeys(livres))
+            self._transaction.membres.update(dict.fromkeys(membres))
+        else:
+            self._stockage.changement(self, livres=livres, membres=membres)
+
+    # Transactions et opérations par lots
+
+    @contextmanager
+    def transaction(self):
+        # with biblio.transaction(): ... regroupe plusieurs opérations.
+        # Elles sont appliquées en mémoire au fur et à mesure ; à la sortie du bloc, le stockage
+        # est écrit une seule fois (une ligne de journal, une réécriture JSON ou un COMMIT
+        # SQLite), puis l'historique et les événements sont émis. Si une exception sort du bloc,
+        # livres et membres retrouvent leur état d'origine et rien n'est écrit.
+        if self._transaction is not None:
+            # Transaction imbriquée : fait partie de la transaction englobante
+            yield self._transaction
+            return
+        # Le verrou du stockage est gardé jusqu'à la validation : la transaction est atomique
+        # aussi vis-à-vis des autres processus
+        with self._stockage.operation(self):
+            transaction = self._transaction = Transaction()
+            try:
+                # En mode sqlite, tout le lot est exécuté dans une transaction de la base
+                with self._stockage.lot() if self._stockage.transactionnel else nullcontext():
+                    try:
+                        yield transaction
+                        self._transaction = None
+                        self._valider(transaction)
+                    except BaseException:
+                        self._transaction = None
+                        self._restaurer(transaction)
+                        raise
+            finally:
+                self._transaction = None
+        for evenement, donnees in transaction.evenements:
+            self._notifier(evenement, **donnees)
+
+    def _memoriser(self, livres=(), membres=()):
+        # Dans une transaction, garde l'état des enregistrements avant leur première modification
+        self._figer(livres, membres)
+        transaction = self._transaction
+        if transaction is None:
+            return
+        for isbn in livres:
+            if isbn not in transaction.livres_origine:
+                livre = self.livres.get(isbn)
+                transaction.livres_origine[isbn] = (livre, livre.vers_dict()) if livre is not None else None
+        for id_membre in membres:
+            if id_membre is not None and id_membre not in transaction.membres_origine:
+                membre = self.membres.get(id_membre)
+                transaction.membres_origine[id_membre] = (
+                    (membre, membre.nom, tuple(membre.livres_empruntes), membre.echeances, membre.reservations)
+                    if membre is not None else None
+                )
+
+    def _figer(self, livres=(), membres=()):
+        # Donne aux vues ouvertes par snapshot() l'état des enregistrements avant leur modification
+        if not self._instantanes:
+            return
+        for instantane in self._instantanes:
+            for isbn in livres:
+                instantane.livres.figer(isbn)
+            for id_membre in membres:
+                if id_membre is not None:
+                    instantane.membres.figer(id_membre)
+
+    def _valider(self, transaction):
+        if not self._stockage.transactionnel:
+            if transaction.livres or transaction.membres:
+                self._stockage.changement(self, livres=list(transaction.livres), membres=list(transaction.membres))
+            for isbn, id_membre, action, date in transaction.historique:
+                self._stockage.historique(isbn, id_membre, action, date)
+        self._stockage.sauvegarder(self)
+
+    def _restaurer(self, transaction):
+        # Remet les objets d'origine dans livres / membres avec leurs valeurs d'origine.
+        # En mode sqlite, ces écritures ont lieu dans la transaction de la base, annulée ensuite.
+        self._figer(transaction.livres_origine, transaction.membres_origine)
+        for isbn, origine in transaction.livres_origine.items():
+            if origine is None:
+                self.livres.pop(isbn, None)
+                continue
+            livre, etat = origine
+            for champ, valeur in etat.items():
+                setattr(livre, champ, valeur)
+            self.livres[isbn] = livre
+        for id_membre, origine in transaction.membres_origine.items():
+            if origine is None:
+                self.membres.pop(id_membre, None)
+                continue
+            membre, nom, empruntes, echeances, reservations = origine
+            membre.nom = nom
+            membre.livres_empruntes = empruntes
+            membre.echeances = echeances
+            membre.reservations = reservations
+            self.membres[id_membre] = membre
+        # Les index ont suivi les opérations annulées : ils seront reconstruits à la demande
+        self._index = None
+        self._recherche = None
+        self._echeancier = None
+        self._reservations = None
+        self.version += 1
+
+    def _executer_lot(self, fonction, operations):
+        # Exécute chaque opération dans une même transaction ; une opération refusée
+        # (livre indisponible, quota atteint, ...) est notée dans le rapport et le lot continue.
+        # Renvoie la liste des échecs : (opération, exception)
+        echecs = []
+        with self.transaction():
+            for operation in operations:
+                try:
+                    fonction(*operation)
+                except ERREURS_OPERATION as e:
+                    echecs.append((operation, e))
+        return echecs
+
+    @instrumenter()
+    def emprunter_lot(self, operations):
+        # operations : itérable de (isbn, id_membre)
+        return self._executer_lot(self.emprunter_livre, operations)
+
+    @instrumenter()
+    def retourner_lot(self, operations):
+        # operations : itérable de (isbn, id_membre)
+        return self._executer_lot(self.retourner_livre, operations)
+
+    @instrumenter()
+    def ajouter_livres(self, livres):
+        return self._executer_lot(self.ajouter_livre, ((livre,) for livre in livres))
+
+    @instrumenter()
+    def snapshot(self):
+        # Vue en lecture seule de la bibliothèque à cet instant (classes/instantane.py) :
+        # livres, membres et historique, insensibles aux opérations suivantes. Coût constant ;
+        # à fermer après usage (with biblio.snapshot() as vue: ...)
+        if self._stockage.transactionnel:
+            livres, membres, fermer = self._stockage.instantane()
+            return Instantane(self, livres, membres, fermer)
+        instantane = Instantane(self, VueFigee(self.livres, copier_livre), VueFigee(self.membres, copier_membre))
+        self._instantanes.add(instantane)
+        return instantane
+
+    @instrumenter()
+    def sauvegarder(self):
+        self._stockage.sauvegarder(self)
+
+    @instrumenter()
+    def charger(self):
+        self._stockage.charger(self)
+        self.version += 1
+        self._index = None
+        self._recherche = None
+        self._echeancier = None
+        self._reservations = None
+        self._externes = (set(), set())
+        self._oublier_statistiques()
+
+    # Modifications faites par d'autres processus sur le même dossier
+
+    @instrumenter()
+    def actualiser(self):
+        # Prend en compte les modifications des autres processus et renvoie les ISBN et ID
+        # membres modifiés depuis le dernier appel, ou (None, None) si tout a pu changer
+        with self._stockage.operation(self):
+            pass
+        self._integrer_historique_externe()
+        externes, self._externes = self._externes, (set(), set())
+        return externes
+
+    def _integrer_historique_externe(self):
+        # Lignes d'historique écrites par les autres processus : ajoutées aux analyses et à la
+        # matrice des recommandations comme celles de ce processus, sans relire tout l'historique
+        if self._analyses is None and self._construction is None:
+            return
+        # Dans l'ordre des dates : les lots des différents processus sont entremêlés (un lot
+        # arrivé en retard est apparié dans l'ordre d'arrivée, comme une ligne de ce processus)
+        lignes = sorted(self._stockage.historique_externe(), key=lambda ligne: ligne[0])
+        for date, isbn, id_membre, action in lignes:
+            donnees = {"date": date, "isbn": isbn, "id_membre": id_membre, "action": action}
+            for abonne in (self._analyses, self._recommandations):
+                if abonne is not None:
+                    abonne.recevoir("historique", donnees)
+            if self._construction is not None:
+                self._construction.append(donnees)
+        if lignes:
+            self.version += 1
+
+    def _appliquer_changements_externes(self, livres, membres):
+        # livres / membres : clé -> état lu sur le disque (dict au format vers_dict), None si supprimé.
+        # Les objets existants sont mis à jour en place et les index suivent.
+        if not livres and not membres:
+            return
+        self._figer(livres, membres)
+        # Les emprunts des autres processus n'ont pas été vus par les statistiques ; les analyses
+        # et les recommandations reçoivent leurs lignes d'historique (_integrer_historique_externe)
+        self._oublier_statistiques(analyses=False)
+        for isbn, d in livres.items():
+            livre = self.livres.get(isbn)
+            if d is None:
+                if livre is None:
+                    continue
+                del self.livres[isbn]
+                if self._index is not None:
+                    self._index.retirer_livre(isbn)
+                if self._recherche is not None:
+                    self._recherche.retirer_livre(isbn)
+                self._notifier("livre_supprime", ancien=livre.vers_dict())
+                continue
+            if livre is None:
+                livre = self.livres[isbn] = Livre(**d)
+                evenement, ancien = "livre_ajoute", None
+            else:
+                evenement, ancien = "livre_modifie", livre.vers_dict()
+                for champ, valeur in d.items():
+                    setattr(livre, champ, valeur)
+            if self._index is not None:
+                self._index.indexer_livre(livre)
+            if self._recherche is not None:
+                self._recherche.indexer_livre(livre)
+            self._notifier(evenement, livre=livre, ancien=ancien)
+        # Anciens emprunts retirés de l'index avant d'ajouter les nouveaux (un livre peut
+        # passer d'un membre à l'autre)
+        nouveaux = []
+        for id_membre, d in membres.items():
+            membre = self.membres.get(id_membre)
+            if membre is not None and self._index is not None:
+                for isbn in membre.livres_empruntes:
+                    self._index.retour(isbn)
+            if d is None:
+                self.membres.pop(id_membre, None)
+                continue
+            if membre is None:
+                membre = self.membres[id_membre] = Membre(id_membre, d["nom"])
+            anciennes = membre.echeances
+            membre.nom = d["nom"]
+            membre.livres_empruntes = d["livres_empruntes"]
+            membre.echeances = d.get("echeances", {})
+            membre.reservations = d.get("reservations", {})
+            # Seules les échéances nouvelles ou changées entrent dans l'échéancier
+            if self._echeancier is not None:
+                for isbn, echeance in membre.echeances.items():
+                    if anciennes.get(isbn) != echeance:
+                        self._echeancier.ajouter(isbn, id_membre, echeance)
+            nouveaux.append(membre)
+        # Les files d'attente sont reconstruites à la demande (ordre des dates de réservation)
+        if membres:
+            self._reservations = None
+        if self._index is not None:
+            for membre in nouveaux:
+                for isbn in membre.livres_empruntes:
+                    self._index.emprunt(isbn, membre.id_membre)
+        if self._externes[0] is not None:
+            self._externes[0].update(livres)
+            self._externes[1].update(membres)
+        self.version += 1
+
+    def _recharge_externe(self):
+        # Le stockage ne sait pas quels enregistrements ont changé (mode sqlite)
+        self._index = None
+        self._recherche = None
+        self._echeancier = None
+        self._reservations = None
+        self._oublier_statistiques(analyses=False)
+        self._externes = (None, None)
+        self.version += 1
+
+    def _oublier_statistiques(self, analyses=True):
+        # Reconstruites au prochain appel de statistiques() / analyses() / recommandations() ;
+        # analyses=False garde les analyses et les recommandations
+        if self._statistiques is not None:
+            self._abonnes.remove(self._statistiques.recevoir)
+            self._statistiques = None
+        if self._analyses is not None and analyses:
+            self._abonnes.remove(self._analyses.recevoir)
+            self._analyses = None
+        if self._recommandations is not None and analyses:
+            self._abonnes.remove(self._recommandations.recevoir)
+            self._recommandations = None
+        if analyses:
+            self._construction = None
+
+    # Requêtes servies par les index secondaires, sans parcourir tout le catalogue
+
+    @instrumenter()
+    def livres_par(self, champ, valeur):
+        if champ not in CHAMPS_INDEXES:
+            raise ValueError(f"Champ non indexé : {champ}")
+        return [self.livres[isbn] for isbn in self._index_secondaires().isbns(champ, valeur)]
+
+    def livres_disponibles(self):
+        return self.livres_par("statut", "disponible")
+
+    def livres_empruntes(self):
+        return self.livres_par("statut", "emprunté")
+
+    def livres_par_genre(self, genre):
+        return self.livres_par("genre", genre)
+
+    def livres_par_auteur(self, auteur):
+        return self.livres_par("auteur", auteur)
+
+    @instrumenter()
+    def rechercher(self, requete, limit=50):
+        # Recherche plein texte sur titre, auteur et genre, insensible aux accents,
+        # chaque mot de la requête pouvant être un début de mot ("exup mis" ...)
+        if self._recherche is None:
+            self._recherche = IndexRecherche()
+            self._recherche.construire(self.livres.values())
+        return [self.livres[isbn] for isbn in self._recherche.rechercher(requete, limit)]
+
+    @instrumenter()
+    def emprunteur_de(self, isbn):
+        # Membre qui a emprunté le livre, ou None s'il est disponible
+        id_membre = self._index_secondaires().emprunteur(isbn)
+        return self.membres.get(id_membre) if id_membre is not None else None
+
+    @instrumenter()
+    def emprunts_en_retard(self, maintenant=None):
+        # Emprunts dont l'échéance est passée : (échéance, isbn, id_membre), les plus anciens
+        # d'abord, lus dans l'échéancier sans parcourir les membres
+        return self._echeances().en_retard(maintenant or datetime.now())
+
+    @instrumenter()
+    def emprunts_a_echeance(self, jours=3, maintenant=None):
+        # Emprunts pas encore en retard qui arrivent à échéance dans les `jours` prochains jours
+        maintenant = maintenant or datetime.now()
+        return self._echeances().a_echeance(maintenant, maintenant + timedelta(days=jours))
+
+    @instrumenter()
+    def fermer(self):
+        # Vide l'historique en attente, attend la fin d'un éventuel snapshot
+        # et ferme les fichiers ouverts
+        self._stockage.fermer(self)
+
+    @instrumenter()
+    def enregistrer_historique(self, isbn, id_membre, action):
+        date = datetime.now().isoformat()
+        if self._transaction is not None and not self._stockage.transactionnel:
+            self._transaction.historique.append((isbn, id_membre, action, date))
+        else:
+            self._stockage.historique(isbn, id_membre, action, date)
+        self._notifier("historique", date=date, isbn=isbn, id_membre=id_membre, action=action)
+
+    def parcourir_historique(self, debut=None, fin=None, id_membre=None, isbn=None):
+        # Lignes d'historique (date, isbn, id_membre, action) en flux, toutes ou seulement celles
+        # de debut <= date < fin (datetime, date ou texte ISO), d'un membre et / ou d'un livre
+        return self._stockage.parcourir_historique(debut, fin, id_membre, isbn)
+
+    @instrumenter()
+    def historique_membre(self, id_membre):
+        # Tout l'historique d'un membre, même supprimé depuis ; lu par l'index des positions
+        # (le coût dépend du nombre de lignes trouvées, pas de la taille de l'historique)
+        return [list(ligne) for ligne in self._stockage.parcourir_historique(id_membre=id_membre)]
+
+    @instrumenter()
+    def historique_livre(self, isbn):
+        # Emprunts et retours d'un livre, par tous les membres
+        return [list(ligne) for ligne in self._stockage.parcourir_historique(isbn=isbn)]
+
+    # Statistiques agrégées pour les graphiques
+
+    @instrumenter()
+    def compter_par(self, champ):
+        # Nombre de livres par valeur de champ (genre, auteur, statut)
+        if champ not in CHAMPS_INDEXES:
+            raise ValueError(f"Champ non indexé : {champ}")
+        if self._stockage.transactionnel:
+            return self._stockage.compter_par(champ)
+        return Counter(getattr(livre, champ) for livre in self.livres.values())
+
+    @instrumenter()
+    def statistiques(self):
+        # Agrégats tenus à jour au fil des événements, construits au premier appel
+        if self._statistiques is None:
+            self._statistiques = Statistiques()
+            self._statistiques.construire(self)
+            self.abonner(self._statistiques.recevoir)
+        return self._statistiques
+
+    @instrumenter()
+    def analyses(self):
+        # Tout l'historique en tableaux NumPy (classes/analyses.py), chargé au premier appel
+        # puis complété par les événements "historique"
+        if self._analyses is None:
+            # L'historique est figé de nouveau : une construction en cours serait incohérente
+            self._construction = None
+            self._analyses = self._stockage.analyses_historique()
+            self.abonner(self._analyses.recevoir)
+        return self._analyses
+
+    @instrumenter()
+    def donnees_analyse(self, type_analyse):
+        # Données d'un graphique d'analyse longue durée : "volumes_jour", "volumes_semaine",
+        # "volumes_mois", "genres_temps", "heures" ou "durees" (voir Analyses.donnees)
+        genres = {isbn: livre.genre for isbn, livre in self.livres.items()} if type_analyse == "genres_temps" else None
+        return self.analyses().donnees(type_analyse, genres)
+
+    def _index_recommandations(self):
+        # Matrice des co-emprunts (classes/recommandations.py), construite au premier appel à
+        # partir des analyses de l'historique puis tenue à jour par les événements "historique"
+        if self._recommandations is None:
+            # Importé à la demande, comme les analyses : NumPy n'est chargé qu'ici
+            from classes.recommandations import Recommandations
+            self._recommandations = Recommandations.depuis_analyses(self.analyses(), **self.options_recommandations)
+            self.abonner(self._recommandations.recevoir)
+        return self._recommandations
+
+    def preparer_recommandations(self):
+        # Construction des analyses et de la matrice des co-emprunts hors du thread principal :
+        #   construire = biblio.preparer_recommandations()  thread principal : historique figé
+        #   resultat = construire()                         autre thread : lecture et calcul
+        #   biblio.installer_recommandations(resultat)      thread principal
+        # La construction ne touche pas à la bibliothèque ; les lignes d'historique émises
+        # entre-temps sont mises de côté et rejouées à l'installation
+        from classes.recommandations import Recommandations
+        lire = self._stockage.lecture_analyses()
+        attente = self._construction = []
+        options = dict(self.options_recommandations)
+
+        def construire():
+            analyses = lire()
+            return attente, analyses, Recommandations.depuis_analyses(analyses, **options)
+        return construire
+
+    def installer_recommandations(self, resultat):
+        attente, analyses, recommandations = resultat
+        if attente is not self._construction:
+            return  # Abandonnée (rechargement, analyses relues entre-temps)
+        self._construction = None
+        for ancien in (self._analyses, self._recommandations):
+            if ancien is not None:
+                self._abonnes.remove(ancien.recevoir)
+        for donnees in attente:
+            analyses.recevoir("historique", donnees)
+            recommandations.recevoir("historique", donnees)
+        self._analyses, self._recommandations = analyses, recommandations
+        self.abonner(analyses.recevoir)
+        self.abonner(recommandations.recevoir)
+
+    @instrumenter()
+    def recommandations(self, isbn, k=5):
+        # Livres les plus souvent empruntés par les membres qui ont emprunté `isbn` :
+        # [(livre, score)], meilleurs d'abord, parmi les livres encore au catalogue
+        suggestions = self._index_recommandations().pour_livre(isbn, k, lambda autre: autre in self.livres)
+        return [(self.livres[autre], score) for autre, score in suggestions]
+
+    @instrumenter()
+    def recommandations_membre(self, id_membre, k=5):
+        # Suggestions d'après les derniers emprunts du membre, sans les livres qu'il a en main
+        membre = self.membres.get(id_membre)
+        if membre is None:
+            raise MembreInexistantError()
+        en_main = set(membre.livres_empruntes)
+        suggestions = self._index_recommandations().pour_membre(
+            id_membre, k, lambda autre: autre in self.livres and autre not in en_main)
+        return [(self.livres[autre], score) for autre, score in suggestions]
@@ -0,0 +1,209 @@
+import itertools
+import json
+import socket
+from collections.abc import Mapping
+from classes import exceptions
+from classes.exceptions import ServeurError
+from classes.livre import Livre
+from classes.membre import Membre, DUREE_EMPRUNT
+from classes.mesures import instrumenter
+from classes.serveur import HOTE, PORT
+from classes.statistiques import Statistiques
+
+# Client du serveur de classes/serveur.py avec la même interface que Bibliotheque pour
+# ce qu'utilise App.py : l'application fonctionne à l'identique en mode client.
+# Les appels sont synchrones (une requête, sa réponse) ; les erreurs métier du serveur
+# sont relevées avec leur classe d'origine (LivreIndisponibleError, ...).
+
+
+class VueDistante(Mapping):
+    # Vue dict-like sur les livres ou les membres du serveur, lus à chaque accès
+    def __init__(self, client, op_cle, nom_cle, op_liste, op_compte, construire):
+        self.client = client
+        self.op_cle = op_cle
+        self.nom_cle = nom_cle
+        self.op_liste = op_liste
+        self.op_compte = op_compte
+        self.construire = construire
+
+    def __getitem__(self, cle):
+        d = self.client.appeler(self.op_cle, **{self.nom_cle: cle})
+        if d is None:
+            raise KeyError(cle)
+        return self.construire(d)
+
+    def __iter__(self):
+        return iter(self.client.appeler(self.op_liste))
+
+    def __len__(self):
+        return self.client.appeler(self.op_compte)
+
+
+def livre_depuis_dict(d):
+    return Livre(**d)
+
+
+def membre_depuis_dict(d):
+    membre = Membre(d["id_membre"], d["nom"])
+    membre.livres_empruntes = d["livres_empruntes"]
+    membre.echeances = d.get("echeances", {})
+    membre.reservations = d.get("reservations", {})
+    return membre
+
+
+class BibliothequeDistante:
+    def __init__(self, adresse=f"{HOTE}:{PORT}", delai=10.0):
+        hote, _, port = adresse.rpartition(":")
+        self.adresse = (hote or HOTE, int(port))
+        self.delai = delai
+        self._socket = None
+        self._fichier = None
+        self._ids = itertools.count(1)
+        # Compteur local incrémenté dès que la version du serveur change (clé des caches de
+        # l'interface), et version du serveur au dernier actualiser()
+        self.version = 0
+        self._version_serveur = None
+        self._synchro = 0
+        self.livres = VueDistante(self, "livre", "isbn", "isbns", "nb_livres", livre_depuis_dict)
+        self.membres = VueDistante(self, "membre", "id_membre", "ids_membres", "nb_membres", membre_depuis_dict)
+
+    def _connecter(self):
+        if self._socket is None:
+            try:
+                self._socket = socket.create_connection(self.adresse, timeout=self.delai)
+            except OSError as e:
+                raise ServeurError(f"Serveur injoignable ({self.adresse[0]}:{self.adresse[1]}) : {e}")
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._fichier = self._socket.makefile("rwb")
+        return self._fichier
+
+    @instrumenter()
+    def appeler(self, op, **args):
+        id_requete = next(self._ids)
+        try:
+            f = self._connecter()
+            f.write(json.dumps({"id": id_requete, "op": op, "args": args}, ensure_ascii=False).encode("utf-8") + b"\n")
+            f.flush()
+            ligne = f.readline()
+        except OSError as e:
+            self.fermer()
+            raise ServeurError(f"Connexion au serveur perdue : {e}")
+        if not ligne:
+            self.fermer()
+            raise ServeurError("Connexion fermée par le serveur.")
+        reponse = json.loads(ligne)
+        if reponse.get("version") != self._version_serveur:
+            self._version_serveur = reponse.get("version")
+            self.version += 1
+        if not reponse["ok"]:
+            classe = getattr(exceptions, reponse["erreur"], None)
+            if isinstance(classe, type) and issubclass(classe, Exception) and classe is not ServeurError:
+                raise classe(reponse["message"])
+            raise ServeurError(reponse["message"])
+        return reponse["resultat"]
+
+    # --- Interface de Bibliotheque ---
+
+    def charger(self):
+        self.appeler("ping")
+        self._synchro = self._version_serveur
+
+    def sauvegarder(self):
+        # Le serveur écrit chaque lot d'écritures dès sa validation
+        pass
+
+    def fermer(self):
+        if self._socket is not None:
+            try:
+                self._fichier.close()
+                self._socket.close()
+            except OSError:
+                pass
+            self._socket = None
+            self._fichier = None
+
+    def actualiser(self):
+        # ISBN et ID modifiés sur le serveur depuis le dernier appel, ou (None, None)
+        changements = self.appeler("changements", version=self._synchro)
+        self._synchro = changements["version"]
+        if changements["livres"] is None:
+            return None, None
+        return set(changements["livres"]), set(changements["membres"])
+
+    def ajouter_livre(self, livre):
+        self.appeler("ajouter_livre", livre=livre.vers_dict())
+
+    def modifier_livre(self, isbn, titre, auteur, annee, genre):
+        self.appeler("modifier_livre", isbn=isbn, titre=titre, auteur=auteur, annee=annee, genre=genre)
+
+    def supprimer_livre(self, isbn):
+        self.appeler("supprimer_livre", isbn=isbn)
+
+    def enregistrer_membre(self, membre):
+        self.appeler("enregistrer_membre", id_membre=membre.id_membre, nom=membre.nom)
+
+    def supprimer_membre(self, id_membre):
+        return [tuple(r) for r in self.appeler("supprimer_membre", id_membre=id_membre)]
+
+    def emprunter_livre(self, isbn, id_membre):
+        self.appeler("emprunter", isbn=isbn, id_membre=id_membre)
+
+    def retourner_livre(self, isbn, id_membre):
+        return self.appeler("retourner", isbn=isbn, id_membre=id_membre)
+
+    def prolonger_emprunt(self, isbn, id_membre, jours=DUREE_EMPRUNT):
+        return self.appeler("prolonger", isbn=isbn, id_membre=id_membre, jours=jours)
+
+    def reserver_livre(self, isbn, id_membre):
+        return self.appeler("reserver", isbn=isbn, id_membre=id_membre)
+
+    def annuler_reservation(self, isbn, id_membre):
+        return self.appeler("annuler_reservation", isbn=isbn, id_membre=id_membre)
+
+    def expirer_reservations(self):
+        return [tuple(e) for e in self.appeler("expirer_reservations")]
+
+    def reservations_livre(self, isbn):
+        detenteur, file = self.appeler("reservations_livre", isbn=isbn)
+        return detenteur, file
+
+    def rechercher(self, requete, limit=50):
+        return [livre_depuis_dict(d) for d in self.appeler("rechercher", requete=requete, limite=limit)]
+
+    def recommandations(self, isbn, k=5):
+        return [(livre_depuis_dict(d), score) for d, score in self.appeler("recommandations", isbn=isbn, k=k)]
+
+    def recommandations_membre(self, id_membre, k=5):
+        return [(livre_depuis_dict(d), score)
+                for d, score in self.appeler("recommandations_membre", id_membre=id_membre, k=k)]
+
+    def emprunteur_de(self, isbn):
+        d = self.appeler("emprunteur", isbn=isbn)
+        return membre_depuis_dict(d) if d is not None else None
+
+    def historique_membre(self, id_membre):
+        return self.appeler("historique_membre", id_membre=id_membre)
+
+    def historique_livre(self, isbn):
+        return self.appeler("historique_livre", isbn=isbn)
+
+    def emprunts_en_retard(self):
+        return [tuple(e) for e in self.appeler("emprunts_en_retard")]
+
+    def emprunts_a_echeance(self, jours=3):
+        return [tuple(e) for e in self.appeler("emprunts_a_echeance", jours=jours)]
+
+    def statistiques(self):
+        # Copie locale des agrégats du serveur, au format de classes.statistiques
+        d = self.appeler("statistiques")
+        stats = Statistiques()
+        for genre, nombre in d["genres"].items():
+            stats.genres.incrementer(genre, nombre)
+        for auteur, nombre in d["auteurs"]:
+            stats.auteurs.incrementer(auteur, nombre)
+        stats.emprunts_par_jour.update(d["emprunts_par_jour"])
+        return stats
+
+    def donnees_analyse(self, type_analyse):
+        # Les tableaux restent sur le serveur : seules les données du graphique transitent
+        return self.appeler("analyse", type_analyse=type_analyse)
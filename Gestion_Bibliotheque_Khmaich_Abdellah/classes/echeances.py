@@ -0,0 +1,83 @@
+import heapq
+from datetime import datetime, timedelta
+from classes.historique_partitions import en_texte
+from classes.membre import DUREE_EMPRUNT
+
+# Échéancier des emprunts en cours (modes json et journal ; en mode sqlite, l'index
+# idx_emprunts_echeance de la base sert les mêmes requêtes, voir EcheancierSQLite).
+#
+# Tas binaire (heapq) de (échéance, isbn, id_membre). Les retours, prolongations et
+# suppressions ne retirent rien du tas : une entrée est périmée dès que le membre n'a plus
+# cet emprunt avec cette échéance, et elle est ignorée à la lecture. Le tas est reconstruit
+# quand les entrées périmées dépassent les entrées valides.
+#
+# Les requêtes parcourent le tas dans l'ordre des échéances sans le vider : une petite file
+# de priorité des nœuds à visiter (les enfants d'un nœud ne sont jamais plus tôt que lui)
+# s'arrête au premier nœud au-delà de la borne, soit O(k log n) pour k emprunts renvoyés.
+
+
+def echeance_depuis(date, jours=DUREE_EMPRUNT):
+    # Échéance d'un emprunt commencé à `date` (datetime ou texte ISO)
+    if isinstance(date, str):
+        date = datetime.fromisoformat(date)
+    return (date + timedelta(days=jours)).isoformat(timespec="seconds")
+
+
+def prolongation(echeance, jours=DUREE_EMPRUNT):
+    # Nouvelle échéance `jours` jours après l'actuelle, ou après maintenant si elle est dépassée
+    maintenant = datetime.now()
+    if echeance is not None and echeance > en_texte(maintenant):
+        return echeance_depuis(echeance, jours)
+    return echeance_depuis(maintenant, jours)
+
+
+class Echeancier:
+    def __init__(self, membres):
+        self.membres = membres
+        self._tas = []
+        self._perimees = 0
+
+    def construire(self):
+        self._tas = [(echeance, isbn, membre.id_membre)
+                     for membre in self.membres.values() for isbn, echeance in membre.echeances.items()]
+        heapq.heapify(self._tas)
+        self._perimees = 0
+
+    def ajouter(self, isbn, id_membre, echeance):
+        heapq.heappush(self._tas, (echeance, isbn, id_membre))
+
+    def perimer(self, nombre=1):
+        # Appelé quand des entrées deviennent périmées (retour, prolongation, suppression)
+        self._perimees += nombre
+        if self._perimees > len(self._tas) // 2 + 64:
+            self._tas = [entree for entree in dict.fromkeys(self._tas) if self._valide(*entree)]
+            heapq.heapify(self._tas)
+            self._perimees = 0
+
+    def _valide(self, echeance, isbn, id_membre):
+        membre = self.membres.get(id_membre)
+        return membre is not None and membre.echeance(isbn) == echeance
+
+    def parcourir(self, debut=None, fin=None):
+        # Emprunts valides de debut <= échéance < fin, dans l'ordre des échéances
+        tas = self._tas
+        debut, fin = en_texte(debut), en_texte(fin)
+        a_visiter = [(tas[0], 0)] if tas else []
+        vus = set()
+        while a_visiter:
+            entree, i = heapq.heappop(a_visiter)
+            if fin is not None and entree[0] >= fin:
+                break
+            for enfant in (2 * i + 1, 2 * i + 2):
+                if enfant < len(tas):
+                    heapq.heappush(a_visiter, (tas[enfant], enfant))
+            # Un livre n'a qu'un emprunt en cours : un doublon du tas n'est renvoyé qu'une fois
+            if (debut is None or entree[0] >= debut) and entree[1] not in vus and self._valide(*entree):
+                vus.add(entree[1])
+                yield entree
+
+    def en_retard(self, maintenant):
+        return list(self.parcourir(fin=maintenant))
+
+    def a_echeance(self, debut, fin):
+        return list(self.parcourir(debut, fin))
@@ -1,17 +1,25 @@
-class LivreIndisponibleError(Exception):
-    def __init__(self, message="Le livre est indisponible."):
-        self.message = message
-        super().__init__(self.message)
-class QuotaEmpruntDepasseError(Exception):
-    def __init__(self, message="Le quota d'emprunt a été dépassé."):
-        self.message = message
-        super().__init__(self.message)
-class MembreInexistantError(Exception):
-    def __init__(self, message="Le membre n'existe pas."):
-        self.message = message
-        super().__init__(self.message)
-class LivreInexistantError(Exception):
-    def __init__(self, message="Le livre n'existe pas."):
-        self.message = message
-        super().__init__(self.message)
-    
\ No newline at end of file
+class LivreIndisponibleError(Exception):
+    def __init__(self, message="Le livre est indisponible."):
+        self.message = message
+        super().__init__(self.message)
+class QuotaEmpruntDepasseError(Exception):
+    def __init__(self, message="Le quota d'emprunt a été dépassé."):
+        self.message = message
+        super().__init__(self.message)
+class MembreInexistantError(Exception):
+    def __init__(self, message="Le membre n'existe pas."):
+        self.message = message
+        super().__init__(self.message)
+class LivreInexistantError(Exception):
+    def __init__(self, message="Le livre n'existe pas."):
+        self.message = message
+        super().__init__(self.message)
+class ServeurError(Exception):
+    def __init__(self, message="Erreur du serveur de la bibliothèque."):
+        self.message = message
+        super().__init__(self.message)
+    
+class ReservationImpossibleError(Exception):
+    def __init__(self, message="La réservation est impossible."):
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,231 @@
+import heapq
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from classes.bibliotheque import Bibliotheque
+from classes.exceptions import LivreInexistantError, LivreIndisponibleError
+from classes.historique_partitions import en_texte
+from classes.livre import Livre
+from classes.membre import Membre
+from classes.mesures import instrumenter
+
+# Plusieurs branches (une Bibliotheque et un dossier de données chacune) vues comme les
+# fragments d'une seule bibliothèque.
+#
+# Chaque branche est chargée dans un processus de travail, qui la garde ouverte : un processus
+# ne charge que ses branches (mémoire et temps de chargement proportionnels à leur taille).
+# Les emprunts et retours sont envoyés au processus de la branche qui possède le livre ; les
+# requêtes sur tout le catalogue (disponibilité d'un ISBN, statistiques par genre ou auteur,
+# historique d'une période) sont envoyées à tous les processus en parallèle et leurs résultats
+# partiels fusionnés ici. Un livre peut être transféré d'une branche à une autre.
+#
+# Le processus principal ne garde que la branche de chaque ISBN déjà rencontré.
+
+# --- Côté processus de travail ---
+
+# Branches ouvertes par ce processus : nom -> Bibliotheque
+_branches = {}
+
+
+def _ouvrir_branches(branches, persistance, options):
+    for nom, dossier in branches.items():
+        biblio = Bibliotheque(persistance, dossier, **options)
+        biblio.charger()
+        _branches[nom] = biblio
+
+
+def _executer(noms, requete, args):
+    # Exécute la requête sur chacune des branches `noms` de ce processus : {nom: résultat}
+    fonction = REQUETES[requete]
+    return {nom: fonction(_branches[nom], *args) for nom in noms}
+
+
+def _disponibilite(biblio, isbn):
+    # Statut du livre et emprunteur, ou None si la branche ne l'a pas
+    livre = biblio.livres.get(isbn)
+    if livre is None:
+        return None
+    emprunteur = biblio.emprunteur_de(isbn)
+    return {"statut": livre.statut, "emprunteur": emprunteur.id_membre if emprunteur is not None else None}
+
+
+def _historique(biblio, debut, fin, id_membre, isbn):
+    return [tuple(ligne) for ligne in biblio.parcourir_historique(debut, fin, id_membre, isbn)]
+
+
+def _sortie_transfert(biblio, isbn):
+    # Retire un livre disponible de la branche et renvoie ses données
+    with biblio.transaction():
+        livre = biblio.livres.get(isbn)
+        if livre is None:
+            raise LivreInexistantError()
+        if livre.statut != "disponible":
+            raise LivreIndisponibleError("Seul un livre disponible peut être transféré.")
+        donnees = livre.vers_dict()
+        biblio.supprimer_livre(isbn)
+    return donnees
+
+
+def _entree_transfert(biblio, donnees):
+    if donnees["isbn"] in biblio.livres:
+        raise ValueError(f"La branche a déjà un livre d'ISBN {donnees['isbn']}")
+    biblio.ajouter_livre(Livre(**donnees))
+
+
+REQUETES = {
+    "ping": lambda biblio: None,
+    "contient": lambda biblio, isbn: isbn in biblio.livres,
+    "disponibilite": _disponibilite,
+    "compter_par": lambda biblio, champ: dict(biblio.compter_par(champ)),
+    "historique": _historique,
+    "tailles": lambda biblio: (len(biblio.livres), len(biblio.membres)),
+    "emprunter_livre": Bibliotheque.emprunter_livre,
+    "retourner_livre": Bibliotheque.retourner_livre,
+    "ajouter_livre": lambda biblio, donnees: biblio.ajouter_livre(Livre(**donnees)),
+    "enregistrer_membre": lambda biblio, id_membre, nom: biblio.enregistrer_membre(Membre(id_membre, nom)),
+    "sortie_transfert": _sortie_transfert,
+    "entree_transfert": _entree_transfert,
+    "fermer": Bibliotheque.fermer,
+}
+
+
+# --- Côté processus principal ---
+
+class Federation:
+    def __init__(self, branches, persistance="journal", processus=None, options=None):
+        # branches : nom -> dossier de données de la branche
+        # processus : nombre de processus de travail (par défaut un par branche, au plus un par cœur) ;
+        #             les branches leur sont réparties à tour de rôle
+        # options : autres paramètres de Bibliotheque (options_historique, snapshot_binaire)
+        self.branches = dict(branches)
+        nb = max(1, min(processus or os.cpu_count() or 1, len(self.branches)))
+        groupes = [{} for _ in range(nb)]
+        for i, (nom, dossier) in enumerate(self.branches.items()):
+            groupes[i % nb][nom] = dossier
+        # Un exécuteur à un seul processus par groupe : les branches restent dans leur processus
+        self._processus = [(list(groupe), ProcessPoolExecutor(1, initializer=_ouvrir_branches,
+                                                              initargs=(groupe, persistance, options or {})))
+                           for groupe in groupes]
+        self._processus_de = {nom: executeur for noms, executeur in self._processus for nom in noms}
+        # ISBN -> branche, rempli à la demande
+        self._routes = {}
+
+    @instrumenter("Federation.demarrer")
+    def demarrer(self):
+        # Charge toutes les branches en parallèle (sinon chacune l'est à sa première requête)
+        self._diffuser("ping")
+
+    def _appeler(self, branche, requete, *args):
+        executeur = self._processus_de.get(branche)
+        if executeur is None:
+            raise ValueError(f"Branche inconnue : {branche}")
+        return executeur.submit(_executer, [branche], requete, args).result()[branche]
+
+    def _diffuser(self, requete, *args):
+        # Requête envoyée à tous les processus à la fois : {branche: résultat}
+        futurs = [executeur.submit(_executer, noms, requete, args) for noms, executeur in self._processus]
+        resultats = {}
+        for futur in futurs:
+            resultats.update(futur.result())
+        return {nom: resultats[nom] for nom in self.branches}
+
+    # --- Routage ---
+
+    def localiser(self, isbn):
+        # Branche qui possède le livre (LivreInexistantError si aucune)
+        branche = self._routes.get(isbn)
+        if branche is None:
+            branche = next((nom for nom, present in self._diffuser("contient", isbn).items() if present), None)
+            if branche is None:
+                raise LivreInexistantError()
+            self._routes[isbn] = branche
+        return branche
+
+    def _appeler_proprietaire(self, requete, isbn, *args):
+        try:
+            return self._appeler(self.localiser(isbn), requete, isbn, *args)
+        except LivreInexistantError:
+            # Route périmée (livre supprimé ou déplacé par un autre processus) : relocalisé une fois
+            if self._routes.pop(isbn, None) is None:
+                raise
+            return self._appeler(self.localiser(isbn), requete, isbn, *args)
+
+    @instrumenter("Federation.emprunter_livre")
+    def emprunter_livre(self, isbn, id_membre):
+        # Le membre doit être inscrit dans la branche qui possède le livre
+        self._appeler_proprietaire("emprunter_livre", isbn, id_membre)
+
+    @instrumenter("Federation.retourner_livre")
+    def retourner_livre(self, isbn, id_membre):
+        self._appeler_proprietaire("retourner_livre", isbn, id_membre)
+
+    def ajouter_livre(self, livre, branche):
+        # Un ISBN n'appartient qu'à une branche
+        try:
+            proprietaire = self.localiser(livre.isbn)
+        except LivreInexistantError:
+            proprietaire = branche
+        if proprietaire != branche:
+            raise ValueError(f"Le livre {livre.isbn} appartient à la branche {proprietaire}")
+        self._appeler(branche, "ajouter_livre", livre.vers_dict())
+        self._routes[livre.isbn] = branche
+
+    def enregistrer_membre(self, membre, branche):
+        self._appeler(branche, "enregistrer_membre", membre.id_membre, membre.nom)
+
+    @instrumenter("Federation.transferer")
+    def transferer(self, isbn, vers):
+        # Déplace un livre disponible vers la branche `vers` ; s'il ne peut pas y être ajouté,
+        # il est remis dans sa branche d'origine
+        source = self.localiser(isbn)
+        if source == vers:
+            return
+        if vers not in self.branches:
+            raise ValueError(f"Branche inconnue : {vers}")
+        donnees = self._appeler(source, "sortie_transfert", isbn)
+        try:
+            self._appeler(vers, "entree_transfert", donnees)
+        except BaseException:
+            self._appeler(source, "entree_transfert", donnees)
+            raise
+        self._routes[isbn] = vers
+
+    # --- Requêtes sur toutes les branches ---
+
+    @instrumenter("Federation.disponibilite")
+    def disponibilite(self, isbn):
+        # {branche: {"statut", "emprunteur"}} pour chaque branche qui a le livre
+        return {nom: etat for nom, etat in self._diffuser("disponibilite", isbn).items() if etat is not None}
+
+    @instrumenter("Federation.compter_par")
+    def compter_par(self, champ):
+        # Nombre de livres par valeur de champ (genre, auteur, statut) sur tout le réseau
+        total = Counter()
+        for comptes in self._diffuser("compter_par", champ).values():
+            total.update(comptes)
+        return total
+
+    @instrumenter("Federation.parcourir_historique")
+    def parcourir_historique(self, debut=None, fin=None, id_membre=None, isbn=None):
+        # Lignes (date, isbn, id_membre, action, branche) de toutes les branches, par date
+        debut, fin = en_texte(debut), en_texte(fin)
+        parties = self._diffuser("historique", debut, fin, id_membre, isbn)
+        return list(heapq.merge(*([ligne + (nom,) for ligne in lignes] for nom, lignes in parties.items()),
+                                key=lambda ligne: ligne[0]))
+
+    def tailles(self):
+        # {branche: (nombre de livres, nombre de membres)}
+        return self._diffuser("tailles")
+
+    def fermer(self):
+        try:
+            self._diffuser("fermer")
+        finally:
+            for _, executeur in self._processus:
+                executeur.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
@@ -0,0 +1,87 @@
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from classes.mesures import instrumenter
+
+DURABILITES = ("ligne", "lot", "jamais")
+
+
+class HistoriqueWriter:
+    # Écriture de l'historique (HistoriquePartitionne, un fichier CSV par mois) avec un tampon en mémoire.
+    # Les lignes sont écrites par lots : quand le tampon atteint `taille_lot` lignes,
+    # quand `intervalle` secondes se sont écoulées depuis la dernière écriture,
+    # ou lors d'un appel explicite à flush() / fermer().
+    #
+    # durabilite : "ligne"  -> chaque ligne est écrite et synchronisée (fsync) immédiatement
+    #              "lot"    -> fsync après chaque lot écrit
+    #              "jamais" -> pas de fsync, le système écrit quand il le souhaite
+    # arriere_plan : si True, un thread dédié écrit les lots ; ecrire() ne touche jamais au disque
+    # Le verrou entre processus est celui de l'historique (historique.verrou)
+    def __init__(self, historique, taille_lot=256, intervalle=1.0, durabilite="lot", arriere_plan=False):
+        if durabilite not in DURABILITES:
+            raise ValueError(f"Durabilité inconnue : {durabilite}")
+        self.historique = historique
+        self.taille_lot = 1 if durabilite == "ligne" else taille_lot
+        self.intervalle = intervalle
+        self.durabilite = durabilite
+        self.arriere_plan = arriere_plan
+        self._tampon = []
+        self._derniere_ecriture = time.monotonic()
+        self._condition = threading.Condition()
+        self._verrou_fichier = threading.Lock()
+        self._thread = None
+        self._arret = False
+
+    def ecrire(self, isbn, id_membre, action, date=None):
+        ligne = [date or datetime.now().isoformat(), isbn, id_membre, action]
+        with self._condition:
+            self._tampon.append(ligne)
+            plein = len(self._tampon) >= self.taille_lot
+            if self.arriere_plan:
+                if self._thread is None:
+                    self._demarrer_thread()
+                if plein:
+                    self._condition.notify()
+                return
+        if plein or time.monotonic() - self._derniere_ecriture >= self.intervalle:
+            self.flush()
+
+    @instrumenter()
+    def flush(self):
+        # Écrit le contenu du tampon ; le verrou du fichier garantit l'ordre des lots
+        # même si le thread d'arrière-plan vide le tampon en même temps, et le verrou
+        # entre processus qu'un lot n'est pas entrecoupé par celui d'un autre processus
+        with self.historique.verrou or nullcontext(), self._verrou_fichier:
+            with self._condition:
+                lignes, self._tampon = self._tampon, []
+            if not lignes:
+                return
+            self.historique.ajouter(lignes, synchroniser=self.durabilite != "jamais")
+            self._derniere_ecriture = time.monotonic()
+
+    def _demarrer_thread(self):
+        self._arret = False
+        self._thread = threading.Thread(target=self._boucle, daemon=True)
+        self._thread.start()
+
+    def _boucle(self):
+        while True:
+            with self._condition:
+                if not self._arret and len(self._tampon) < self.taille_lot:
+                    self._condition.wait(self.intervalle)
+                arret = self._arret
+            self.flush()
+            if arret:
+                return
+
+    def fermer(self):
+        if self._thread is not None:
+            with self._condition:
+                self._arret = True
+                self._condition.notify()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._verrou_fichier:
+            self.historique.fermer()
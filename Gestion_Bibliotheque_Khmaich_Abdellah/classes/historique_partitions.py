@@ -0,0 +1,1041 @@
+import array
+import base64
+import csv
+import hashlib
+import io
+import json
+import math
+import os
+import shutil
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from itertools import accumulate, chain
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta
+from classes.mesures import instrumenter, registre
+
+# Historique découpé par mois dans data/historique/ :
+#   AAAA-MM.csv            lignes du mois, même format que l'ancien historique.csv (avec en-tête)
+#   AAAA-MM.csv.index.json index du fichier : lignes, première / dernière date, emprunts par jour
+#                          et blocs de LIGNES_PAR_BLOC lignes (position en octets, dates min / max)
+#   AAAA-MM.csv.positions  position de chaque ligne du CSV avec son ISBN et son membre (IndexPositions)
+#   AAAA-MM.col            mois compacté, lignes triées par date : dictionnaires triés des ISBN,
+#                          membres et actions, numéros des lignes de chaque ISBN et de chaque membre,
+#                          puis les colonnes par blocs compressés (zlib). La première ligne du fichier
+#                          est son index (mêmes champs que ci-dessus, plus des filtres de Bloom des
+#                          membres et des ISBN)
+#
+# Les lignes sont ajoutées au fichier CSV du mois de leur date. Les mois terminés depuis plus
+# de MOIS_ACTIFS mois sont compactés (compacter(), lancé en arrière-plan au chargement).
+# Une requête (parcourir) ne lit que les mois, et dans un CSV que les blocs, dont l'index
+# recoupe l'intervalle demandé ; un mois compacté dont le filtre de Bloom exclut le membre
+# ou l'ISBN recherché n'est pas lu. L'historique d'un membre ou d'un livre passe par les
+# positions : seules ses lignes sont lues, quelle que soit la taille du mois.
+#
+# Les index des CSV sont tenus à jour à la lecture : seule la fin du fichier ajoutée depuis
+# le dernier index est relue. L'ancien fichier unique data/historique.csv est migré à la
+# première ouverture, puis renommé historique.csv.migre.
+
+VERSION_INDEX = 1
+EN_TETE = ["date", "ISBN", "ID_membre", "action"]
+LIGNES_PAR_BLOC = 4096
+# Blocs plus petits dans les mois compactés : lire une ligne isolée décompresse tout son bloc
+LIGNES_PAR_BLOC_COLONNES = 256
+# Mois courant et mois précédent restent en CSV (des lots en retard peuvent encore y arriver)
+MOIS_ACTIFS = 2
+MAGIE_COLONNES = b"HCOL2\n"
+COLONNES = ("date", "isbn", "membre", "action")
+DICTIONNAIRES = ("isbn", "membre", "action")
+# Colonnes dont les positions des lignes sont indexées
+CLES = ("isbn", "membre")
+TAUX_FAUX_POSITIFS = 0.01
+EPOQUE = datetime(1970, 1, 1)
+UNE_MICROSECONDE = timedelta(microseconds=1)
+# Mois des lignes dont la date est illisible
+MOIS_INCONNU = "0000-00"
+
+
+def mois_de(texte):
+    mois = texte[:7]
+    if len(mois) == 7 and mois[4] == "-" and mois[:4].isdigit() and mois[5:].isdigit():
+        return mois
+    return MOIS_INCONNU
+
+
+def en_texte(moment):
+    # Borne de requête (datetime, date ou texte ISO) -> texte comparable aux dates des lignes
+    if moment is None:
+        return None
+    if isinstance(moment, str):
+        moment = datetime.fromisoformat(moment)
+    elif not isinstance(moment, datetime):
+        moment = datetime.combine(moment, datetime.min.time())
+    return moment.isoformat()
+
+
+def en_microsecondes(texte):
+    # Date ISO -> microsecondes depuis 1970 ; ValueError si la conversion inverse
+    # ne redonne pas exactement le même texte (fuseau horaire, format inhabituel)
+    moment = datetime.fromisoformat(texte)
+    if moment.tzinfo is not None:
+        raise ValueError(texte)
+    valeur = (moment - EPOQUE) // UNE_MICROSECONDE
+    if depuis_microsecondes(valeur) != texte:
+        raise ValueError(texte)
+    return valeur
+
+
+def depuis_microsecondes(valeur):
+    return (EPOQUE + timedelta(microseconds=valeur)).isoformat()
+
+
+def decouper_ligne(ligne):
+    # Ligne CSV (octets) -> liste de champs ; csv n'est utilisé que si un champ est entre guillemets
+    texte = ligne.decode("utf-8").rstrip("\r\n")
+    if '"' in texte:
+        return next(csv.reader([texte]))
+    return texte.split(",")
+
+
+def colonnes_csv(donnees):
+    # Contenu d'un CSV mensuel -> listes (dates, isbns, membres, actions) des lignes complètes.
+    # Sans guillemets (cas courant, voir encoder_ligne) tout le fichier est découpé en une fois.
+    texte = donnees[:donnees.rfind(b"\n") + 1].decode("utf-8")
+    if '"' not in texte:
+        champs = texte.replace("\r\n", "\n").replace("\n", ",").split(",")
+        champs.pop()
+        if len(champs) == 4 * texte.count("\n"):
+            debut = 4 if champs[:1] == ["date"] else 0
+            return tuple(champs[debut + i::4] for i in range(4))
+    lignes = [champs for champs in map(decouper_ligne, texte.encode("utf-8").splitlines(True))
+              if len(champs) == 4 and champs[0] != "date"]
+    return tuple(map(list, zip(*lignes))) if lignes else ([], [], [], [])
+
+
+def ecrire_atomique(chemin, donnees):
+    # Index reconstructibles : pas de fsync, nom temporaire propre au processus
+    tmp = f"{chemin}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp, "wb") as f:
+        f.write(donnees)
+    os.replace(tmp, chemin)
+
+
+class FiltreBloom:
+    # Ensemble approché : "absent" est certain, "présent" se trompe dans ~TAUX_FAUX_POSITIFS des cas
+    def __init__(self, nb_bits, nb_hachages, bits=None):
+        self.nb_bits = nb_bits
+        self.nb_hachages = nb_hachages
+        self.bits = bits if bits is not None else bytearray((nb_bits + 7) // 8)
+
+    @classmethod
+    def construire(cls, cles):
+        cles = set(cles)
+        # Taille optimale : ~9,6 bits et 7 hachages par clé pour 1 % de faux positifs
+        nb_bits = max(64, int(len(cles) * -math.log(TAUX_FAUX_POSITIFS) / math.log(2) ** 2))
+        filtre = cls(nb_bits, max(1, round(-math.log2(TAUX_FAUX_POSITIFS))))
+        for cle in cles:
+            for position in filtre._positions(cle):
+                filtre.bits[position >> 3] |= 1 << (position & 7)
+        return filtre
+
+    def _positions(self, cle):
+        empreinte = hashlib.blake2b(cle.encode("utf-8"), digest_size=16).digest()
+        a = int.from_bytes(empreinte[:8], "little")
+        b = int.from_bytes(empreinte[8:], "little") | 1
+        return [(a + i * b) % self.nb_bits for i in range(self.nb_hachages)]
+
+    def __contains__(self, cle):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(cle))
+
+    def vers_dict(self):
+        return {"bits": self.nb_bits, "hachages": self.nb_hachages,
+                "donnees": base64.b64encode(zlib.compress(bytes(self.bits))).decode("ascii")}
+
+    @classmethod
+    def depuis_dict(cls, d):
+        return cls(d["bits"], d["hachages"], bytearray(zlib.decompress(base64.b64decode(d["donnees"]))))
+
+
+def _octets(valeurs, code="q"):
+    # Entiers petit-boutistes (q : 64 bits signés, Q / I : 64 / 32 bits non signés)
+    tableau = array.array(code, valeurs)
+    if sys.byteorder == "big":
+        tableau.byteswap()
+    return tableau.tobytes()
+
+
+def _depuis_octets(donnees, code="q"):
+    tableau = array.array(code)
+    tableau.frombytes(donnees)
+    if sys.byteorder == "big":
+        tableau.byteswap()
+    return tableau
+
+
+def _tableau(valeurs):
+    return zlib.compress(_octets(valeurs))
+
+
+def _depuis_tableau(donnees):
+    return _depuis_octets(zlib.decompress(donnees))
+
+
+def nouvel_index():
+    return {"version": VERSION_INDEX, "octets": 0, "lignes": 0, "debut": None, "fin": None,
+            "emprunts_par_jour": {}, "blocs": []}
+
+
+def indexer_ligne(index, champs):
+    # Met à jour l'index d'un mois avec une ligne (date, isbn, id_membre, action)
+    date_ligne = champs[0]
+    index["lignes"] += 1
+    if index["debut"] is None or date_ligne < index["debut"]:
+        index["debut"] = date_ligne
+    if index["fin"] is None or date_ligne > index["fin"]:
+        index["fin"] = date_ligne
+    if champs[3] == "emprunt" and len(date_ligne) >= 10:
+        jour = date_ligne[:10]
+        index["emprunts_par_jour"][jour] = index["emprunts_par_jour"].get(jour, 0) + 1
+
+
+def ecrire_colonnes(chemin, lignes, octets_csv):
+    # Écrit un mois compacté ; `lignes` doivent être triées par date et toutes convertibles
+    # (en_microsecondes). octets_csv : taille du CSV absorbé (reprise après un arrêt brutal)
+    index = nouvel_index()
+    dates = []
+    for ligne in lignes:
+        dates.append(en_microsecondes(ligne[0]))
+        indexer_ligne(index, ligne)
+    # Dictionnaires triés : le code d'une valeur se retrouve par dichotomie
+    valeurs = {nom: sorted({ligne[i] for ligne in lignes}) for i, nom in enumerate(COLONNES) if i}
+    codes = {}
+    for i, nom in enumerate(COLONNES):
+        if i:
+            code_de = {valeur: code for code, valeur in enumerate(valeurs[nom])}
+            codes[nom] = [code_de[ligne[i]] for ligne in lignes]
+    sections = []
+    for nom in DICTIONNAIRES:
+        textes = [valeur.encode("utf-8") for valeur in valeurs[nom]]
+        sections.append((f"{nom}.offsets", _octets(accumulate((len(t) for t in textes), initial=0), "Q")))
+        sections.append((f"{nom}.texte", b"".join(textes)))
+    for nom in CLES:
+        # Positions : numéros des lignes de chaque valeur (croissants), regroupés par code
+        par_code = [[] for _ in valeurs[nom]]
+        for numero, code in enumerate(codes[nom]):
+            par_code[code].append(numero)
+        sections.append((f"{nom}.debuts", _octets(accumulate((len(n) for n in par_code), initial=0), "Q")))
+        sections.append((f"{nom}.lignes", _octets(chain.from_iterable(par_code), "I")))
+    # Sections non compressées (lues par morceaux), puis les blocs de lignes compressés ;
+    # positions comptées depuis la fin de la ligne d'index
+    index["sections"] = {}
+    position = 0
+    for nom, donnees in sections:
+        index["sections"][nom] = [position, len(donnees)]
+        position += len(donnees)
+    for debut in range(0, len(lignes), LIGNES_PAR_BLOC_COLONNES):
+        fin = min(debut + LIGNES_PAR_BLOC_COLONNES, len(lignes))
+        # Dates en écarts depuis la première du bloc : chaque bloc se décode seul
+        ecarts = [dates[debut]] + [dates[i] - dates[i - 1] for i in range(debut + 1, fin)]
+        morceaux = [_tableau(ecarts)] + [_tableau(codes[nom][debut:fin]) for nom in DICTIONNAIRES]
+        # Bloc : [position, date min, date max, lignes, tailles des colonnes]
+        index["blocs"].append([position, lignes[debut][0], lignes[fin - 1][0], fin - debut, [len(m) for m in morceaux]])
+        sections.append((None, b"".join(morceaux)))
+        position += len(sections[-1][1])
+    index["format"] = "colonnes"
+    index["csv_absorbe"] = octets_csv
+    index["membres"] = FiltreBloom.construire(valeurs["membre"]).vers_dict()
+    index["isbns"] = FiltreBloom.construire(valeurs["isbn"]).vers_dict()
+    tmp = f"{chemin}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp, "wb") as f:
+        f.write(MAGIE_COLONNES)
+        f.write(json.dumps(index).encode("utf-8") + b"\n")
+        for _, donnees in sections:
+            f.write(donnees)
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp, index
+
+
+def lire_index_colonnes(f):
+    magie = f.readline()
+    if magie != MAGIE_COLONNES:
+        raise ValueError("Fichier d'historique compacté invalide")
+    index = json.loads(f.readline())
+    index["debut_donnees"] = f.tell()
+    return index
+
+
+class LecteurColonnes:
+    # Lecture d'un mois compacté : les dictionnaires et les positions sont lus à la demande
+    # (dichotomie dans le fichier), les blocs de lignes décompressés un par un.
+    # index : index du fichier déjà lu (HistoriquePartitionne.index), sinon relu ici
+    def __init__(self, chemin, index=None):
+        self._f = open(chemin, "rb")
+        try:
+            self.index = index or lire_index_colonnes(self._f)
+        except BaseException:
+            self._f.close()
+            raise
+        self._debut = self.index["debut_donnees"]
+        # code -> valeur déjà lue, par dictionnaire
+        self._valeurs = {nom: {} for nom in DICTIONNAIRES}
+        self._bloc = (None, None)
+
+    def fermer(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+    def _lire(self, section, debut=0, taille=None):
+        position, longueur = self.index["sections"][section]
+        self._f.seek(self._debut + position + debut)
+        return self._f.read(longueur - debut if taille is None else taille)
+
+    def valeur(self, nom, code):
+        connues = self._valeurs[nom]
+        if code not in connues:
+            debut, fin = _depuis_octets(self._lire(f"{nom}.offsets", code * 8, 16), "Q")
+            connues[code] = self._lire(f"{nom}.texte", debut, fin - debut).decode("utf-8")
+        return connues[code]
+
+    def valeurs(self, nom):
+        # Dictionnaire complet (lecture de tout le mois)
+        offsets = _depuis_octets(self._lire(f"{nom}.offsets"), "Q")
+        texte = self._lire(f"{nom}.texte")
+        return [texte[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+    def code(self, nom, valeur):
+        nombre = self.index["sections"][f"{nom}.offsets"][1] // 8 - 1
+        bas, haut = 0, nombre
+        while bas < haut:
+            milieu = (bas + haut) // 2
+            if self.valeur(nom, milieu) < valeur:
+                bas = milieu + 1
+            else:
+                haut = milieu
+        return bas if bas < nombre and self.valeur(nom, bas) == valeur else None
+
+    def numeros(self, nom, valeur):
+        # Numéros des lignes d'un membre ou d'un ISBN, croissants (donc par date)
+        code = self.code(nom, valeur)
+        if code is None:
+            return []
+        debut, fin = _depuis_octets(self._lire(f"{nom}.debuts", code * 8, 16), "Q")
+        return _depuis_octets(self._lire(f"{nom}.lignes", debut * 4, (fin - debut) * 4), "I")
+
+    def _colonnes_bloc(self, numero_bloc):
+        if self._bloc[0] != numero_bloc:
+            position, _, _, _, tailles = self.index["blocs"][numero_bloc]
+            self._f.seek(self._debut + position)
+            colonnes = [_depuis_tableau(self._f.read(taille)) for taille in tailles]
+            colonnes[0] = list(accumulate(colonnes[0]))
+            self._bloc = (numero_bloc, colonnes)
+        return self._bloc[1]
+
+    def octets_blocs(self):
+        # Colonnes de chaque bloc décompressées sans conversion (entiers 64 bits petit-boutistes,
+        # dates en écarts cumulés depuis le début du bloc), pour les lectures vectorisées
+        for position, _, _, _, tailles in self.index["blocs"]:
+            self._f.seek(self._debut + position)
+            yield [zlib.decompress(self._f.read(taille)) for taille in tailles]
+
+    def ligne(self, numero):
+        dates, isbns, membres, actions = self._colonnes_bloc(numero // LIGNES_PAR_BLOC_COLONNES)
+        i = numero % LIGNES_PAR_BLOC_COLONNES
+        return [depuis_microsecondes(dates[i]), self.valeur("isbn", isbns[i]),
+                self.valeur("membre", membres[i]), self.valeur("action", actions[i])]
+
+    def parcourir(self, debut=None, fin=None, id_membre=None, isbn=None):
+        if id_membre is not None or isbn is not None:
+            # Par les positions : seuls les blocs des lignes trouvées sont décompressés
+            numeros = self.numeros("membre", id_membre) if id_membre is not None else self.numeros("isbn", isbn)
+            if id_membre is not None and isbn is not None:
+                numeros = sorted(set(numeros).intersection(self.numeros("isbn", isbn)))
+            for numero in numeros:
+                ligne = self.ligne(numero)
+                if _dans_intervalle(ligne[0], debut, fin):
+                    yield ligne
+            return
+        # Lignes triées par date : les blocs hors de l'intervalle sont sautés
+        isbns, membres, actions = (self.valeurs(nom) for nom in DICTIONNAIRES)
+        for numero_bloc, (_, minimum, maximum, nombre, _) in enumerate(self.index["blocs"]):
+            if (debut and maximum < debut) or (fin and minimum >= fin):
+                continue
+            dates, codes_isbn, codes_membre, codes_action = self._colonnes_bloc(numero_bloc)
+            for i in range(nombre):
+                date_ligne = depuis_microsecondes(dates[i])
+                if _dans_intervalle(date_ligne, debut, fin):
+                    yield [date_ligne, isbns[codes_isbn[i]], membres[codes_membre[i]], actions[codes_action[i]]]
+
+
+def lire_colonnes(chemin, debut=None, fin=None, id_membre=None, isbn=None):
+    # Lignes d'un mois compacté, filtrées avant d'être reconstruites en texte
+    with LecteurColonnes(chemin) as lecteur:
+        yield from lecteur.parcourir(debut, fin, id_membre, isbn)
+
+
+def _dans_intervalle(date_ligne, debut, fin):
+    return (debut is None or date_ligne >= debut) and (fin is None or date_ligne < fin)
+
+
+def encoder_ligne(champs):
+    # Ligne CSV en octets, identique à csv.writer (fin de ligne \r\n)
+    texte = ",".join(map(str, champs))
+    if texte.count(",") != len(champs) - 1 or '"' in texte or "\n" in texte or "\r" in texte:
+        tampon = io.StringIO()
+        csv.writer(tampon).writerow(champs)
+        return tampon.getvalue().encode("utf-8")
+    return (texte + "\r\n").encode("utf-8")
+
+
+class IndexPositions:
+    # Positions (en octets) des lignes d'un CSV mensuel par membre et par ISBN, pour lire
+    # l'historique d'un membre ou d'un livre sans parcourir tout le mois.
+    # Fichier AAAA-MM.csv.positions : une ligne "position,longueur,isbn,id_membre" par ligne
+    # du CSV (en-tête compris, avec isbn et membre vides), complété à chaque ajout. Les lignes
+    # du CSV qu'il ne couvre pas encore (fichier absent, ajout interrompu) sont indexées à la
+    # lecture suivante. Toutes les méthodes s'appellent sous le verrou entre processus.
+    def __init__(self, chemin_csv):
+        self.chemin_csv = chemin_csv
+        self.chemin = chemin_csv + ".positions"
+        self._inode = None
+        # (taille du fichier des positions, fin couverte dans le CSV) après le dernier ajout de ce processus
+        self._dernier_ajout = None
+        self._vider()
+
+    def _vider(self):
+        self.membres = {}
+        self.isbns = {}
+        # Octets du CSV couverts, et du fichier des positions déjà lus
+        self.couvert = 0
+        self._lu = 0
+
+    def ajouter(self, entrees, debut):
+        # Entrées (position, longueur, isbn, id_membre) des lignes écrites à partir de `debut` ;
+        # ignorées si le fichier ne couvre pas exactement le CSV jusque-là (rattrapage à la lecture)
+        try:
+            taille = os.path.getsize(self.chemin)
+        except FileNotFoundError:
+            taille = 0
+        # Fichier inchangé depuis notre dernier ajout : sa fin est déjà connue
+        if self._dernier_ajout != (taille, debut) and self._fin_couverte() != debut:
+            return
+        with open(self.chemin, "a", encoding="utf-8", newline="") as f:
+            csv.writer(f, lineterminator="\n").writerows(entrees)
+        if entrees:
+            position, longueur = entrees[-1][:2]
+            self._dernier_ajout = (os.path.getsize(self.chemin), position + longueur)
+
+    def _fin_couverte(self):
+        # Fin dans le CSV de la dernière ligne indexée ; une ligne incomplète (arrêt brutal) est retirée
+        try:
+            f = open(self.chemin, "r+b")
+        except FileNotFoundError:
+            return 0
+        with f:
+            taille = f.seek(0, os.SEEK_END)
+            f.seek(max(0, taille - 4096))
+            fin = f.read()
+            if fin and not fin.endswith(b"\n"):
+                coupure = fin.rfind(b"\n") + 1
+                f.truncate(taille - len(fin) + coupure)
+                fin = fin[:coupure]
+            lignes = fin.splitlines()
+            if not lignes:
+                return 0
+            champs = decouper_ligne(lignes[-1])
+            return int(champs[0]) + int(champs[1])
+
+    def actualiser(self):
+        # Lit les entrées ajoutées depuis le dernier appel, puis indexe la fin du CSV non couverte
+        try:
+            stat = os.stat(self.chemin_csv)
+        except FileNotFoundError:
+            self._vider()
+            return
+        if stat.st_ino != self._inode:
+            # CSV compacté puis recréé : les positions connues ne le concernent plus
+            self._inode = stat.st_ino
+            self._vider()
+        taille_csv = stat.st_size
+        try:
+            f = open(self.chemin, "r+b")
+        except FileNotFoundError:
+            self._vider()
+            f = None
+        if f is not None:
+            with f:
+                if f.seek(0, os.SEEK_END) < self._lu:
+                    self._vider()  # Fichier refait par un autre processus
+                f.seek(self._lu)
+                position = self._lu
+                for ligne in f:
+                    champs = decouper_ligne(ligne) if ligne.endswith(b"\n") else None
+                    if champs is None or len(champs) != 4 or int(champs[0]) != self.couvert:
+                        # Entrée incomplète ou incohérente : la suite est refaite depuis le CSV
+                        f.truncate(position)
+                        break
+                    self._noter(int(champs[0]), champs[2], champs[3])
+                    self.couvert += int(champs[1])
+                    position += len(ligne)
+                self._lu = position
+        if self.couvert < taille_csv:
+            self._indexer(taille_csv)
+
+    def _indexer(self, taille_csv):
+        entrees = []
+        with open(self.chemin_csv, "rb") as f:
+            f.seek(self.couvert)
+            position = self.couvert
+            for ligne in f:
+                if not ligne.endswith(b"\n") or position + len(ligne) > taille_csv:
+                    break  # Ligne en cours d'écriture
+                champs = decouper_ligne(ligne)
+                isbn, id_membre = (champs[1], champs[2]) if len(champs) == 4 and champs[0] != "date" else ("", "")
+                entrees.append((position, len(ligne), isbn, id_membre))
+                self._noter(position, isbn, id_membre)
+                position += len(ligne)
+        self.couvert = position
+        registre.compter("historique.lignes_indexees", len(entrees))
+        with open(self.chemin, "a", encoding="utf-8", newline="") as f:
+            csv.writer(f, lineterminator="\n").writerows(entrees)
+        self._lu = os.path.getsize(self.chemin)
+
+    def _noter(self, position, isbn, id_membre):
+        if isbn:
+            self.isbns.setdefault(isbn, []).append(position)
+        if id_membre:
+            self.membres.setdefault(id_membre, []).append(position)
+
+    def positions(self, id_membre=None, isbn=None):
+        # Positions des lignes d'un membre et / ou d'un ISBN, dans l'ordre du fichier
+        self.actualiser()
+        if id_membre is None:
+            return list(self.isbns.get(isbn, ()))
+        positions = self.membres.get(id_membre, ())
+        if isbn is not None:
+            du_livre = set(self.isbns.get(isbn, ()))
+            return [p for p in positions if p in du_livre]
+        return list(positions)
+
+
+class HistoriquePartitionne:
+    # verrou : VerrouFichier partagé avec les autres processus (ajouts, migration, compactage)
+    # ancien_fichier : historique.csv d'avant le découpage, migré à la première ouverture
+    def __init__(self, dossier, verrou=None, ancien_fichier=None):
+        self.dossier = dossier
+        self.verrou = verrou
+        self.ancien_fichier = ancien_fichier
+        self._ouvert = False
+        # Fichiers CSV ouverts en ajout : mois -> fichier ; seul le mois courant reste ouvert
+        self._fichiers = {}
+        # Index déjà lus : nom -> (signature du fichier, index)
+        self._index = {}
+        # Index des positions des CSV : nom -> IndexPositions
+        self._positions = {}
+        # Suivi des CSV depuis le dernier parcourir_mois() (voir lignes_externes) : nom ->
+        # [inode, octets déjà vus], et parties écrites depuis par ce processus : nom -> [[inode, début, fin]]
+        self._suivi = None
+        self._propres = {}
+        self._verrou_index = threading.Lock()
+        self._thread = None
+        self._arret = False
+
+    def _verrou(self):
+        return self.verrou if self.verrou is not None else nullcontext()
+
+    def _chemin(self, nom):
+        return os.path.join(self.dossier, nom)
+
+    # --- Ouverture, migration et reprise ---
+
+    def ouvrir(self):
+        if self._ouvert:
+            return
+        with self._verrou():
+            os.makedirs(self.dossier, exist_ok=True)
+            self._reprendre_compactages()
+            if self.ancien_fichier and os.path.exists(self.ancien_fichier):
+                self._migrer()
+        self._ouvert = True
+
+    def _reprendre_compactages(self):
+        # Compactage interrompu : le CSV renommé est soit absorbé par le .col (à supprimer),
+        # soit à remettre en place
+        for nom in os.listdir(self.dossier):
+            if nom.endswith(".csv.compacte"):
+                mois = nom[:7]
+                chemin = self._chemin(nom)
+                try:
+                    with open(self._chemin(f"{mois}.col"), "rb") as f:
+                        absorbe = lire_index_colonnes(f).get("csv_absorbe")
+                except (FileNotFoundError, ValueError):
+                    absorbe = None
+                if absorbe == os.path.getsize(chemin):
+                    os.remove(chemin)
+                else:
+                    os.replace(chemin, self._chemin(f"{mois}.csv"))
+            elif ".tmp-" in nom:
+                # Fichier temporaire d'un processus arrêté pendant une écriture
+                chemin = self._chemin(nom)
+                if time.time() - os.path.getmtime(chemin) > 3600:
+                    os.remove(chemin)
+
+    @instrumenter()
+    def _migrer(self):
+        # Répartit l'ancien historique.csv par mois, dans un dossier temporaire renommé à la fin
+        temporaire = self.dossier + ".migration"
+        shutil.rmtree(temporaire, ignore_errors=True)
+        os.makedirs(temporaire)
+        fichiers = {}
+        try:
+            with open(self.ancien_fichier, "r", encoding="utf-8", newline="") as source:
+                for ligne in csv.reader(source):
+                    if len(ligne) != 4 or ligne[0] == "date":
+                        continue
+                    mois = mois_de(ligne[0])
+                    if mois not in fichiers:
+                        f = open(os.path.join(temporaire, f"{mois}.csv"), "w", encoding="utf-8", newline="")
+                        fichiers[mois] = (f, csv.writer(f))
+                        fichiers[mois][1].writerow(EN_TETE)
+                    fichiers[mois][1].writerow(ligne)
+        finally:
+            for f, _ in fichiers.values():
+                f.flush()
+                os.fsync(f.fileno())
+                f.close()
+        if not os.listdir(self.dossier):
+            os.rmdir(self.dossier)
+            os.replace(temporaire, self.dossier)
+        else:
+            # Des mois existent déjà : les lignes migrées sont ajoutées à leur fin
+            for nom in os.listdir(temporaire):
+                destination = self._chemin(nom)
+                if not os.path.exists(destination):
+                    os.replace(os.path.join(temporaire, nom), destination)
+                    continue
+                with open(os.path.join(temporaire, nom), "rb") as source, open(destination, "ab") as f:
+                    source.readline()  # en-tête
+                    shutil.copyfileobj(source, f)
+            shutil.rmtree(temporaire)
+        os.replace(self.ancien_fichier, self.ancien_fichier + ".migre")
+
+    # --- Ajout ---
+
+    def ajouter(self, lignes, synchroniser=True):
+        # Ajoute des lignes [date, isbn, id_membre, action] au CSV de leur mois ;
+        # à appeler sous le verrou entre processus (HistoriqueWriter.flush)
+        self.ouvrir()
+        par_mois = {}
+        for ligne in lignes:
+            par_mois.setdefault(mois_de(ligne[0]), []).append(ligne)
+        courant = date.today().isoformat()[:7]
+        for mois, lignes_mois in par_mois.items():
+            f, debut = self._fichier(mois)
+            # Les lignes sont encodées ici pour connaître leur position dans le fichier
+            morceaux = []
+            entrees = []
+            position = debut
+            if debut == 0:
+                morceaux.append(encoder_ligne(EN_TETE))
+                entrees.append((0, len(morceaux[-1]), "", ""))
+                position += len(morceaux[-1])
+            for ligne in lignes_mois:
+                morceaux.append(encoder_ligne(ligne))
+                entrees.append((position, len(morceaux[-1]), ligne[1], ligne[2]))
+                position += len(morceaux[-1])
+            f.write(b"".join(morceaux))
+            f.flush()
+            if synchroniser:
+                os.fsync(f.fileno())
+            self._index_positions(f"{mois}.csv").ajouter(entrees, debut)
+            if self._suivi is not None:
+                self._noter_propres(f"{mois}.csv", os.fstat(f.fileno()).st_ino, debut, position)
+            registre.compter("historique.lignes", len(lignes_mois))
+            registre.compter("historique.octets", position - debut)
+            if mois != courant:
+                # Lot en retard ou import : le fichier n'est pas gardé ouvert (compactage possible)
+                f.close()
+                del self._fichiers[mois]
+
+    def _noter_propres(self, nom, inode, debut, fin):
+        # Lignes de ce processus : déjà transmises par ses événements, sautées par lignes_externes()
+        propres = self._propres.setdefault(nom, [])
+        if propres and propres[-1][0] == inode and propres[-1][2] == debut:
+            propres[-1][2] = fin
+        else:
+            propres.append([inode, debut, fin])
+
+    def _fichier(self, mois):
+        # (fichier ouvert en ajout, taille actuelle) ; la taille vient du système, car d'autres
+        # processus ajoutent au même fichier
+        if mois not in self._fichiers:
+            self._fichiers[mois] = open(self._chemin(f"{mois}.csv"), "ab")
+        f = self._fichiers[mois]
+        # Vérifié à chaque lot : le compactage a pu retirer le fichier
+        stat = os.fstat(f.fileno())
+        if stat.st_nlink == 0:
+            f.close()
+            del self._fichiers[mois]
+            return self._fichier(mois)
+        return f, stat.st_size
+
+    def _index_positions(self, nom):
+        if nom not in self._positions:
+            self._positions[nom] = IndexPositions(self._chemin(nom))
+        return self._positions[nom]
+
+    def fermer(self):
+        # Un compactage en cours s'arrête à sa prochaine étape
+        self._arret = True
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        for f in self._fichiers.values():
+            f.close()
+        self._fichiers = {}
+
+    # --- Index ---
+
+    def partitions(self):
+        # (mois, nom) triés par mois, le fichier compacté d'un mois avant son CSV
+        partitions = []
+        try:
+            noms = os.listdir(self.dossier)
+        except FileNotFoundError:
+            return []
+        for nom in noms:
+            if nom.endswith(".col") or nom.endswith(".csv"):
+                partitions.append((nom[:7], nom.endswith(".csv"), nom))
+        return [(mois, nom) for mois, _, nom in sorted(partitions)]
+
+    def index(self, nom):
+        # Index à jour d'une partition (None si elle vient de disparaître)
+        chemin = self._chemin(nom)
+        try:
+            stat = os.stat(chemin)
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._verrou_index:
+            connu = self._index.get(nom)
+            if connu is not None and connu[0] == signature:
+                return connu[1]
+            if nom.endswith(".col"):
+                with open(chemin, "rb") as f:
+                    index = lire_index_colonnes(f)
+                index["membres"] = FiltreBloom.depuis_dict(index["membres"])
+                index["isbns"] = FiltreBloom.depuis_dict(index["isbns"])
+            else:
+                index = self._indexer_csv(chemin, stat.st_size, connu[1] if connu else None)
+            self._index[nom] = (signature, index)
+            return index
+
+    @instrumenter()
+    def _indexer_csv(self, chemin, taille, index):
+        # Reprend l'index enregistré (ou en mémoire) et n'indexe que les lignes ajoutées depuis
+        chemin_index = chemin + ".index.json"
+        if index is None:
+            try:
+                with open(chemin_index, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+            except (FileNotFoundError, ValueError):
+                index = None
+        if index is None or index.get("version") != VERSION_INDEX or index["octets"] > taille:
+            index = nouvel_index()
+        if index["octets"] == taille:
+            return index
+        position = index["octets"]
+        blocs = index["blocs"]
+        with open(chemin, "rb") as f:
+            f.seek(position)
+            for ligne in f:
+                if not ligne.endswith(b"\n"):
+                    break  # Ligne en cours d'écriture
+                champs = decouper_ligne(ligne)
+                if len(champs) == 4 and champs[0] != "date":
+                    if not blocs or blocs[-1][3] >= LIGNES_PAR_BLOC:
+                        # Bloc : [position, date min, date max, lignes]
+                        blocs.append([position, champs[0], champs[0], 0])
+                    bloc = blocs[-1]
+                    bloc[1] = min(bloc[1], champs[0])
+                    bloc[2] = max(bloc[2], champs[0])
+                    bloc[3] += 1
+                    indexer_ligne(index, champs)
+                position += len(ligne)
+        index["octets"] = position
+        try:
+            ecrire_atomique(chemin_index, json.dumps(index).encode("utf-8"))
+        except OSError:
+            pass  # Dossier en lecture seule : l'index reste en mémoire
+        return index
+
+    def emprunts_par_jour(self):
+        # "AAAA-MM-JJ" -> nombre d'emprunts, lu dans les index sans relire les lignes
+        self.ouvrir()
+        total = Counter()
+        for _, nom in self.partitions():
+            index = self.index(nom)
+            if index is not None:
+                total.update(index["emprunts_par_jour"])
+        return total
+
+    # --- Requêtes ---
+
+    @instrumenter()
+    def parcourir(self, debut=None, fin=None, id_membre=None, isbn=None):
+        # Lignes [date, isbn, id_membre, action] avec debut <= date < fin, d'un membre et / ou d'un
+        # ISBN, mois par mois. Seuls les mois (et les blocs) qui peuvent contenir un résultat sont lus.
+        self.ouvrir()
+        debut, fin = en_texte(debut), en_texte(fin)
+        # Les fichiers sont ouverts sous le verrou : un compactage ne peut pas les retirer entre
+        # la liste et l'ouverture (ils restent lisibles une fois ouverts)
+        sources = []
+        with self._verrou():
+            for mois, nom in self.partitions():
+                if mois != MOIS_INCONNU and ((debut and mois < debut[:7]) or (fin and mois > fin[:7])):
+                    continue
+                index = self.index(nom)
+                if index is None or not index["lignes"]:
+                    continue
+                if (debut and index["fin"] < debut) or (fin and index["debut"] >= fin):
+                    continue
+                if nom.endswith(".col"):
+                    if (id_membre is not None and id_membre not in index["membres"]) or \
+                            (isbn is not None and isbn not in index["isbns"]):
+                        continue
+                    sources.append((nom, LecteurColonnes(self._chemin(nom), index), index, None))
+                else:
+                    # Historique d'un membre ou d'un livre : seules ses lignes sont lues
+                    positions = None
+                    if id_membre is not None or isbn is not None:
+                        positions = self._index_positions(nom).positions(id_membre, isbn)
+                        if not positions:
+                            continue
+                    sources.append((nom, open(self._chemin(nom), "rb"), index, positions))
+        return self._lire_sources(sources, debut, fin, id_membre, isbn)
+
+    def parcourir_mois(self):
+        # Tout l'historique mois par mois pour les lectures en colonnes (classes/analyses.py) :
+        # un LecteurColonnes pour un mois compacté (ses blocs sont lus sans reconstruire les
+        # lignes), les colonnes du mois (colonnes_csv) pour un CSV.
+        # L'historique est figé à l'appel (sous le verrou) ; les lignes ajoutées ensuite par
+        # les autres processus sont rendues par lignes_externes()
+        self.ouvrir()
+        sources = []
+        suivi = {}
+        with self._verrou():
+            for _, nom in self.partitions():
+                if not nom.endswith(".col"):
+                    # Lu en entier jusqu'à sa taille actuelle, lignes ajoutées après l'index comprises
+                    f = open(self._chemin(nom), "rb")
+                    stat = os.fstat(f.fileno())
+                    sources.append((f, stat.st_size))
+                    suivi[nom] = [stat.st_ino, stat.st_size]
+                    continue
+                index = self.index(nom)
+                if index is not None and index["lignes"]:
+                    sources.append(LecteurColonnes(self._chemin(nom), index))
+            self._suivi, self._propres = suivi, {}
+        return self._lire_mois(sources)
+
+    def _lire_mois(self, sources):
+        try:
+            for source in sources:
+                registre.compter("historique.partitions_lues")
+                if isinstance(source, LecteurColonnes):
+                    yield source
+                else:
+                    f, taille = source
+                    yield colonnes_csv(f.read(taille))
+        finally:
+            for source in sources:
+                if isinstance(source, LecteurColonnes):
+                    source.fermer()
+                else:
+                    source[0].close()
+
+    @instrumenter()
+    def lignes_externes(self):
+        # Lignes [date, isbn, id_membre, action] ajoutées par les autres processus depuis le
+        # dernier parcourir_mois() ou le dernier appel, fichier par fichier ([] sans parcourir_mois()).
+        # Seule la fin des CSV est lue ; un CSV compacté entre-temps par un autre processus
+        # n'est pas relu (seuls les mois terminés depuis plus de MOIS_ACTIFS mois le sont)
+        if self._suivi is None:
+            return []
+        lignes = []
+        with self._verrou():
+            for _, nom in self.partitions():
+                if not nom.endswith(".csv"):
+                    continue
+                try:
+                    stat = os.stat(self._chemin(nom))
+                except FileNotFoundError:
+                    continue
+                inode, vus = self._suivi.get(nom, (stat.st_ino, 0))
+                if inode != stat.st_ino:
+                    vus = 0
+                propres = [(debut, fin) for ino, debut, fin in self._propres.pop(nom, ()) if ino == stat.st_ino]
+                if stat.st_size > vus:
+                    with open(self._chemin(nom), "rb") as f:
+                        f.seek(vus)
+                        suivante = 0
+                        for ligne in f:
+                            if not ligne.endswith(b"\n"):
+                                break
+                            while suivante < len(propres) and propres[suivante][1] <= vus:
+                                suivante += 1
+                            if suivante == len(propres) or vus < propres[suivante][0]:
+                                champs = decouper_ligne(ligne)
+                                if len(champs) == 4 and champs[0] != "date":
+                                    lignes.append(champs)
+                            vus += len(ligne)
+                self._suivi[nom] = [stat.st_ino, vus]
+        return lignes
+
+    def _lire_sources(self, sources, debut, fin, id_membre, isbn):
+        try:
+            for nom, f, index, positions in sources:
+                registre.compter("historique.partitions_lues")
+                if isinstance(f, LecteurColonnes):
+                    yield from f.parcourir(debut, fin, id_membre, isbn)
+                    continue
+                if positions is not None:
+                    # Les positions couvrent tout le fichier au moment de la requête
+                    for position in positions:
+                        f.seek(position)
+                        champs = decouper_ligne(f.readline())
+                        if _dans_intervalle(champs[0], debut, fin):
+                            yield champs
+                    continue
+                for position, minimum, maximum, nb_lignes in index["blocs"]:
+                    if (debut and maximum < debut) or (fin and minimum >= fin):
+                        continue
+                    f.seek(position)
+                    lues = 0
+                    for ligne in f:
+                        if not ligne.endswith(b"\n"):
+                            break
+                        champs = decouper_ligne(ligne)
+                        if len(champs) != 4 or champs[0] == "date":
+                            continue
+                        lues += 1
+                        if (id_membre is None or champs[2] == id_membre) and (isbn is None or champs[1] == isbn) \
+                                and _dans_intervalle(champs[0], debut, fin):
+                            yield champs
+                        if lues == nb_lignes:
+                            break
+                # Lignes ajoutées après l'index (lecture concurrente d'un ajout)
+                f.seek(index["octets"])
+                for ligne in f:
+                    if not ligne.endswith(b"\n"):
+                        break
+                    champs = decouper_ligne(ligne)
+                    if len(champs) == 4 and champs[0] != "date" and (id_membre is None or champs[2] == id_membre) \
+                            and (isbn is None or champs[1] == isbn) and _dans_intervalle(champs[0], debut, fin):
+                        yield champs
+        finally:
+            for _, f, _, _ in sources:
+                if isinstance(f, LecteurColonnes):
+                    f.fermer()
+                else:
+                    f.close()
+
+    # --- Compactage ---
+
+    def compacter_en_arriere_plan(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._arret = False
+            self._thread = threading.Thread(target=self.compacter, daemon=True)
+            self._thread.start()
+
+    @instrumenter()
+    def compacter(self, avant=None):
+        # Compacte les mois antérieurs à `avant` ("AAAA-MM", par défaut les mois terminés depuis
+        # plus de MOIS_ACTIFS mois). La lecture et l'écriture se font hors du verrou ; seul le
+        # remplacement des fichiers le prend, et il est abandonné si le CSV a changé entre-temps.
+        self.ouvrir()
+        if avant is None:
+            aujourdhui = date.today()
+            annee, mois = divmod(aujourdhui.year * 12 + aujourdhui.month - 1 - (MOIS_ACTIFS - 1), 12)
+            avant = f"{annee:04d}-{mois + 1:02d}"
+        compactes = []
+        for mois, nom in self.partitions():
+            if self._arret:
+                break
+            if nom.endswith(".csv") and mois < avant and mois != MOIS_INCONNU:
+                if self._compacter_mois(mois):
+                    compactes.append(mois)
+        return compactes
+
+    def _compacter_mois(self, mois):
+        chemin_csv = self._chemin(f"{mois}.csv")
+        chemin_col = self._chemin(f"{mois}.col")
+        index_csv = self.index(f"{mois}.csv")
+        if index_csv is None or index_csv.get("non_compactable") == index_csv["octets"]:
+            return False
+        octets = index_csv["octets"]
+        lignes = list(lire_colonnes(chemin_col)) if os.path.exists(chemin_col) else []
+        with open(chemin_csv, "rb") as f:
+            position = 0
+            for ligne in f:
+                position += len(ligne)
+                if position > octets:
+                    break
+                champs = decouper_ligne(ligne)
+                if len(champs) == 4 and champs[0] != "date":
+                    lignes.append(champs)
+        lignes.sort(key=lambda ligne: ligne[0])
+        if self._arret:
+            return False
+        try:
+            tmp, _ = ecrire_colonnes(chemin_col, lignes, octets)
+        except ValueError:
+            # Dates non convertibles sans perte : le mois reste en CSV (noté pour ne pas réessayer)
+            index_csv["non_compactable"] = octets
+            ecrire_atomique(chemin_csv + ".index.json", json.dumps(index_csv).encode("utf-8"))
+            return False
+        compacte = chemin_csv + ".compacte"
+        with self._verrou():
+            try:
+                if self._arret:
+                    raise OSError("Compactage interrompu")
+                if os.path.getsize(chemin_csv) != octets:
+                    raise OSError("CSV modifié pendant le compactage")
+                # Le CSV est d'abord mis de côté (échoue sous Windows s'il est encore ouvert) ;
+                # le .col qui le remplace porte sa taille, ce qui permet la reprise. Les positions
+                # sont retirées avant : elles ne doivent pas survivre au CSV qu'elles décrivent
+                for annexe in (".positions", ".index.json"):
+                    try:
+                        os.remove(chemin_csv + annexe)
+                    except FileNotFoundError:
+                        pass
+                os.replace(chemin_csv, compacte)
+            except OSError:
+                os.remove(tmp)
+                return False
+            os.replace(tmp, chemin_col)
+            os.remove(compacte)
+            self._positions.pop(f"{mois}.csv", None)
+        with self._verrou_index:
+            self._index.pop(f"{mois}.csv", None)
+        return True
+
+
+def historique_du_dossier(dossier, verrou=None):
+    # Historique partitionné de data/ (data/historique/), avec migration de data/historique.csv
+    return HistoriquePartitionne(os.path.join(dossier, "historique"), verrou, os.path.join(dossier, "historique.csv"))
+
+
+if __name__ == "__main__":
+    # python -m classes.historique_partitions [dossier] : migre et compacte l'historique d'un dossier de données
+    from classes.verrou import VerrouFichier
+    dossier = sys.argv[1] if len(sys.argv) > 1 else "data"
+    historique = historique_du_dossier(dossier, VerrouFichier(os.path.join(dossier, ".verrou")))
+    print("mois compactés :", ", ".join(historique.compacter()) or "aucun")
@@ -0,0 +1,221 @@
+import csv
+import json
+import os
+from contextlib import nullcontext
+from itertools import islice
+from classes.livre import Livre
+from classes.membre import Membre
+from classes.stockage import StockageJSON
+
+# Import / export en flux des livres, des membres et de l'historique.
+# Les fichiers sont lus et écrits ligne par ligne (CSV avec en-tête, ou JSON lines :
+# un objet JSON par ligne), et l'import passe par une chaîne de générateurs :
+#   lecture -> validation -> dédoublonnage -> paquets -> application dans une transaction
+# Seuls un paquet et l'ensemble des clés déjà vues sont gardés en mémoire.
+
+TAILLE_PAQUET = 10000
+
+CHAMPS_LIVRE = ("isbn", "titre", "auteur", "annee", "genre")
+CHAMPS_MEMBRE = ("id_membre", "nom")
+# Autres noms de colonnes acceptés (en-têtes de l'historique, exports d'autres outils)
+ALIAS = {"id": "id_membre", "année": "annee"}
+
+
+def format_fichier(chemin):
+    extension = os.path.splitext(chemin)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Format non reconnu pour {chemin} (attendu : .csv, .jsonl ou .ndjson)")
+
+
+def _normaliser_cle(cle):
+    cle = str(cle).strip().lower()
+    return ALIAS.get(cle, cle)
+
+
+def lire_enregistrements(chemin):
+    # (numéro de ligne, dict) pour chaque enregistrement du fichier ; une ligne JSON illisible
+    # donne un dict None, rejeté ensuite par la validation
+    if format_fichier(chemin) == "csv":
+        with open(chemin, "r", encoding="utf-8", newline="") as f:
+            lecteur = csv.reader(f)
+            entete = [_normaliser_cle(cle) for cle in next(lecteur, [])]
+            for numero, ligne in enumerate(lecteur, start=2):
+                yield numero, dict(zip(entete, ligne))
+    else:
+        with open(chemin, "r", encoding="utf-8") as f:
+            for numero, ligne in enumerate(f, start=1):
+                if not ligne.strip():
+                    continue
+                try:
+                    d = json.loads(ligne)
+                except ValueError:
+                    d = None
+                if isinstance(d, dict):
+                    yield numero, {_normaliser_cle(cle): valeur for cle, valeur in d.items()}
+                else:
+                    yield numero, None
+
+
+def valider_livre(d):
+    valeurs = _champs_obligatoires(d, CHAMPS_LIVRE)
+    try:
+        int(valeurs[3])
+    except ValueError:
+        raise ValueError(f"année invalide : {valeurs[3]!r}")
+    return valeurs
+
+
+def valider_membre(d):
+    return _champs_obligatoires(d, CHAMPS_MEMBRE)
+
+
+def _champs_obligatoires(d, champs):
+    if d is None:
+        raise ValueError("ligne illisible")
+    valeurs = tuple("" if d.get(champ) is None else str(d[champ]).strip() for champ in champs)
+    manquants = [champ for champ, valeur in zip(champs, valeurs) if not valeur]
+    if manquants:
+        raise ValueError(f"champ(s) manquant(s) : {', '.join(manquants)}")
+    return valeurs
+
+
+def valider(enregistrements, validateur, rapport):
+    # Ne laisse passer que les enregistrements valides ; les autres sont comptés dans le rapport
+    for numero, d in enregistrements:
+        try:
+            yield numero, validateur(d)
+        except ValueError as e:
+            rapport.rejeter(numero, str(e))
+
+
+def dedoublonner(enregistrements, rapport):
+    # Garde la première occurrence de chaque clé (premier champ : ISBN ou ID du membre)
+    vues = set()
+    for numero, valeurs in enregistrements:
+        if valeurs[0] in vues:
+            rapport.rejeter(numero, f"doublon de {valeurs[0]}")
+            continue
+        vues.add(valeurs[0])
+        yield numero, valeurs
+
+
+def par_paquets(iterable, taille):
+    iterateur = iter(iterable)
+    while True:
+        paquet = list(islice(iterateur, taille))
+        if not paquet:
+            return
+        yield paquet
+
+
+class RapportImport:
+    def __init__(self, max_erreurs=20):
+        self.ajoutes = 0
+        self.modifies = 0
+        self.rejetes = 0
+        # Premières erreurs seulement, pour garder une mémoire bornée
+        self.erreurs = []
+        self.max_erreurs = max_erreurs
+
+    def rejeter(self, numero, raison):
+        self.rejetes += 1
+        if len(self.erreurs) < self.max_erreurs:
+            self.erreurs.append((numero, raison))
+
+    @property
+    def traites(self):
+        return self.ajoutes + self.modifies + self.rejetes
+
+
+def _importer(biblio, chemin, validateur, appliquer, taille_paquet, progression):
+    rapport = RapportImport()
+    flux = dedoublonner(valider(lire_enregistrements(chemin), validateur, rapport), rapport)
+    # En mode json, chaque validation de transaction réécrit tout le catalogue :
+    # les paquets sont alors regroupés dans une seule transaction
+    englobante = biblio.transaction() if type(biblio._stockage) is StockageJSON else nullcontext()
+    with englobante:
+        for paquet in par_paquets(flux, taille_paquet):
+            with biblio.transaction():
+                for _, valeurs in paquet:
+                    appliquer(valeurs, rapport)
+            if progression is not None:
+                progression(rapport)
+    return rapport
+
+
+def importer_livres(biblio, chemin, taille_paquet=TAILLE_PAQUET, progression=None):
+    # Un livre existant garde son statut (il peut être emprunté) : seuls ses champs sont mis à jour
+    def appliquer(valeurs, rapport):
+        isbn, titre, auteur, annee, genre = valeurs
+        if isbn in biblio.livres:
+            biblio.modifier_livre(isbn, titre, auteur, annee, genre)
+            rapport.modifies += 1
+        else:
+            biblio.ajouter_livre(Livre(isbn, titre, auteur, annee, genre))
+            rapport.ajoutes += 1
+    return _importer(biblio, chemin, valider_livre, appliquer, taille_paquet, progression)
+
+
+def importer_membres(biblio, chemin, taille_paquet=TAILLE_PAQUET, progression=None):
+    # Un membre existant garde ses emprunts et ses réservations : seul son nom est mis à jour
+    def appliquer(valeurs, rapport):
+        id_membre, nom = valeurs
+        membre = Membre(id_membre, nom)
+        ancien = biblio.membres.get(id_membre)
+        if ancien is not None:
+            membre.livres_empruntes = ancien.livres_empruntes
+            membre.echeances = ancien.echeances
+            membre.reservations = ancien.reservations
+            rapport.modifies += 1
+        else:
+            rapport.ajoutes += 1
+        biblio.enregistrer_membre(membre)
+    return _importer(biblio, chemin, valider_membre, appliquer, taille_paquet, progression)
+
+
+# --- Export ---
+
+def _ecrire_lignes(chemin, entete, lignes, progression=None, tous=TAILLE_PAQUET):
+    # Écrit les lignes une à une (CSV ou JSON lines) dans un fichier temporaire renommé à la fin
+    format_ = format_fichier(chemin)
+    tmp = chemin + ".tmp"
+    nb = 0
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        if format_ == "csv":
+            writer = csv.writer(f)
+            writer.writerow(entete)
+            ecrire = writer.writerow
+        else:
+            def ecrire(ligne):
+                f.write(json.dumps(dict(zip(entete, ligne)), ensure_ascii=False) + "\n")
+        for ligne in lignes:
+            ecrire(ligne)
+            nb += 1
+            if progression is not None and nb % tous == 0:
+                progression(nb)
+    os.replace(tmp, chemin)
+    if progression is not None:
+        progression(nb)
+    return nb
+
+
+def exporter_livres(biblio, chemin, progression=None):
+    lignes = ((l.isbn, l.titre, l.auteur, str(l.annee), l.genre, l.statut) for l in biblio.livres.values())
+    return _ecrire_lignes(chemin, CHAMPS_LIVRE + ("statut",), lignes, progression)
+
+
+def exporter_membres(biblio, chemin, progression=None):
+    # Les emprunts sont écrits séparés par des ";" (CSV) ou en liste (JSON lines)
+    jsonl = format_fichier(chemin) == "jsonl"
+    lignes = (
+        (m.id_membre, m.nom, list(m.livres_empruntes) if jsonl else ";".join(m.livres_empruntes))
+        for m in biblio.membres.values()
+    )
+    return _ecrire_lignes(chemin, CHAMPS_MEMBRE + ("livres_empruntes",), lignes, progression)
+
+
+def exporter_historique(biblio, chemin, progression=None):
+    return _ecrire_lignes(chemin, ("date", "isbn", "id_membre", "action"), biblio.parcourir_historique(), progression)
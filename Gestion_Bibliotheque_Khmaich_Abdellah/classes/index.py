@@ -0,0 +1,48 @@
+CHAMPS_INDEXES = ("statut", "genre", "auteur")
+
+
+class IndexSecondaires:
+    # Index secondaires sur les livres en mémoire, tenus à jour par Bibliotheque :
+    #   statut / genre / auteur -> ensemble des ISBN
+    #   isbn -> ID du membre qui l'a emprunté
+    def __init__(self):
+        self.par_champ = {champ: {} for champ in CHAMPS_INDEXES}
+        self.emprunteurs = {}
+        # Valeurs indexées pour chaque ISBN, pour retirer l'ancienne entrée lors d'une modification
+        self._valeurs = {}
+
+    def construire(self, livres, membres):
+        for livre in livres.values():
+            self.indexer_livre(livre)
+        for membre in membres.values():
+            for isbn in membre.livres_empruntes:
+                self.emprunteurs[isbn] = membre.id_membre
+
+    def indexer_livre(self, livre):
+        self.retirer_livre(livre.isbn)
+        valeurs = tuple(getattr(livre, champ) for champ in CHAMPS_INDEXES)
+        for champ, valeur in zip(CHAMPS_INDEXES, valeurs):
+            self.par_champ[champ].setdefault(valeur, set()).add(livre.isbn)
+        self._valeurs[livre.isbn] = valeurs
+
+    def retirer_livre(self, isbn):
+        valeurs = self._valeurs.pop(isbn, None)
+        if valeurs is None:
+            return
+        for champ, valeur in zip(CHAMPS_INDEXES, valeurs):
+            isbns = self.par_champ[champ][valeur]
+            isbns.discard(isbn)
+            if not isbns:
+                del self.par_champ[champ][valeur]
+
+    def emprunt(self, isbn, id_membre):
+        self.emprunteurs[isbn] = id_membre
+
+    def retour(self, isbn):
+        self.emprunteurs.pop(isbn, None)
+
+    def isbns(self, champ, valeur):
+        return self.par_champ[champ].get(valeur, ())
+
+    def emprunteur(self, isbn):
+        return self.emprunteurs.get(isbn)
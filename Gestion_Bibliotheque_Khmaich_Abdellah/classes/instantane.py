@@ -0,0 +1,119 @@
+from collections.abc import Mapping
+from datetime import datetime
+from classes.historique_partitions import en_texte
+from classes.livre import Livre
+from classes.membre import Membre
+
+# Vues en lecture seule de la bibliothèque à un instant donné (Bibliotheque.snapshot()),
+# pour les rapports et exports qui lisent longtemps pendant que l'application modifie les données.
+#
+# Modes json et journal : la vue partage les enregistrements de la bibliothèque. Avant chaque
+# modification, Bibliotheque copie l'état d'origine de l'enregistrement dans chaque vue ouverte
+# (la première fois seulement) ; la vue lit ces copies et, pour tout le reste, les objets de la
+# bibliothèque, inchangés depuis. Créer une vue ne coûte rien, sa mémoire croît avec le nombre
+# d'enregistrements modifiés depuis. En mode sqlite, la vue garde sa propre transaction de
+# lecture sur la base (WAL), qui voit la base telle qu'à l'ouverture.
+#
+# Les objets renvoyés ne doivent pas être modifiés : ceux qui n'ont pas changé depuis la vue
+# sont les objets de la bibliothèque.
+
+# Clé pas encore modifiée depuis la vue
+_NON_FIGE = object()
+
+
+def copier_livre(livre):
+    return Livre(**livre.vers_dict())
+
+
+def copier_membre(membre):
+    copie = Membre(membre.id_membre, membre.nom)
+    copie.livres_empruntes = membre.livres_empruntes
+    copie.echeances = membre.echeances
+    copie.reservations = membre.reservations
+    return copie
+
+
+class VueFigee(Mapping):
+    # `courant` (livres ou membres de la bibliothèque) tel qu'à la création de la vue :
+    # _origines garde, pour chaque clé modifiée depuis, une copie de l'état d'origine
+    # (None si la clé n'existait pas)
+    def __init__(self, courant, copier):
+        self._courant = courant
+        self._copier = copier
+        self._origines = {}
+
+    def figer(self, cle):
+        # Appelé par Bibliotheque juste avant de modifier, ajouter ou supprimer la clé
+        if cle not in self._origines:
+            objet = self._courant.get(cle)
+            self._origines[cle] = self._copier(objet) if objet is not None else None
+
+    def __getitem__(self, cle):
+        origine = self._origines.get(cle, _NON_FIGE)
+        if origine is _NON_FIGE:
+            try:
+                objet = self._courant[cle]
+            except KeyError:
+                objet = None
+            # Modifiée pendant la lecture (autre thread) : la copie d'origine fait foi
+            origine = self._origines.get(cle, _NON_FIGE)
+            if origine is _NON_FIGE:
+                if objet is None:
+                    raise KeyError(cle)
+                return objet
+        if origine is None:
+            raise KeyError(cle)
+        return origine
+
+    def __contains__(self, cle):
+        origine = self._origines.get(cle, _NON_FIGE)
+        return cle in self._courant if origine is _NON_FIGE else origine is not None
+
+    def __iter__(self):
+        # Les clés courantes sont copiées avant les origines : une clé modifiée entre les deux
+        # est lue dans les origines, une clé modifiée pendant le parcours n'est pas vue deux fois
+        cles = list(self._courant)
+        origines = dict(self._origines)
+        for cle in cles:
+            if cle not in origines:
+                yield cle
+        for cle, origine in origines.items():
+            if origine is not None:
+                yield cle
+
+    def __len__(self):
+        origines = dict(self._origines)
+        nombre = len(self._courant)
+        for cle, origine in origines.items():
+            nombre += (origine is not None) - (cle in self._courant)
+        return nombre
+
+
+class Instantane:
+    # Vue de la bibliothèque renvoyée par Bibliotheque.snapshot() : livres et membres en
+    # lecture seule, historique jusqu'à la date de la vue. À fermer (ou utiliser dans un
+    # bloc with) pour que la bibliothèque cesse d'y copier les enregistrements modifiés.
+    def __init__(self, biblio, livres, membres, fermer=None):
+        self._biblio = biblio
+        self.livres = livres
+        self.membres = membres
+        self.version = biblio.version
+        self.date = datetime.now().isoformat()
+        self._fermer = fermer
+
+    def parcourir_historique(self, debut=None, fin=None, id_membre=None, isbn=None):
+        # Mêmes paramètres que Bibliotheque.parcourir_historique ; les lignes postérieures à la vue sont exclues
+        fin = self.date if fin is None else min(en_texte(fin), self.date)
+        return self._biblio.parcourir_historique(debut, fin, id_membre, isbn)
+
+    def fermer(self):
+        self._biblio._instantanes.discard(self)
+        if self._fermer is not None:
+            self._fermer()
+            self._fermer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
@@ -1,11 +1,82 @@
-class Livre:
-    def __init__(self, isbn, titre, auteur, annee, genre, statut="disponible"):
-        self.isbn = isbn
-        self.titre = titre
-        self.auteur = auteur
-        self.annee = annee
-        self.genre = genre
-        self.statut = statut
-
-    def __str__(self):
-        return f"{self.titre} ({self.auteur}, {self.annee}) - {self.statut}"
+import sys
+
+# Valeurs de statut connues ; une valeur nouvelle est ajoutée à la volée
+STATUTS = ["disponible", "emprunté", "réservé"]
+_CODES_STATUT = {statut: code for code, statut in enumerate(STATUTS)}
+
+
+def _code_statut(statut):
+    code = _CODES_STATUT.get(statut)
+    if code is None:
+        code = _CODES_STATUT[statut] = len(STATUTS)
+        STATUTS.append(statut)
+    return code
+
+
+def convertir_annee(valeur):
+    # Année en entier ; ValueError si elle n'en est pas un
+    try:
+        return int(valeur)
+    except (TypeError, ValueError):
+        raise ValueError(f"L'année doit être un nombre entier (reçu : {valeur!r}).")
+
+
+class Livre:
+    # Représentation compacte : pas de __dict__ par instance (__slots__), statut codé
+    # par un petit entier, auteur et genre internés (une seule copie de "Roman" pour tout
+    # le catalogue) et année stockée en entier
+    __slots__ = ("isbn", "titre", "_auteur", "_annee", "_genre", "_statut", "__weakref__")
+
+    def __init__(self, isbn, titre, auteur, annee, genre, statut="disponible"):
+        self.isbn = isbn
+        self.titre = titre
+        self.auteur = auteur
+        self.annee = annee
+        self.genre = genre
+        self.statut = statut
+
+    @property
+    def auteur(self):
+        return self._auteur
+
+    @auteur.setter
+    def auteur(self, valeur):
+        self._auteur = sys.intern(valeur)
+
+    @property
+    def genre(self):
+        return self._genre
+
+    @genre.setter
+    def genre(self, valeur):
+        self._genre = sys.intern(valeur)
+
+    @property
+    def statut(self):
+        return STATUTS[self._statut]
+
+    @statut.setter
+    def statut(self, valeur):
+        self._statut = _code_statut(valeur)
+
+    @property
+    def annee(self):
+        return self._annee
+
+    @annee.setter
+    def annee(self, valeur):
+        self._annee = convertir_annee(valeur)
+
+    def vers_dict(self):
+        # Représentation sérialisable, identique au format de livres.json (année en texte)
+        return {
+            "isbn": self.isbn,
+            "titre": self.titre,
+            "auteur": self.auteur,
+            "annee": str(self.annee),
+            "genre": self.genre,
+            "statut": self.statut,
+        }
+
+    def __str__(self):
+        return f"{self.titre} ({self.auteur}, {self.annee}) - {self.statut}"
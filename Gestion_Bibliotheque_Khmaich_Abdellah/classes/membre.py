@@ -1,8 +1,121 @@
-class Membre:
-    def __init__(self, id_membre, nom):
-        self.id_membre = id_membre
-        self.nom = nom
-        self.livres_empruntes = []
-
-    def __str__(self):
-        return f"Membre {self.nom} (ID: {self.id_membre})"
+from classes.exceptions import QuotaEmpruntDepasseError
+
+# Nombre maximum de livres empruntés simultanément par un membre
+QUOTA_EMPRUNTS = 3
+# Durée d'un emprunt (et d'une prolongation), en jours
+DUREE_EMPRUNT = 14
+
+
+class ListeEmprunts:
+    # Vue de type liste sur les emprunts d'un membre. Les ISBN sont stockés dans un
+    # tuple sur le membre (le tuple vide est partagé par tous les membres sans emprunt),
+    # et append() refuse de dépasser QUOTA_EMPRUNTS.
+    __slots__ = ("_membre",)
+
+    def __init__(self, membre):
+        self._membre = membre
+
+    def append(self, isbn):
+        if len(self._membre._empruntes) >= QUOTA_EMPRUNTS:
+            raise QuotaEmpruntDepasseError()
+        self._membre._empruntes += (isbn,)
+
+    def remove(self, isbn):
+        empruntes = self._membre._empruntes
+        i = empruntes.index(isbn)  # ValueError si absent, comme list.remove
+        self._membre._empruntes = empruntes[:i] + empruntes[i + 1:]
+        if self._membre._echeances:
+            self._membre._echeances.pop(isbn, None)
+
+    def __contains__(self, isbn):
+        return isbn in self._membre._empruntes
+
+    def __iter__(self):
+        return iter(self._membre._empruntes)
+
+    def __len__(self):
+        return len(self._membre._empruntes)
+
+    def __getitem__(self, i):
+        return self._membre._empruntes[i]
+
+    def __eq__(self, autre):
+        return list(self._membre._empruntes) == list(autre)
+
+    def __repr__(self):
+        return repr(list(self._membre._empruntes))
+
+
+class Membre:
+    __slots__ = ("id_membre", "nom", "_empruntes", "_echeances", "_reservations", "__weakref__")
+
+    def __init__(self, id_membre, nom):
+        self.id_membre = id_membre
+        self.nom = nom
+        self._empruntes = ()
+        # ISBN -> date d'échéance (texte ISO) ; None tant que le membre n'a aucune échéance
+        self._echeances = None
+        # ISBN -> (date de la réservation, fin de la mise de côté ou None tant que le membre
+        # attend dans la file du livre) ; None tant que le membre n'a aucune réservation
+        self._reservations = None
+
+    @property
+    def livres_empruntes(self):
+        return ListeEmprunts(self)
+
+    @livres_empruntes.setter
+    def livres_empruntes(self, isbns):
+        self._empruntes = tuple(isbns)
+        if self._echeances:
+            self._echeances = {isbn: e for isbn, e in self._echeances.items() if isbn in self._empruntes} or None
+
+    def echeance(self, isbn):
+        # Date d'échéance de l'emprunt, ou None (emprunt antérieur aux échéances)
+        return self._echeances.get(isbn) if self._echeances else None
+
+    def fixer_echeance(self, isbn, echeance):
+        if self._echeances is None:
+            self._echeances = {}
+        self._echeances[isbn] = echeance
+
+    @property
+    def echeances(self):
+        return dict(self._echeances) if self._echeances else {}
+
+    @echeances.setter
+    def echeances(self, echeances):
+        self._echeances = {isbn: e for isbn, e in echeances.items() if isbn in self._empruntes} or None
+
+    def reservation(self, isbn):
+        # (date, fin de la mise de côté ou None), ou None si le membre n'a pas réservé le livre
+        return self._reservations.get(isbn) if self._reservations else None
+
+    def fixer_reservation(self, isbn, date, retrait=None):
+        if self._reservations is None:
+            self._reservations = {}
+        self._reservations[isbn] = (date, retrait)
+
+    def retirer_reservation(self, isbn):
+        if self._reservations:
+            self._reservations.pop(isbn, None)
+
+    def nb_reservations(self):
+        return len(self._reservations) if self._reservations else 0
+
+    @property
+    def reservations(self):
+        return dict(self._reservations) if self._reservations else {}
+
+    @reservations.setter
+    def reservations(self, reservations):
+        # Accepte aussi les listes [date, retrait] relues depuis le JSON
+        self._reservations = {isbn: tuple(r) for isbn, r in reservations.items()} or None
+
+    def vers_dict(self):
+        # Représentation sérialisable, identique au format de membres.json
+        # (les fichiers écrits avant les échéances ou les réservations n'ont pas ces clés)
+        return {"nom": self.nom, "livres_empruntes": list(self._empruntes), "echeances": self.echeances,
+                "reservations": {isbn: list(r) for isbn, r in self.reservations.items()}}
+
+    def __str__(self):
+        return f"Membre {self.nom} (ID: {self.id_membre})"
@@ -0,0 +1,173 @@
+import bisect
+import io
+import json
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from functools import wraps
+
+# Instrumentation des opérations : durée de chaque appel (histogramme en mémoire) et compteurs
+# (octets écrits, lignes, ...). Désactivée par défaut : un point de mesure ne coûte alors qu'un
+# test de booléen. Activée par la variable d'environnement BIBLIOTHEQUE_MESURES=1, par
+# registre.activer() ou depuis l'onglet Diagnostics de l'application.
+#
+# Les noms sont de la forme "Bibliotheque.emprunter_livre", "StockageJournal.changement",
+# "app.refresh_liste_livres" ; registre.profiler(nom) exécute le prochain appel sous cProfile.
+
+# Bornes supérieures des cases de l'histogramme : 1 µs, 2 µs, 4 µs, ... jusqu'à ~1 min
+BORNES = tuple(1e-6 * 2 ** i for i in range(26))
+NB_LIGNES_PROFIL = 30
+
+
+class Histogramme:
+    # Durées regroupées par puissance de 2 : les quantiles sont approchés à un facteur 2 près
+    __slots__ = ("nombre", "total", "maximum", "cases")
+
+    def __init__(self):
+        self.nombre = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.cases = [0] * (len(BORNES) + 1)
+
+    def ajouter(self, duree):
+        self.nombre += 1
+        self.total += duree
+        if duree > self.maximum:
+            self.maximum = duree
+        self.cases[bisect.bisect_left(BORNES, duree)] += 1
+
+    def quantile(self, q):
+        # Borne supérieure de la case contenant le quantile q (bornée par le maximum observé)
+        if not self.nombre:
+            return 0.0
+        rang = q * self.nombre
+        cumul = 0
+        for i, nombre in enumerate(self.cases):
+            cumul += nombre
+            if cumul >= rang:
+                return min(BORNES[i], self.maximum) if i < len(BORNES) else self.maximum
+        return self.maximum
+
+    def vers_dict(self):
+        return {
+            "appels": self.nombre,
+            "total_s": self.total,
+            "moyenne_s": self.total / self.nombre if self.nombre else 0.0,
+            "p50_s": self.quantile(0.50),
+            "p99_s": self.quantile(0.99),
+            "max_s": self.maximum,
+            "cases": {f"{borne:g}": n for borne, n in zip(BORNES + (float("inf"),), self.cases) if n},
+        }
+
+
+class Registre:
+    def __init__(self):
+        self.actif = os.environ.get("BIBLIOTHEQUE_MESURES", "") not in ("", "0")
+        # Noms de tous les points de mesure, même jamais appelés (liste de l'onglet Diagnostics)
+        self.noms = set()
+        self.histogrammes = {}
+        self.compteurs = Counter()
+        # nom -> texte pstats du dernier appel profilé ; noms à profiler au prochain appel
+        self.profils = {}
+        self._a_profiler = set()
+        self._dossier_profils = None
+        self._verrou = threading.Lock()
+        self._profil_en_cours = False
+
+    def activer(self, actif=True):
+        self.actif = actif
+
+    def reinitialiser(self):
+        with self._verrou:
+            self.histogrammes = {}
+            self.compteurs = Counter()
+            self.profils = {}
+
+    def enregistrer(self, nom, duree):
+        with self._verrou:
+            histogramme = self.histogrammes.get(nom)
+            if histogramme is None:
+                histogramme = self.histogrammes[nom] = Histogramme()
+            histogramme.ajouter(duree)
+
+    def compter(self, nom, nombre=1):
+        if self.actif:
+            with self._verrou:
+                self.compteurs[nom] += nombre
+
+    def profiler(self, nom, dossier=None):
+        # Le prochain appel mesuré de `nom` s'exécute sous cProfile ; le résultat est gardé dans
+        # self.profils[nom] et, si `dossier` est donné, écrit dans dossier/<nom>.prof (pstats)
+        self._a_profiler.add(nom)
+        self._dossier_profils = dossier
+
+    def _executer_profile(self, nom, fonction, args, kwargs):
+        with self._verrou:
+            # Un seul profileur à la fois : les appels imbriqués ou concurrents ne sont que chronométrés
+            if self._profil_en_cours or nom not in self._a_profiler:
+                return None, False
+            self._a_profiler.discard(nom)
+            self._profil_en_cours = True
+        # Importés au premier profil : pstats (qui charge inspect et dataclasses) ralentirait
+        # le démarrage de l'application pour une fonction rarement utilisée
+        import cProfile
+        import pstats
+        profil = cProfile.Profile()
+        try:
+            debut = time.perf_counter()
+            try:
+                resultat = profil.runcall(fonction, *args, **kwargs)
+            finally:
+                self.enregistrer(nom, time.perf_counter() - debut)
+        finally:
+            self._profil_en_cours = False
+            texte = io.StringIO()
+            pstats.Stats(profil, stream=texte).sort_stats("cumulative").print_stats(NB_LIGNES_PROFIL)
+            self.profils[nom] = texte.getvalue()
+            if self._dossier_profils:
+                os.makedirs(self._dossier_profils, exist_ok=True)
+                profil.dump_stats(os.path.join(self._dossier_profils, f"{nom}.prof"))
+        return resultat, True
+
+    def vers_dict(self):
+        with self._verrou:
+            return {
+                "date": datetime.now().isoformat(timespec="seconds"),
+                "actif": self.actif,
+                "operations": {nom: h.vers_dict() for nom, h in sorted(self.histogrammes.items())},
+                "compteurs": dict(sorted(self.compteurs.items())),
+                "profils": dict(self.profils),
+            }
+
+    def vider(self, chemin):
+        # Écrit toutes les mesures dans un fichier JSON
+        with open(chemin, "w", encoding="utf-8") as f:
+            json.dump(self.vers_dict(), f, indent=2, ensure_ascii=False)
+
+
+registre = Registre()
+
+
+def instrumenter(nom=None):
+    # Décorateur : chronomètre chaque appel sous `nom` (par défaut Classe.methode)
+    def decorer(fonction):
+        cle = nom or fonction.__qualname__
+        registre.noms.add(cle)
+
+        @wraps(fonction)
+        def mesuree(*args, **kwargs):
+            if not registre.actif:
+                return fonction(*args, **kwargs)
+            if registre._a_profiler:
+                resultat, profile = registre._executer_profile(cle, fonction, args, kwargs)
+                if profile:
+                    return resultat
+            debut = time.perf_counter()
+            try:
+                return fonction(*args, **kwargs)
+            finally:
+                registre.enregistrer(cle, time.perf_counter() - debut)
+        return mesuree
+    return decorer
@@ -0,0 +1,169 @@
+import bisect
+import heapq
+import re
+import unicodedata
+
+# Poids de chaque champ dans le score d'un livre
+POIDS_CHAMPS = {"titre": 3, "auteur": 2, "genre": 1}
+# Nombre maximum de mots du vocabulaire pris en compte pour un préfixe ("a" -> "amour", "antoine", ...)
+MAX_EXPANSION = 64
+# Bonus multiplicatif quand le terme cherché est le mot exact et pas seulement un préfixe
+BONUS_EXACT = 2
+
+_MOT = re.compile(r"\w+")
+# Ligatures que la décomposition Unicode ne sépare pas
+_LIGATURES = str.maketrans({"œ": "oe", "æ": "ae"})
+# Diacritiques combinants (U+0300 à U+036F) laissés par la décomposition NFKD
+_DIACRITIQUES = dict.fromkeys(range(0x300, 0x370))
+
+
+def normaliser(texte):
+    # "Exupéry" -> "exupery", "Cœur" -> "coeur" : suppression des accents puis passage en minuscules
+    texte = str(texte)
+    if texte.isascii():
+        return texte.lower()
+    decompose = unicodedata.normalize("NFKD", texte.casefold().translate(_LIGATURES))
+    return decompose.translate(_DIACRITIQUES)
+
+
+def tokeniser(texte):
+    return _MOT.findall(normaliser(texte))
+
+
+class IndexRecherche:
+    # Index inversé en mémoire sur le titre, l'auteur et le genre des livres.
+    #   postings : mot -> {poids: {isbn: None}}, le poids cumulant les champs où le mot
+    #              apparaît ; les livres d'un même poids gardent l'ordre d'insertion
+    #   vocabulaire : liste triée des mots, pour retrouver par dichotomie ceux qui
+    #                 commencent par un préfixe donné
+    # Les groupes de poids permettent de parcourir les résultats du meilleur au moins bon
+    # et d'arrêter la recherche dès que `limite` résultats ne peuvent plus être dépassés.
+    def __init__(self):
+        self.postings = {}
+        self.vocabulaire = []
+        self._mots_par_isbn = {}
+
+    def construire(self, livres):
+        for livre in livres:
+            mots = self._mots(livre)
+            for mot, poids in mots:
+                self.postings.setdefault(mot, {}).setdefault(poids, {})[livre.isbn] = None
+            self._mots_par_isbn[livre.isbn] = mots
+        # Un seul tri à la construction plutôt qu'une insertion triée par mot
+        self.vocabulaire = sorted(self.postings)
+
+    def _mots(self, livre):
+        mots = {}
+        for champ, poids in POIDS_CHAMPS.items():
+            for mot in set(tokeniser(getattr(livre, champ))):
+                mots[mot] = mots.get(mot, 0) + poids
+        return tuple(mots.items())
+
+    def indexer_livre(self, livre):
+        self.retirer_livre(livre.isbn)
+        mots = self._mots(livre)
+        for mot, poids in mots:
+            groupes = self.postings.get(mot)
+            if groupes is None:
+                groupes = self.postings[mot] = {}
+                bisect.insort(self.vocabulaire, mot)
+            groupes.setdefault(poids, {})[livre.isbn] = None
+        self._mots_par_isbn[livre.isbn] = mots
+
+    def retirer_livre(self, isbn):
+        for mot, poids in self._mots_par_isbn.pop(isbn, ()):
+            groupes = self.postings[mot]
+            del groupes[poids][isbn]
+            if not groupes[poids]:
+                del groupes[poids]
+            if not groupes:
+                del self.postings[mot]
+                del self.vocabulaire[bisect.bisect_left(self.vocabulaire, mot)]
+
+    def _expansion(self, terme):
+        # Mots du vocabulaire commençant par le terme (le mot exact en premier s'il existe),
+        # limités à MAX_EXPANSION ; le booléen indique si la liste est complète
+        debut = bisect.bisect_left(self.vocabulaire, terme)
+        fin = bisect.bisect_left(self.vocabulaire, terme + "\U0010ffff")
+        return self.vocabulaire[debut:min(fin, debut + MAX_EXPANSION)], fin - debut <= MAX_EXPANSION
+
+    def _groupes(self, terme, mots):
+        # (score, livres) pour un terme, du score le plus élevé au plus faible
+        groupes = []
+        for mot in mots:
+            bonus = BONUS_EXACT if mot == terme else 1
+            for poids, isbns in self.postings[mot].items():
+                groupes.append((poids * bonus, isbns))
+        groupes.sort(key=lambda groupe: -groupe[0])
+        return groupes
+
+    def _score_terme(self, terme, mots, isbn):
+        # Meilleur score du terme pour un livre déjà candidat (mots=None : expansion incomplète)
+        meilleur = 0
+        if mots is not None and len(mots) <= 4:
+            # Peu de mots pour ce terme : consultation directe de leurs groupes
+            for mot in mots:
+                bonus = BONUS_EXACT if mot == terme else 1
+                for poids, isbns in self.postings[mot].items():
+                    if isbn in isbns and poids * bonus > meilleur:
+                        meilleur = poids * bonus
+        else:
+            # Sinon on parcourt les mots du livre : le coût ne dépend pas du vocabulaire
+            for mot, poids in self._mots_par_isbn[isbn]:
+                if mot.startswith(terme):
+                    meilleur = max(meilleur, poids * (BONUS_EXACT if mot == terme else 1))
+        return meilleur
+
+    def rechercher(self, requete, limite=50):
+        # Renvoie les ISBN des livres contenant tous les termes (en préfixe), du plus pertinent au moins pertinent
+        termes = list(dict.fromkeys(tokeniser(requete)))
+        if not termes or limite <= 0:
+            return []
+        expansions = []
+        for terme in termes:
+            mots, complet = self._expansion(terme)
+            if not mots:
+                return []
+            if complet:
+                taille = sum(len(isbns) for mot in mots for isbns in self.postings[mot].values())
+            else:
+                # Préfixe très court ("1", "a") : ne sert de source de candidats qu'en dernier recours
+                taille, mots = float("inf"), None
+            expansions.append((taille, -len(terme), terme, mots))
+        # Le terme le plus sélectif fournit les candidats, les autres ne font que filtrer
+        expansions.sort()
+        _, _, terme, mots = expansions[0]
+        if mots is None:
+            mots, _ = self._expansion(terme)
+        autres = [(t, m) for _, _, t, m in expansions[1:]]
+        max_autres = 0
+        for t, m in autres:
+            if m is None:
+                max_autres += sum(POIDS_CHAMPS.values()) * BONUS_EXACT
+            else:
+                max_autres += max(poids * (BONUS_EXACT if mot == t else 1) for mot in m for poids in self.postings[mot])
+        meilleurs = []  # tas des `limite` meilleurs (score, -ordre, isbn)
+        vus = set()
+        ordre = 0
+        for score, isbns in self._groupes(terme, mots):
+            if len(meilleurs) >= limite and meilleurs[0][0] >= score + max_autres:
+                break  # plus aucun livre restant ne peut entrer dans les résultats
+            for isbn in isbns:
+                if len(meilleurs) >= limite and meilleurs[0][0] >= score + max_autres:
+                    break
+                if isbn in vus:
+                    continue
+                vus.add(isbn)
+                total = score
+                for t, m in autres:
+                    score_terme = self._score_terme(t, m, isbn)
+                    if not score_terme:
+                        break
+                    total += score_terme
+                else:
+                    ordre += 1
+                    if len(meilleurs) < limite:
+                        heapq.heappush(meilleurs, (total, -ordre, isbn))
+                    elif total > meilleurs[0][0]:
+                        heapq.heapreplace(meilleurs, (total, -ordre, isbn))
+        return [isbn for _, _, isbn in sorted(meilleurs, reverse=True)]
@@ -0,0 +1,201 @@
+from collections import deque
+from datetime import datetime
+import numpy as np
+from classes.analyses import tri_par_code
+from classes.mesures import instrumenter
+
+# Recommandations « ont aussi emprunté » : matrice creuse livre x livre des co-emprunts, tirée
+# des lignes "emprunt" de l'historique groupées par membre.
+#
+# Deux livres sont co-empruntés quand le même membre les emprunte à moins de `fenetre`
+# emprunts d'écart (et non sur toute sa vie de lecteur, ce qui rendrait la matrice quadratique
+# pour les gros lecteurs). Chaque paire compte 1, ou 2 ** (âge / demi_vie) avec une demi-vie
+# en jours : les scores sont exprimés par rapport à une date d'origine, ce qui évite de les
+# réduire au fil du temps, et ramenés à aujourd'hui à la lecture. L'origine est la date de
+# construction (l'historique pèse donc au plus 1) ; elle est avancée, et tous les scores
+# divisés d'autant, dès que les nouveaux poids dépassent 2 ** DEMI_VIES_MAX, bien avant la
+# limite des float32 (2 ** 128).
+#
+# La matrice est construite une fois avec NumPy à partir des tableaux de classes/analyses.py :
+# les paires sont groupées par livre (tri par base, linéaire), une ligne de voisins et de poids
+# par livre. À sa première lecture, une ligne est regroupée par voisin, triée par score
+# décroissant et gardée : les k meilleurs voisins sont alors le début de la ligne. Les nouveaux
+# emprunts (événements "historique") s'ajoutent à des écarts par livre, fusionnés dans la
+# ligne à sa lecture suivante.
+
+FENETRE = 5
+# Voisins de chaque emprunt récent pris en compte pour les suggestions d'un membre
+VOISINS_PAR_EMPRUNT = 100
+# Demi-vies écoulées depuis l'origine au-delà desquelles l'origine est avancée
+DEMI_VIES_MAX = 60
+
+
+def _regrouper(cles, poids):
+    # Somme des poids par clé : clés distinctes triées et poids cumulés
+    ordre = np.argsort(cles, kind="stable")
+    cles = cles[ordre]
+    debuts = np.flatnonzero(np.diff(cles, prepend=-1))
+    return cles[debuts], np.add.reduceat(poids[ordre], debuts) if len(debuts) else poids[:0]
+
+
+class Recommandations:
+    def __init__(self, isbns, fenetre=FENETRE, demi_vie=None):
+        # isbns : Dictionnaire des codes ISBN, partagé avec Analyses (codes identiques)
+        self.isbns = isbns
+        self.fenetre = fenetre
+        self.demi_vie = demi_vie
+        self._origine = np.datetime64(datetime.now(), "us")
+        # Lignes de la matrice construite : voisins du livre de code c (avec répétitions) et
+        # poids de chaque paire dans [_debuts[c], _debuts[c + 1])
+        self._debuts = np.zeros(1, dtype=np.int64)
+        self._voisins = np.empty(0, dtype=np.int32)
+        self._scores = np.empty(0, dtype=np.float32)
+        # Lignes déjà lues, par score décroissant, écarts fusionnés : code -> (voisins, scores)
+        self._lignes = {}
+        # Co-emprunts pas encore fusionnés : code -> {code voisin: score}
+        self._ecarts = {}
+        # Derniers emprunts de chaque membre (codes ISBN, du plus ancien au plus récent)
+        self._recents = {}
+
+    # --- Construction ---
+
+    @classmethod
+    @instrumenter("Recommandations.depuis_analyses")
+    def depuis_analyses(cls, analyses, fenetre=FENETRE, demi_vie=None):
+        reco = cls(analyses.isbns, fenetre, demi_vie)
+        len(analyses)  # intègre les lignes reçues depuis le dernier calcul
+        code_emprunt = analyses.actions.codes.get("emprunt")
+        lignes = np.flatnonzero(analyses.action == code_emprunt) if code_emprunt is not None else []
+        if len(lignes):
+            membres = analyses.membre[lignes]
+            # Emprunts groupés par membre, dans l'ordre des dates (tri stable)
+            ordre = tri_par_code(membres, len(analyses.membres.codes))
+            lignes, membres = lignes[ordre], membres[ordre]
+            reco._construire(analyses.isbn[lignes], membres, reco._poids(analyses.dates[lignes]))
+            reco._retenir_recents(analyses.isbn[lignes], membres, analyses.membres.valeurs)
+        return reco
+
+    def _poids(self, dates):
+        if self.demi_vie is None:
+            return np.ones(len(dates), dtype=np.float32)
+        return np.exp2((dates - self._origine) / np.timedelta64(1, "D") / self.demi_vie)
+
+    def _reorigine(self, date):
+        # Avance l'origine à `date` (datetime64) quand elle est à plus de DEMI_VIES_MAX demi-vies :
+        # scores de la matrice, des lignes triées et des écarts divisés par 2 ** demi-vies
+        if self.demi_vie is None:
+            return
+        demi_vies = (date - self._origine) / np.timedelta64(1, "D") / self.demi_vie
+        if demi_vies <= DEMI_VIES_MAX:
+            return
+        facteur = np.float32(np.exp2(-demi_vies))
+        self._origine = date
+        self._scores = self._scores * facteur
+        self._lignes = {code: (voisins, scores * facteur) for code, (voisins, scores) in self._lignes.items()}
+        for ecart in self._ecarts.values():
+            for autre in ecart:
+                ecart[autre] *= float(facteur)
+
+    def _construire(self, isbns, membres, poids):
+        # Paires (emprunt, emprunt précédent du même membre à `decalage` emprunts d'écart),
+        # comptées dans les deux sens ; le poids est celui de l'emprunt le plus récent
+        nb = len(self.isbns.codes)
+        recents, anciens, poids_paires = [], [], []
+        for decalage in range(1, self.fenetre + 1):
+            garder = (membres[decalage:] == membres[:-decalage]) & (isbns[decalage:] != isbns[:-decalage])
+            recents.append(isbns[decalage:][garder])
+            anciens.append(isbns[:-decalage][garder])
+            poids_paires.append(poids[decalage:][garder])
+        livres = np.concatenate(recents + anciens)
+        ordre = tri_par_code(livres, nb)
+        self._voisins = np.concatenate(anciens + recents)[ordre]
+        self._scores = np.concatenate(poids_paires * 2).astype(np.float32)[ordre]
+        self._debuts = np.concatenate(([0], np.cumsum(np.bincount(livres, minlength=nb))))
+
+    def _retenir_recents(self, isbns, membres, noms):
+        bornes = np.concatenate(([0], np.flatnonzero(membres[1:] != membres[:-1]) + 1, [len(membres)]))
+        for debut, fin in zip(bornes[:-1].tolist(), bornes[1:].tolist()):
+            self._recents[noms[membres[debut]]] = deque(isbns[max(debut, fin - self.fenetre):fin].tolist(),
+                                                       maxlen=self.fenetre)
+
+    def recevoir(self, evenement, donnees):
+        # Abonné aux événements de Bibliotheque : chaque emprunt est apparié aux derniers
+        # emprunts du membre
+        if evenement != "historique" or donnees["action"] != "emprunt":
+            return
+        codes = self.isbns.codes
+        code = codes.setdefault(donnees["isbn"], len(codes))
+        date = np.array([donnees["date"]], dtype="datetime64[us]")
+        self._reorigine(date[0])
+        poids = float(self._poids(date)[0])
+        recents = self._recents.setdefault(donnees["id_membre"], deque(maxlen=self.fenetre))
+        for autre in recents:
+            if autre != code:
+                ecart = self._ecarts.setdefault(code, {})
+                ecart[autre] = ecart.get(autre, 0.0) + poids
+                ecart = self._ecarts.setdefault(autre, {})
+                ecart[code] = ecart.get(code, 0.0) + poids
+        recents.append(code)
+
+    # --- Requêtes ---
+
+    def _ligne(self, code):
+        # Voisins distincts et scores du livre, par score décroissant, écarts en attente compris
+        ligne = self._lignes.get(code)
+        ecart = self._ecarts.pop(code, None)
+        if ligne is not None and not ecart:
+            return ligne
+        if ligne is None:
+            if code + 1 < len(self._debuts):
+                debut, fin = self._debuts[code], self._debuts[code + 1]
+                ligne = self._voisins[debut:fin], self._scores[debut:fin]
+            else:
+                ligne = self._voisins[:0], self._scores[:0]
+        voisins, scores = ligne
+        if ecart:
+            voisins = np.concatenate((voisins, np.fromiter(ecart, dtype=np.int32, count=len(ecart))))
+            scores = np.concatenate((scores, np.fromiter(ecart.values(), dtype=np.float32, count=len(ecart))))
+        voisins, scores = _regrouper(voisins, scores)
+        ordre = np.argsort(-scores, kind="stable")
+        ligne = self._lignes[code] = voisins[ordre].astype(np.int32), scores[ordre]
+        return ligne
+
+    def _meilleurs(self, voisins, scores, k, garder):
+        # Les k premiers voisins acceptés par `garder` : [(isbn, score ramené à aujourd'hui)]
+        valeurs = self.isbns.valeurs
+        echelle = float(self._poids(np.array([np.datetime64(datetime.now(), "us")]))[0])
+        resultats = []
+        debut, pas = 0, max(4 * k, 32)
+        while len(resultats) < k and debut < len(voisins):
+            for code, score in zip(voisins[debut:debut + pas].tolist(), scores[debut:debut + pas].tolist()):
+                isbn = valeurs[code]
+                if garder is None or garder(isbn):
+                    resultats.append((isbn, score / echelle))
+                    if len(resultats) == k:
+                        break
+            debut += pas
+        return resultats
+
+    @instrumenter("Recommandations.pour_livre")
+    def pour_livre(self, isbn, k=5, garder=None):
+        # Livres les plus co-empruntés avec `isbn`
+        code = self.isbns.codes.get(isbn)
+        if code is None:
+            return []
+        self._reorigine(np.datetime64(datetime.now(), "us"))
+        return self._meilleurs(*self._ligne(code), k, garder)
+
+    @instrumenter("Recommandations.pour_membre")
+    def pour_membre(self, id_membre, k=5, garder=None):
+        # Somme des lignes des derniers emprunts du membre, sans ces livres eux-mêmes
+        recents = self._recents.get(id_membre)
+        if not recents:
+            return []
+        self._reorigine(np.datetime64(datetime.now(), "us"))
+        lignes = [self._ligne(code) for code in set(recents)]
+        voisins, scores = _regrouper(np.concatenate([v[:VOISINS_PAR_EMPRUNT] for v, _ in lignes]),
+                                     np.concatenate([s[:VOISINS_PAR_EMPRUNT] for _, s in lignes]))
+        garder_ligne = ~np.isin(voisins, list(recents))
+        voisins, scores = voisins[garder_ligne], scores[garder_ligne]
+        ordre = np.argsort(-scores, kind="stable")
+        return self._meilleurs(voisins[ordre], scores[ordre], k, garder)
@@ -0,0 +1,128 @@
+import heapq
+from collections import deque
+from datetime import timedelta
+
+# Files d'attente des réservations (modes json et journal ; en mode sqlite, la table
+# reservations et ses index servent les mêmes requêtes, voir ReservationsSQLite).
+#
+# Les réservations elles-mêmes sont sur les membres (Membre.reservation) et persistent avec eux.
+# Cet index, reconstruit à la demande, les range pour que rien ne soit parcouru :
+#   - une file FIFO (deque) de (date, id_membre) par livre : au retour du livre, le premier
+#     membre encore en attente est retiré de la tête en O(1) ;
+#   - un tas (heapq) de (fin de mise de côté, isbn, id_membre) : les mises de côté échues sont
+#     en tête, retirées sans parcourir les livres ;
+#   - isbn -> membre pour qui le livre est mis de côté.
+# Comme dans l'Echeancier, une annulation ne retire rien : une entrée est périmée dès que le
+# membre n'a plus cette réservation dans cet état, et elle est ignorée quand elle est lue.
+
+# Durée pendant laquelle un livre rendu est mis de côté pour le premier de sa file, en jours
+DELAI_RETRAIT = 3
+
+
+def fin_retrait(date, jours=DELAI_RETRAIT):
+    # Fin de la mise de côté d'un livre rendu à `date` (datetime)
+    return (date + timedelta(days=jours)).isoformat(timespec="seconds")
+
+
+class FilesReservations:
+    def __init__(self, membres):
+        self.membres = membres
+        self._files = {}
+        self._retraits = []
+        self._detenteurs = {}
+        self._perimees = 0
+
+    def construire(self):
+        attentes = []
+        self._retraits = []
+        self._detenteurs = {}
+        for membre in self.membres.values():
+            for isbn, (date, retrait) in membre.reservations.items():
+                if retrait is None:
+                    attentes.append((date, isbn, membre.id_membre))
+                else:
+                    self._retraits.append((retrait, isbn, membre.id_membre))
+                    self._detenteurs[isbn] = membre.id_membre
+        # Files dans l'ordre des dates de réservation
+        self._files = {}
+        for date, isbn, id_membre in sorted(attentes):
+            self._files.setdefault(isbn, deque()).append((date, id_membre))
+        heapq.heapify(self._retraits)
+        self._perimees = 0
+
+    def _en_attente(self, isbn, id_membre, date):
+        membre = self.membres.get(id_membre)
+        return membre is not None and membre.reservation(isbn) == (date, None)
+
+    def _retenu(self, isbn, id_membre, retrait):
+        membre = self.membres.get(id_membre)
+        reservation = membre.reservation(isbn) if membre is not None else None
+        return reservation is not None and reservation[1] == retrait
+
+    def ajouter(self, isbn, id_membre, date):
+        self._files.setdefault(isbn, deque()).append((date, id_membre))
+
+    def retenir(self, isbn, id_membre, retrait):
+        heapq.heappush(self._retraits, (retrait, isbn, id_membre))
+        self._detenteurs[isbn] = id_membre
+
+    def perimer(self, nombre=1):
+        # Appelé quand des entrées deviennent périmées (annulation, emprunt, suppression)
+        self._perimees += nombre
+        if self._perimees > (len(self._retraits) + len(self._files)) // 2 + 64:
+            for isbn, file in list(self._files.items()):
+                file = deque(entree for entree in file if self._en_attente(isbn, entree[1], entree[0]))
+                if file:
+                    self._files[isbn] = file
+                else:
+                    del self._files[isbn]
+            self._retraits = [entree for entree in self._retraits if self._retenu(entree[1], entree[2], entree[0])]
+            heapq.heapify(self._retraits)
+            self._detenteurs = {isbn: id_membre for _, isbn, id_membre in self._retraits}
+            self._perimees = 0
+
+    def suivant(self, isbn):
+        # Premier membre encore en attente du livre, retiré de la file
+        file = self._files.get(isbn)
+        while file:
+            date, id_membre = file.popleft()
+            if self._en_attente(isbn, id_membre, date):
+                if not file:
+                    del self._files[isbn]
+                return id_membre
+        self._files.pop(isbn, None)
+        return None
+
+    def en_attente(self, isbn):
+        # Membres en attente du livre, dans l'ordre de la file
+        return [id_membre for date, id_membre in self._files.get(isbn, ()) if self._en_attente(isbn, id_membre, date)]
+
+    def detenteur(self, isbn):
+        # Membre pour qui le livre est mis de côté, ou None
+        id_membre = self._detenteurs.get(isbn)
+        membre = self.membres.get(id_membre) if id_membre is not None else None
+        if membre is None or (membre.reservation(isbn) or (None, None))[1] is None:
+            return None
+        return id_membre
+
+    def oublier_livre(self, isbn):
+        # Livre supprimé : sa file et sa mise de côté disparaissent avec lui
+        self._files.pop(isbn, None)
+        self._detenteurs.pop(isbn, None)
+
+    def prochaine_expiration(self):
+        # Plus proche fin de mise de côté (éventuellement périmée), ou None
+        return self._retraits[0][0] if self._retraits else None
+
+    def echues(self, maintenant):
+        # Mises de côté terminées avant `maintenant` (texte ISO), retirées du tas :
+        # [(isbn, id_membre)], les plus anciennes d'abord
+        echues = []
+        while self._retraits and self._retraits[0][0] <= maintenant:
+            retrait, isbn, id_membre = heapq.heappop(self._retraits)
+            if self._retenu(isbn, id_membre, retrait):
+                echues.append((isbn, id_membre))
+                if self._detenteurs.get(isbn) == id_membre:
+                    del self._detenteurs[isbn]
+        # Une mise de côté poussée deux fois dans le tas n'est renvoyée qu'une fois
+        return list(dict.fromkeys(echues))
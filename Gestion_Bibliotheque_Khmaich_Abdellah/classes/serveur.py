@@ -0,0 +1,358 @@
+import argparse
+import asyncio
+import json
+import signal
+import sys
+from collections import deque
+from classes.bibliotheque import Bibliotheque, ERREURS_OPERATION
+from classes.livre import Livre
+from classes.membre import Membre, DUREE_EMPRUNT
+
+# Serveur réseau local : un seul processus garde la Bibliotheque en mémoire et la sert
+# à plusieurs postes (App.py --serveur, benchmarks.bench_serveur).
+#   python -m classes.serveur [--persistance journal] [--dossier data] [--port 8765]
+#
+# Protocole : une requête JSON par ligne, une réponse JSON par ligne.
+#   -> {"id": 7, "op": "emprunter", "args": {"isbn": "12", "id_membre": "003"}}
+#   <- {"id": 7, "ok": true, "resultat": null, "version": 42}
+#   <- {"id": 7, "ok": false, "erreur": "LivreIndisponibleError", "message": "...", "version": 42}
+# Un client peut envoyer plusieurs requêtes sans attendre les réponses : les lectures
+# sont servies dès leur arrivée, les écritures quand leur lot est validé, donc les réponses
+# peuvent arriver dans un autre ordre que les requêtes (l'id permet de les associer).
+#
+# Les écritures passent par une file unique : elles sont appliquées une par une (contrôles de
+# statut et de quota toujours justes), par lots dans une même transaction, ce qui partage
+# l'écriture du stockage (fsync du journal) entre toutes les requêtes du lot.
+
+HOTE = "127.0.0.1"
+PORT = 8765
+TAILLE_LOT = 256
+LIMITE_LIGNE = 1 << 20
+LIMITE_TAMPON = 1 << 20
+INTERVALLE_ACTUALISATION = 2.0
+# Changements gardés pour l'opération "changements" (au-delà, le client recharge tout)
+TAILLE_CHANGEMENTS = 10000
+
+
+def membre_vers_dict(membre):
+    d = membre.vers_dict()
+    d["id_membre"] = membre.id_membre
+    return d
+
+
+class RequeteInvalide(Exception):
+    pass
+
+
+class ServeurBibliotheque:
+    def __init__(self, biblio, taille_lot=TAILLE_LOT):
+        self.biblio = biblio
+        self.taille_lot = taille_lot
+        # Version des données servies : incrémentée à chaque lot d'écritures validé
+        self.version = 0
+        # (version, isbns, ids) des derniers lots, pour les clients qui se resynchronisent
+        self._changements = deque()
+        self._version_min = 0
+        self._file = None
+        self.lectures = {
+            "ping": lambda: None,
+            "livre": self._livre,
+            "membre": self._membre,
+            "isbns": lambda: list(self.biblio.livres),
+            "ids_membres": lambda: list(self.biblio.membres),
+            "nb_livres": lambda: len(self.biblio.livres),
+            "nb_membres": lambda: len(self.biblio.membres),
+            "rechercher": self._rechercher,
+            "emprunteur": self._emprunteur,
+            "historique_membre": self.biblio.historique_membre,
+            "historique_livre": self.biblio.historique_livre,
+            "emprunts_en_retard": lambda: self.biblio.emprunts_en_retard(),
+            "emprunts_a_echeance": lambda jours=3: self.biblio.emprunts_a_echeance(jours),
+            "statistiques": self._statistiques,
+            "analyse": self.biblio.donnees_analyse,
+            "recommandations": self._recommandations,
+            "recommandations_membre": self._recommandations_membre,
+            "reservations_livre": self.biblio.reservations_livre,
+            "changements": self._changements_depuis,
+        }
+        # Chaque écriture renvoie (résultat, isbns touchés, ids touchés)
+        self.ecritures = {
+            "ajouter_livre": self._ajouter_livre,
+            "modifier_livre": self._modifier_livre,
+            "supprimer_livre": self._supprimer_livre,
+            "enregistrer_membre": self._enregistrer_membre,
+            "supprimer_membre": self._supprimer_membre,
+            "emprunter": self._emprunter,
+            "retourner": self._retourner,
+            "prolonger": self._prolonger,
+            "reserver": self._reserver,
+            "annuler_reservation": self._annuler_reservation,
+            "expirer_reservations": self._expirer_reservations,
+        }
+
+    # --- Lectures ---
+
+    def _livre(self, isbn):
+        livre = self.biblio.livres.get(isbn)
+        return livre.vers_dict() if livre is not None else None
+
+    def _membre(self, id_membre):
+        membre = self.biblio.membres.get(id_membre)
+        return membre_vers_dict(membre) if membre is not None else None
+
+    def _rechercher(self, requete, limite=50):
+        return [livre.vers_dict() for livre in self.biblio.rechercher(requete, limite)]
+
+    def _recommandations(self, isbn, k=5):
+        return [(livre.vers_dict(), score) for livre, score in self.biblio.recommandations(isbn, k)]
+
+    def _recommandations_membre(self, id_membre, k=5):
+        return [(livre.vers_dict(), score) for livre, score in self.biblio.recommandations_membre(id_membre, k)]
+
+    def _emprunteur(self, isbn):
+        membre = self.biblio.emprunteur_de(isbn)
+        return membre_vers_dict(membre) if membre is not None else None
+
+    def _statistiques(self, nb_jours=30, nb_auteurs=50):
+        stats = self.biblio.statistiques()
+        jours, nombres = stats.emprunts_derniers_jours(nb_jours)
+        return {
+            "genres": dict(stats.genres.items()),
+            "auteurs": stats.auteurs.plus_frequents(nb_auteurs),
+            "emprunts_par_jour": {jour.isoformat(): nb for jour, nb in zip(jours, nombres) if nb},
+        }
+
+    def _changements_depuis(self, version):
+        # ISBN et ID modifiés après `version`, ou None si le client doit tout recharger
+        if version < self._version_min or version > self.version:
+            return {"version": self.version, "livres": None, "membres": None}
+        isbns = set()
+        ids = set()
+        for v, livres, membres in reversed(self._changements):
+            if v <= version:
+                break
+            isbns.update(livres)
+            ids.update(membres)
+        return {"version": self.version, "livres": sorted(isbns), "membres": sorted(ids)}
+
+    def _noter_changement(self, isbns, ids):
+        self.version += 1
+        if len(self._changements) == TAILLE_CHANGEMENTS:
+            self._version_min = self._changements.popleft()[0]
+        self._changements.append((self.version, isbns, ids))
+
+    def _tout_recharger(self):
+        self.version += 1
+        self._changements.clear()
+        self._version_min = self.version
+
+    # --- Écritures ---
+
+    def _ajouter_livre(self, livre):
+        livre = Livre(**livre)
+        self.biblio.ajouter_livre(livre)
+        return None, [livre.isbn], []
+
+    def _modifier_livre(self, isbn, titre, auteur, annee, genre):
+        self.biblio.modifier_livre(isbn, titre, auteur, annee, genre)
+        return None, [isbn], []
+
+    def _supprimer_livre(self, isbn):
+        emprunteur = self.biblio.emprunteur_de(isbn)
+        detenteur, file = self.biblio.reservations_livre(isbn)
+        self.biblio.supprimer_livre(isbn)
+        membres = [emprunteur.id_membre] if emprunteur is not None else []
+        return None, [isbn], membres + ([detenteur] if detenteur is not None else []) + file
+
+    def _enregistrer_membre(self, id_membre, nom):
+        # Un membre existant garde ses emprunts, leurs échéances et ses réservations
+        membre = Membre(id_membre, nom)
+        ancien = self.biblio.membres.get(id_membre)
+        if ancien is not None:
+            membre.livres_empruntes = ancien.livres_empruntes
+            membre.echeances = ancien.echeances
+            membre.reservations = ancien.reservations
+        self.biblio.enregistrer_membre(membre)
+        return None, [], [id_membre]
+
+    def _supprimer_membre(self, id_membre):
+        # Livres rendus ou mis de côté pour lui : (isbn, membre suivant de la file ou None)
+        remis = self.biblio.supprimer_membre(id_membre)
+        return remis, [isbn for isbn, _ in remis], [id_membre] + [suivant for _, suivant in remis if suivant]
+
+    def _emprunter(self, isbn, id_membre):
+        self.biblio.emprunter_livre(isbn, id_membre)
+        return None, [isbn], [id_membre]
+
+    def _retourner(self, isbn, id_membre):
+        suivant = self.biblio.retourner_livre(isbn, id_membre)
+        return suivant, [isbn], [id_membre] + ([suivant] if suivant is not None else [])
+
+    def _prolonger(self, isbn, id_membre, jours=DUREE_EMPRUNT):
+        return self.biblio.prolonger_emprunt(isbn, id_membre, jours), [], [id_membre]
+
+    def _reserver(self, isbn, id_membre):
+        return self.biblio.reserver_livre(isbn, id_membre), [isbn], [id_membre]
+
+    def _annuler_reservation(self, isbn, id_membre):
+        suivant = self.biblio.annuler_reservation(isbn, id_membre)
+        return suivant, [isbn], [id_membre] + ([suivant] if suivant is not None else [])
+
+    def _expirer_reservations(self):
+        expirees = self.biblio.expirer_reservations()
+        return (expirees, [isbn for isbn, _, _ in expirees],
+                [id_membre for _, a, b in expirees for id_membre in (a, b) if id_membre is not None])
+
+    async def _ecrivain(self):
+        # Seule tâche qui modifie la bibliothèque : vide la file par lots
+        while True:
+            lot = [await self._file.get()]
+            while len(lot) < self.taille_lot and not self._file.empty():
+                lot.append(self._file.get_nowait())
+            self._appliquer_lot(lot)
+
+    def _appliquer_lot(self, lot):
+        resultats = []
+        isbns = set()
+        ids = set()
+        try:
+            with self.biblio.transaction():
+                for op, args, futur in lot:
+                    try:
+                        resultat, livres, membres = self.ecritures[op](**args)
+                    except ERREURS_OPERATION as e:
+                        resultats.append((futur, e))
+                    except (TypeError, ValueError) as e:
+                        resultats.append((futur, RequeteInvalide(str(e))))
+                    else:
+                        resultats.append((futur, resultat))
+                        isbns.update(livres)
+                        ids.update(membres)
+        except Exception as e:
+            # Lot annulé en entier (erreur du stockage) : aucune écriture n'est confirmée
+            for _, _, futur in lot:
+                if not futur.done():
+                    futur.set_exception(e)
+            return
+        if isbns or ids:
+            self._noter_changement(isbns, ids)
+        for futur, resultat in resultats:
+            if futur.done():
+                continue  # Client déconnecté entre-temps
+            if isinstance(resultat, Exception):
+                futur.set_exception(resultat)
+            else:
+                futur.set_result(resultat)
+
+    async def _actualiser(self):
+        # Reprend les modifications faites par d'autres processus sur le même dossier
+        while True:
+            await asyncio.sleep(INTERVALLE_ACTUALISATION)
+            isbns, ids = self.biblio.actualiser()
+            if isbns is None:
+                self._tout_recharger()
+            elif isbns or ids:
+                self._noter_changement(isbns, ids)
+
+    # --- Connexions ---
+
+    def _reponse(self, id_requete, resultat=None, erreur=None):
+        if erreur is None:
+            return {"id": id_requete, "ok": True, "resultat": resultat, "version": self.version}
+        message = getattr(erreur, "message", None) or str(erreur)
+        return {"id": id_requete, "ok": False, "erreur": type(erreur).__name__, "message": message,
+                "version": self.version}
+
+    def _envoyer(self, writer, reponse):
+        if not writer.is_closing():
+            writer.write(json.dumps(reponse, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def _lire(self, id_requete, op, args):
+        try:
+            return self._reponse(id_requete, self.lectures[op](**args))
+        except ERREURS_OPERATION as e:
+            # Membre ou livre inconnu (recommandations d'un membre) : renvoyé comme pour une écriture
+            return self._reponse(id_requete, erreur=e)
+        except (TypeError, ValueError, KeyError) as e:
+            return self._reponse(id_requete, erreur=RequeteInvalide(str(e)))
+
+    async def _attendre_ecriture(self, writer, id_requete, futur):
+        try:
+            reponse = self._reponse(id_requete, await futur)
+        except Exception as e:
+            reponse = self._reponse(id_requete, erreur=e)
+        self._envoyer(writer, reponse)
+
+    async def _connexion(self, reader, writer):
+        en_attente = set()
+        try:
+            async for ligne in reader:
+                try:
+                    requete = json.loads(ligne)
+                    id_requete, op, args = requete.get("id"), requete["op"], requete.get("args") or {}
+                    if op not in self.lectures and op not in self.ecritures:
+                        raise RequeteInvalide(f"opération inconnue : {op}")
+                    if not isinstance(args, dict):
+                        raise RequeteInvalide("args doit être un objet")
+                except (ValueError, KeyError, AttributeError, RequeteInvalide) as e:
+                    self._envoyer(writer, self._reponse(None, erreur=RequeteInvalide(str(e))))
+                    continue
+                if op in self.ecritures:
+                    futur = asyncio.get_running_loop().create_future()
+                    self._file.put_nowait((op, args, futur))
+                    tache = asyncio.create_task(self._attendre_ecriture(writer, id_requete, futur))
+                    en_attente.add(tache)
+                    tache.add_done_callback(en_attente.discard)
+                else:
+                    self._envoyer(writer, self._lire(id_requete, op, args))
+                # Client qui ne lit pas ses réponses : on attend qu'il rattrape son retard
+                if writer.transport.get_write_buffer_size() > LIMITE_TAMPON:
+                    await writer.drain()
+            if en_attente:
+                await asyncio.gather(*en_attente)
+            await writer.drain()
+        except (ConnectionError, ValueError):
+            pass  # Déconnexion, ou ligne plus longue que LIMITE_LIGNE
+        finally:
+            writer.close()
+
+    async def servir(self, hote=HOTE, port=PORT, pret=None):
+        # pret(adresse) est appelé une fois le serveur en écoute (port 0 : port choisi par le système)
+        self._file = asyncio.Queue()
+        taches = [asyncio.create_task(self._ecrivain()), asyncio.create_task(self._actualiser())]
+        serveur = await asyncio.start_server(self._connexion, hote, port, limit=LIMITE_LIGNE)
+        if pret is not None:
+            pret(serveur.sockets[0].getsockname()[:2])
+        try:
+            async with serveur:
+                await serveur.serve_forever()
+        finally:
+            for tache in taches:
+                tache.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serveur réseau local de la bibliothèque")
+    parser.add_argument("--persistance", choices=("json", "journal", "sqlite"), default="journal")
+    parser.add_argument("--dossier", default="data")
+    parser.add_argument("--hote", default=HOTE)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args(argv)
+    biblio = Bibliotheque(persistance=args.persistance, dossier=args.dossier)
+    biblio.charger()
+    serveur = ServeurBibliotheque(biblio)
+    # SIGTERM arrête le serveur aussi proprement que Ctrl+C
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        asyncio.run(serveur.servir(args.hote, args.port,
+                                   lambda adresse: print(f"En écoute sur {adresse[0]}:{adresse[1]}", flush=True)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        biblio.fermer()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
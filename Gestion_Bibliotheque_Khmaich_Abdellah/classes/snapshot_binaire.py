@@ -0,0 +1,201 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import MutableMapping
+from itertools import accumulate
+from classes.livre import Livre
+
+# Snapshot binaire de livres.json, lu par mmap au démarrage.
+#
+# Format (entiers little-endian) :
+#   en-tête  : MAGIC, version, crc32 du corps, nombre de livres,
+#              taille et date de modification (ns) du livres.json source
+#   corps    : table des colonnes (position des offsets et du texte de chaque champ),
+#              puis pour chaque champ un tableau de nb+1 offsets (uint64) et le texte UTF-8
+#              de toutes les valeurs mises bout à bout.
+# Les lignes sont triées par ISBN : une recherche par clé est une dichotomie sur la colonne isbn.
+# Un snapshot dont la version, le crc ou la source ne correspondent pas est rejeté.
+
+MAGIC = b"BIBSNAP\0"
+VERSION = 1
+CHAMPS = ("isbn", "titre", "auteur", "annee", "genre", "statut")
+_ENTETE = struct.Struct("<8sIIQQQ")
+_COLONNES = struct.Struct("<" + "QQ" * len(CHAMPS))
+
+
+class SnapshotInvalide(Exception):
+    pass
+
+
+def signature_source(chemin_json):
+    stat = os.stat(chemin_json)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def ecrire_snapshot(chemin, livres, signature):
+    # livres : itérable de dicts au format de livres.json ; écriture atomique (tmp + rename)
+    lignes = sorted(livres, key=lambda d: d["isbn"])
+    colonnes = []
+    for champ in CHAMPS:
+        valeurs = [str(d[champ]).encode("utf-8") for d in lignes]
+        offsets = array("Q", [0])
+        offsets.extend(accumulate(len(v) for v in valeurs))
+        colonnes.append((offsets.tobytes(), b"".join(valeurs)))
+    positions = []
+    morceaux = []
+    position = _ENTETE.size + _COLONNES.size
+    for offsets, texte in colonnes:
+        bourrage = b"\0" * (-len(texte) % 8)
+        positions += [position, position + len(offsets)]
+        morceaux += [offsets, texte, bourrage]
+        position += len(offsets) + len(texte) + len(bourrage)
+    corps = _COLONNES.pack(*positions) + b"".join(morceaux)
+    entete = _ENTETE.pack(MAGIC, VERSION, zlib.crc32(corps), len(lignes), *signature)
+    tmp = chemin + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(entete)
+        f.write(corps)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, chemin)
+
+
+class SnapshotLivres:
+    # Accès en lecture aux colonnes d'un snapshot projeté en mémoire
+    def __init__(self, chemin, signature=None):
+        with open(chemin, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        vue = memoryview(self._mmap)
+        if len(vue) < _ENTETE.size + _COLONNES.size:
+            raise SnapshotInvalide("fichier tronqué")
+        magic, version, crc, self.nb, *source = _ENTETE.unpack_from(vue)
+        if magic != MAGIC or version != VERSION:
+            raise SnapshotInvalide("format ou version inconnus")
+        if signature is not None and tuple(source) != tuple(signature):
+            raise SnapshotInvalide("livres.json a changé depuis la création du snapshot")
+        if zlib.crc32(vue[_ENTETE.size:]) != crc:
+            raise SnapshotInvalide("somme de contrôle incorrecte")
+        positions = _COLONNES.unpack_from(vue, _ENTETE.size)
+        self._colonnes = []
+        for i in range(len(CHAMPS)):
+            debut_offsets, debut_texte = positions[2 * i], positions[2 * i + 1]
+            offsets = vue[debut_offsets:debut_texte].cast("Q")
+            self._colonnes.append((offsets, debut_texte))
+        self._vue = vue
+
+    def valeur(self, champ, i):
+        offsets, debut = self._colonnes[champ]
+        return bytes(self._vue[debut + offsets[i]:debut + offsets[i + 1]])
+
+    def ligne(self, i):
+        return [self.valeur(c, i).decode("utf-8") for c in range(len(CHAMPS))]
+
+    def __len__(self):
+        return self.nb
+
+    def __getitem__(self, i):
+        # Séquence des ISBN encodés, utilisée pour la dichotomie
+        return self.valeur(0, i)
+
+    def position(self, isbn):
+        cle = isbn.encode("utf-8")
+        bas, haut = 0, self.nb
+        while bas < haut:
+            milieu = (bas + haut) // 2
+            if self[milieu] < cle:
+                bas = milieu + 1
+            else:
+                haut = milieu
+        if bas < self.nb and self[bas] == cle:
+            return bas
+        return -1
+
+
+class LivresMappes(MutableMapping):
+    # Vue dict-like sur un snapshot binaire : un Livre n'est construit qu'au premier accès.
+    # Les livres lus par clé, ajoutés ou modifiés sont gardés dans _modifies (les mutations
+    # sur l'objet sont donc conservées) ; les suppressions sont notées dans _supprimes.
+    # Un parcours complet (values(), items()) ne met pas les livres du snapshot en cache.
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self._modifies = {}
+        self._supprimes = set()
+        self._ajoutes = set()  # clés de _modifies absentes du snapshot
+
+    def _depuis_snapshot(self, isbn):
+        if isbn in self._supprimes:
+            return -1
+        return self.snapshot.position(isbn)
+
+    def __getitem__(self, isbn):
+        livre = self._modifies.get(isbn)
+        if livre is not None:
+            return livre
+        i = self._depuis_snapshot(isbn)
+        if i < 0:
+            raise KeyError(isbn)
+        livre = self._modifies[isbn] = Livre(*self.snapshot.ligne(i))
+        return livre
+
+    def __contains__(self, isbn):
+        return isbn in self._modifies or self._depuis_snapshot(isbn) >= 0
+
+    def __setitem__(self, isbn, livre):
+        # Un ISBN du snapshot supprimé puis ajouté à nouveau n'est pas un ajout
+        if isbn not in self._modifies and self.snapshot.position(isbn) < 0:
+            self._ajoutes.add(isbn)
+        self._supprimes.discard(isbn)
+        self._modifies[isbn] = livre
+
+    def __delitem__(self, isbn):
+        if isbn not in self:
+            raise KeyError(isbn)
+        self._modifies.pop(isbn, None)
+        if isbn in self._ajoutes:
+            self._ajoutes.discard(isbn)
+        else:
+            self._supprimes.add(isbn)
+
+    def __len__(self):
+        return len(self.snapshot) - len(self._supprimes) + len(self._ajoutes)
+
+    def __iter__(self):
+        for isbn, _ in self._parcourir(construire=False):
+            yield isbn
+
+    def _parcourir(self, construire=True):
+        for i in range(len(self.snapshot)):
+            isbn = self.snapshot[i].decode("utf-8")
+            if isbn in self._supprimes:
+                continue
+            livre = self._modifies.get(isbn)
+            if livre is None and construire:
+                livre = Livre(*self.snapshot.ligne(i))
+            yield isbn, livre
+        for isbn in list(self._ajoutes):
+            yield isbn, self._modifies[isbn]
+
+    def values(self):
+        for _, livre in self._parcourir():
+            yield livre
+
+    def items(self):
+        return self._parcourir()
+
+
+def convertir(chemin_json, chemin_bin=None):
+    # Crée (ou recrée) le snapshot binaire à partir d'un livres.json
+    chemin_bin = chemin_bin or os.path.splitext(chemin_json)[0] + ".bin"
+    with open(chemin_json, "r", encoding="utf-8") as f:
+        livres = json.load(f)
+    ecrire_snapshot(chemin_bin, livres.values(), signature_source(chemin_json))
+    return chemin_bin
+
+
+if __name__ == "__main__":
+    # python -m classes.snapshot_binaire [data/livres.json]
+    print(convertir(sys.argv[1] if len(sys.argv) > 1 else "data/livres.json"))
@@ -0,0 +1,74 @@
+from collections import Counter
+from datetime import date, timedelta
+
+
+class CompteurTop:
+    # Compteur qui range aussi les clés par valeur : les k plus fréquentes s'obtiennent
+    # en parcourant les valeurs distinctes (peu nombreuses), sans trier toutes les clés
+    def __init__(self):
+        self.comptes = {}
+        self._par_compte = {}
+
+    def incrementer(self, cle, delta=1):
+        ancien = self.comptes.get(cle, 0)
+        nouveau = ancien + delta
+        if ancien:
+            cles = self._par_compte[ancien]
+            del cles[cle]
+            if not cles:
+                del self._par_compte[ancien]
+        if nouveau > 0:
+            self.comptes[cle] = nouveau
+            self._par_compte.setdefault(nouveau, {})[cle] = None
+        else:
+            self.comptes.pop(cle, None)
+
+    def plus_frequents(self, k):
+        resultat = []
+        for compte in sorted(self._par_compte, reverse=True):
+            for cle in self._par_compte[compte]:
+                resultat.append((cle, compte))
+                if len(resultat) == k:
+                    return resultat
+        return resultat
+
+    def items(self):
+        return self.comptes.items()
+
+
+class Statistiques:
+    # Agrégats utilisés par les graphiques, tenus à jour à partir des événements de Bibliotheque :
+    #   genres / auteurs   -> nombre de livres (CompteurTop)
+    #   emprunts_par_jour  -> "AAAA-MM-JJ" -> nombre d'emprunts
+    # Au démarrage, les compteurs de livres viennent du catalogue déjà chargé et les emprunts
+    # par jour du stockage (comptes tenus dans l'index de chaque partition mensuelle, ou requête SQL).
+    def __init__(self):
+        self.genres = CompteurTop()
+        self.auteurs = CompteurTop()
+        self.emprunts_par_jour = Counter()
+
+    def construire(self, biblio):
+        for genre, nombre in biblio.compter_par("genre").items():
+            self.genres.incrementer(genre, nombre)
+        for auteur, nombre in biblio.compter_par("auteur").items():
+            self.auteurs.incrementer(auteur, nombre)
+        self.emprunts_par_jour = Counter(biblio._stockage.emprunts_par_jour())
+
+    def recevoir(self, evenement, donnees):
+        # Abonné aux événements de Bibliotheque
+        if evenement in ("livre_modifie", "livre_supprime") or (evenement == "livre_ajoute" and donnees["ancien"]):
+            ancien = donnees["ancien"]
+            self.genres.incrementer(ancien["genre"], -1)
+            self.auteurs.incrementer(ancien["auteur"], -1)
+        if evenement in ("livre_ajoute", "livre_modifie"):
+            livre = donnees["livre"]
+            self.genres.incrementer(livre.genre)
+            self.auteurs.incrementer(livre.auteur)
+        elif evenement == "historique" and donnees["action"] == "emprunt":
+            self.emprunts_par_jour[donnees["date"][:10]] += 1
+
+    def emprunts_derniers_jours(self, nb_jours=30):
+        # (jours, nombre d'emprunts) pour les nb_jours derniers jours, aujourd'hui compris
+        aujourdhui = date.today()
+        jours = [aujourdhui - timedelta(days=i) for i in range(nb_jours - 1, -1, -1)]
+        return jours, [self.emprunts_par_jour.get(j.isoformat(), 0) for j in jours]
@@ -0,0 +1,491 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from classes.livre import Livre
+from classes.membre import Membre
+from classes.historique import HistoriqueWriter
+from classes.historique_partitions import historique_du_dossier
+from classes.verrou import VerrouFichier
+from classes.mesures import instrumenter, registre
+from classes.snapshot_binaire import LivresMappes, SnapshotInvalide, SnapshotLivres, ecrire_snapshot, signature_source
+
+
+@instrumenter("stockage.ecrire_json_atomique")
+def ecrire_json_atomique(chemin, donnees, indent=2):
+    # Écrit d'abord dans un fichier temporaire puis le renomme : un crash
+    # pendant l'écriture laisse toujours l'ancienne version intacte
+    tmp = chemin + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(donnees, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+        registre.compter("stockage.octets_json", f.tell())
+    os.replace(tmp, chemin)
+
+
+def livres_depuis_dict(data):
+    return {isbn: Livre(**d) for isbn, d in data.items()}
+
+
+def membres_depuis_dict(data):
+    membres = {}
+    for id_, d in data.items():
+        membre = Membre(id_, d["nom"])
+        membre.livres_empruntes = d["livres_empruntes"]
+        membre.echeances = d.get("echeances", {})
+        membre.reservations = d.get("reservations", {})
+        membres[id_] = membre
+    return membres
+
+
+class StockageJSON:
+    # Persistance d'origine : livres.json et membres.json réécrits en entier à chaque sauvegarde
+    # Les stockages transactionnels (SQLite) exécutent eux-mêmes emprunts, retours et suppressions
+    #
+    # Chaque mutation s'exécute sous un verrou de fichier (data/.verrou) après avoir pris en
+    # compte les fichiers réécrits par les autres processus (détectés par inode / date / taille).
+    # Les fichiers ne sont réécrits que par sauvegarder() (et à la fin d'une transaction) : une
+    # réécriture complète par opération coûterait des centaines de millisecondes sous le verrou
+    # pour un gros catalogue. Ce mode est donc prévu pour un seul poste : un autre processus ne
+    # voit les opérations qu'après sauvegarder(), et deux postes peuvent prêter le même livre
+    # entre deux sauvegardes. Le mode journal est le mode multi-processus (une ligne de journal
+    # par opération). Les enregistrements modifiés ici et pas encore écrits gagnent lors de la fusion.
+    transactionnel = False
+
+    def __init__(self, dossier="data", options_historique=None, snapshot_binaire=False):
+        self.dossier = dossier
+        # snapshot_binaire : livres.bin est écrit à côté de livres.json et lu par mmap au démarrage
+        self.snapshot_binaire = snapshot_binaire
+        self.chemin_livres = os.path.join(dossier, "livres.json")
+        self.chemin_livres_bin = os.path.join(dossier, "livres.bin")
+        self.chemin_membres = os.path.join(dossier, "membres.json")
+        self.verrou = VerrouFichier(os.path.join(dossier, ".verrou"))
+        # Historique découpé par mois dans data/historique/ (classes/historique_partitions.py)
+        self.historique_partitions = historique_du_dossier(dossier, self.verrou)
+        self.historique_writer = HistoriqueWriter(self.historique_partitions, **(options_historique or {}))
+        # Fichiers lus ou écrits en dernier, et modifications locales pas encore sauvegardées
+        self._generation = None
+        self._en_attente_livres = set()
+        self._en_attente_membres = set()
+
+    def _lire_generation(self):
+        generation = []
+        for chemin in (self.chemin_livres, self.chemin_membres):
+            try:
+                stat = os.stat(chemin)
+                generation.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                generation.append(None)
+        return tuple(generation)
+
+    @instrumenter()
+    def charger(self, biblio):
+        with self.verrou:
+            self._charger(biblio)
+            self._generation = self._lire_generation()
+            self._en_attente_livres.clear()
+            self._en_attente_membres.clear()
+            self.historique_partitions.ouvrir()
+        # Les mois anciens de l'historique sont compactés sans bloquer le chargement
+        self.historique_partitions.compacter_en_arriere_plan()
+
+    def _charger(self, biblio):
+        snapshot = None
+        if self.snapshot_binaire:
+            try:
+                snapshot = SnapshotLivres(self.chemin_livres_bin, signature_source(self.chemin_livres))
+                biblio.livres = LivresMappes(snapshot)
+            except (FileNotFoundError, SnapshotInvalide):
+                pass  # Snapshot absent, périmé ou corrompu : lecture classique du JSON
+        if snapshot is None:
+            try:
+                with open(self.chemin_livres, "r", encoding="utf-8") as f:
+                    biblio.livres = livres_depuis_dict(json.load(f))
+            except FileNotFoundError:
+                pass
+        try:
+            with open(self.chemin_membres, "r", encoding="utf-8") as f:
+                biblio.membres = membres_depuis_dict(json.load(f))
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def operation(self, biblio):
+        # Section critique d'une mutation de Bibliotheque : verrou entre processus, puis prise
+        # en compte des modifications des autres processus avant de valider l'opération.
+        # Rien n'est écrit ici (voir sauvegarder)
+        try:
+            with self.verrou:
+                externe = self.verrou.premiere_acquisition
+                if externe:
+                    self.actualiser(biblio)
+                yield
+        finally:
+            if externe:
+                self._apres_operation()
+
+    def _apres_operation(self):
+        pass
+
+    @instrumenter()
+    def actualiser(self, biblio):
+        # Recharge les enregistrements modifiés par un autre processus depuis la dernière lecture
+        generation = self._lire_generation()
+        if generation != self._generation:
+            self._fusionner_fichiers(biblio)
+            self._generation = generation
+
+    def _fusionner_fichiers(self, biblio):
+        livres = self._lire_json(self.chemin_livres)
+        membres = self._lire_json(self.chemin_membres)
+        biblio._appliquer_changements_externes(
+            self._differences(biblio.livres, livres, self._en_attente_livres),
+            self._differences(biblio.membres, membres, self._en_attente_membres),
+        )
+
+    def _lire_json(self, chemin):
+        try:
+            with open(chemin, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _differences(self, memoire, disque, en_attente):
+        # Enregistrements du disque différents de la mémoire (None = supprimé sur le disque),
+        # sauf ceux modifiés localement et pas encore sauvegardés
+        differences = {}
+        for cle, d in disque.items():
+            if cle not in en_attente:
+                objet = memoire.get(cle)
+                if objet is None or objet.vers_dict() != d:
+                    differences[cle] = d
+        for cle in memoire:
+            if cle not in disque and cle not in en_attente:
+                differences[cle] = None
+        return differences
+
+    def changement(self, biblio, livres=(), membres=()):
+        # Tout est écrit à la prochaine sauvegarde ; les clés sont notées pour la fusion
+        self._en_attente_livres.update(livres)
+        self._en_attente_membres.update(membres)
+
+    @instrumenter()
+    def sauvegarder(self, biblio):
+        # Réécrit livres.json et membres.json s'il y a des modifications locales, après avoir
+        # fusionné celles des autres processus
+        with self.verrou:
+            self.actualiser(biblio)
+            self.historique_writer.flush()
+            if self._en_attente_livres or self._en_attente_membres:
+                self._ecrire(biblio)
+
+    @instrumenter()
+    def _ecrire(self, biblio):
+        livres = {isbn: livre.vers_dict() for isbn, livre in biblio.livres.items()}
+        ecrire_json_atomique(self.chemin_livres, livres)
+        self._ecrire_snapshot_binaire(livres)
+        ecrire_json_atomique(self.chemin_membres, {id_: m.vers_dict() for id_, m in biblio.membres.items()})
+        self._generation = self._lire_generation()
+        self._en_attente_livres.clear()
+        self._en_attente_membres.clear()
+
+    @instrumenter()
+    def _ecrire_snapshot_binaire(self, livres):
+        # Le snapshot porte la signature du livres.json qui vient d'être écrit
+        if self.snapshot_binaire:
+            ecrire_snapshot(self.chemin_livres_bin, livres.values(), signature_source(self.chemin_livres))
+
+    def historique(self, isbn, id_membre, action, date):
+        self.historique_writer.ecrire(isbn, id_membre, action, date)
+
+    def parcourir_historique(self, debut=None, fin=None, id_membre=None, isbn=None):
+        # Lignes [date, isbn, id_membre, action] de l'historique, lues en flux
+        self.historique_writer.flush()
+        return self.historique_partitions.parcourir(debut, fin, id_membre, isbn)
+
+    def emprunts_par_jour(self):
+        self.historique_writer.flush()
+        return self.historique_partitions.emprunts_par_jour()
+
+    def analyses_historique(self):
+        return self.lecture_analyses()()
+
+    def lecture_analyses(self):
+        # Fige l'historique maintenant (sous le verrou) et renvoie la fonction qui le lit en
+        # tableaux, exécutable sur un autre thread
+        # Importé à la demande : NumPy n'est chargé que pour les analyses
+        from classes.analyses import Analyses
+        self.historique_writer.flush()
+        mois = self.historique_partitions.parcourir_mois()
+        return lambda: Analyses.depuis_mois(mois)
+
+    def historique_externe(self):
+        # Lignes écrites par les autres processus depuis analyses_historique()
+        return self.historique_partitions.lignes_externes()
+
+    def fermer(self, biblio):
+        # Les modifications pas encore sauvegardées sont écrites avant de fermer
+        if self._en_attente_livres or self._en_attente_membres:
+            self.sauvegarder(biblio)
+        self.historique_writer.fermer()
+
+
+class StockageJournal(StockageJSON):
+    # Persistance par journal : chaque mutation ajoute une ligne à data/journal.jsonl.
+    # Toutes les `snapshot_tous` opérations, livres.json et membres.json sont réécrits
+    # en arrière-plan (le snapshot) et les segments de journal couverts sont supprimés.
+    #
+    # Une ligne du journal contient l'état final des enregistrements touchés
+    # ({"seq": 12, "livres": {"5": {...}}, "membres": {"001": {...}}}, None = supprimé) :
+    # rejouer une ligne déjà présente dans le snapshot ne change donc rien, ce qui rend
+    # la reprise après un crash (même au milieu d'un snapshot) toujours correcte.
+    #
+    # Entre processus, le numéro de séquence est global : avant chaque opération, les lignes
+    # ajoutées par les autres depuis la dernière lecture (position gardée dans _position) sont
+    # rejouées, puis la nouvelle ligne prend le numéro suivant. Un seul snapshot s'écrit à la
+    # fois (data/.verrou_snapshot) et un snapshot plus ancien que celui sur disque est abandonné.
+    def __init__(self, dossier="data", options_historique=None, snapshot_binaire=False, snapshot_tous=1000):
+        super().__init__(dossier, options_historique, snapshot_binaire)
+        self.snapshot_tous = snapshot_tous
+        self.chemin_journal = os.path.join(dossier, "journal.jsonl")
+        self.chemin_meta = os.path.join(dossier, "journal.meta.json")
+        self._fichier = None
+        self._seq = 0
+        self._operations = 0
+        self._thread = None
+        self._verrou_snapshot = VerrouFichier(os.path.join(dossier, ".verrou_snapshot"))
+        # (inode, octets lus) du journal courant, et fsync différé à la fin de l'opération
+        self._position = None
+        self._a_synchroniser = False
+
+    def _segments(self):
+        # Segments scellés "journal-<seq>.jsonl" en attente d'être couverts par un snapshot
+        segments = []
+        for nom in os.listdir(self.dossier):
+            if nom.startswith("journal-") and nom.endswith(".jsonl"):
+                segments.append((int(nom[len("journal-"):-len(".jsonl")]), os.path.join(self.dossier, nom)))
+        return sorted(segments)
+
+    def _seq_snapshot(self):
+        try:
+            with open(self.chemin_meta, "r", encoding="utf-8") as f:
+                return json.load(f)["seq"]
+        except FileNotFoundError:
+            return 0
+
+    @instrumenter()
+    def charger(self, biblio):
+        # Aucun snapshot ne doit supprimer de segment pendant la lecture
+        with self.verrou, self._verrou_snapshot:
+            if self._fichier is not None:
+                self._fichier.close()
+                self._fichier = None
+            super().charger(biblio)
+            seq_snapshot = self._seq_snapshot()
+            self._seq = seq_snapshot
+            for _, chemin in self._segments():
+                for enregistrement in self._lire(chemin)[0]:
+                    if enregistrement["seq"] > seq_snapshot:
+                        self._rejouer(biblio, enregistrement)
+                    self._seq = max(self._seq, enregistrement["seq"])
+            for enregistrement in self._lire_journal(0):
+                if enregistrement["seq"] > seq_snapshot:
+                    self._rejouer(biblio, enregistrement)
+                self._seq = max(self._seq, enregistrement["seq"])
+        self._operations = 0
+
+    def _lire(self, chemin, debut=0):
+        # Enregistrements complets de `chemin` à partir de l'octet `debut`, et position de fin ;
+        # la lecture s'arrête à une dernière ligne tronquée (crash pendant l'ajout)
+        enregistrements = []
+        fin = debut
+        try:
+            with open(chemin, "rb") as f:
+                f.seek(debut)
+                for ligne in f:
+                    if not ligne.endswith(b"\n"):
+                        break
+                    try:
+                        enregistrements.append(json.loads(ligne))
+                    except ValueError:
+                        break
+                    fin += len(ligne)
+        except FileNotFoundError:
+            pass
+        return enregistrements, fin
+
+    def _lire_journal(self, debut):
+        # Lit le journal courant (sous le verrou) et retient la position atteinte
+        enregistrements, fin = self._lire(self.chemin_journal, debut)
+        try:
+            stat = os.stat(self.chemin_journal)
+        except FileNotFoundError:
+            self._position = None
+            return enregistrements
+        if fin < stat.st_size:
+            # Coupe la ligne incomplète pour que les prochains ajouts repartent d'une ligne propre
+            with open(self.chemin_journal, "r+b") as f:
+                f.truncate(fin)
+        self._position = (stat.st_ino, fin)
+        return enregistrements
+
+    @instrumenter()
+    def actualiser(self, biblio):
+        # Rejoue les lignes écrites par les autres processus depuis la dernière lecture
+        try:
+            stat = os.stat(self.chemin_journal)
+        except FileNotFoundError:
+            stat = None
+        if self._position is not None and stat is not None and stat.st_ino == self._position[0]:
+            if stat.st_size == self._position[1]:
+                return
+            if stat.st_size > self._position[1]:
+                enregistrements = self._lire_journal(self._position[1])
+                # La suite attendue commence au numéro suivant ; sinon le fichier a été remplacé
+                if not enregistrements or enregistrements[0]["seq"] == self._seq + 1:
+                    self._appliquer(biblio, enregistrements)
+                    return
+        # Le journal a été scellé par un autre processus : notre fichier ouvert est devenu un
+        # segment, et les lignes manquantes sont dans les segments ou déjà dans un snapshot
+        if self._fichier is not None:
+            self._fichier.close()
+            self._fichier = None
+        with self._verrou_snapshot:
+            seq_snapshot = self._seq_snapshot()
+            if seq_snapshot > self._seq:
+                # Segments peut-être déjà supprimés : on part des fichiers du snapshot
+                self._fusionner_fichiers(biblio)
+                self._seq = seq_snapshot
+            enregistrements = []
+            for seq_segment, chemin in self._segments():
+                if seq_segment > self._seq:
+                    enregistrements += self._lire(chemin)[0]
+            enregistrements += self._lire_journal(0)
+        self._appliquer(biblio, enregistrements)
+
+    def _appliquer(self, biblio, enregistrements):
+        # Regroupe l'état final de chaque enregistrement touché, appliqué en une fois
+        livres = {}
+        membres = {}
+        for enregistrement in enregistrements:
+            if enregistrement["seq"] > self._seq:
+                livres.update(enregistrement.get("livres", {}))
+                membres.update(enregistrement.get("membres", {}))
+                self._seq = enregistrement["seq"]
+        if livres or membres:
+            biblio._appliquer_changements_externes(livres, membres)
+
+    def _rejouer(self, biblio, enregistrement):
+        for isbn, d in enregistrement.get("livres", {}).items():
+            if d is None:
+                biblio.livres.pop(isbn, None)
+            else:
+                biblio.livres[isbn] = Livre(**d)
+        for id_, d in enregistrement.get("membres", {}).items():
+            if d is None:
+                biblio.membres.pop(id_, None)
+            else:
+                membre = Membre(id_, d["nom"])
+                membre.livres_empruntes = d["livres_empruntes"]
+                membre.echeances = d.get("echeances", {})
+                membre.reservations = d.get("reservations", {})
+                biblio.membres[id_] = membre
+
+    def _ouvrir(self):
+        if self._fichier is None:
+            self._fichier = open(self.chemin_journal, "a", encoding="utf-8")
+        return self._fichier
+
+    @instrumenter()
+    def changement(self, biblio, livres=(), membres=()):
+        with self.verrou:
+            self._seq += 1
+            enregistrement = {"seq": self._seq}
+            if livres:
+                enregistrement["livres"] = {}
+                for isbn in livres:
+                    livre = biblio.livres.get(isbn)
+                    enregistrement["livres"][isbn] = livre.vers_dict() if livre else None
+            if membres:
+                enregistrement["membres"] = {}
+                for id_ in membres:
+                    membre = biblio.membres.get(id_)
+                    enregistrement["membres"][id_] = membre.vers_dict() if membre else None
+            f = self._ouvrir()
+            ligne = json.dumps(enregistrement, separators=(",", ":")) + "\n"
+            f.write(ligne)
+            registre.compter("stockage.octets_journal", len(ligne))
+            f.flush()
+            stat = os.fstat(f.fileno())
+            self._position = (stat.st_ino, stat.st_size)
+            if self.verrou.premiere_acquisition:
+                os.fsync(f.fileno())
+            else:
+                # Dans une opération : fsync après la libération du verrou
+                self._a_synchroniser = True
+            self._operations += 1
+            if self._operations >= self.snapshot_tous:
+                self._declencher_snapshot(biblio)
+
+    @instrumenter()
+    def _apres_operation(self):
+        if self._a_synchroniser and self._fichier is not None:
+            os.fsync(self._fichier.fileno())
+        self._a_synchroniser = False
+
+    def _declencher_snapshot(self, biblio):
+        if self._thread is not None and self._thread.is_alive():
+            return  # Un snapshot est déjà en cours, on réessaiera à la prochaine opération
+        # Scelle le journal courant : les nouvelles opérations iront dans un nouveau fichier
+        if self._fichier is not None:
+            if self._a_synchroniser:
+                os.fsync(self._fichier.fileno())
+                self._a_synchroniser = False
+            self._fichier.close()
+            self._fichier = None
+        if os.path.exists(self.chemin_journal):
+            os.replace(self.chemin_journal, os.path.join(self.dossier, f"journal-{self._seq:012d}.jsonl"))
+        # Nouveau journal vide tout de suite : les autres processus voient le changement d'inode
+        f = self._ouvrir()
+        self._position = (os.fstat(f.fileno()).st_ino, 0)
+        # Copie de l'état sur le thread principal pour que le thread d'écriture
+        # ne lise jamais des objets en cours de modification
+        livres = {isbn: livre.vers_dict() for isbn, livre in biblio.livres.items()}
+        membres = {id_: m.vers_dict() for id_, m in biblio.membres.items()}
+        self._operations = 0
+        self._thread = threading.Thread(target=self._ecrire_snapshot, args=(livres, membres, self._seq), daemon=True)
+        self._thread.start()
+
+    @instrumenter()
+    def _ecrire_snapshot(self, livres, membres, seq):
+        with self._verrou_snapshot:
+            if self._seq_snapshot() >= seq:
+                return  # Un autre processus a déjà écrit un snapshot plus récent
+            ecrire_json_atomique(self.chemin_livres, livres)
+            self._ecrire_snapshot_binaire(livres)
+            ecrire_json_atomique(self.chemin_membres, membres)
+            ecrire_json_atomique(self.chemin_meta, {"seq": seq})
+            for seq_segment, chemin in self._segments():
+                if seq_segment <= seq:
+                    try:
+                        os.remove(chemin)
+                    except FileNotFoundError:
+                        pass
+
+    @instrumenter()
+    def sauvegarder(self, biblio):
+        # Chaque opération est déjà écrite et synchronisée dans le journal :
+        # le coût ne dépend plus de la taille du catalogue
+        with self.verrou:
+            if self._fichier is not None:
+                self._fichier.flush()
+            self.historique_writer.flush()
+
+    def fermer(self, biblio):
+        super().fermer(biblio)
+        if self._thread is not None:
+            self._thread.join()
+        if self._fichier is not None:
+            self._fichier.close()
+            self._fichier = None
@@ -0,0 +1,750 @@
+import json
+import os
+import sqlite3
+import weakref
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from datetime import datetime
+from types import MappingProxyType
+from classes.livre import Livre
+from classes.membre import Membre, DUREE_EMPRUNT, QUOTA_EMPRUNTS
+from classes.echeances import prolongation
+from classes.reservations import fin_retrait
+from classes.historique_partitions import en_texte, historique_du_dossier
+from classes.mesures import instrumenter, registre
+from classes.verrou import VerrouFichier
+from classes.exceptions import *
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS livres (
+    isbn   TEXT PRIMARY KEY,
+    titre  TEXT NOT NULL,
+    auteur TEXT NOT NULL,
+    annee  TEXT NOT NULL,
+    genre  TEXT NOT NULL,
+    statut TEXT NOT NULL DEFAULT 'disponible'
+);
+CREATE INDEX IF NOT EXISTS idx_livres_statut ON livres(statut);
+CREATE INDEX IF NOT EXISTS idx_livres_genre ON livres(genre);
+CREATE INDEX IF NOT EXISTS idx_livres_auteur ON livres(auteur);
+
+CREATE TABLE IF NOT EXISTS membres (
+    id_membre TEXT PRIMARY KEY,
+    nom       TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS emprunts (
+    isbn      TEXT PRIMARY KEY REFERENCES livres(isbn) ON DELETE CASCADE,
+    id_membre TEXT NOT NULL REFERENCES membres(id_membre) ON DELETE CASCADE,
+    date      TEXT NOT NULL,
+    echeance  TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_emprunts_membre ON emprunts(id_membre);
+CREATE INDEX IF NOT EXISTS idx_emprunts_echeance ON emprunts(echeance);
+
+CREATE TABLE IF NOT EXISTS historique (
+    id        INTEGER PRIMARY KEY,
+    date      TEXT NOT NULL,
+    isbn      TEXT NOT NULL,
+    id_membre TEXT NOT NULL,
+    action    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_historique_date ON historique(date);
+CREATE INDEX IF NOT EXISTS idx_historique_isbn ON historique(isbn);
+CREATE INDEX IF NOT EXISTS idx_historique_membre ON historique(id_membre);
+
+-- retrait : fin de la mise de côté du livre pour ce membre, NULL tant qu'il attend dans la file
+CREATE TABLE IF NOT EXISTS reservations (
+    isbn      TEXT NOT NULL REFERENCES livres(isbn) ON DELETE CASCADE,
+    id_membre TEXT NOT NULL REFERENCES membres(id_membre) ON DELETE CASCADE,
+    date      TEXT NOT NULL,
+    retrait   TEXT,
+    PRIMARY KEY (isbn, id_membre)
+);
+-- Tête de la file d'un livre (isbn, retrait IS NULL, plus petite date) et mises de côté échues
+CREATE INDEX IF NOT EXISTS idx_reservations_file ON reservations(isbn, retrait, date);
+CREATE INDEX IF NOT EXISTS idx_reservations_retrait ON reservations(retrait);
+CREATE INDEX IF NOT EXISTS idx_reservations_membre ON reservations(id_membre);
+
+-- Le statut d'un livre suit la table des emprunts
+CREATE TRIGGER IF NOT EXISTS emprunt_ajoute AFTER INSERT ON emprunts BEGIN
+    UPDATE livres SET statut = 'emprunté' WHERE isbn = NEW.isbn;
+END;
+CREATE TRIGGER IF NOT EXISTS emprunt_supprime AFTER DELETE ON emprunts BEGIN
+    UPDATE livres SET statut = 'disponible' WHERE isbn = OLD.isbn;
+END;
+"""
+
+# Vérifications de statut et de quota + insertion en une seule instruction :
+# aucune autre connexion ne peut s'intercaler entre le contrôle et l'emprunt.
+# Un livre mis de côté ne peut être emprunté que par son réservataire ; les réservations
+# comptent dans le quota, sauf celle que l'emprunt honore
+SQL_EMPRUNTER = """
+INSERT INTO emprunts (isbn, id_membre, date, echeance)
+SELECT l.isbn, m.id_membre, ?, ?
+FROM livres l, membres m
+WHERE l.isbn = ? AND m.id_membre = ?
+  AND (l.statut = 'disponible' OR (l.statut = 'réservé' AND EXISTS (
+       SELECT 1 FROM reservations r WHERE r.isbn = l.isbn AND r.id_membre = m.id_membre AND r.retrait IS NOT NULL)))
+  AND (SELECT COUNT(*) FROM emprunts e WHERE e.id_membre = m.id_membre)
+    + (SELECT COUNT(*) FROM reservations r WHERE r.id_membre = m.id_membre AND r.isbn <> l.isbn) < ?
+"""
+
+# Emprunts migrés depuis un membres.json sans échéances : échéance comptée depuis leur
+# dernière ligne "emprunt" de l'historique, ou depuis la date de l'emprunt
+SQL_DATER_EMPRUNTS = """
+UPDATE emprunts SET echeance = strftime('%Y-%m-%dT%H:%M:%S', COALESCE(
+    (SELECT MAX(h.date) FROM historique h
+     WHERE h.isbn = emprunts.isbn AND h.id_membre = emprunts.id_membre AND h.action = 'emprunt'),
+    date), ?)
+WHERE echeance IS NULL
+"""
+
+
+class LivresSQLite(MutableMapping):
+    # Vue dict-like sur la table livres : rien n'est chargé à l'avance, chaque accès
+    # est une requête sur la clé primaire. Les objets déjà distribués sont gardés dans
+    # un cache faible pour que deux accès au même ISBN renvoient le même objet.
+    def __init__(self, connexion):
+        self.connexion = connexion
+        self._cache = weakref.WeakValueDictionary()
+
+    def __getitem__(self, isbn):
+        livre = self._cache.get(isbn)
+        if livre is not None:
+            return livre
+        row = self.connexion.execute(
+            "SELECT isbn, titre, auteur, annee, genre, statut FROM livres WHERE isbn = ?", (isbn,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(isbn)
+        livre = Livre(*row)
+        self._cache[isbn] = livre
+        return livre
+
+    def __contains__(self, isbn):
+        return self.connexion.execute("SELECT 1 FROM livres WHERE isbn = ?", (isbn,)).fetchone() is not None
+
+    def __setitem__(self, isbn, livre):
+        self.connexion.execute(
+            "INSERT INTO livres (isbn, titre, auteur, annee, genre, statut) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(isbn) DO UPDATE SET titre = excluded.titre, auteur = excluded.auteur, "
+            "annee = excluded.annee, genre = excluded.genre",
+            (isbn, livre.titre, livre.auteur, livre.annee, livre.genre, livre.statut),
+        )
+        self._cache[isbn] = livre
+
+    def __delitem__(self, isbn):
+        if self.connexion.execute("DELETE FROM livres WHERE isbn = ?", (isbn,)).rowcount == 0:
+            raise KeyError(isbn)
+        self._cache.pop(isbn, None)
+
+    def __iter__(self):
+        for (isbn,) in self.connexion.execute("SELECT isbn FROM livres ORDER BY rowid"):
+            yield isbn
+
+    def __len__(self):
+        return self.connexion.execute("SELECT COUNT(*) FROM livres").fetchone()[0]
+
+    def values(self):
+        # Un seul parcours de la table au lieu d'une requête par clé
+        for row in self.connexion.execute("SELECT isbn, titre, auteur, annee, genre, statut FROM livres ORDER BY rowid"):
+            livre = self._cache.get(row[0])
+            if livre is None:
+                livre = Livre(*row)
+                self._cache[row[0]] = livre
+            yield livre
+
+    def items(self):
+        for livre in self.values():
+            yield livre.isbn, livre
+
+
+def lire_emprunts(membre, empruntes, reservations=()):
+    # reservations : liste de (isbn, date, retrait)
+    membre.livres_empruntes = [isbn for isbn, _ in empruntes]
+    membre.echeances = {isbn: echeance for isbn, echeance in empruntes if echeance is not None}
+    membre.reservations = {isbn: (date, retrait) for isbn, date, retrait in reservations}
+
+
+def emprunts_du_membre(connexion, id_membre):
+    return (connexion.execute(
+                "SELECT isbn, echeance FROM emprunts WHERE id_membre = ? ORDER BY rowid", (id_membre,)).fetchall(),
+            connexion.execute(
+                "SELECT isbn, date, retrait FROM reservations WHERE id_membre = ? ORDER BY date", (id_membre,)).fetchall())
+
+
+class MembresSQLite(MutableMapping):
+    # Même principe que LivresSQLite ; livres_empruntes est lu dans la table emprunts
+    # et les réservations dans la table reservations
+    def __init__(self, connexion):
+        self.connexion = connexion
+        self._cache = weakref.WeakValueDictionary()
+
+    def _construire(self, id_membre, nom, empruntes, reservations=()):
+        # empruntes : liste de (isbn, échéance)
+        membre = Membre(id_membre, nom)
+        lire_emprunts(membre, empruntes, reservations)
+        self._cache[id_membre] = membre
+        return membre
+
+    def __getitem__(self, id_membre):
+        membre = self._cache.get(id_membre)
+        if membre is not None:
+            return membre
+        row = self.connexion.execute("SELECT nom FROM membres WHERE id_membre = ?", (id_membre,)).fetchone()
+        if row is None:
+            raise KeyError(id_membre)
+        return self._construire(id_membre, row[0], *emprunts_du_membre(self.connexion, id_membre))
+
+    def __contains__(self, id_membre):
+        return self.connexion.execute("SELECT 1 FROM membres WHERE id_membre = ?", (id_membre,)).fetchone() is not None
+
+    def __setitem__(self, id_membre, membre):
+        # Les emprunts ne sont modifiés que par les transactions d'emprunt et de retour
+        self.connexion.execute(
+            "INSERT INTO membres (id_membre, nom) VALUES (?, ?) "
+            "ON CONFLICT(id_membre) DO UPDATE SET nom = excluded.nom",
+            (id_membre, membre.nom),
+        )
+        self._cache[id_membre] = membre
+
+    def __delitem__(self, id_membre):
+        if self.connexion.execute("DELETE FROM membres WHERE id_membre = ?", (id_membre,)).rowcount == 0:
+            raise KeyError(id_membre)
+        self._cache.pop(id_membre, None)
+
+    def __iter__(self):
+        for (id_membre,) in self.connexion.execute("SELECT id_membre FROM membres ORDER BY rowid"):
+            yield id_membre
+
+    def __len__(self):
+        return self.connexion.execute("SELECT COUNT(*) FROM membres").fetchone()[0]
+
+    def values(self):
+        empruntes = {}
+        for isbn, id_membre, echeance in self.connexion.execute(
+                "SELECT isbn, id_membre, echeance FROM emprunts ORDER BY rowid"):
+            empruntes.setdefault(id_membre, []).append((isbn, echeance))
+        reservations = {}
+        for isbn, id_membre, date, retrait in self.connexion.execute(
+                "SELECT isbn, id_membre, date, retrait FROM reservations ORDER BY date"):
+            reservations.setdefault(id_membre, []).append((isbn, date, retrait))
+        for id_membre, nom in self.connexion.execute("SELECT id_membre, nom FROM membres ORDER BY rowid").fetchall():
+            membre = self._cache.get(id_membre)
+            yield membre if membre is not None else self._construire(
+                id_membre, nom, empruntes.get(id_membre, []), reservations.get(id_membre, []))
+
+    def items(self):
+        for membre in self.values():
+            yield membre.id_membre, membre
+
+
+class IndexSQLite:
+    # Même interface que classes.index.IndexSecondaires, servie par les index de la base
+    def __init__(self, stockage):
+        self.stockage = stockage
+
+    def isbns(self, champ, valeur):
+        # champ est vérifié par Bibliotheque.livres_par (statut, genre ou auteur)
+        return [isbn for (isbn,) in self.stockage._ouvrir().execute(
+            f"SELECT isbn FROM livres WHERE {champ} = ? ORDER BY rowid", (valeur,))]
+
+    def emprunteur(self, isbn):
+        row = self.stockage._ouvrir().execute("SELECT id_membre FROM emprunts WHERE isbn = ?", (isbn,)).fetchone()
+        return row[0] if row else None
+
+
+class EcheancierSQLite:
+    # Même interface que classes.echeances.Echeancier, servie par l'index idx_emprunts_echeance
+    def __init__(self, stockage):
+        self.stockage = stockage
+
+    def a_echeance(self, debut, fin):
+        conditions, parametres = ["echeance < ?"], [en_texte(fin)]
+        if debut is not None:
+            conditions.append("echeance >= ?")
+            parametres.append(en_texte(debut))
+        return self.stockage._ouvrir().execute(
+            f"SELECT echeance, isbn, id_membre FROM emprunts WHERE {' AND '.join(conditions)} ORDER BY echeance, isbn",
+            parametres).fetchall()
+
+    def en_retard(self, maintenant):
+        return self.a_echeance(None, maintenant)
+
+
+class ReservationsSQLite:
+    # Même interface de lecture que classes.reservations.FilesReservations, servie par les
+    # index idx_reservations_file et idx_reservations_retrait
+    def __init__(self, stockage):
+        self.stockage = stockage
+
+    def en_attente(self, isbn):
+        return [id_membre for (id_membre,) in self.stockage._ouvrir().execute(
+            "SELECT id_membre FROM reservations WHERE isbn = ? AND retrait IS NULL ORDER BY date", (isbn,))]
+
+    def detenteur(self, isbn):
+        row = self.stockage._ouvrir().execute(
+            "SELECT id_membre FROM reservations WHERE isbn = ? AND retrait IS NOT NULL", (isbn,)).fetchone()
+        return row[0] if row else None
+
+    def prochaine_expiration(self):
+        return self.stockage._ouvrir().execute("SELECT MIN(retrait) FROM reservations").fetchone()[0]
+
+
+class StockageSQLite:
+    # Persistance dans data/bibliotheque.db (module sqlite3 de la bibliothèque standard).
+    # biblio.livres et biblio.membres deviennent des vues sur les tables : charger() ne lit
+    # plus tout le catalogue et une recherche par ISBN reste une requête indexée.
+    # Plusieurs processus peuvent partager la base : SQLite verrouille lui-même les écritures,
+    # et PRAGMA data_version signale les validations faites par les autres connexions.
+    transactionnel = True
+
+    def __init__(self, dossier="data", nom_fichier="bibliotheque.db", attente=30.0):
+        self.dossier = dossier
+        self.chemin = os.path.join(dossier, nom_fichier)
+        # Secondes d'attente quand un autre processus écrit dans la base
+        self.attente = attente
+        self.connexion = None
+        self.index = IndexSQLite(self)
+        self.echeancier = EcheancierSQLite(self)
+        self.reservations = ReservationsSQLite(self)
+        self._data_version = None
+        # Plus grand id de l'historique déjà lu par les analyses, et ids écrits depuis par ce processus
+        self._historique_vu = None
+        self._historique_propres = set()
+
+    def _ouvrir(self):
+        if self.connexion is None:
+            nouvelle = not os.path.exists(self.chemin)
+            # Mode autocommit : les transactions sont ouvertes explicitement dans _transaction()
+            self.connexion = sqlite3.connect(self.chemin, isolation_level=None, timeout=self.attente)
+            self.connexion.execute("PRAGMA foreign_keys = ON")
+            self.connexion.execute("PRAGMA journal_mode = WAL")
+            self.connexion.executescript(SCHEMA)
+            if nouvelle:
+                migrer_json_vers_sqlite(self.dossier, self.connexion)
+        return self.connexion
+
+    @contextmanager
+    def _transaction(self):
+        connexion = self._ouvrir()
+        if connexion.in_transaction:
+            # Opération d'un lot (voir lot()) : un savepoint permet d'annuler cette seule
+            # opération si elle échoue, sans toucher aux précédentes
+            connexion.execute("SAVEPOINT operation")
+            try:
+                yield connexion
+            except BaseException:
+                connexion.execute("ROLLBACK TO operation")
+                connexion.execute("RELEASE operation")
+                raise
+            connexion.execute("RELEASE operation")
+            return
+        connexion.execute("BEGIN IMMEDIATE")
+        try:
+            yield connexion
+        except BaseException:
+            connexion.execute("ROLLBACK")
+            raise
+        connexion.execute("COMMIT")
+        registre.compter("sqlite.commits")
+
+    @contextmanager
+    def lot(self):
+        # Transaction englobant plusieurs opérations (Bibliotheque.transaction) : un seul COMMIT
+        # à la fin, ou un ROLLBACK de tout le lot si une exception en sort
+        with self._transaction():
+            yield
+
+    @instrumenter()
+    def charger(self, biblio):
+        connexion = self._ouvrir()
+        biblio.livres = LivresSQLite(connexion)
+        biblio.membres = MembresSQLite(connexion)
+        self._data_version = self._lire_data_version()
+
+    def instantane(self):
+        # Livres et membres lus dans une transaction de lecture ouverte sur une connexion à part :
+        # en mode WAL, elle voit la base telle qu'à son premier SELECT, quelles que soient les
+        # écritures validées ensuite (par ce processus ou un autre). Renvoie (livres, membres, fermer)
+        self._ouvrir()
+        connexion = sqlite3.connect(self.chemin, isolation_level=None, timeout=self.attente, check_same_thread=False)
+        connexion.execute("BEGIN")
+        connexion.execute("SELECT COUNT(*) FROM livres").fetchone()
+        return MappingProxyType(LivresSQLite(connexion)), MappingProxyType(MembresSQLite(connexion)), connexion.close
+
+    def _lire_data_version(self):
+        return self._ouvrir().execute("PRAGMA data_version").fetchone()[0]
+
+    @contextmanager
+    def operation(self, biblio):
+        # Le verrou d'écriture est pris par BEGIN IMMEDIATE dans _transaction()
+        if not self._ouvrir().in_transaction:
+            self.actualiser(biblio)
+        yield
+
+    @instrumenter()
+    def actualiser(self, biblio):
+        # Un autre processus a validé une transaction : les objets déjà distribués sont relus
+        data_version = self._lire_data_version()
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        connexion = self._ouvrir()
+        for isbn, livre in list(biblio.livres._cache.items()):
+            row = connexion.execute(
+                "SELECT titre, auteur, annee, genre, statut FROM livres WHERE isbn = ?", (isbn,)).fetchone()
+            if row is None:
+                biblio.livres._cache.pop(isbn, None)
+            else:
+                livre.titre, livre.auteur, livre.annee, livre.genre, livre.statut = row
+        for id_membre, membre in list(biblio.membres._cache.items()):
+            row = connexion.execute("SELECT nom FROM membres WHERE id_membre = ?", (id_membre,)).fetchone()
+            if row is None:
+                biblio.membres._cache.pop(id_membre, None)
+            else:
+                membre.nom = row[0]
+                lire_emprunts(membre, *emprunts_du_membre(connexion, id_membre))
+        biblio._recharge_externe()
+
+    @instrumenter()
+    def changement(self, biblio, livres=(), membres=()):
+        # Réécrit les enregistrements modifiés en mémoire (modifier_livre, ...)
+        with self._transaction():
+            for isbn in livres:
+                livre = biblio.livres._cache.get(isbn)
+                if livre is not None:
+                    biblio.livres[isbn] = livre
+            for id_membre in membres:
+                membre = biblio.membres._cache.get(id_membre)
+                if membre is not None:
+                    biblio.membres[id_membre] = membre
+
+    @instrumenter()
+    def emprunter(self, biblio, isbn, id_membre, echeance):
+        with self._transaction() as connexion:
+            cur = connexion.execute(SQL_EMPRUNTER, (datetime.now().isoformat(), echeance, isbn, id_membre, QUOTA_EMPRUNTS))
+            if cur.rowcount == 0:
+                # L'emprunt a été refusé : on retrouve la condition qui a échoué
+                if connexion.execute("SELECT 1 FROM membres WHERE id_membre = ?", (id_membre,)).fetchone() is None:
+                    raise MembreInexistantError()
+                row = connexion.execute("SELECT statut FROM livres WHERE isbn = ?", (isbn,)).fetchone()
+                if row is None:
+                    raise LivreInexistantError()
+                if row[0] == "réservé" and connexion.execute(
+                        "SELECT 1 FROM reservations WHERE isbn = ? AND id_membre = ? AND retrait IS NOT NULL",
+                        (isbn, id_membre)).fetchone() is None:
+                    raise LivreIndisponibleError("Le livre est mis de côté pour un autre membre.")
+                if row[0] not in ("disponible", "réservé"):
+                    raise LivreIndisponibleError()
+                raise QuotaEmpruntDepasseError()
+            # L'emprunt honore la réservation du membre, s'il en avait une
+            connexion.execute("DELETE FROM reservations WHERE isbn = ? AND id_membre = ?", (isbn, id_membre))
+        # Met à jour les objets déjà distribués par les vues
+        livre = biblio.livres._cache.get(isbn)
+        if livre is not None:
+            livre.statut = "emprunté"
+        membre = biblio.membres._cache.get(id_membre)
+        if membre is not None:
+            membre.retirer_reservation(isbn)
+            membre.livres_empruntes.append(isbn)
+            membre.fixer_echeance(isbn, echeance)
+
+    @instrumenter()
+    def retourner(self, biblio, isbn, id_membre):
+        with self._transaction() as connexion:
+            cur = connexion.execute("DELETE FROM emprunts WHERE isbn = ? AND id_membre = ?", (isbn, id_membre))
+            if cur.rowcount == 0:
+                raise LivreInexistantError("Le livre n'est pas emprunté par ce membre.")
+            remise = self._remettre(biblio, connexion, isbn)
+        membre = biblio.membres._cache.get(id_membre)
+        if membre is not None and isbn in membre.livres_empruntes:
+            membre.livres_empruntes.remove(isbn)
+        return self._retenir(biblio, isbn, remise)
+
+    def _remettre(self, biblio, connexion, isbn):
+        # Dans la transaction d'un retour (ou d'une fin de mise de côté) : le livre est mis de côté
+        # pour le premier membre de sa file, lu par idx_reservations_file, sinon il redevient
+        # disponible. Renvoie (id_membre, date de réservation, fin de mise de côté) ou None
+        row = connexion.execute(
+            "SELECT id_membre, date FROM reservations WHERE isbn = ? AND retrait IS NULL ORDER BY date LIMIT 1",
+            (isbn,)).fetchone()
+        biblio._memoriser(livres=[isbn], membres=[row[0]] if row else ())
+        if row is None:
+            connexion.execute("UPDATE livres SET statut = 'disponible' WHERE isbn = ?", (isbn,))
+            return None
+        retrait = fin_retrait(datetime.now())
+        connexion.execute("UPDATE reservations SET retrait = ? WHERE isbn = ? AND id_membre = ?", (retrait, isbn, row[0]))
+        connexion.execute("UPDATE livres SET statut = 'réservé' WHERE isbn = ?", (isbn,))
+        return row[0], row[1], retrait
+
+    def _retenir(self, biblio, isbn, remise):
+        # Après validation de _remettre : met à jour les objets déjà distribués, renvoie le
+        # membre pour qui le livre est mis de côté ou None
+        livre = biblio.livres._cache.get(isbn)
+        if livre is not None:
+            livre.statut = "disponible" if remise is None else "réservé"
+        if remise is None:
+            return None
+        id_membre, date, retrait = remise
+        membre = biblio.membres._cache.get(id_membre)
+        if membre is not None:
+            membre.fixer_reservation(isbn, date, retrait)
+        return id_membre
+
+    @instrumenter()
+    def reserver(self, biblio, isbn, id_membre, date):
+        with self._transaction() as connexion:
+            if connexion.execute("SELECT 1 FROM membres WHERE id_membre = ?", (id_membre,)).fetchone() is None:
+                raise MembreInexistantError()
+            row = connexion.execute("SELECT statut FROM livres WHERE isbn = ?", (isbn,)).fetchone()
+            if row is None:
+                raise LivreInexistantError()
+            if row[0] == "disponible":
+                raise ReservationImpossibleError("Le livre est disponible : il peut être emprunté.")
+            if connexion.execute(
+                    "SELECT 1 FROM emprunts WHERE isbn = ? AND id_membre = ? "
+                    "UNION ALL SELECT 1 FROM reservations WHERE isbn = ? AND id_membre = ?",
+                    (isbn, id_membre, isbn, id_membre)).fetchone() is not None:
+                raise ReservationImpossibleError("Le membre a déjà emprunté ou réservé ce livre.")
+            if connexion.execute(
+                    "SELECT (SELECT COUNT(*) FROM emprunts WHERE id_membre = ?) "
+                    "+ (SELECT COUNT(*) FROM reservations WHERE id_membre = ?)",
+                    (id_membre, id_membre)).fetchone()[0] >= QUOTA_EMPRUNTS:
+                raise QuotaEmpruntDepasseError()
+            connexion.execute("INSERT INTO reservations (isbn, id_membre, date) VALUES (?, ?, ?)", (isbn, id_membre, date))
+            rang = connexion.execute(
+                "SELECT COUNT(*) FROM reservations WHERE isbn = ? AND retrait IS NULL AND date <= ?",
+                (isbn, date)).fetchone()[0]
+        membre = biblio.membres._cache.get(id_membre)
+        if membre is not None:
+            membre.fixer_reservation(isbn, date)
+        return rang
+
+    @instrumenter()
+    def annuler_reservation(self, biblio, isbn, id_membre):
+        with self._transaction() as connexion:
+            row = connexion.execute(
+                "SELECT retrait FROM reservations WHERE isbn = ? AND id_membre = ?", (isbn, id_membre)).fetchone()
+            if row is None:
+                raise ReservationImpossibleError("Le membre n'a pas réservé ce livre.")
+            connexion.execute("DELETE FROM reservations WHERE isbn = ? AND id_membre = ?", (isbn, id_membre))
+            remise = self._remettre(biblio, connexion, isbn) if row[0] is not None else None
+        membre = biblio.membres._cache.get(id_membre)
+        if membre is not None:
+            membre.retirer_reservation(isbn)
+        return self._retenir(biblio, isbn, remise) if row[0] is not None else None
+
+    @instrumenter()
+    def expirer(self, biblio, maintenant):
+        # Mises de côté échues, lues par idx_reservations_retrait : chaque livre passe au suivant
+        with self._transaction() as connexion:
+            echues = connexion.execute(
+                "SELECT isbn, id_membre FROM reservations WHERE retrait <= ? ORDER BY retrait", (maintenant,)).fetchall()
+            remises = []
+            for isbn, id_membre in echues:
+                biblio._memoriser(membres=[id_membre])
+                connexion.execute("DELETE FROM reservations WHERE isbn = ? AND id_membre = ?", (isbn, id_membre))
+                remises.append(self._remettre(biblio, connexion, isbn))
+        expirees = []
+        for (isbn, id_membre), remise in zip(echues, remises):
+            membre = biblio.membres._cache.get(id_membre)
+            if membre is not None:
+                membre.retirer_reservation(isbn)
+            expirees.append((isbn, id_membre, self._retenir(biblio, isbn, remise)))
+        return expirees
+
+    @instrumenter()
+    def prolonger(self, biblio, isbn, id_membre, jours):
+        with self._transaction() as connexion:
+            row = connexion.execute(
+                "SELECT echeance FROM emprunts WHERE isbn = ? AND id_membre = ?", (isbn, id_membre)).fetchone()
+            if row is None:
+                raise LivreInexistantError("Le livre n'est pas emprunté par ce membre.")
+            echeance = prolongation(row[0], jours)
+            connexion.execute("UPDATE emprunts SET echeance = ? WHERE isbn = ?", (echeance, isbn))
+        membre = biblio.membres._cache.get(id_membre)
+        if membre is not None and isbn in membre.livres_empruntes:
+            membre.fixer_echeance(isbn, echeance)
+        return echeance
+
+    @instrumenter()
+    def supprimer_livre(self, biblio, isbn):
+        with self._transaction() as connexion:
+            row = connexion.execute("SELECT id_membre FROM emprunts WHERE isbn = ?", (isbn,)).fetchone()
+            reservataires = [id_membre for (id_membre,) in connexion.execute(
+                "SELECT id_membre FROM reservations WHERE isbn = ?", (isbn,))]
+            # Les emprunts et les réservations du livre sont supprimés en cascade
+            if connexion.execute("DELETE FROM livres WHERE isbn = ?", (isbn,)).rowcount == 0:
+                raise LivreInexistantError()
+        biblio.livres._cache.pop(isbn, None)
+        membre = biblio.membres._cache.get(row[0]) if row else None
+        if membre is not None and isbn in membre.livres_empruntes:
+            membre.livres_empruntes.remove(isbn)
+        for id_membre in reservataires:
+            membre = biblio.membres._cache.get(id_membre)
+            if membre is not None:
+                membre.retirer_reservation(isbn)
+
+    @instrumenter()
+    def supprimer_membre(self, biblio, id_membre):
+        with self._transaction() as connexion:
+            rendus = [isbn for (isbn,) in connexion.execute(
+                "SELECT isbn FROM emprunts WHERE id_membre = ?", (id_membre,))]
+            retenus = [isbn for (isbn,) in connexion.execute(
+                "SELECT isbn FROM reservations WHERE id_membre = ? AND retrait IS NOT NULL", (id_membre,))]
+            # Les emprunts et les réservations sont supprimés en cascade ; les livres empruntés
+            # ou mis de côté passent au premier de leur file, ou redeviennent disponibles
+            if connexion.execute("DELETE FROM membres WHERE id_membre = ?", (id_membre,)).rowcount == 0:
+                raise MembreInexistantError()
+            liberes = retenus + rendus
+            remises = [self._remettre(biblio, connexion, isbn) for isbn in liberes]
+        biblio.membres._cache.pop(id_membre, None)
+        return [(isbn, self._retenir(biblio, isbn, remise)) for isbn, remise in zip(liberes, remises)]
+
+    @instrumenter()
+    def historique(self, isbn, id_membre, action, date):
+        cur = self._ouvrir().execute(
+            "INSERT INTO historique (date, isbn, id_membre, action) VALUES (?, ?, ?, ?)",
+            (date, isbn, id_membre, action),
+        )
+        if self._historique_vu is not None:
+            self._historique_propres.add(cur.lastrowid)
+
+    def parcourir_historique(self, debut=None, fin=None, id_membre=None, isbn=None):
+        # Curseur parcouru ligne à ligne, sans charger toute la table ; les filtres
+        # utilisent les index sur date, isbn et id_membre
+        conditions, parametres = [], []
+        for condition, valeur in (("date >= ?", en_texte(debut)), ("date < ?", en_texte(fin)),
+                                  ("id_membre = ?", id_membre), ("isbn = ?", isbn)):
+            if valeur is not None:
+                conditions.append(condition)
+                parametres.append(valeur)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        yield from self._ouvrir().execute(
+            f"SELECT date, isbn, id_membre, action FROM historique{where} ORDER BY id", parametres)
+
+    @instrumenter()
+    def compter_par(self, champ):
+        # champ est vérifié par Bibliotheque.compter_par (statut, genre ou auteur)
+        return dict(self._ouvrir().execute(f"SELECT {champ}, COUNT(*) FROM livres GROUP BY {champ}"))
+
+    @instrumenter()
+    def emprunts_par_jour(self):
+        return dict(self._ouvrir().execute(
+            "SELECT substr(date, 1, 10), COUNT(*) FROM historique WHERE action = 'emprunt' GROUP BY 1"))
+
+    def analyses_historique(self):
+        return lire_analyses(self._ouvrir(), self._figer_historique())
+
+    def lecture_analyses(self):
+        # Historique figé maintenant ; la fonction renvoyée le lit sur une connexion à part,
+        # celle du stockage n'étant utilisable que depuis son thread
+        vu = self._figer_historique()
+        chemin, attente = self.chemin, self.attente
+
+        def lire():
+            connexion = sqlite3.connect(chemin, timeout=attente)
+            try:
+                return lire_analyses(connexion, vu)
+            finally:
+                connexion.close()
+        return lire
+
+    def _figer_historique(self):
+        # Point de départ de historique_externe()
+        self._historique_vu = self._ouvrir().execute("SELECT COALESCE(MAX(id), 0) FROM historique").fetchone()[0]
+        self._historique_propres = set()
+        return self._historique_vu
+
+    def historique_externe(self):
+        # Lignes validées par les autres processus depuis analyses_historique() ou le dernier appel
+        if self._historique_vu is None:
+            return []
+        lignes = []
+        for id_, *ligne in self._ouvrir().execute(
+                "SELECT id, date, isbn, id_membre, action FROM historique WHERE id > ? ORDER BY id", (self._historique_vu,)):
+            if id_ not in self._historique_propres:
+                lignes.append(ligne)
+            self._historique_vu = id_
+        self._historique_propres = {id_ for id_ in self._historique_propres if id_ > self._historique_vu}
+        return lignes
+
+    def sauvegarder(self, biblio):
+        # Chaque opération est validée dans sa propre transaction : rien à réécrire
+        pass
+
+    def fermer(self, biblio):
+        if self.connexion is not None:
+            self.connexion.close()
+            self.connexion = None
+
+
+def lire_analyses(connexion, vu):
+    # Historique jusqu'à l'id `vu` en tableaux ; NumPy n'est importé que pour les analyses
+    from classes.analyses import Analyses
+    return Analyses.depuis_lignes(connexion.execute(
+        "SELECT date, isbn, id_membre, action FROM historique WHERE id <= ? ORDER BY id", (vu,)))
+
+
+def migrer_json_vers_sqlite(dossier, connexion):
+    # Migration unique de data/livres.json, data/membres.json et de l'historique (data/historique/)
+    # vers une base SQLite, dans une seule transaction
+    connexion.execute("BEGIN IMMEDIATE")
+    if connexion.execute("PRAGMA user_version").fetchone()[0]:
+        # Un autre processus qui a créé la base en même temps a déjà fait la migration
+        connexion.execute("ROLLBACK")
+        return
+    try:
+        try:
+            with open(os.path.join(dossier, "livres.json"), "r", encoding="utf-8") as f:
+                livres = json.load(f)
+        except FileNotFoundError:
+            livres = {}
+        connexion.executemany(
+            "INSERT OR REPLACE INTO livres (isbn, titre, auteur, annee, genre, statut) VALUES (?, ?, ?, ?, ?, 'disponible')",
+            ((isbn, d["titre"], d["auteur"], str(d["annee"]), d["genre"]) for isbn, d in livres.items()),
+        )
+        try:
+            with open(os.path.join(dossier, "membres.json"), "r", encoding="utf-8") as f:
+                membres = json.load(f)
+        except FileNotFoundError:
+            membres = {}
+        connexion.executemany(
+            "INSERT OR REPLACE INTO membres (id_membre, nom) VALUES (?, ?)",
+            ((id_membre, d["nom"]) for id_membre, d in membres.items()),
+        )
+        # Un emprunt vers un livre inexistant (incohérence des fichiers JSON) est ignoré ;
+        # le trigger met à jour le statut des livres empruntés
+        # (les emprunts sans échéance sont datés d'après l'historique, plus bas)
+        date = datetime.now().isoformat()
+        connexion.executemany(
+            "INSERT OR IGNORE INTO emprunts (isbn, id_membre, date, echeance) "
+            "SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM livres WHERE isbn = ?)",
+            ((isbn, id_membre, date, d.get("echeances", {}).get(isbn), isbn)
+             for id_membre, d in membres.items() for isbn in d["livres_empruntes"]),
+        )
+        connexion.executemany(
+            "INSERT OR IGNORE INTO reservations (isbn, id_membre, date, retrait) "
+            "SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM livres WHERE isbn = ?)",
+            ((isbn, id_membre, date_reservation, retrait, isbn)
+             for id_membre, d in membres.items() for isbn, (date_reservation, retrait) in d.get("reservations", {}).items()),
+        )
+        connexion.execute(
+            "UPDATE livres SET statut = 'réservé' WHERE isbn IN (SELECT isbn FROM reservations WHERE retrait IS NOT NULL)")
+        historique = historique_du_dossier(dossier, VerrouFichier(os.path.join(dossier, ".verrou")))
+        try:
+            connexion.executemany(
+                "INSERT INTO historique (date, isbn, id_membre, action) VALUES (?, ?, ?, ?)",
+                historique.parcourir(),
+            )
+        finally:
+            historique.fermer()
+        connexion.execute(SQL_DATER_EMPRUNTS, (f"+{DUREE_EMPRUNT} days",))
+        connexion.execute("PRAGMA user_version = 1")
+    except BaseException:
+        connexion.execute("ROLLBACK")
+        raise
+    connexion.execute("COMMIT")
+
@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class VerrouFichier:
+    # Verrou consultatif exclusif entre processus sur un fichier (fcntl.flock, ou
+    # msvcrt.locking sous Windows). Il est réentrant dans un même processus : seule la
+    # première acquisition prend le verrou du fichier, et les threads du processus
+    # s'attendent entre eux.
+    # Les durées d'attente et de détention sont cumulées pour les mesures (bench_concurrence).
+    def __init__(self, chemin):
+        self.chemin = chemin
+        self._verrou_local = threading.RLock()
+        self._profondeur = 0
+        self._fichier = None
+        self._debut_detention = 0.0
+        self.acquisitions = 0
+        self.attente = 0.0
+        self.detention = 0.0
+        self.detention_max = 0.0
+
+    @property
+    def premiere_acquisition(self):
+        # Vrai à l'intérieur de l'acquisition la plus externe
+        return self._profondeur == 1
+
+    def acquerir(self, bloquant=True):
+        if not self._verrou_local.acquire(blocking=bloquant):
+            return False
+        if self._profondeur == 0:
+            debut = time.perf_counter()
+            try:
+                if not self._verrouiller_fichier(bloquant):
+                    self._verrou_local.release()
+                    return False
+            except BaseException:
+                self._verrou_local.release()
+                raise
+            self._debut_detention = time.perf_counter()
+            self.attente += self._debut_detention - debut
+            self.acquisitions += 1
+        self._profondeur += 1
+        return True
+
+    def liberer(self):
+        self._profondeur -= 1
+        if self._profondeur == 0:
+            duree = time.perf_counter() - self._debut_detention
+            self.detention += duree
+            self.detention_max = max(self.detention_max, duree)
+            self._deverrouiller_fichier()
+        self._verrou_local.release()
+
+    def __enter__(self):
+        self.acquerir()
+        return self
+
+    def __exit__(self, *exc):
+        self.liberer()
+
+    def _verrouiller_fichier(self, bloquant):
+        os.makedirs(os.path.dirname(self.chemin) or ".", exist_ok=True)
+        self._fichier = open(self.chemin, "a+b")
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fichier.fileno(), fcntl.LOCK_EX | (0 if bloquant else fcntl.LOCK_NB))
+            else:
+                # Verrou sur le premier octet ; LK_LOCK abandonne après 10 essais, d'où la boucle
+                self._fichier.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self._fichier.fileno(), msvcrt.LK_NBLCK if not bloquant else msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        if not bloquant:
+                            raise
+        except OSError:
+            self._fichier.close()
+            self._fichier = None
+            if bloquant:
+                raise
+            return False
+        return True
+
+    def _deverrouiller_fichier(self):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fichier.fileno(), fcntl.LOCK_UN)
+            else:
+                self._fichier.seek(0)
+                msvcrt.locking(self._fichier.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._fichier.close()
+            self._fichier = None
@@ -0,0 +1,87 @@
+import argparse
+import sys
+import time
+from classes.bibliotheque import Bibliotheque
+from classes.import_export import (TAILLE_PAQUET, exporter_historique, exporter_livres, exporter_membres,
+                                   importer_livres, importer_membres)
+
+# Import / export en ligne de commande, sans interface graphique :
+#   python cli.py importer livres nouveaux_livres.csv
+#   python cli.py importer membres membres.jsonl --paquet 5000
+#   python cli.py exporter historique historique.jsonl
+#   python cli.py --persistance sqlite exporter livres catalogue.csv
+
+
+class Progression:
+    # Affiche sur stderr le nombre d'enregistrements traités et le débit, au plus 4 fois par seconde
+    def __init__(self):
+        self.debut = time.perf_counter()
+        self.dernier_affichage = 0
+
+    def __call__(self, nb, final=False):
+        maintenant = time.perf_counter()
+        if not final and maintenant - self.dernier_affichage < 0.25:
+            return
+        self.dernier_affichage = maintenant
+        duree = maintenant - self.debut
+        debit = nb / duree if duree > 0 else 0
+        print(f"\r{nb:>12,} enregistrements  {debit:>10,.0f}/s  {duree:7.1f} s".replace(",", " "),
+              end="\n" if final else "", file=sys.stderr, flush=True)
+
+
+def importer(biblio, args):
+    progression = Progression()
+    fonction = importer_livres if args.type == "livres" else importer_membres
+    rapport = fonction(biblio, args.fichier, args.paquet, lambda r: progression(r.traites))
+    progression(rapport.traites, final=True)
+    print(f"{rapport.ajoutes} ajouté(s), {rapport.modifies} mis à jour, {rapport.rejetes} rejeté(s)")
+    for numero, raison in rapport.erreurs:
+        print(f"  ligne {numero} : {raison}", file=sys.stderr)
+    if rapport.rejetes > len(rapport.erreurs):
+        print(f"  ... et {rapport.rejetes - len(rapport.erreurs)} autre(s)", file=sys.stderr)
+    return 1 if rapport.rejetes else 0
+
+
+def exporter(biblio, args):
+    progression = Progression()
+    fonction = {"livres": exporter_livres, "membres": exporter_membres, "historique": exporter_historique}[args.type]
+    # Export d'une vue figée : les modifications faites pendant l'export (autre processus en
+    # mode sqlite) n'y apparaissent pas à moitié
+    with biblio.snapshot() as vue:
+        nb = fonction(vue, args.fichier, progression)
+    progression(nb, final=True)
+    print(f"{nb} ligne(s) écrite(s) dans {args.fichier}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import / export en flux des données de la bibliothèque")
+    parser.add_argument("--persistance", choices=("json", "journal", "sqlite"), default="journal")
+    parser.add_argument("--dossier", default="data")
+    commandes = parser.add_subparsers(dest="commande", required=True)
+
+    p_import = commandes.add_parser("importer", help="importe un fichier CSV ou JSON lines")
+    p_import.add_argument("type", choices=("livres", "membres"))
+    p_import.add_argument("fichier")
+    p_import.add_argument("--paquet", type=int, default=TAILLE_PAQUET, help="enregistrements par transaction")
+    p_import.set_defaults(fonction=importer)
+
+    p_export = commandes.add_parser("exporter", help="exporte en CSV ou JSON lines (selon l'extension)")
+    p_export.add_argument("type", choices=("livres", "membres", "historique"))
+    p_export.add_argument("fichier")
+    p_export.set_defaults(fonction=exporter)
+
+    args = parser.parse_args(argv)
+    biblio = Bibliotheque(persistance=args.persistance, dossier=args.dossier)
+    biblio.charger()
+    try:
+        return args.fonction(biblio, args)
+    except (OSError, ValueError) as e:
+        print(f"Erreur : {e}", file=sys.stderr)
+        return 2
+    finally:
+        biblio.fermer()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
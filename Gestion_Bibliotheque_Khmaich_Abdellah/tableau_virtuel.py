@@ -0,0 +1,236 @@
+import ttkbootstrap as ttk
+from classes.mesures import instrumenter
+
+# Tableau virtualisé : seules les lignes visibles existent dans le Treeview.
+# Le tableau garde la liste ordonnée des clés (ISBN, ID membre) et demande les valeurs
+# d'une ligne à la fonction `valeurs(cle)` uniquement quand elle devient visible.
+# Le défilement ne fait qu'échanger quelques lignes, et mettre_a_jour(cle) ne touche
+# qu'à la ligne concernée au lieu de tout réinsérer.
+
+
+class TableauVirtuel(ttk.Frame):
+    def __init__(self, parent, colonnes, valeurs, hauteur_ligne=None, **options):
+        # valeurs(cle) -> tuple des valeurs affichées, ou None si la clé n'existe plus
+        super().__init__(parent)
+        self.valeurs = valeurs
+        self.colonnes = colonnes
+        self._cles = []
+        self._presentes = set()
+        self._premiere = 0      # index (dans _cles) de la première ligne visible
+        self._nb_visibles = 20
+        self._tri = None        # (index de colonne, ordre inverse) ou None
+        self._cles_tri = {}     # clé -> valeur de tri, pour insérer à la bonne place
+        self._etiquetees = {}   # étiquette (tag du Treeview) -> ensemble des clés qui la portent
+        self.tree = ttk.Treeview(self, columns=colonnes, show='headings', **options)
+        for i, col in enumerate(colonnes):
+            self.tree.heading(col, text=col, command=lambda i=i: self.trier(i))
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical', command=self._defiler)
+        self.scrollbar.pack(side='right', fill='y')
+        self.tree.pack(side='left', fill='both', expand=True)
+        self._hauteur_ligne = hauteur_ligne or self._lire_hauteur_ligne()
+        self.tree.bind("<Configure>", self._redimensionner)
+        self.tree.bind("<MouseWheel>", self._molette)
+        self.tree.bind("<Button-4>", lambda e: self._decaler(-3))
+        self.tree.bind("<Button-5>", lambda e: self._decaler(3))
+        self.tree.bind("<Down>", lambda e: self._fleche(1))
+        self.tree.bind("<Up>", lambda e: self._fleche(-1))
+        self.tree.bind("<Next>", lambda e: self._decaler(self._nb_visibles) or "break")
+        self.tree.bind("<Prior>", lambda e: self._decaler(-self._nb_visibles) or "break")
+
+    def _lire_hauteur_ligne(self):
+        style = self.tree.cget("style") or "Treeview"
+        try:
+            return int(ttk.Style().lookup(style, "rowheight")) or 20
+        except (ValueError, TypeError):
+            return 20
+
+    # --- Contenu ---
+
+    @instrumenter()
+    def afficher(self, cles):
+        # Remplace la liste des clés affichées (chargement, résultat d'une recherche)
+        self._cles = list(dict.fromkeys(cles))
+        self._presentes = set(self._cles)
+        self._cles_tri = {}
+        if self._tri is not None:
+            self._trier_cles()
+        self._premiere = 0
+        self._rafraichir()
+
+    @instrumenter()
+    def mettre_a_jour(self, *cles):
+        # Met à jour les lignes des clés données : valeurs modifiées, nouvelle clé
+        # insérée à sa place, ou clé retirée si valeurs(cle) renvoie None
+        deplacement = False
+        for cle in cles:
+            valeurs = self.valeurs(cle)
+            if cle not in self._presentes:
+                if valeurs is not None:
+                    self._inserer(cle, valeurs)
+                    deplacement = True
+            elif valeurs is None:
+                self._retirer(cle)
+                deplacement = True
+            elif self._tri is not None and self._cles_tri[cle] != self._valeur_tri(valeurs):
+                # La valeur de la colonne triée a changé : la ligne change de place
+                self._retirer(cle)
+                self._inserer(cle, valeurs)
+                deplacement = True
+            elif self.tree.exists(cle):
+                self.tree.item(cle, values=valeurs)
+        if deplacement:
+            self._rafraichir()
+
+    def _retirer(self, cle):
+        if self._tri is not None:
+            # Dichotomie sur la valeur de tri, puis recherche de la clé parmi les égales
+            position = self._cles.index(cle, self._bisect(self._cles_tri[cle]))
+            del self._cles_tri[cle]
+        else:
+            position = self._cles.index(cle)
+        del self._cles[position]
+        self._presentes.discard(cle)
+        if position < self._premiere:
+            self._premiere -= 1
+
+    def _inserer(self, cle, valeurs):
+        self._presentes.add(cle)
+        if self._tri is None:
+            self._cles.append(cle)
+            return
+        valeur = self._cles_tri[cle] = self._valeur_tri(valeurs)
+        self._cles.insert(self._bisect(valeur, droite=True), cle)
+
+    def etiqueter(self, etiquette, cles):
+        # Remplace l'ensemble des clés qui portent `etiquette` (apparence réglée par
+        # tree.tag_configure) ; seules les lignes visibles qui changent sont touchées
+        cles = set(cles)
+        changees = self._etiquetees.get(etiquette, set()) ^ cles
+        self._etiquetees[etiquette] = cles
+        for cle in changees:
+            if self.tree.exists(cle):
+                self.tree.item(cle, tags=self._etiquettes(cle))
+
+    def _etiquettes(self, cle):
+        return tuple(etiquette for etiquette, cles in self._etiquetees.items() if cle in cles)
+
+    def selection(self):
+        return self.tree.selection()
+
+    def __len__(self):
+        return len(self._cles)
+
+    def __contains__(self, cle):
+        return cle in self._presentes
+
+    # --- Tri ---
+
+    def _valeur_tri(self, valeurs):
+        valeur = valeurs[self._tri[0]]
+        # Tri numérique quand la colonne s'y prête (ISBN, années, ID numériques)
+        return (0, int(valeur), "") if str(valeur).isdigit() else (1, 0, str(valeur).lower())
+
+    def _bisect(self, valeur, droite=False):
+        # Position d'insertion de `valeur` dans _cles, dans l'ordre croissant ou décroissant du tri
+        inverse = self._tri[1]
+        bas, haut = 0, len(self._cles)
+        while bas < haut:
+            milieu = (bas + haut) // 2
+            courante = self._cles_tri[self._cles[milieu]]
+            if courante == valeur:
+                avant = droite
+            else:
+                avant = (courante > valeur) if inverse else (courante < valeur)
+            if avant:
+                bas = milieu + 1
+            else:
+                haut = milieu
+        return bas
+
+    def _trier_cles(self):
+        self._cles_tri = {}
+        for cle in self._cles:
+            valeurs = self.valeurs(cle)
+            if valeurs is not None:
+                self._cles_tri[cle] = self._valeur_tri(valeurs)
+        self._cles = [c for c in self._cles if c in self._cles_tri]
+        self._presentes = set(self._cles)
+        self._cles.sort(key=self._cles_tri.__getitem__, reverse=self._tri[1])
+
+    @instrumenter()
+    def trier(self, colonne):
+        # Un clic sur l'en-tête trie par cette colonne, un second clic inverse l'ordre.
+        # Seule la liste des clés est triée : le Treeview ne reçoit que la fenêtre visible.
+        inverse = self._tri is not None and self._tri[0] == colonne and not self._tri[1]
+        self._tri = (colonne, inverse)
+        self._trier_cles()
+        for i, col in enumerate(self.colonnes):
+            fleche = (" ▼" if inverse else " ▲") if i == colonne else ""
+            self.tree.heading(col, text=col + fleche)
+        self._premiere = 0
+        self._rafraichir()
+
+    # --- Fenêtre visible ---
+
+    @instrumenter()
+    def _rafraichir(self):
+        # Aligne les lignes du Treeview sur la fenêtre [_premiere, _premiere + _nb_visibles)
+        self._premiere = max(0, min(self._premiere, len(self._cles) - self._nb_visibles))
+        fenetre = self._cles[self._premiere:self._premiere + self._nb_visibles]
+        visibles = set(fenetre)
+        actuelles = self.tree.get_children()
+        a_supprimer = [iid for iid in actuelles if iid not in visibles]
+        if a_supprimer:
+            self.tree.delete(*a_supprimer)
+        for position, cle in enumerate(fenetre):
+            if self.tree.exists(cle):
+                self.tree.move(cle, '', position)
+            else:
+                valeurs = self.valeurs(cle)
+                self.tree.insert('', position, iid=cle, values=valeurs if valeurs is not None else (),
+                                 tags=self._etiquettes(cle))
+        total = len(self._cles)
+        if total:
+            self.scrollbar.set(self._premiere / total, min(1.0, (self._premiere + len(fenetre)) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _redimensionner(self, event):
+        # Nombre de lignes visibles d'après la hauteur du widget (moins l'en-tête)
+        nb = max(1, (event.height - self._hauteur_ligne) // self._hauteur_ligne)
+        if nb != self._nb_visibles:
+            self._nb_visibles = nb
+            self._rafraichir()
+
+    def _decaler(self, nb_lignes):
+        self._premiere += nb_lignes
+        self._rafraichir()
+
+    def _defiler(self, action, quantite, unite=None):
+        # Commandes de la barre de défilement : ("moveto", fraction) ou ("scroll", n, "units"/"pages")
+        if action == "moveto":
+            self._premiere = int(float(quantite) * len(self._cles))
+            self._rafraichir()
+        elif action == "scroll":
+            pas = self._nb_visibles if unite == "pages" else 1
+            self._decaler(int(quantite) * pas)
+
+    def _molette(self, event):
+        self._decaler(-3 if event.delta > 0 else 3)
+
+    def _fleche(self, sens):
+        # Aux bords de la fenêtre, les flèches font défiler au lieu de bloquer la sélection
+        selection = self.tree.selection()
+        if not selection or not self._cles:
+            return None
+        enfants = self.tree.get_children()
+        bord = enfants[-1] if sens > 0 else enfants[0]
+        if selection[-1 if sens > 0 else 0] != bord:
+            return None
+        self._decaler(sens)
+        enfants = self.tree.get_children()
+        suivant = enfants[-1] if sens > 0 else enfants[0]
+        self.tree.selection_set(suivant)
+        self.tree.focus(suivant)
+        self.tree.see(suivant)
+        return "break"
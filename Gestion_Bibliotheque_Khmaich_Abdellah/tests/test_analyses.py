@@ -0,0 +1,42 @@
+import pytest
+from classes.bibliotheque import Bibliotheque
+from classes.livre import Livre
+from classes.membre import Membre
+
+# Lancer depuis le dossier du projet : python -m pytest
+
+
+@pytest.fixture(params=["json", "journal", "sqlite"])
+def postes(request, tmp_path):
+    # Deux processus (deux postes) sur le même dossier
+    premier = Bibliotheque(persistance=request.param, dossier=str(tmp_path))
+    premier.charger()
+    for isbn in ("X", "Y", "Z"):
+        premier.ajouter_livre(Livre(isbn, isbn, "Auteur", 2000, "Roman"))
+    for id_membre in ("A", "B"):
+        premier.enregistrer_membre(Membre(id_membre, id_membre))
+    premier.emprunter_livre("X", "A")
+    premier.sauvegarder()
+    second = Bibliotheque(persistance=request.param, dossier=str(tmp_path))
+    second.charger()
+    yield premier, second
+    premier.fermer()
+    second.fermer()
+
+
+def test_emprunts_des_autres_postes_ajoutes_aux_analyses(postes):
+    premier, second = postes
+    analyses = premier.analyses()
+    assert len(analyses) == 1
+    second.emprunter_livre("Y", "B")
+    second.sauvegarder()
+    premier.emprunter_livre("Z", "A")
+    second.retourner_livre("Y", "B")
+    second.sauvegarder()
+    premier.actualiser()
+    # Mêmes tableaux, complétés : chaque ligne une seule fois, celles de ce poste comprises
+    assert premier.analyses() is analyses
+    assert len(analyses) == 4
+    assert sorted(analyses.isbns.valeurs[code] for code in analyses.isbn) == ["X", "Y", "Y", "Z"]
+    premier.actualiser()
+    assert len(premier.analyses()) == 4
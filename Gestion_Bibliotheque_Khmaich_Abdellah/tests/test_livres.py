@@ -0,0 +1,30 @@
+import pytest
+from classes.bibliotheque import Bibliotheque
+from classes.livre import Livre
+
+# Lancer depuis le dossier du projet : python -m pytest
+
+
+@pytest.mark.parametrize("persistance", ["json", "journal", "sqlite"])
+def test_annee_refusee_laisse_le_livre_intact(persistance, tmp_path):
+    biblio = Bibliotheque(persistance=persistance, dossier=str(tmp_path))
+    biblio.charger()
+    biblio.ajouter_livre(Livre("X", "Les Misérables", "Hugo", 1862, "Roman"))
+    biblio.sauvegarder()
+    # Index construits avant la modification
+    assert [livre.isbn for livre in biblio.livres_par_auteur("Hugo")] == ["X"]
+    assert [livre.isbn for livre in biblio.rechercher("Misérables")] == ["X"]
+    with pytest.raises(ValueError):
+        biblio.modifier_livre("X", "Germinal", "Zola", "vers 1885", "Roman")
+    livre = biblio.livres["X"]
+    assert (livre.titre, livre.auteur, livre.annee) == ("Les Misérables", "Hugo", 1862)
+    assert [livre.isbn for livre in biblio.livres_par_auteur("Hugo")] == ["X"]
+    assert biblio.livres_par_auteur("Zola") == []
+    assert [livre.isbn for livre in biblio.rechercher("Misérables")] == ["X"]
+    assert biblio.rechercher("Germinal") == []
+    biblio.sauvegarder()
+    biblio.fermer()
+    relu = Bibliotheque(persistance=persistance, dossier=str(tmp_path))
+    relu.charger()
+    assert relu.livres["X"].vers_dict()["titre"] == "Les Misérables"
+    relu.fermer()
@@ -0,0 +1,122 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from classes.analyses import Analyses, Dictionnaire
+from classes.bibliotheque import Bibliotheque
+from classes.livre import Livre
+from classes.membre import Membre
+from classes.recommandations import Recommandations
+
+# Lancer depuis le dossier du projet : python -m pytest
+
+
+def historique(maintenant, annees=6):
+    # Chaque semaine pendant `annees` ans, un membre emprunte A puis B ; les deux derniers
+    # mois, deux fois par semaine, un membre emprunte A puis C
+    lignes = []
+    debut = maintenant - timedelta(days=365 * annees)
+    for semaine in range(annees * 52):
+        date = debut + timedelta(weeks=semaine)
+        lignes += [(date, "A", f"m{semaine}", "emprunt"), (date + timedelta(hours=1), "B", f"m{semaine}", "emprunt")]
+    for jour in range(0, 60, 3):
+        date = maintenant - timedelta(days=60 - jour)
+        lignes += [(date, "A", f"r{jour}", "emprunt"), (date + timedelta(hours=1), "C", f"r{jour}", "emprunt")]
+    return sorted(lignes)
+
+
+def verifier(resultats):
+    assert [isbn for isbn, _ in resultats] == ["C", "B"]
+    assert all(math.isfinite(score) and score > 0 for _, score in resultats)
+    # Emprunts des deux derniers mois, tous les 3 jours, avec une demi-vie de 14 jours : au plus 1 / (1 - 2 ** (-3 / 14))
+    assert resultats[0][1] < 1 / (1 - 2 ** (-3 / 14))
+
+
+def test_historique_de_plusieurs_annees_et_demi_vie_courte():
+    lignes = historique(datetime.now())
+    analyses = Analyses.depuis_lignes([(date.isoformat(), isbn, membre, action) for date, isbn, membre, action in lignes])
+    verifier(Recommandations.depuis_analyses(analyses, demi_vie=14).pour_livre("A"))
+
+
+def test_emprunts_recus_sur_plusieurs_annees_et_demi_vie_courte():
+    # Index construit il y a six ans et tenu à jour depuis, emprunt par emprunt
+    maintenant = datetime.now()
+    lignes = historique(maintenant)
+    reco = Recommandations(Dictionnaire(), demi_vie=14)
+    reco._origine = np.datetime64(lignes[0][0], "us")
+    for date, isbn, membre, action in lignes:
+        reco.recevoir("historique", {"date": date.isoformat(), "isbn": isbn, "id_membre": membre, "action": action})
+        if date.day == 1:
+            reco.pour_livre("A")
+    assert np.isfinite(reco._scores).all()
+    verifier(reco.pour_livre("A"))
+
+
+def test_emprunts_des_autres_postes_ajoutes_a_la_matrice(tmp_path):
+    # Deux processus sur le même dossier : la matrice est gardée et complétée par actualiser()
+    premier = Bibliotheque(persistance="journal", dossier=str(tmp_path))
+    premier.charger()
+    for isbn in ("X", "Y", "Z"):
+        premier.ajouter_livre(Livre(isbn, isbn, "Auteur", 2000, "Roman"))
+    premier.enregistrer_membre(Membre("A", "A"))
+    premier.emprunter_livre("X", "A")
+    premier.retourner_livre("X", "A")
+    second = Bibliotheque(persistance="journal", dossier=str(tmp_path))
+    second.charger()
+    assert premier.recommandations("X") == []
+    matrice = premier._recommandations
+    second.emprunter_livre("Y", "A")
+    second.sauvegarder()
+    premier.actualiser()
+    assert premier._recommandations is matrice
+    assert [(livre.isbn, score) for livre, score in premier.recommandations("X")] == [("Y", 1.0)]
+    premier.fermer()
+    second.fermer()
+
+
+@pytest.mark.parametrize("persistance", ["json", "journal", "sqlite"])
+def test_construction_sur_un_autre_thread(persistance, tmp_path):
+    premier = Bibliotheque(persistance=persistance, dossier=str(tmp_path))
+    premier.charger()
+    for isbn in ("W", "X", "Y", "Z"):
+        premier.ajouter_livre(Livre(isbn, isbn, "Auteur", 2000, "Roman"))
+    for id_membre in ("A", "B"):
+        premier.enregistrer_membre(Membre(id_membre, id_membre))
+    premier.emprunter_livre("W", "A")
+    premier.emprunter_livre("X", "A")
+    premier.sauvegarder()
+    second = Bibliotheque(persistance=persistance, dossier=str(tmp_path))
+    second.charger()
+    construire = premier.preparer_recommandations()
+    with ThreadPoolExecutor(max_workers=1) as executeur:
+        futur = executeur.submit(construire)
+        # Emprunts de ce processus et d'un autre pendant la construction
+        premier.emprunter_livre("Y", "A")
+        second.emprunter_livre("Z", "B")
+        second.sauvegarder()
+        premier.actualiser()
+        resultat = futur.result()
+    assert premier._recommandations is None
+    premier.installer_recommandations(resultat)
+    premier.sauvegarder()
+    second.fermer()
+    relu = Bibliotheque(persistance=persistance, dossier=str(tmp_path))
+    relu.charger()
+    assert len(premier.analyses()) == len(relu.analyses()) == 4
+    assert "Y" in [livre.isbn for livre, _ in premier.recommandations("W")]
+    for isbn in ("W", "X", "Y", "Z"):
+        # Les ex aequo peuvent sortir dans un autre ordre
+        assert sorted((livre.isbn, score) for livre, score in premier.recommandations(isbn)) == \
+            sorted((livre.isbn, score) for livre, score in relu.recommandations(isbn))
+    relu.fermer()
+    premier.fermer()
+
+
+def test_construction_abandonnee_apres_rechargement(tmp_path):
+    biblio = Bibliotheque(persistance="json", dossier=str(tmp_path))
+    biblio.charger()
+    construire = biblio.preparer_recommandations()
+    biblio.charger()
+    biblio.installer_recommandations(construire())
+    assert biblio._recommandations is None
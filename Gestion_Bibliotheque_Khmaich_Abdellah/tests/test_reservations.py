@@ -0,0 +1,47 @@
+import pytest
+from classes.bibliotheque import Bibliotheque
+from classes.exceptions import LivreIndisponibleError
+from classes.livre import Livre
+from classes.membre import Membre
+
+# Lancer depuis le dossier du projet : python -m pytest
+
+
+@pytest.fixture(params=["json", "journal", "sqlite"])
+def biblio(request, tmp_path):
+    biblio = Bibliotheque(persistance=request.param, dossier=str(tmp_path))
+    biblio.charger()
+    biblio.ajouter_livre(Livre("X", "Titre", "Auteur", 2000, "Roman"))
+    for id_membre in ("A", "B", "C"):
+        biblio.enregistrer_membre(Membre(id_membre, id_membre))
+    yield biblio
+    biblio.fermer()
+
+
+def test_retour_remet_le_livre_au_premier_de_la_file(biblio):
+    biblio.emprunter_livre("X", "A")
+    biblio.reserver_livre("X", "B")
+    biblio.reserver_livre("X", "C")
+    assert biblio.retourner_livre("X", "A") == "B"
+    assert biblio.livres["X"].statut == "réservé"
+    assert biblio.reservations_livre("X") == ("B", ["C"])
+    with pytest.raises(LivreIndisponibleError):
+        biblio.emprunter_livre("X", "C")
+
+
+def test_supprimer_emprunteur_remet_le_livre_a_la_file(biblio):
+    biblio.emprunter_livre("X", "A")
+    biblio.reserver_livre("X", "B")
+    assert biblio.supprimer_membre("A") == [("X", "B")]
+    assert biblio.livres["X"].statut == "réservé"
+    assert biblio.reservations_livre("X") == ("B", [])
+    with pytest.raises(LivreIndisponibleError):
+        biblio.emprunter_livre("X", "C")
+    biblio.emprunter_livre("X", "B")
+    assert biblio.livres["X"].statut == "emprunté"
+
+
+def test_supprimer_emprunteur_sans_file(biblio):
+    biblio.emprunter_livre("X", "A")
+    assert biblio.supprimer_membre("A") == [("X", None)]
+    assert biblio.livres["X"].statut == "disponible"
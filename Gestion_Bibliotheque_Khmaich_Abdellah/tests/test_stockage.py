@@ -0,0 +1,30 @@
+from classes.bibliotheque import Bibliotheque
+from classes.livre import Livre
+from classes.membre import Membre
+
+# Lancer depuis le dossier du projet : python -m pytest
+
+
+def ouvrir(dossier):
+    biblio = Bibliotheque(persistance="json", dossier=str(dossier))
+    biblio.charger()
+    return biblio
+
+
+def test_json_ecrit_a_la_sauvegarde_et_non_a_chaque_operation(tmp_path):
+    biblio = ouvrir(tmp_path)
+    biblio.ajouter_livre(Livre("X", "Titre", "Auteur", 2000, "Roman"))
+    biblio.enregistrer_membre(Membre("A", "A"))
+    assert not (tmp_path / "livres.json").exists()
+    biblio.sauvegarder()
+    autre = ouvrir(tmp_path)
+    biblio.emprunter_livre("X", "A")
+    assert autre.actualiser() == (set(), set())
+    biblio.sauvegarder()
+    assert autre.actualiser() == ({"X"}, {"A"})
+    assert autre.livres["X"].statut == "emprunté"
+    autre.fermer()
+    # Les modifications pas encore sauvegardées sont écrites à la fermeture
+    biblio.retourner_livre("X", "A")
+    biblio.fermer()
+    assert ouvrir(tmp_path).livres["X"].statut == "disponible"
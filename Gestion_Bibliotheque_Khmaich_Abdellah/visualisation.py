@@ -1,111 +1,274 @@
-import json
-import matplotlib.pyplot as plt
-from collections import Counter
-import csv
-from datetime import datetime, timedelta
-from matplotlib.figure import Figure
-from matplotlib.ticker import MaxNLocator
-from matplotlib import dates as mdates
-
-# Fonction utilitaire pour tronquer les noms trop longs
-def truncate_labels(labels, max_len=15):
-    return [label if len(label) <= max_len else label[:max_len-3] + '...' for label in labels]
-
-# Couleurs et polices cohérentes
-color_pie = ['#264653', '#2a9d8f', '#e9c46a', '#f4a261', '#e76f51']
-color_bar = '#2a9d8f'
-color_line = '#f4a261'
-font_family = 'Segoe UI'
-
-# 📊 1. Diagramme circulaire : % des livres par genre
-def genre_pie_chart_figure():
-    with open("data/livres.json", "r", encoding="utf-8") as f:
-        livres = json.load(f)
-    genres = [livre.get("genre", "Inconnu") for livre in livres.values()]
-    genre_counts = Counter(genres)
-
-    fig = Figure(figsize=(6, 6), facecolor='none')
-    ax = fig.add_subplot(111)
-    ax.pie(
-        genre_counts.values(),
-        labels=genre_counts.keys(),
-        autopct='%1.1f%%',
-        startangle=140,
-        colors=color_pie,
-        textprops={'fontsize': 11, 'fontname': font_family, 'color': "#e1e6e6"}
-    )
-    ax.set_title("Répartition des livres par genre", fontsize=16, fontweight='bold', fontname=font_family, color="#2CD0C0", pad=20)
-    return fig
-
-# 📊 2. Histogramme : Top 10 des auteurs
-def top_auteurs_bar_figure():
-    with open("data/livres.json", "r", encoding="utf-8") as f:
-        livres = json.load(f)
-    auteurs = [livre.get("auteur", "Inconnu") for livre in livres.values()]
-    auteur_counts = Counter(auteurs).most_common(10)
-    if auteur_counts:
-        noms, nb = zip(*auteur_counts)
-        noms = truncate_labels(noms, max_len=15)
-    else:
-        noms, nb = [], []
-
-    fig, ax = plt.subplots(figsize=(10, 4), facecolor='none')
-    ax.set_facecolor('none')
-
-    ax.bar(noms, nb, color=color_bar)
-    ax.set_xticks(range(len(noms)))  # Fixe les positions des ticks
-    ax.set_xticklabels(noms, rotation=90, fontsize=10, fontname=font_family, color="#EFF3F4")
-
-
-    ax.tick_params(axis='y', labelsize=10, labelcolor="#2B9DCA")
-    ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-
-    ax.set_title("Top 10 des auteurs les plus populaires", fontsize=16, fontweight='bold', fontname=font_family, color='#264653', pad=20)
-    ax.set_ylabel("Nombre de livres", fontsize=12, fontname=font_family, color="#2B9DCA")
-    fig.tight_layout(rect=[0, 0, 1, 0.95])
-
-    return fig
-
-# 📊 3. Courbe d'activité : nombre d'emprunts sur les 30 derniers jours
-def activite_emprunts_courbe_figure():
-    dates = []
-    with open("data/historique.csv", "r", encoding="utf-8") as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if len(row) < 4:
-                continue
-            date_str, _, _, action = row
-            if action == "emprunt":
-                try:
-                    date_obj = datetime.fromisoformat(date_str)
-                    if datetime.now() - date_obj <= timedelta(days=30):
-                        dates.append(date_obj.date())
-                except Exception:
-                    continue
-
-    date_counts = Counter(dates)
-    jours = [datetime.now().date() - timedelta(days=i) for i in range(29, -1, -1)]
-    valeurs = [date_counts.get(j, 0) for j in jours]
-
-    fig, ax = plt.subplots(figsize=(12, 6), facecolor='none')
-    ax.set_facecolor('none')
-
-    ax.plot(jours, valeurs, marker='o', linestyle='-', color=color_line, linewidth=2)
-
-    # ✅ Appliquer les styles cohérents
-    ax.set_title("Emprunts - 30 derniers jours", fontsize=18, fontweight='bold', fontname=font_family, color="#27B3EB", pad=25)
-    ax.set_xlabel("Date", fontsize=14, fontname=font_family, color='#264653')
-    ax.set_ylabel("Nombre d'emprunts", fontsize=14, fontname=font_family, color='#264653')
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-    
-    ax.set_xticks(jours)
-    ax.tick_params(axis='x', labelrotation=90, labelsize=11, labelcolor="#F2F5F6")
-    ax.tick_params(axis='y', labelsize=11, labelcolor="#F5F8FA")
-
-    # ✅ Forcer les entiers uniquement sur l’axe Y
-    ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-
-    ax.grid(True, linestyle='--', alpha=0.4)
-    fig.tight_layout(rect=[0, 0, 1, 0.95])
-
-    return fig
+import json
+from collections import Counter
+from datetime import datetime, timedelta
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.ticker import MaxNLocator
+from matplotlib import dates as mdates
+from classes.historique_partitions import historique_du_dossier
+from classes.mesures import instrumenter
+
+# Fonction utilitaire pour tronquer les noms trop longs
+def truncate_labels(labels, max_len=15):
+    return [label if len(label) <= max_len else label[:max_len-3] + '...' for label in labels]
+
+# Couleurs et polices cohérentes
+color_pie = ['#264653', '#2a9d8f', '#e9c46a', '#f4a261', '#e76f51']
+color_bar = '#2a9d8f'
+color_line = '#f4a261'
+font_family = 'Segoe UI'
+
+# Préparation des données des graphiques : lues dans les statistiques tenues à jour
+# par la bibliothèque (biblio.statistiques()) si fournies, sinon recalculées depuis les fichiers
+def donnees_genres(stats=None):
+    if stats is not None:
+        return dict(stats.genres.items())
+    with open("data/livres.json", "r", encoding="utf-8") as f:
+        livres = json.load(f)
+    return Counter(livre.get("genre", "Inconnu") for livre in livres.values())
+
+def donnees_top_auteurs(stats=None, n=10):
+    if stats is not None:
+        return stats.auteurs.plus_frequents(n)
+    with open("data/livres.json", "r", encoding="utf-8") as f:
+        livres = json.load(f)
+    return Counter(livre.get("auteur", "Inconnu") for livre in livres.values()).most_common(n)
+
+def donnees_emprunts_30_jours(stats=None):
+    if stats is not None:
+        return stats.emprunts_derniers_jours(30)
+    # Seules les partitions des 30 derniers jours de data/historique/ sont lues
+    jours = [datetime.now().date() - timedelta(days=i) for i in range(29, -1, -1)]
+    historique = historique_du_dossier("data")
+    try:
+        date_counts = Counter(date_str[:10] for date_str, _, _, action in historique.parcourir(debut=jours[0])
+                              if action == "emprunt")
+    finally:
+        historique.fermer()
+    return jours, [date_counts.get(j.isoformat(), 0) for j in jours]
+
+# 📊 1. Diagramme circulaire : % des livres par genre
+def genre_pie_chart_figure(stats=None, donnees=None, figsize=(6, 6)):
+    genre_counts = donnees if donnees is not None else donnees_genres(stats)
+
+    fig = Figure(figsize=figsize, facecolor='none')
+    ax = fig.add_subplot(111)
+    ax.pie(
+        genre_counts.values(),
+        labels=genre_counts.keys(),
+        autopct='%1.1f%%',
+        startangle=140,
+        colors=color_pie,
+        textprops={'fontsize': 11, 'fontname': font_family, 'color': "#e1e6e6"}
+    )
+    ax.set_title("Répartition des livres par genre", fontsize=16, fontweight='bold', fontname=font_family, color="#2CD0C0", pad=20)
+    return fig
+
+# 📊 2. Histogramme : Top 10 des auteurs
+def top_auteurs_bar_figure(stats=None, donnees=None, figsize=(10, 4)):
+    auteur_counts = donnees if donnees is not None else donnees_top_auteurs(stats, 10)
+    if auteur_counts:
+        noms, nb = zip(*auteur_counts)
+        noms = truncate_labels(noms, max_len=15)
+    else:
+        noms, nb = [], []
+
+    fig = Figure(figsize=figsize, facecolor='none')
+    ax = fig.add_subplot(111)
+    ax.set_facecolor('none')
+
+    ax.bar(noms, nb, color=color_bar)
+    ax.set_xticks(range(len(noms)))  # Fixe les positions des ticks
+    ax.set_xticklabels(noms, rotation=90, fontsize=10, fontname=font_family, color="#EFF3F4")
+
+
+    ax.tick_params(axis='y', labelsize=10, labelcolor="#2B9DCA")
+    ax.yaxis.set_major_locator(MaxNLocator(integer=True))
+
+    ax.set_title("Top 10 des auteurs les plus populaires", fontsize=16, fontweight='bold', fontname=font_family, color='#264653', pad=20)
+    ax.set_ylabel("Nombre de livres", fontsize=12, fontname=font_family, color="#2B9DCA")
+    fig.tight_layout(rect=[0, 0, 1, 0.95])
+
+    return fig
+
+# 📊 3. Courbe d'activité : nombre d'emprunts sur les 30 derniers jours
+def activite_emprunts_courbe_figure(stats=None, donnees=None, figsize=(12, 6)):
+    jours, valeurs = donnees if donnees is not None else donnees_emprunts_30_jours(stats)
+
+    fig = Figure(figsize=figsize, facecolor='none')
+    ax = fig.add_subplot(111)
+    ax.set_facecolor('none')
+
+    ax.plot(jours, valeurs, marker='o', linestyle='-', color=color_line, linewidth=2)
+
+    # ✅ Appliquer les styles cohérents
+    ax.set_title("Emprunts - 30 derniers jours", fontsize=18, fontweight='bold', fontname=font_family, color="#27B3EB", pad=25)
+    ax.set_xlabel("Date", fontsize=14, fontname=font_family, color='#264653')
+    ax.set_ylabel("Nombre d'emprunts", fontsize=14, fontname=font_family, color='#264653')
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
+    
+    ax.set_xticks(jours)
+    ax.tick_params(axis='x', labelrotation=90, labelsize=11, labelcolor="#F2F5F6")
+    ax.tick_params(axis='y', labelsize=11, labelcolor="#F5F8FA")
+
+    # ✅ Forcer les entiers uniquement sur l’axe Y
+    ax.yaxis.set_major_locator(MaxNLocator(integer=True))
+
+    ax.grid(True, linestyle='--', alpha=0.4)
+    fig.tight_layout(rect=[0, 0, 1, 0.95])
+
+    return fig
+
+# Analyses longue durée de tout l'historique (classes/analyses.py), lues auprès de la
+# bibliothèque (ou du client du serveur) si fournie, sinon calculées depuis data/historique/
+ANALYSES = {
+    "volumes_jour": "Emprunts et retours par jour",
+    "volumes_semaine": "Emprunts et retours par semaine",
+    "volumes_mois": "Emprunts et retours par mois",
+    "genres_temps": "Emprunts par genre et par mois",
+    "heures": "Emprunts par jour et par heure",
+    "durees": "Durée des emprunts",
+}
+
+def donnees_analyse(type_analyse, source=None):
+    if source is not None:
+        return source.donnees_analyse(type_analyse)
+    from classes.analyses import Analyses
+    genres = None
+    if type_analyse == "genres_temps":
+        with open("data/livres.json", "r", encoding="utf-8") as f:
+            genres = {isbn: livre.get("genre", "Inconnu") for isbn, livre in json.load(f).items()}
+    historique = historique_du_dossier("data")
+    try:
+        return Analyses.depuis_historique(historique).donnees(type_analyse, genres)
+    finally:
+        historique.fermer()
+
+def _style_axes(ax, titre, xlabel, ylabel):
+    ax.set_facecolor('none')
+    ax.set_title(titre, fontsize=16, fontweight='bold', fontname=font_family, color="#27B3EB", pad=20)
+    ax.set_xlabel(xlabel, fontsize=12, fontname=font_family, color="#2B9DCA")
+    ax.set_ylabel(ylabel, fontsize=12, fontname=font_family, color="#2B9DCA")
+    ax.tick_params(axis='both', labelsize=10, labelcolor="#F2F5F6")
+    ax.grid(True, linestyle='--', alpha=0.4)
+
+# 📊 4. Volumes d'emprunts et de retours par jour, semaine ou mois, sur tout l'historique
+def volumes_figure(donnees, figsize=(12, 6), titre="Emprunts et retours"):
+    periodes = [datetime.fromisoformat(p) for p in donnees["periodes"]]
+
+    fig = Figure(figsize=figsize, facecolor='none')
+    ax = fig.add_subplot(111)
+    ax.plot(periodes, donnees.get("emprunt", []), color=color_line, linewidth=1.5, label="Emprunts")
+    ax.plot(periodes, donnees.get("retour", []), color=color_bar, linewidth=1.5, label="Retours")
+    _style_axes(ax, titre, "Période", "Nombre")
+    ax.xaxis.set_major_locator(mdates.AutoDateLocator())
+    ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(ax.xaxis.get_major_locator()))
+    ax.yaxis.set_major_locator(MaxNLocator(integer=True))
+    ax.legend()
+    fig.tight_layout(rect=[0, 0, 1, 0.95])
+    return fig
+
+def volumes_jour_figure(stats=None, donnees=None, figsize=(12, 6)):
+    donnees = donnees if donnees is not None else donnees_analyse("volumes_jour")
+    return volumes_figure(donnees, figsize, ANALYSES["volumes_jour"])
+
+def volumes_semaine_figure(stats=None, donnees=None, figsize=(12, 6)):
+    donnees = donnees if donnees is not None else donnees_analyse("volumes_semaine")
+    return volumes_figure(donnees, figsize, ANALYSES["volumes_semaine"])
+
+def volumes_mois_figure(stats=None, donnees=None, figsize=(12, 6)):
+    donnees = donnees if donnees is not None else donnees_analyse("volumes_mois")
+    return volumes_figure(donnees, figsize, ANALYSES["volumes_mois"])
+
+# 📊 5. Popularité des genres dans le temps : aires empilées des emprunts mensuels
+def genres_temps_figure(stats=None, donnees=None, figsize=(12, 6), nb_genres=8):
+    donnees = donnees if donnees is not None else donnees_analyse("genres_temps")
+    periodes = [datetime.fromisoformat(p) for p in donnees["periodes"]]
+    # Les genres les moins empruntés sont regroupés dans "Autres"
+    series = sorted(zip(donnees["genres"], donnees["valeurs"]), key=lambda g: -sum(g[1]))
+    if len(series) > nb_genres:
+        autres = [sum(valeurs) for valeurs in zip(*(v for _, v in series[nb_genres - 1:]))]
+        series = series[:nb_genres - 1] + [("Autres", autres)]
+
+    fig = Figure(figsize=figsize, facecolor='none')
+    ax = fig.add_subplot(111)
+    if series:
+        noms, valeurs = zip(*series)
+        ax.stackplot(periodes, *valeurs, labels=truncate_labels(noms, max_len=20))
+        ax.legend(loc='upper left', fontsize=9)
+    _style_axes(ax, ANALYSES["genres_temps"], "Mois", "Emprunts")
+    ax.yaxis.set_major_locator(MaxNLocator(integer=True))
+    fig.tight_layout(rect=[0, 0, 1, 0.95])
+    return fig
+
+# 📊 6. Carte de chaleur : emprunts par jour de la semaine et par heure
+def heures_figure(stats=None, donnees=None, figsize=(12, 5)):
+    donnees = donnees if donnees is not None else donnees_analyse("heures")
+
+    fig = Figure(figsize=figsize, facecolor='none')
+    ax = fig.add_subplot(111)
+    image = ax.imshow(donnees["valeurs"], aspect='auto', cmap='viridis')
+    ax.set_yticks(range(len(donnees["jours"])))
+    ax.set_yticklabels(donnees["jours"], fontname=font_family)
+    ax.set_xticks(range(24))
+    ax.set_xticklabels([f"{h}h" for h in range(24)])
+    _style_axes(ax, ANALYSES["heures"], "Heure", "")
+    ax.grid(False)
+    fig.colorbar(image, ax=ax)
+    fig.tight_layout(rect=[0, 0, 1, 0.95])
+    return fig
+
+# 📊 7. Histogramme de la durée des emprunts rendus (la dernière barre regroupe les plus longs)
+def durees_figure(stats=None, donnees=None, figsize=(12, 6)):
+    donnees = donnees if donnees is not None else donnees_analyse("durees")
+    nombres = donnees["nombres"]
+
+    fig = Figure(figsize=figsize, facecolor='none')
+    ax = fig.add_subplot(111)
+    ax.bar(range(len(nombres)), nombres, color=color_bar)
+    titre = ANALYSES["durees"]
+    if donnees["nombre"]:
+        titre += f" (moyenne {donnees['moyenne']:.1f} j, médiane {donnees['mediane']:.1f} j)"
+    _style_axes(ax, titre, "Jours", "Emprunts")
+    ax.yaxis.set_major_locator(MaxNLocator(integer=True))
+    fig.tight_layout(rect=[0, 0, 1, 0.95])
+    return fig
+
+# Rendu hors de l'interface : les figures sont créées sans pyplot et dessinées par Agg,
+# ce qui permet de les préparer sur un thread pendant que Tkinter reste réactif
+figures_graphiques = {
+    "genres": genre_pie_chart_figure,
+    "auteurs": top_auteurs_bar_figure,
+    "emprunts": activite_emprunts_courbe_figure,
+    "volumes_jour": volumes_jour_figure,
+    "volumes_semaine": volumes_semaine_figure,
+    "volumes_mois": volumes_mois_figure,
+    "genres_temps": genres_temps_figure,
+    "heures": heures_figure,
+    "durees": durees_figure,
+}
+
+@instrumenter("visualisation.donnees_graphique")
+def donnees_graphique(type_chart, stats=None, source=None):
+    # Copie des données d'un graphique (à faire sur le thread de l'interface, qui modifie stats).
+    # source : bibliothèque (ou client) qui fournit les données des analyses
+    if type_chart in ANALYSES:
+        return donnees_analyse(type_chart, source)
+    if type_chart == "auteurs":
+        return donnees_top_auteurs(stats, 10)
+    if type_chart == "emprunts":
+        return donnees_emprunts_30_jours(stats)
+    return dict(donnees_genres(stats))
+
+@instrumenter("visualisation.rendre_graphique")
+def rendre_graphique(type_chart, donnees, largeur=None, hauteur=None, dpi=100):
+    # Construit et dessine la figure ; renvoie (figure, renderer Agg contenant l'image)
+    fonction = figures_graphiques.get(type_chart, genre_pie_chart_figure)
+    if largeur and hauteur:
+        fig = fonction(donnees=donnees, figsize=(largeur / dpi, hauteur / dpi))
+    else:
+        fig = fonction(donnees=donnees)
+    fig.set_dpi(dpi)
+    canvas = FigureCanvasAgg(fig)
+    canvas.draw()
+    return fig, canvas.get_renderer()